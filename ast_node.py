@@ -1,5 +1,4 @@
 from enum import Enum, auto
-from dataclasses import dataclass
 from oberon_types import *
 
 class Operation(Enum):
@@ -14,7 +13,7 @@ class Operation(Enum):
     LOGICAL_NOT = "~"
     UNION_FOR_SET = "+ (для множеств)"
     DIFFERENCE_FOR_SET = "- (для множеств)"
-    INTERSECTION_FOR_SET = "- (для множеств)"
+    INTERSECTION_FOR_SET = "* (для множеств)"
     SYMMETRIC_SET_DIFFERENCE = "/ (для множеств)"
     equal = "="
     unequal = "#"
@@ -27,74 +26,260 @@ class Operation(Enum):
     procedure_call = "вызов процедуры"
     get_var_value = "получение значения переменной"
     get_const_value = "получение значения константы"
+    set_constructor = "построение множества"
+    set_range = "диапазон элементов множества"
+    field_access = "доступ к полю записи"
+    index = "индексирование массива"
+    dereference = "разыменование указателя"
+    type_guard = "охрана типа"
 
 
-class AstNode:
+# Узлы дерева используют __slots__: дерево большого модуля содержит
+# миллионы узлов, а без __dict__ каждый узел в разы меньше.
+# _children - имена слотов с дочерними узлами (или списками узлов),
+# по ним обходит дерево функция walk.
+class Node:
+    __slots__ = ()
+    _children: tuple[str, ...] = ()
+
+
+class AstNode(Node):
+    __slots__ = ("value",)
+
     def __init__(self, value: Operation = None) -> None:
         self.value = value
 
 
-class Statement:
-    pass
+class LiteralValue(AstNode):
+    __slots__ = ("literal",)
 
+    # literal: int, float, str, bool; None - это NIL
+    def __init__(self, literal: int | float | str | bool | None) -> None:
+        super().__init__(Operation.get_const_value)
+        self.literal = literal
 
-@dataclass
-class Assignment(Statement):
-    var: CompositeIdentifier
-    expression: AstNode
+
+class UnaryOperation(AstNode):
+    __slots__ = ("operand",)
+    _children = ("operand",)
+
+    def __init__(self, value: Operation, operand: AstNode) -> None:
+        super().__init__(value)
+        self.operand = operand
+
+
+class BinaryOperation(AstNode):
+    __slots__ = ("left", "right")
+    _children = ("left", "right")
+
+    def __init__(self, value: Operation, left: AstNode, right: AstNode) -> None:
+        super().__init__(value)
+        self.left = left
+        self.right = right
+
+
+class SetRange(AstNode):
+    __slots__ = ("low", "high")
+    _children = ("low", "high")
+
+    def __init__(self, low: AstNode, high: AstNode) -> None:
+        super().__init__(Operation.set_range)
+        self.low = low
+        self.high = high
+
+
+class SetConstructor(AstNode):
+    __slots__ = ("elements",)
+    _children = ("elements",)
+
+    def __init__(self, elements: list[AstNode]) -> None:
+        super().__init__(Operation.set_constructor)
+        self.elements = elements
+
+
+class FieldSelector(AstNode):
+    __slots__ = ("field_name",)
+
+    def __init__(self, field_name: str) -> None:
+        super().__init__(Operation.field_access)
+        self.field_name = field_name
+
+
+class IndexSelector(AstNode):
+    __slots__ = ("indexes",)
+    _children = ("indexes",)
+
+    def __init__(self, indexes: list[AstNode]) -> None:
+        super().__init__(Operation.index)
+        self.indexes = indexes
+
+
+class DereferenceSelector(AstNode):
+    __slots__ = ()
+
+    def __init__(self) -> None:
+        super().__init__(Operation.dereference)
+
+
+class TypeGuardSelector(AstNode):
+    __slots__ = ("type_name", "guard_type")
+
+    def __init__(self, type_name: CompositeIdentifier, guard_type: OberonType | None = None) -> None:
+        super().__init__(Operation.type_guard)
+        self.type_name = type_name
+        self.guard_type = guard_type
 
 
-@dataclass
-class ProcedureActualParameterCalculation:
-    by_ref: bool
-    code: AstNode
+class Designator(AstNode):
+    __slots__ = ("name", "entity", "selectors")
+    _children = ("selectors",)
+
+    # entity - объект из таблицы имен (переменная, константа, процедура...)
+    def __init__(self, name: CompositeIdentifier, entity=None, selectors: list[AstNode] | None = None) -> None:
+        super().__init__(Operation.get_var_value)
+        self.name = name
+        self.entity = entity
+        self.selectors = selectors if selectors is not None else []
+
+
+class ProcedureActualParameterCalculation(Node):
+    __slots__ = ("by_ref", "code")
+    _children = ("code",)
+
+    def __init__(self, by_ref: bool, code: AstNode) -> None:
+        self.by_ref = by_ref
+        self.code = code
+
+
+class FunctionCall(AstNode):
+    __slots__ = ("procedure", "actual_parameters")
+    _children = ("procedure", "actual_parameters")
+
+    def __init__(self, procedure: Designator, actual_parameters: list[ProcedureActualParameterCalculation]) -> None:
+        super().__init__(Operation.procedure_call)
+        self.procedure = procedure
+        self.actual_parameters = actual_parameters
+
+
+class Statement(Node):
+    __slots__ = ()
+
+
+class Assignment(Statement):
+    __slots__ = ("var", "expression")
+    _children = ("var", "expression")
+
+    def __init__(self, var: Designator, expression: AstNode) -> None:
+        self.var = var
+        self.expression = expression
 
 
 class ProcedureCall(Statement):
-    actual_parameters: list[ProcedureActualParameterCalculation]
-    code: AstNode
+    __slots__ = ("procedure", "actual_parameters")
+    _children = ("procedure", "actual_parameters")
+
+    def __init__(self, procedure: Designator, actual_parameters: list[ProcedureActualParameterCalculation]) -> None:
+        self.procedure = procedure
+        self.actual_parameters = actual_parameters
 
 
+# ELSIF представляется вложенным IF в else_code
 class IF(Statement):
-    condition: AstNode
-    code: AstNode
-    else_code: AstNode
+    __slots__ = ("condition", "code", "else_code")
+    _children = ("condition", "code", "else_code")
 
+    def __init__(self, condition: AstNode, code: list[Statement], else_code: list[Statement] | None = None) -> None:
+        self.condition = condition
+        self.code = code
+        self.else_code = else_code
 
-@dataclass
-class IntRange:
-    start: int
-    end: int
 
+class IntRange(Node):
+    __slots__ = ("start", "end")
 
-@dataclass
-class CaseLabel:
-    value: int | IntRange | str | CompositeIdentifier
+    def __init__(self, start: int | str, end: int | str) -> None:
+        self.start = start
+        self.end = end
 
 
-@dataclass
-class CaseBranch:
-    labels: list[CaseLabel]
-    code: AstNode
+class CaseLabel(Node):
+    __slots__ = ("value",)
+
+    # value - целое, символ, диапазон или тип записи (CASE по типу)
+    def __init__(self, value: int | IntRange | str | OberonType) -> None:
+        self.value = value
+
+
+class CaseBranch(Node):
+    __slots__ = ("labels", "code")
+    _children = ("code",)
+
+    def __init__(self, labels: list[CaseLabel], code: list[Statement]) -> None:
+        self.labels = labels
+        self.code = code
 
 
 class CASE(Statement):
-    branches: list[CaseBranch]
+    __slots__ = ("expression", "branches")
+    _children = ("expression", "branches")
+
+    def __init__(self, expression: AstNode, branches: list[CaseBranch]) -> None:
+        self.expression = expression
+        self.branches = branches
+
 
+class WhileBranch(Node):
+    __slots__ = ("condition", "code")
+    _children = ("condition", "code")
+
+    def __init__(self, condition: AstNode, code: list[Statement]) -> None:
+        self.condition = condition
+        self.code = code
 
-@dataclass
-class WhileBranch:
-    condition: AstNode
-    code: AstNode
 
 class WHILE(Statement):
-    branches: list[WhileBranch]
+    __slots__ = ("branches",)
+    _children = ("branches",)
+
+    def __init__(self, branches: list[WhileBranch]) -> None:
+        self.branches = branches
 
 
 class REPEAT(Statement):
-    condition: AstNode
-    
+    __slots__ = ("code", "condition")
+    _children = ("code", "condition")
+
+    def __init__(self, code: list[Statement], condition: AstNode) -> None:
+        self.code = code
+        self.condition = condition
 
 
 class FOR(Statement):
-    pass
+    __slots__ = ("variable", "start", "end", "step", "code")
+    _children = ("variable", "start", "end", "step", "code")
+
+    # step - константное выражение после BY или None
+    def __init__(self, variable: Designator, start: AstNode, end: AstNode,
+                 step: AstNode | None, code: list[Statement]) -> None:
+        self.variable = variable
+        self.start = start
+        self.end = end
+        self.step = step
+        self.code = code
+
+
+# Обход дерева в прямом порядке без рекурсии, поэтому глубина дерева
+# не ограничена глубиной стека интерпретатора
+def walk(root: Node | list[Node]):
+    stack = list(reversed(root)) if isinstance(root, list) else [root]
+    while stack:
+        node = stack.pop()
+        yield node
+        for name in reversed(node._children):
+            child = getattr(node, name)
+            if child is None:
+                continue
+            if isinstance(child, list):
+                stack.extend(reversed(child))
+            else:
+                stack.append(child)
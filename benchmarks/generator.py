@@ -0,0 +1,181 @@
+import random
+from dataclasses import dataclass, asdict
+
+
+# Параметры синтетического модуля. Одинаковые параметры и seed всегда
+# дают один и тот же текст, поэтому результаты замеров сравнимы
+@dataclass
+class GeneratorConfig:
+    declarations: int = 100
+    procedures: int = 50
+    statements_per_procedure: int = 8
+    expression_depth: int = 3
+    line_length: int = 80
+    comment_density: float = 0.1
+    seed: int = 0
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+PRESETS: dict[str, GeneratorConfig] = {
+    "small": GeneratorConfig(declarations=50, procedures=20),
+    "medium": GeneratorConfig(declarations=500, procedures=300),
+    "large": GeneratorConfig(declarations=5000, procedures=3000),
+    "long_lines": GeneratorConfig(declarations=500, procedures=300, line_length=100000),
+    "deep_expressions": GeneratorConfig(declarations=100, procedures=100, expression_depth=12),
+}
+
+_ARITHMETIC_OPERATIONS = ["+", "-", "*", "DIV", "MOD"]
+_COMPARISONS = ["=", "#", "<", "<=", ">", ">="]
+_COMMENT_WORDS = ["счетчик", "проверка", "цикл", "значение", "индекс", "результат"]
+
+
+class _ModuleGenerator:
+    def __init__(self, config: GeneratorConfig) -> None:
+        self._config = config
+        self._random = random.Random(config.seed)
+        self._lines: list[str] = []
+        self._current_line = ""
+        self._constants = [f"c{i}" for i in range(max(1, config.declarations // 4))]
+        self._globals = [f"g{i}" for i in range(max(1, config.declarations - len(self._constants)))]
+        self._procedures: list[str] = []
+        self._locals: list[str] = []
+
+    # Текст собирается из фрагментов, перенос строки - когда строка
+    # длиннее line_length, поэтому длину строк можно задавать произвольно
+    def _emit(self, fragment: str):
+        if self._current_line and len(self._current_line) + len(fragment) + 1 > self._config.line_length:
+            self._new_line()
+        self._current_line += (" " if self._current_line else "") + fragment
+        if self._random.random() < self._config.comment_density:
+            words = self._random.sample(_COMMENT_WORDS, 2)
+            self._current_line += f" (* {' '.join(words)} *)"
+
+    def _new_line(self):
+        if self._current_line:
+            self._lines.append(self._current_line)
+        self._current_line = ""
+
+    def _variables(self) -> list[str]:
+        return self._locals + self._globals
+
+    def _operand(self) -> str:
+        choice = self._random.random()
+        if choice < 0.5:
+            return self._random.choice(self._variables())
+        if choice < 0.7:
+            return self._random.choice(self._constants)
+        if choice < 0.8:
+            return f"arr[{self._random.randrange(16)}]"
+        return str(self._random.randrange(1000))
+
+    def _expression(self, depth: int) -> str:
+        if depth <= 0:
+            return self._operand()
+        operation = self._random.choice(_ARITHMETIC_OPERATIONS)
+        left = self._expression(depth - 1)
+        if operation in ("DIV", "MOD"):
+            right = str(self._random.randrange(1, 100))
+        elif operation == "*":
+            # множитель - переменная, чтобы свертка констант
+            # не приводила к переполнению INTEGER
+            right = self._random.choice(self._variables())
+        else:
+            right = self._expression(self._random.randrange(depth))
+        return f"({left} {operation} {right})"
+
+    def _condition(self) -> str:
+        depth = max(0, self._config.expression_depth - 1)
+        comparison = self._random.choice(_COMPARISONS)
+        return f"{self._expression(depth)} {comparison} {self._expression(depth)}"
+
+    def _statement(self, nesting: int):
+        variable = self._random.choice(self._variables())
+        kind = self._random.random() if nesting < 2 else 0.0
+        if kind < 0.45:
+            self._emit(f"{variable} := {self._expression(self._config.expression_depth)}")
+        elif kind < 0.55 and self._procedures:
+            procedure = self._random.choice(self._procedures)
+            argument = self._random.choice(self._variables())
+            self._emit(f"{variable} := {procedure}({self._operand()}, {argument})")
+        elif kind < 0.7:
+            self._emit(f"IF {self._condition()} THEN")
+            self._statement_sequence(nesting + 1, 2)
+            self._emit(f"ELSIF {self._condition()} THEN")
+            self._statement_sequence(nesting + 1, 1)
+            self._emit("ELSE")
+            self._statement_sequence(nesting + 1, 1)
+            self._emit("END")
+        elif kind < 0.8:
+            self._emit(f"WHILE {variable} > 0 DO")
+            self._emit(f"{variable} := {variable} - 1")
+            self._emit("END")
+        elif kind < 0.87:
+            self._emit("REPEAT")
+            self._emit(f"{variable} := {variable} + 1")
+            self._emit(f"UNTIL {variable} > {self._random.randrange(100)}")
+        elif kind < 0.94:
+            self._emit(f"FOR {variable} := 0 TO {self._random.randrange(1, 100)} DO")
+            self._statement_sequence(nesting + 1, 1)
+            self._emit("END")
+        else:
+            self._emit(f"CASE {variable} MOD 3 OF")
+            self._emit("0:")
+            self._statement_sequence(nesting + 1, 1)
+            self._emit("| 1, 2:")
+            self._statement_sequence(nesting + 1, 1)
+            self._emit("END")
+
+    def _statement_sequence(self, nesting: int, count: int):
+        for i in range(count):
+            self._statement(nesting)
+            if i != count - 1:
+                self._current_line += ";"
+
+    def _procedure(self, index: int):
+        name = f"P{index}"
+        self._new_line()
+        self._emit(f"PROCEDURE {name}*(x: INTEGER; VAR y: INTEGER): INTEGER;")
+        self._new_line()
+        self._emit("VAR t, u: INTEGER;")
+        self._new_line()
+        self._locals = ["x", "y", "t", "u"]
+        self._emit("BEGIN")
+        self._statement_sequence(0, self._config.statements_per_procedure)
+        self._emit(f"RETURN {self._expression(self._config.expression_depth)}")
+        self._new_line()
+        self._emit(f"END {name};")
+        self._new_line()
+        self._locals = []
+        self._procedures.append(name)
+
+    def generate(self, module_name: str) -> str:
+        self._emit(f"MODULE {module_name};")
+        self._new_line()
+        self._emit("IMPORT Log;")
+        self._new_line()
+        self._emit("CONST")
+        for i, name in enumerate(self._constants):
+            self._emit(f"{name}* = {i % 16 + 1};")
+        self._new_line()
+        self._emit("TYPE Vector* = ARRAY 16 OF INTEGER;")
+        self._new_line()
+        self._emit("VAR arr: ARRAY 16 OF INTEGER;")
+        for name in self._globals:
+            self._emit(f"{name}*: INTEGER;")
+        self._new_line()
+        for i in range(self._config.procedures):
+            self._procedure(i)
+        self._emit("BEGIN")
+        self._statement_sequence(0, max(1, self._config.statements_per_procedure))
+        self._emit(";")
+        self._emit(f"Log.Int({self._globals[0]}); Log.Ln")
+        self._new_line()
+        self._emit(f"END {module_name}.")
+        self._new_line()
+        return "\n".join(self._lines) + "\n"
+
+
+def generate_module(config: GeneratorConfig | None = None, module_name: str = "Bench") -> str:
+    return _ModuleGenerator(config or GeneratorConfig()).generate(module_name)
@@ -0,0 +1,55 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from lexer import Lexer, Lex
+
+
+def make_large_module(procedures_count: int) -> str:
+    result = "MODULE Big;\n\nIMPORT Log;\n\nVAR\n    a, b, c: INTEGER;\n    r: REAL;\n\n"
+    for i in range(procedures_count):
+        result += (
+            f"PROCEDURE Proc{i}(VAR x: INTEGER; y: INTEGER): BOOLEAN;\n"
+            f"(* процедура номер {i} *)\n"
+            "VAR\n    t: INTEGER;\n"
+            "BEGIN\n"
+            f"    t := x * {i} + y DIV 2 - 0FFH;\n"
+            "    IF (t >= 10) & (t <= 100) THEN\n"
+            "        x := t MOD 7\n"
+            "    ELSIF t # 0 THEN\n"
+            "        r := 3.14E+2\n"
+            "    END;\n"
+            "    Log.String(\"proc\"); Log.Ln\n"
+            f"    RETURN t > {i}\n"
+            f"END Proc{i};\n\n"
+        )
+    result += "BEGIN\n    a := 1\nEND Big.\n"
+    return result
+
+
+def count_tokens(program: str) -> int:
+    lexer = Lexer(program)
+    count = 0
+    while lexer.lex != Lex.end_of_text:
+        count += 1
+        lexer.get_next()
+    return count
+
+
+def main():
+    procedures_count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    program = make_large_module(procedures_count)
+    best = None
+    for _ in range(3):
+        start = time.perf_counter()
+        tokens = count_tokens(program)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"строк: {program.count(chr(10))}, лексем: {tokens}")
+    print(f"время: {best:.3f} c, лексем/с: {tokens / best:.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from syntax_analyzer import Parser
+
+
+def make_module(declarations_count: int) -> str:
+    result = "MODULE Names;\n\nVAR\n"
+    for i in range(declarations_count):
+        result += f"    v{i}: INTEGER;\n"
+    result += "\nBEGIN\n    v0 := 0"
+    for i in range(1, declarations_count):
+        result += f";\n    v{i} := v{i - 1} + 1"
+    result += "\nEND Names.\n"
+    return result
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10000, 20000, 50000, 100000]
+    for declarations_count in sizes:
+        program = make_module(declarations_count)
+        start = time.perf_counter()
+        Parser(program)
+        elapsed = time.perf_counter() - start
+        print(f"объявлений: {declarations_count:>7}, время: {elapsed:.3f} c, "
+              f"мкс на объявление: {elapsed / declarations_count * 1e6:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT_DIR)
+
+from benchmarks.generator import GeneratorConfig, PRESETS, generate_module
+from lexer import Lexer, Lex
+from nametable import Nametable, NameTableEntry, Variable
+from oberon_types import Identifier
+from syntax_analyzer import Parser
+from token_stream import TokenStream
+from universe import INTEGER_TYPE, UNIVERSE
+
+
+def _lex_only(program: str) -> int:
+    lexer = Lexer(program)
+    count = 0
+    while lexer.lex != Lex.end_of_text:
+        count += 1
+        lexer.get_next()
+    return count
+
+
+def _tokenize(program: str) -> int:
+    return len(TokenStream(program))
+
+
+def _parse_tokens(stream: TokenStream):
+    Parser(stream)
+
+
+def _compile(program: str):
+    Parser(program)
+
+
+def _interface(program: str):
+    Parser(program, interface_only=True).exported_entries()
+
+
+def _nametable_operations(declarations_count: int) -> int:
+    nametable = Nametable(UNIVERSE)
+    names = [Identifier(f"v{i}", False) for i in range(declarations_count)]
+    for name in names:
+        nametable.add_entry(NameTableEntry(name, Variable(name.name, INTEGER_TYPE)))
+    operations = declarations_count
+    for i in range(0, declarations_count, 10):
+        nametable.open_scope()
+        nametable.add_entry(NameTableEntry(names[i], Variable(names[i].name, INTEGER_TYPE)))
+        for name in names[i:i + 10]:
+            nametable.lookup(name)
+        nametable.lookup("INTEGER")
+        nametable.close_scope()
+        operations += 14
+    return operations
+
+
+# units - число обработанных единиц (лексем, операций) для расчета
+# пропускной способности; если не задано, его возвращает сама функция
+def _measure(function, argument, repeat: int, units: int | None = None) -> dict:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(argument)
+        timings.append(time.perf_counter() - start)
+        if units is None:
+            units = result
+    best = min(timings)
+    result = {
+        "seconds_min": best,
+        "seconds_mean": sum(timings) / len(timings),
+        "repeat": repeat,
+    }
+    if units:
+        result["units"] = units
+        result["units_per_second"] = units / best if best > 0 else None
+    return result
+
+
+def run_benchmarks(config: GeneratorConfig, repeat: int = 3) -> dict:
+    program = generate_module(config)
+    stream = TokenStream(program)
+    results = {
+        "lexer": _measure(_lex_only, program, repeat),
+        "tokenize": _measure(_tokenize, program, repeat),
+        "parser": _measure(_parse_tokens, stream, repeat, len(stream)),
+        "pipeline": _measure(_compile, program, repeat, len(stream)),
+        "interface": _measure(_interface, program, repeat, len(stream)),
+        "nametable": _measure(_nametable_operations, max(config.declarations, 10), repeat),
+    }
+    return {
+        "config": config.to_dict(),
+        "source_bytes": len(program.encode()),
+        "source_lines": program.count("\n"),
+        "tokens": len(stream),
+        "results": results,
+    }
+
+
+# Запуск "oberon.py check" отдельным процессом: время процесса целиком и
+# время импорта по -X importtime (сумма собственных времен модулей), а также
+# загруженные модули компилятора - сборка, кеш и бэкенды среди них быть не должны
+def measure_startup(path_to_file: str, repeat: int = 3) -> dict:
+    command = [sys.executable, "-X", "importtime", os.path.join(ROOT_DIR, "oberon.py"), "check", path_to_file]
+    timings = []
+    import_timings = []
+    modules = set()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        completed = subprocess.run(command, capture_output=True, text=True)
+        timings.append(time.perf_counter() - start)
+        import_microseconds = 0
+        for line in completed.stderr.splitlines():
+            if not line.startswith("import time:") or "[us]" in line:
+                continue
+            self_time, _, name = line[len("import time:"):].split("|")
+            import_microseconds += int(self_time)
+            name = name.strip()
+            if os.path.isfile(os.path.join(ROOT_DIR, name + ".py")):
+                modules.add(name)
+        import_timings.append(import_microseconds / 1e6)
+    return {
+        "seconds_min": min(timings),
+        "seconds_mean": sum(timings) / len(timings),
+        "import_seconds_min": min(import_timings),
+        "repeat": repeat,
+        "modules": sorted(modules),
+    }
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _print_comparison(report: dict, baseline: dict):
+    for preset, current in report["presets"].items():
+        previous = baseline.get("presets", {}).get(preset)
+        if previous is None:
+            continue
+        for name, result in current["results"].items():
+            old = previous["results"].get(name)
+            if old is None:
+                continue
+            ratio = result["seconds_min"] / old["seconds_min"] if old["seconds_min"] else float("nan")
+            print(f"{preset:>18} {name:>10}: {old['seconds_min']:.4f} c -> {result['seconds_min']:.4f} c ({ratio:.2f}x)",
+                  file=sys.stderr)
+    if "startup" in report and "startup" in baseline:
+        old, new = baseline["startup"], report["startup"]
+        print(f"{'startup':>18} {'check':>10}: {old['seconds_min']:.4f} c -> {new['seconds_min']:.4f} c, "
+              f"импорт {old['import_seconds_min']:.4f} c -> {new['import_seconds_min']:.4f} c", file=sys.stderr)
+
+
+def main(argv: list[str] | None = None) -> int:
+    argument_parser = argparse.ArgumentParser(description="Замеры производительности компилятора")
+    argument_parser.add_argument("--preset", action="append", choices=sorted(PRESETS),
+                                 help="набор параметров модуля (можно указать несколько)")
+    argument_parser.add_argument("--seed", type=int, default=0)
+    argument_parser.add_argument("--repeat", type=int, default=3)
+    argument_parser.add_argument("--output", help="файл для результатов в формате JSON")
+    argument_parser.add_argument("--baseline", help="JSON с прошлыми результатами для сравнения")
+    argument_parser.add_argument("--startup", nargs="?", const=os.path.join(ROOT_DIR, "code_samples", "1.oberon07"),
+                                 metavar="FILE", help="замерить запуск oberon.py check (по умолчанию на примере)")
+    args = argument_parser.parse_args(argv)
+
+    presets = args.preset or ["small", "medium"]
+    report = {
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.time(),
+        "presets": {},
+    }
+    for preset in presets:
+        config = GeneratorConfig(**{**PRESETS[preset].to_dict(), "seed": args.seed})
+        report["presets"][preset] = run_benchmarks(config, args.repeat)
+    if args.startup:
+        report["startup"] = measure_startup(args.startup, args.repeat)
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.baseline:
+        with open(args.baseline) as f:
+            _print_comparison(report, json.load(f))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
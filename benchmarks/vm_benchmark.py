@@ -0,0 +1,159 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bytecode_compiler import compile_module
+from syntax_analyzer import Parser
+from transpiler import PythonModule, load_code
+from vm import VM
+
+
+# Вычислительные ядра на Обероне и такие же функции на Python:
+# по отношению времени видно, во сколько раз ВМ и трансляция в Python
+# медленнее написанного вручную кода на Python на той же работе
+KERNELS_MODULE = """
+MODULE Kernels;
+
+VAR primes: ARRAY 100000 OF BOOLEAN;
+
+PROCEDURE Sum*(n: INTEGER): INTEGER;
+VAR i, s: INTEGER;
+BEGIN
+    s := 0;
+    FOR i := 1 TO n DO s := s + i * 7 MOD 11 END
+    RETURN s
+END Sum;
+
+PROCEDURE Sieve*(n: INTEGER): INTEGER;
+VAR i, j, count: INTEGER;
+BEGIN
+    FOR i := 2 TO n - 1 DO primes[i] := TRUE END;
+    count := 0;
+    i := 2;
+    WHILE i < n DO
+        IF primes[i] THEN
+            INC(count);
+            IF i <= n DIV i THEN
+                j := i * i;
+                WHILE j < n DO primes[j] := FALSE; j := j + i END
+            END
+        END;
+        INC(i)
+    END
+    RETURN count
+END Sieve;
+
+PROCEDURE Gcd(a, b: INTEGER): INTEGER;
+VAR t: INTEGER;
+BEGIN
+    WHILE b # 0 DO t := a MOD b; a := b; b := t END
+    RETURN a
+END Gcd;
+
+PROCEDURE GcdSum*(n: INTEGER): INTEGER;
+VAR i, s: INTEGER;
+BEGIN
+    s := 0;
+    FOR i := 1 TO n DO s := s + Gcd(i, 360) END
+    RETURN s
+END GcdSum;
+
+PROCEDURE Fib*(n: INTEGER): INTEGER;
+VAR res: INTEGER;
+BEGIN
+    IF n < 2 THEN res := n ELSE res := Fib(n - 1) + Fib(n - 2) END
+    RETURN res
+END Fib;
+
+END Kernels.
+"""
+
+
+def python_sum(n: int) -> int:
+    s = 0
+    for i in range(1, n + 1):
+        s = s + i * 7 % 11
+    return s
+
+
+def python_sieve(n: int) -> int:
+    primes = [False] * 100000
+    for i in range(2, n):
+        primes[i] = True
+    count = 0
+    i = 2
+    while i < n:
+        if primes[i]:
+            count += 1
+            if i <= n // i:
+                j = i * i
+                while j < n:
+                    primes[j] = False
+                    j = j + i
+        i += 1
+    return count
+
+
+def python_gcd(a: int, b: int) -> int:
+    while b != 0:
+        a, b = b, a % b
+    return a
+
+
+def python_gcd_sum(n: int) -> int:
+    s = 0
+    for i in range(1, n + 1):
+        s = s + python_gcd(i, 360)
+    return s
+
+
+def python_fib(n: int) -> int:
+    return n if n < 2 else python_fib(n - 1) + python_fib(n - 2)
+
+
+KERNELS = [
+    ("Sum", 200000, python_sum),
+    ("Sieve", 100000, python_sieve),
+    ("GcdSum", 50000, python_gcd_sum),
+    ("Fib", 20, python_fib),
+]
+
+
+def _best_time(function, argument, repeat: int) -> tuple[float, object]:
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(argument)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    module = compile_module(Parser(KERNELS_MODULE))
+    instructions = sum(len(function.code) // 2 for function in module.functions)
+    print(f"байт-код: функций {len(module.functions)}, команд {instructions}, констант {len(module.constants)}")
+    vm = VM(module)
+    vm.run()
+    start = time.perf_counter()
+    transpiled = PythonModule(load_code(KERNELS_MODULE))
+    print(f"трансляция в Python: {time.perf_counter() - start:.3f} c")
+    transpiled.run()
+    for name, argument, python_function in KERNELS:
+        vm_time, vm_result = _best_time(lambda n: vm.call(name, n), argument, repeat)
+        transpiled_time, transpiled_result = _best_time(lambda n: transpiled.call(name, n), argument, repeat)
+        python_time, python_result = _best_time(python_function, argument, repeat)
+        if vm_result != python_result or transpiled_result != python_result:
+            raise Exception(f"{name}: результаты ВМ {vm_result} и трансляции {transpiled_result} "
+                            f"не совпадают с {python_result}")
+        print(f"{name:>7}({argument}): ВМ {vm_time:.3f} c (x{vm_time / python_time:.1f}), "
+              f"трансляция {transpiled_time:.3f} c (x{transpiled_time / python_time:.1f}), "
+              f"Python {python_time:.3f} c")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+import hashlib
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import NamedTuple
+
+from lexer import Lexer, Lex
+from syntax_analyzer import Diagnostic, Parser
+from symbol_file import LIBRARY_DIR, encode_interface, find_symbol_file, write_symbol_file
+from compile_cache import CompilationCache, make_cache_key
+from source_input import StreamingLexer, file_hash, is_large_source, source_chunks
+from stats import CompileStats
+from token_stream import TokenStream
+
+
+SOURCE_EXTENSION = ".oberon07"
+DEFAULT_SYMBOL_DIR = ".oberon_sym"
+TOKENS_CACHE_TAG = "tokens"
+
+
+class ModuleInfo(NamedTuple):
+    path: str
+    name: str | None
+    imports: list[str]
+    source_hash: str
+
+
+# экспортированное имя модуля и вид объявления (Constant, Procedure, RecordType...)
+class ExportedName(NamedTuple):
+    name: str
+    kind: str
+
+
+# результат компиляции одного модуля; он же хранится в кеше компиляции
+# и передается между процессами, поэтому в нем нет таблицы имен и деревьев
+# процедур (глубокие выражения не сериализуются pickle).
+# error - все сообщения об ошибках, diagnostics - они же с позициями
+class CompiledModule(NamedTuple):
+    module_name: str | None
+    error: str | None
+    interface: bytes | None
+    exports: list[ExportedName]
+    diagnostics: list[Diagnostic] = []
+
+
+def read_source(path_to_file: str) -> str:
+    with open(path_to_file) as f:
+        return f.read()
+
+
+# Очень большие файлы не читаются в память целиком: лексер получает
+# текст кусками (см. source_input.py)
+def open_source(path_to_file: str) -> str | Lexer:
+    if is_large_source(path_to_file):
+        return StreamingLexer(source_chunks(path_to_file))
+    return read_source(path_to_file)
+
+
+# Лексемы текста из кеша компиляции. Модуль с неизмененным текстом
+# перекомпилируется, когда меняется интерфейс импорта, и тогда текст
+# повторно не разбирается на лексемы. Текст с лексической ошибкой
+# возвращается как есть: ее вместе с предыдущими ошибками сообщит разбор
+def tokenize_source(program: str, cache: CompilationCache | None = None) -> TokenStream | str:
+    key = None
+    if cache is not None:
+        key = make_cache_key(hashlib.sha256(program.encode()).hexdigest(), [(TOKENS_CACHE_TAG, TOKENS_CACHE_TAG)])
+        data = cache.get(key)
+        if data is not None:
+            try:
+                return TokenStream.from_bytes(program, data)
+            except Exception:
+                pass
+    try:
+        tokens = TokenStream(program)
+    except Exception:
+        return program
+    if cache is not None:
+        cache.put(key, tokens.to_bytes())
+    return tokens
+
+
+def scan_module_header(program: str | Lexer) -> tuple[str | None, list[str]]:
+    # разбирается только заголовок модуля:
+    # MODULE имя; [IMPORT [псевдоним :=] имя {, [псевдоним :=] имя};]
+    # при ошибке возвращается то, что успели прочитать - саму ошибку
+    # сообщит синтаксический анализатор при компиляции
+    lexer = program if isinstance(program, Lexer) else Lexer(program)
+    imports = []
+    if lexer.lex != Lex.MODULE:
+        return None, imports
+    lexer.get_next()
+    if lexer.lex != Lex.ident:
+        return None, imports
+    module_name = lexer.value
+    lexer.get_next()
+    if lexer.lex != Lex.semicollon:
+        return module_name, imports
+    lexer.get_next()
+    if lexer.lex != Lex.IMPORT:
+        return module_name, imports
+    lexer.get_next()
+    while lexer.lex == Lex.ident:
+        imported_module_name = lexer.value
+        lexer.get_next()
+        if lexer.lex == Lex.assignment:
+            lexer.get_next()
+            if lexer.lex != Lex.ident:
+                break
+            imported_module_name = lexer.value
+            lexer.get_next()
+        imports.append(imported_module_name)
+        if lexer.lex != Lex.comma:
+            break
+        lexer.get_next()
+    return module_name, imports
+
+
+def find_module_files(paths: list[str]) -> list[str]:
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for file in sorted(os.listdir(path)):
+                if file.endswith(SOURCE_EXTENSION):
+                    files.append(os.path.join(path, file))
+        else:
+            files.append(path)
+    return files
+
+
+def scan_modules(files: list[str]) -> list[ModuleInfo]:
+    modules = []
+    for path in files:
+        if is_large_source(path):
+            module_name, imports = scan_module_header(open_source(path))
+            source_hash = file_hash(path)
+        else:
+            source = read_source(path)
+            module_name, imports = scan_module_header(source)
+            source_hash = hashlib.sha256(source.encode()).hexdigest()
+        modules.append(ModuleInfo(path, module_name, imports, source_hash))
+    return modules
+
+
+# Импортируемые модули, которых нет среди исходников, ищутся в каталоге
+# библиотеки и добавляются в сборку, чтобы для них появились файлы символов
+def add_library_modules(modules: list[ModuleInfo]) -> list[ModuleInfo]:
+    known_names = {module.name for module in modules}
+    result = list(modules)
+    index = 0
+    while index < len(result):
+        for imported_name in result[index].imports:
+            library_source = os.path.join(LIBRARY_DIR, imported_name + SOURCE_EXTENSION)
+            if imported_name not in known_names and os.path.isfile(library_source):
+                known_names.add(imported_name)
+                result.extend(scan_modules([library_source]))
+        index += 1
+    return result
+
+
+# граф зависимостей: путь модуля -> пути модулей, которые он импортирует.
+# Импорты модулей, которых нет среди исходников (например, Log),
+# считаются внешними и в граф не попадают
+def build_dependency_graph(modules: list[ModuleInfo]) -> dict[str, set[str]]:
+    paths_by_name: dict[str, list[str]] = dict()
+    for module in modules:
+        if module.name is not None:
+            paths_by_name.setdefault(module.name, []).append(module.path)
+    graph: dict[str, set[str]] = dict()
+    for module in modules:
+        dependencies = set()
+        for imported_name in module.imports:
+            paths = paths_by_name.get(imported_name, [])
+            if len(paths) > 1:
+                raise Exception(f"{module.path}: модуль {imported_name} определен в нескольких файлах: {', '.join(paths)}")
+            dependencies.update(paths)
+        graph[module.path] = dependencies
+    return graph
+
+
+def _find_cycle(graph: dict[str, set[str]], nodes: set[str]) -> list[str]:
+    path: list[str] = []
+    on_path: set[str] = set()
+    visited: set[str] = set()
+
+    def visit(node: str) -> list[str] | None:
+        path.append(node)
+        on_path.add(node)
+        visited.add(node)
+        for dependency in sorted(graph[node]):
+            if dependency not in nodes:
+                continue
+            if dependency in on_path:
+                return path[path.index(dependency):] + [dependency]
+            if dependency not in visited:
+                cycle = visit(dependency)
+                if cycle is not None:
+                    return cycle
+        path.pop()
+        on_path.remove(node)
+        return None
+
+    for node in sorted(nodes):
+        if node not in visited:
+            cycle = visit(node)
+            if cycle is not None:
+                return cycle
+    return sorted(nodes)
+
+
+# Волны топологической сортировки: модули одной волны не зависят друг
+# от друга и могут компилироваться одновременно
+def topological_waves(graph: dict[str, set[str]]) -> list[list[str]]:
+    remaining_dependencies = {node: len(dependencies) for node, dependencies in graph.items()}
+    dependents: dict[str, list[str]] = {node: [] for node in graph}
+    for node, dependencies in graph.items():
+        for dependency in dependencies:
+            dependents[dependency].append(node)
+    waves = []
+    wave = sorted(node for node, count in remaining_dependencies.items() if count == 0)
+    while wave:
+        waves.append(wave)
+        next_wave = []
+        for node in wave:
+            for dependent in dependents[node]:
+                remaining_dependencies[dependent] -= 1
+                if remaining_dependencies[dependent] == 0:
+                    next_wave.append(dependent)
+        wave = sorted(next_wave)
+    compiled_count = sum(len(wave) for wave in waves)
+    if compiled_count != len(graph):
+        compiled = {node for wave in waves for node in wave}
+        cycle = _find_cycle(graph, set(graph) - compiled)
+        raise Exception("циклический импорт модулей: " + " -> ".join(cycle))
+    return waves
+
+
+# Статистика возвращается словарем: компиляция может идти в другом процессе
+def compile_module_file(path_to_file: str, symbol_dir: str = DEFAULT_SYMBOL_DIR,
+                        collect_stats: bool = False,
+                        cache: CompilationCache | None = None) -> tuple[CompiledModule, dict | None]:
+    stats = CompileStats() if collect_stats else None
+    try:
+        if stats is None:
+            program = open_source(path_to_file)
+        else:
+            with stats.phase("read"):
+                program = open_source(path_to_file)
+        if isinstance(program, str) and cache is not None:
+            if stats is None:
+                program = tokenize_source(program, cache)
+            else:
+                with stats.phase("lex"):
+                    program = tokenize_source(program, cache)
+        # разбор не останавливается на первой ошибке: за один проход
+        # сообщаются все синтаксические ошибки модуля
+        parser = Parser(program, symbol_paths=[symbol_dir], stats=stats, recover=True)
+        if parser.diagnostics:
+            error = "\n".join(diagnostic.message for diagnostic in parser.diagnostics)
+            compiled_module = CompiledModule(None, error, None, [], parser.diagnostics)
+        else:
+            entries = parser.exported_entries()
+            interface = encode_interface(parser.module_name, entries)
+            exports = [ExportedName(entry.name.name, type(entry.entity).__name__) for entry in entries]
+            compiled_module = CompiledModule(parser.module_name, None, interface, exports)
+    except Exception as e:
+        compiled_module = CompiledModule(None, str(e), None, [])
+    if stats is None:
+        return compiled_module, None
+    stats.modules_compiled += 1
+    return compiled_module, stats.to_dict()
+
+
+# хеш файла символов модуля; пустая строка, если файла нет
+def interface_hash(module_name: str, symbol_paths: list[str]) -> str:
+    path = find_symbol_file(module_name, symbol_paths)
+    if path is None:
+        return ""
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return ""
+
+
+# Ключ кеша учитывает исходный текст, версию компилятора и интерфейсы
+# импортируемых модулей (файлы символов предыдущих волн уже записаны)
+def module_cache_key(module: ModuleInfo, symbol_dir: str) -> str:
+    imported_interface_hashes = [(name, interface_hash(name, [symbol_dir])) for name in set(module.imports)]
+    return make_cache_key(module.source_hash, imported_interface_hashes)
+
+
+# Результат: путь модуля -> текст ошибки (None, если модуль скомпилирован).
+# Модули, зависящие от модуля с ошибкой, не компилируются.
+def build(paths: list[str], jobs: int = 1, symbol_dir: str = DEFAULT_SYMBOL_DIR,
+          cache: CompilationCache | None = None, stats: CompileStats | None = None) -> dict[str, str | None]:
+    start = time.perf_counter()
+    modules = scan_modules(find_module_files(paths))
+    all_modules = {module.path: module for module in add_library_modules(modules)}
+    graph = build_dependency_graph(list(all_modules.values()))
+    waves = topological_waves(graph)
+    if stats is not None:
+        stats.add_time("scan", time.perf_counter() - start)
+    results: dict[str, str | None] = dict()
+    executor = None
+    compile_one = partial(compile_module_file, symbol_dir=symbol_dir, collect_stats=stats is not None, cache=cache)
+    try:
+        for wave in waves:
+            compiled: dict[str, CompiledModule] = dict()
+            cache_keys: dict[str, str] = dict()
+            ready = []
+            for path in wave:
+                failed = [dependency for dependency in graph[path] if results[dependency] is not None]
+                if failed:
+                    results[path] = "не скомпилированы импортируемые модули: " + ", ".join(sorted(failed))
+                    continue
+                if cache is not None:
+                    cache_keys[path] = module_cache_key(all_modules[path], symbol_dir)
+                    data = cache.get(cache_keys[path])
+                    if data is not None:
+                        compiled[path] = pickle.loads(data)
+                        continue
+                ready.append(path)
+            futures = None
+            if jobs > 1 and len(ready) > 1:
+                if executor is None:
+                    executor = ProcessPoolExecutor(jobs)
+                futures = [executor.submit(compile_one, path) for path in ready]
+            for index, path in enumerate(ready):
+                # сбой при компиляции, передаче результата или записи в кеш -
+                # ошибка этого модуля, а не всей сборки
+                try:
+                    compiled_module, module_stats = futures[index].result() if futures else compile_one(path)
+                    data = None if cache is None else pickle.dumps(compiled_module, pickle.HIGHEST_PROTOCOL)
+                except Exception as e:
+                    compiled_module, module_stats, data = CompiledModule(None, str(e), None, []), None, None
+                compiled[path] = compiled_module
+                if stats is not None and module_stats is not None:
+                    stats.merge(module_stats)
+                if data is not None:
+                    cache.put(cache_keys[path], data)
+            for path, compiled_module in compiled.items():
+                if compiled_module.interface is not None:
+                    write_symbol_file(symbol_dir, compiled_module.module_name, compiled_module.interface)
+                results[path] = compiled_module.error
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        if cache is not None:
+            cache.evict()
+        if stats is not None:
+            if cache is not None:
+                stats.cache_hits += cache.hits
+                stats.cache_misses += cache.misses
+            stats.record_peak_memory()
+            stats.add_time("total", time.perf_counter() - start)
+    return {module.path: results[module.path] for module in modules}
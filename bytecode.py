@@ -0,0 +1,183 @@
+from array import array
+from enum import IntEnum
+from typing import NamedTuple
+
+from oberon_types import *
+
+
+# Байт-код - последовательность пар "код операции, аргумент" в array("i").
+# Переходы задаются абсолютным номером элемента массива. Константы
+# (литералы, типы, внешние процедуры) хранятся в общем для модуля пуле.
+#
+# Значения во время исполнения: INTEGER - int, REAL - float, BOOLEAN - bool,
+# CHAR - строка из одного символа, SET - frozenset, NIL - None.
+# Массив - список элементов, запись - список [тип записи, поля...],
+# указатель - ссылка на такой же список записи. Параметр VAR передается
+# адресом - парой (список, индекс).
+
+class Opcode(IntEnum):
+    LOAD_CONST = 1
+    PUSH_INT = 2
+    LOAD_LOCAL = 3
+    STORE_LOCAL = 4
+    LOAD_GLOBAL = 5
+    STORE_GLOBAL = 6
+    LOAD_REF = 7
+    STORE_REF = 8
+    LOAD_FRAME = 9
+    LOAD_GLOBALS = 10
+    UNPACK_REF = 11
+    MAKE_REF = 12
+    LOAD_INDEX = 13
+    LOAD_FIELD = 14
+    STORE_ITEM = 15
+    STORE_COPY = 16
+    POP = 17
+    ADD = 20
+    SUB = 21
+    MUL = 22
+    DIVIDE = 23
+    DIV = 24
+    MOD = 25
+    NEG = 26
+    NOT = 27
+    SET_UNION = 28
+    SET_INTERSECTION = 29
+    SET_SYMMETRIC_DIFFERENCE = 30
+    SET_COMPLEMENT = 31
+    SET_ADD_ELEMENT = 32
+    SET_ADD_RANGE = 33
+    SET_DIFFERENCE = 34
+    EQ = 40
+    NE = 41
+    LT = 42
+    LE = 43
+    GT = 44
+    GE = 45
+    IN = 46
+    IS = 47
+    STR_COMPARE = 48
+    TYPE_GUARD = 49
+    JUMP = 60
+    JUMP_IF_FALSE = 61
+    JUMP_IF_TRUE = 62
+    JUMP_IF_FALSE_OR_POP = 63
+    JUMP_IF_TRUE_OR_POP = 64
+    CASE_JUMP = 65
+    CALL = 70
+    CALL_VALUE = 71
+    CALL_EXTERNAL = 72
+    CALL_BUILTIN = 73
+    RETURN = 74
+    RETURN_NONE = 75
+    NEW_RECORD = 80
+    ASSERT = 81
+    TRAP = 82
+
+
+# операции, аргумент которых - номер константы или адрес перехода
+CONSTANT_OPERANDS = frozenset((Opcode.LOAD_CONST, Opcode.STORE_COPY, Opcode.IS, Opcode.TYPE_GUARD,
+                               Opcode.CASE_JUMP, Opcode.NEW_RECORD, Opcode.TRAP))
+JUMP_OPERANDS = frozenset((Opcode.JUMP, Opcode.JUMP_IF_FALSE, Opcode.JUMP_IF_TRUE,
+                           Opcode.JUMP_IF_FALSE_OR_POP, Opcode.JUMP_IF_TRUE_OR_POP))
+
+# у CALL_EXTERNAL и CALL_BUILTIN аргумент - номер * ARGUMENT_COUNT_BASE + число аргументов
+ARGUMENT_COUNT_BASE = 256
+
+# встроенные функции и процедуры, вызываемые через CALL_BUILTIN
+BUILTINS = ("ABS", "ODD", "LSL", "ASR", "ROR", "FLOOR", "FLT", "ORD", "CHR", "LEN", "PACK", "UNPK")
+
+
+class ExternalProcedure(NamedTuple):
+    module_name: str
+    name: str
+
+
+# Таблица переходов оператора CASE: значение метки -> адрес ветки,
+# диапазоны меток, адрес продолжения при отсутствии подходящей метки
+class CaseTable(NamedTuple):
+    targets: dict
+    ranges: list[tuple[int | str, int | str, int]]
+    default: int
+
+
+class BytecodeFunction:
+    __slots__ = ("name", "code", "parameters_count", "locals_count", "local_types", "returns_value")
+
+    def __init__(self, name: str, parameters_count: int = 0) -> None:
+        self.name = name
+        self.code = array("i")
+        self.parameters_count = parameters_count
+        self.locals_count = parameters_count
+        # типы локальных переменных (не параметров) для начальных значений
+        self.local_types: list[OberonType | None] = []
+        self.returns_value = False
+
+
+class BytecodeModule:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.constants: list = []
+        self.functions: list[BytecodeFunction] = []
+        self.global_types: list[OberonType | None] = []
+        self.global_names: list[str] = []
+        self.body: int | None = None
+        # экспортированные и глобальные процедуры: имя -> номер функции
+        self.procedures: dict[str, int] = dict()
+
+
+# Размещение полей записи: поля базовых типов идут первыми,
+# элемент 0 списка записи - ее тип
+def record_layout(record_type: RecordType) -> list[tuple[str, OberonType]]:
+    chain = []
+    while isinstance(record_type, RecordType):
+        chain.append(record_type)
+        record_type = record_type.base_type
+    layout = []
+    for record in reversed(chain):
+        for field in record.fields:
+            layout.append((field.identifier.name, field.field_type))
+    return layout
+
+
+def is_structured(oberon_type: OberonType | None) -> bool:
+    return isinstance(oberon_type, (ArrayType, RecordType))
+
+
+def _format_argument(module: BytecodeModule, opcode: Opcode, argument: int) -> str:
+    if opcode in CONSTANT_OPERANDS:
+        constant = module.constants[argument]
+        if isinstance(constant, OberonType) and constant.type_name is not None:
+            return f"{argument} ({constant.type_name.name})"
+        if isinstance(constant, CaseTable):
+            return f"{argument} (меток: {len(constant.targets) + len(constant.ranges)}, иначе -> {constant.default})"
+        return f"{argument} ({constant!r})"
+    if opcode in JUMP_OPERANDS:
+        return f"-> {argument}"
+    if opcode == Opcode.CALL:
+        return f"{argument} ({module.functions[argument].name})"
+    if opcode in (Opcode.CALL_EXTERNAL, Opcode.CALL_BUILTIN):
+        index, count = divmod(argument, ARGUMENT_COUNT_BASE)
+        name = module.constants[index] if opcode == Opcode.CALL_EXTERNAL else BUILTINS[index]
+        if isinstance(name, ExternalProcedure):
+            name = f"{name.module_name}.{name.name}"
+        return f"{name}, аргументов: {count}"
+    if opcode == Opcode.STR_COMPARE:
+        return Opcode(argument).name
+    return str(argument)
+
+
+def disassemble_function(module: BytecodeModule, function: BytecodeFunction) -> str:
+    lines = [f"{function.name}: параметров {function.parameters_count}, локальных {function.locals_count}"]
+    code = function.code
+    for pc in range(0, len(code), 2):
+        opcode = Opcode(code[pc])
+        lines.append(f"  {pc:>5} {opcode.name:<26} {_format_argument(module, opcode, code[pc + 1])}")
+    return "\n".join(lines)
+
+
+def disassemble(module: BytecodeModule) -> str:
+    parts = [f"модуль {module.name}: констант {len(module.constants)}, глобальных {len(module.global_types)}"]
+    for function in module.functions:
+        parts.append(disassemble_function(module, function))
+    return "\n\n".join(parts) + "\n"
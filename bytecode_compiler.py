@@ -0,0 +1,717 @@
+from ast_node import *
+from nametable import *
+from bytecode import *
+from constant_folding import constant_type
+from type_table import TYPES
+from universe import BOOLEAN_TYPE, CHAR_TYPE, INTEGER_TYPE, REAL_TYPE, SET_TYPE, StandardProcedure
+
+
+_ARITHMETIC = {
+    Operation.plus: Opcode.ADD,
+    Operation.minus: Opcode.SUB,
+    Operation.multiple: Opcode.MUL,
+    Operation.divide: Opcode.DIVIDE,
+    Operation.DIV: Opcode.DIV,
+    Operation.MOD: Opcode.MOD,
+}
+_SET_OPERATIONS = {
+    Operation.plus: Opcode.SET_UNION,
+    Operation.minus: Opcode.SET_DIFFERENCE,
+    Operation.multiple: Opcode.SET_INTERSECTION,
+    Operation.divide: Opcode.SET_SYMMETRIC_DIFFERENCE,
+}
+_RELATIONS = {
+    Operation.equal: Opcode.EQ,
+    Operation.unequal: Opcode.NE,
+    Operation.less: Opcode.LT,
+    Operation.less_or_equal: Opcode.LE,
+    Operation.greater: Opcode.GT,
+    Operation.greater_or_equal: Opcode.GE,
+}
+_BUILTIN_RESULT_TYPES = {
+    "ODD": BOOLEAN_TYPE, "LSL": INTEGER_TYPE, "ASR": INTEGER_TYPE, "ROR": INTEGER_TYPE,
+    "FLOOR": INTEGER_TYPE, "FLT": REAL_TYPE, "ORD": INTEGER_TYPE, "CHR": CHAR_TYPE, "LEN": INTEGER_TYPE,
+}
+_CASE_TRAP = "нет подходящей метки в операторе CASE"
+# диапазоны меток CASE не длиннее этого раскладываются в таблицу переходов
+_CASE_RANGE_EXPANSION_LIMIT = 64
+_PUSH_INT_MIN = -2 ** 31
+_PUSH_INT_MAX = 2 ** 31 - 1
+
+
+def _is_no_return(return_type) -> bool:
+    return return_type is None or return_type is NoReturnType or isinstance(return_type, NoReturnType)
+
+
+def _is_text(oberon_type: OberonType | None) -> bool:
+    return isinstance(oberon_type, ArrayType) and TYPES.canonical(oberon_type.element_type) is CHAR_TYPE
+
+
+# Тип значения для проверки совместимости: строковый литерал из одного
+# символа имеет тип CHAR, но присваивается и массиву символов как строка
+def _value_type(expression: AstNode, expression_type: OberonType | None) -> OberonType | None:
+    if type(expression) is LiteralValue and isinstance(expression.literal, str):
+        return TYPES.string(len(expression.literal) + 1)
+    return expression_type
+
+
+def _record_of(oberon_type: OberonType | None) -> OberonType | None:
+    if isinstance(oberon_type, PointerType):
+        return oberon_type.type_of_pointer
+    return oberon_type
+
+
+# Перевод дерева разобранного модуля в байт-код. Глобальные переменные
+# и локальные переменные процедур адресуются номерами ячеек, которые
+# назначаются по объектам таблицы имен (Variable, ProcedureParameter),
+# на которые ссылаются узлы Designator. Процедуры компилируются по мере
+# того, как на них находятся ссылки.
+class BytecodeCompiler:
+    def __init__(self, parser) -> None:
+        self._parser = parser
+        self._module = BytecodeModule(parser.module_name)
+        self._constant_indexes: dict = dict()
+        self._globals: dict[int, int] = dict()
+        self._function_indexes: dict[int, int] = dict()
+        self._pending: list[tuple[Procedure, BytecodeFunction]] = []
+        self._record_fields: dict[int, dict[str, tuple[int, OberonType]]] = dict()
+        self._function: BytecodeFunction | None = None
+        self._locals: dict[int, int] = dict()
+        self._by_ref: set[int] = set()
+        # тип переменной внутри ветки CASE по типу записи
+        self._type_overrides: dict[int, OberonType] = dict()
+
+    def compile(self) -> BytecodeModule:
+        module = self._module
+        for entry in self._parser.nametable.get_global_scope_identifiers():
+            if not isinstance(entry.name, Identifier):
+                continue
+            entity = entry.entity
+            if isinstance(entity, Variable):
+                self._globals[id(entity)] = len(module.global_types)
+                module.global_types.append(entity.variable_type)
+                module.global_names.append(entity.name)
+            elif isinstance(entity, Procedure) and not isinstance(entity, StandardProcedure):
+                module.procedures[entry.name.name] = self._function_index(entity)
+        body = BytecodeFunction(f"{module.name}.<тело модуля>")
+        module.body = len(module.functions)
+        module.functions.append(body)
+        self._begin_function(body)
+        self._compile_statements(self._parser.module_body)
+        self._emit(Opcode.RETURN_NONE)
+        while self._pending:
+            procedure, function = self._pending.pop()
+            self._compile_procedure(procedure, function)
+        return module
+
+    ######################################################
+    #                  ВСПОМОГАТЕЛЬНЫЕ                   #
+    ######################################################
+
+    def _error(self, message: str):
+        raise Exception(f"{self._function.name}: {message}")
+
+    def _emit(self, opcode: Opcode, argument: int = 0) -> int:
+        code = self._function.code
+        position = len(code)
+        code.append(opcode)
+        code.append(argument)
+        return position
+
+    def _here(self) -> int:
+        return len(self._function.code)
+
+    def _patch(self, position: int, target: int):
+        self._function.code[position + 1] = target
+
+    def _constant(self, value) -> int:
+        # изменяемые значения (списки, таблицы CASE) не объединяются
+        if isinstance(value, (int, str, frozenset)) or value is None:
+            key = (type(value), value)
+        elif isinstance(value, float):
+            key = (float, repr(value))
+        else:
+            key = (type(value), id(value))
+        index = self._constant_indexes.get(key)
+        if index is None:
+            index = len(self._module.constants)
+            self._module.constants.append(value)
+            self._constant_indexes[key] = index
+        return index
+
+    def _emit_literal(self, value):
+        if type(value) is int and _PUSH_INT_MIN <= value <= _PUSH_INT_MAX:
+            self._emit(Opcode.PUSH_INT, value)
+        else:
+            self._emit(Opcode.LOAD_CONST, self._constant(value))
+
+    def _function_index(self, procedure: Procedure) -> int:
+        index = self._function_indexes.get(id(procedure))
+        if index is None:
+            functions = self._module.functions
+            index = len(functions)
+            function = BytecodeFunction(procedure.head.name.name, len(procedure.head.procedure_type.parameters))
+            functions.append(function)
+            self._function_indexes[id(procedure)] = index
+            self._pending.append((procedure, function))
+        return index
+
+    def _begin_function(self, function: BytecodeFunction):
+        self._function = function
+        self._locals = dict()
+        self._by_ref = set()
+
+    def _new_local(self, oberon_type: OberonType | None = None) -> int:
+        function = self._function
+        slot = function.locals_count
+        function.locals_count += 1
+        function.local_types.append(oberon_type)
+        return slot
+
+    def _compile_procedure(self, procedure: Procedure, function: BytecodeFunction):
+        self._begin_function(function)
+        procedure_type = procedure.head.procedure_type
+        for slot, parameter in enumerate(procedure_type.parameters):
+            self._locals[id(parameter)] = slot
+            if parameter.by_ref:
+                self._by_ref.add(slot)
+        for variable in procedure.body.variables:
+            self._locals[id(variable)] = self._new_local(variable.variable_type)
+        function.returns_value = not _is_no_return(procedure_type.return_type)
+        self._compile_statements(procedure.body.code)
+        if procedure.body.return_expression is not None:
+            self._compile_expression(procedure.body.return_expression)
+            self._emit(Opcode.RETURN)
+        else:
+            self._emit(Opcode.RETURN_NONE)
+
+    def _entity_type(self, entity) -> OberonType | None:
+        override = self._type_overrides.get(id(entity))
+        if override is not None:
+            return override
+        if isinstance(entity, Variable):
+            return entity.variable_type
+        if isinstance(entity, ProcedureParameter):
+            return entity.param_type
+        if isinstance(entity, Constant):
+            return entity.constant_type
+        if isinstance(entity, Procedure):
+            return entity.head.procedure_type
+        return None
+
+    def _field(self, record_type: OberonType | None, name: str) -> tuple[int, OberonType]:
+        if not isinstance(record_type, RecordType):
+            self._error(f"поле {name} у значения, не являющегося записью")
+        fields = self._record_fields.get(id(record_type))
+        if fields is None:
+            fields = {field_name: (index + 1, field_type)
+                      for index, (field_name, field_type) in enumerate(record_layout(record_type))}
+            self._record_fields[id(record_type)] = fields
+        field = fields.get(name)
+        if field is None:
+            self._error(f"у записи нет поля {name}")
+        return field
+
+    ######################################################
+    #                  ОПЕРАТОРЫ                         #
+    ######################################################
+
+    def _compile_statements(self, statements: list[Statement]):
+        for statement in statements:
+            self._compile_statement(statement)
+
+    def _compile_statement(self, statement: Statement):
+        match statement:
+            case Assignment():
+                self._compile_assignment(statement.var, statement.expression)
+            case ProcedureCall():
+                entity = statement.procedure.entity
+                if isinstance(entity, StandardProcedure) and not entity.is_function:
+                    self._compile_standard_procedure(entity.head.name.name, statement.actual_parameters)
+                else:
+                    self._compile_call(statement.procedure, statement.actual_parameters)
+                    self._emit(Opcode.POP)
+            case IF():
+                self._compile_if(statement)
+            case CASE():
+                self._compile_case(statement)
+            case WHILE():
+                top = self._here()
+                for branch in statement.branches:
+                    self._compile_expression(branch.condition)
+                    exit_jump = self._emit(Opcode.JUMP_IF_FALSE)
+                    self._compile_statements(branch.code)
+                    self._emit(Opcode.JUMP, top)
+                    self._patch(exit_jump, self._here())
+            case REPEAT():
+                top = self._here()
+                self._compile_statements(statement.code)
+                self._compile_expression(statement.condition)
+                self._emit(Opcode.JUMP_IF_FALSE, top)
+            case FOR():
+                self._compile_for(statement)
+            case _:
+                self._error(f"неизвестный оператор {type(statement).__name__}")
+
+    def _compile_if(self, statement: IF):
+        end_jumps = []
+        while True:
+            self._compile_expression(statement.condition)
+            false_jump = self._emit(Opcode.JUMP_IF_FALSE)
+            self._compile_statements(statement.code)
+            else_code = statement.else_code
+            if else_code is None:
+                self._patch(false_jump, self._here())
+                break
+            end_jumps.append(self._emit(Opcode.JUMP))
+            self._patch(false_jump, self._here())
+            if len(else_code) == 1 and type(else_code[0]) is IF:
+                # ELSIF
+                statement = else_code[0]
+                continue
+            self._compile_statements(else_code)
+            break
+        for jump in end_jumps:
+            self._patch(jump, self._here())
+
+    def _compile_for(self, statement: FOR):
+        variable = statement.variable
+        step = statement.step.literal if statement.step is not None else 1
+        self._compile_expression(statement.start)
+        self._compile_store(variable)
+        # граница вычисляется один раз
+        limit = self._new_local()
+        self._compile_expression(statement.end)
+        self._emit(Opcode.STORE_LOCAL, limit)
+        top = self._here()
+        self._compile_load(variable)
+        self._emit(Opcode.LOAD_LOCAL, limit)
+        self._emit(Opcode.LE if step > 0 else Opcode.GE)
+        exit_jump = self._emit(Opcode.JUMP_IF_FALSE)
+        self._compile_statements(statement.code)
+        self._compile_load(variable)
+        self._emit_literal(step)
+        self._emit(Opcode.ADD)
+        self._compile_store(variable)
+        self._emit(Opcode.JUMP, top)
+        self._patch(exit_jump, self._here())
+
+    def _compile_case(self, statement: CASE):
+        labels = [label.value for branch in statement.branches for label in branch.labels]
+        if any(isinstance(label, OberonType) for label in labels):
+            self._compile_type_case(statement)
+            return
+        self._compile_expression(statement.expression)
+        case_jump = self._emit(Opcode.CASE_JUMP)
+        targets = dict()
+        ranges = []
+        end_jumps = []
+        for branch in statement.branches:
+            start = self._here()
+            for label in branch.labels:
+                value = label.value
+                if isinstance(value, IntRange):
+                    low, high = value.start, value.end
+                    numeric_low = ord(low) if isinstance(low, str) else low
+                    numeric_high = ord(high) if isinstance(high, str) else high
+                    if numeric_high - numeric_low < _CASE_RANGE_EXPANSION_LIMIT:
+                        for number in range(numeric_low, numeric_high + 1):
+                            targets[chr(number) if isinstance(low, str) else number] = start
+                    else:
+                        ranges.append((low, high, start))
+                else:
+                    targets[value] = start
+            self._compile_statements(branch.code)
+            end_jumps.append(self._emit(Opcode.JUMP))
+        default = self._here()
+        self._emit(Opcode.TRAP, self._constant(_CASE_TRAP))
+        for jump in end_jumps:
+            self._patch(jump, self._here())
+        self._patch(case_jump, self._constant(CaseTable(targets, ranges, default)))
+
+    def _compile_type_case(self, statement: CASE):
+        expression = statement.expression
+        if type(expression) is not Designator or expression.selectors:
+            self._error("в CASE по типу ожидалась переменная")
+        temporary = self._new_local()
+        self._compile_expression(expression)
+        self._emit(Opcode.STORE_LOCAL, temporary)
+        end_jumps = []
+        for branch in statement.branches:
+            body_jumps = []
+            for label in branch.labels:
+                self._emit(Opcode.LOAD_LOCAL, temporary)
+                self._emit(Opcode.IS, self._constant(_record_of(label.value)))
+                body_jumps.append(self._emit(Opcode.JUMP_IF_TRUE))
+            next_branch = self._emit(Opcode.JUMP)
+            for jump in body_jumps:
+                self._patch(jump, self._here())
+            # внутри ветки переменная имеет тип метки
+            key = id(expression.entity)
+            previous = self._type_overrides.get(key)
+            self._type_overrides[key] = branch.labels[0].value
+            self._compile_statements(branch.code)
+            if previous is None:
+                del self._type_overrides[key]
+            else:
+                self._type_overrides[key] = previous
+            end_jumps.append(self._emit(Opcode.JUMP))
+            self._patch(next_branch, self._here())
+        self._emit(Opcode.TRAP, self._constant(_CASE_TRAP))
+        for jump in end_jumps:
+            self._patch(jump, self._here())
+
+    ######################################################
+    #                  ПЕРЕМЕННЫЕ                        #
+    ######################################################
+
+    def _variable_slot(self, designator: Designator) -> tuple[Opcode, int]:
+        # способ доступа к переменной без селекторов: локальная, VAR-параметр, глобальная
+        key = id(designator.entity)
+        slot = self._locals.get(key)
+        if slot is not None:
+            return (Opcode.LOAD_REF if slot in self._by_ref else Opcode.LOAD_LOCAL), slot
+        slot = self._globals.get(key)
+        if slot is None:
+            self._error(f"{identifier_to_str(designator.name)} недоступно во время исполнения")
+        return Opcode.LOAD_GLOBAL, slot
+
+    def _compile_load(self, designator: Designator):
+        opcode, slot = self._variable_slot(designator)
+        self._emit(opcode, slot)
+
+    def _compile_store(self, designator: Designator):
+        opcode, slot = self._variable_slot(designator)
+        store = {Opcode.LOAD_LOCAL: Opcode.STORE_LOCAL, Opcode.LOAD_REF: Opcode.STORE_REF,
+                 Opcode.LOAD_GLOBAL: Opcode.STORE_GLOBAL}[opcode]
+        self._emit(store, slot)
+
+    def _compile_designator_base(self, designator: Designator) -> OberonType | None:
+        entity = designator.entity
+        if isinstance(entity, Constant):
+            self._emit_literal(entity.value)
+        else:
+            self._compile_load(designator)
+        return self._entity_type(entity)
+
+    def _compile_selector(self, selector: AstNode, current_type: OberonType | None) -> OberonType | None:
+        match selector:
+            case IndexSelector():
+                for index in selector.indexes:
+                    self._compile_expression(index)
+                    self._emit(Opcode.LOAD_INDEX)
+                    current_type = current_type.element_type if isinstance(current_type, ArrayType) else None
+                return current_type
+            case FieldSelector():
+                index, field_type = self._field(_record_of(current_type), selector.field_name)
+                self._emit(Opcode.LOAD_FIELD, index)
+                return field_type
+            case DereferenceSelector():
+                return _record_of(current_type)
+            case TypeGuardSelector():
+                if selector.guard_type is None:
+                    self._error(f"неизвестный тип {identifier_to_str(selector.type_name)}")
+                self._emit(Opcode.TYPE_GUARD, self._constant(_record_of(selector.guard_type)))
+                return selector.guard_type
+
+    def _compile_designator(self, designator: Designator) -> OberonType | None:
+        entity = designator.entity
+        if isinstance(entity, OberonType):
+            self._error(f"тип {identifier_to_str(designator.name)} использован как значение")
+        if isinstance(entity, Procedure):
+            # процедура как значение процедурного типа
+            if isinstance(entity, StandardProcedure) or designator.name.child_name is not None:
+                self._error(f"процедуру {identifier_to_str(designator.name)} нельзя использовать как значение")
+            function = self._module.functions[self._function_index(entity)]
+            self._emit(Opcode.LOAD_CONST, self._constant(function))
+            return entity.head.procedure_type
+        current_type = self._compile_designator_base(designator)
+        for selector in designator.selectors:
+            current_type = self._compile_selector(selector, current_type)
+        return current_type
+
+    def _designator_type(self, designator: Designator) -> OberonType | None:
+        current_type = self._entity_type(designator.entity)
+        for selector in designator.selectors:
+            match selector:
+                case IndexSelector():
+                    for _ in selector.indexes:
+                        current_type = current_type.element_type if isinstance(current_type, ArrayType) else None
+                case FieldSelector():
+                    current_type = self._field(_record_of(current_type), selector.field_name)[1]
+                case DereferenceSelector():
+                    current_type = _record_of(current_type)
+                case TypeGuardSelector():
+                    current_type = selector.guard_type
+        return current_type
+
+    # Адрес переменной - пара (контейнер, индекс) на стеке. Разыменование
+    # и охрана типа в конце обозначения адрес не меняют: присваивание
+    # записи или массива копирует значение внутрь существующего объекта
+    def _compile_address(self, designator: Designator):
+        selectors = designator.selectors
+        last = len(selectors) - 1
+        while last >= 0 and type(selectors[last]) in (DereferenceSelector, TypeGuardSelector):
+            last -= 1
+        if last < 0:
+            opcode, slot = self._variable_slot(designator)
+            if opcode == Opcode.LOAD_REF:
+                self._emit(Opcode.LOAD_LOCAL, slot)
+                self._emit(Opcode.UNPACK_REF)
+            else:
+                self._emit(Opcode.LOAD_FRAME if opcode == Opcode.LOAD_LOCAL else Opcode.LOAD_GLOBALS)
+                self._emit(Opcode.PUSH_INT, slot)
+            return
+        current_type = self._compile_designator_base(designator)
+        for selector in selectors[:last]:
+            current_type = self._compile_selector(selector, current_type)
+        selector = selectors[last]
+        if type(selector) is IndexSelector:
+            for index in selector.indexes[:-1]:
+                self._compile_expression(index)
+                self._emit(Opcode.LOAD_INDEX)
+            self._compile_expression(selector.indexes[-1])
+        else:
+            index, _ = self._field(_record_of(current_type), selector.field_name)
+            self._emit(Opcode.PUSH_INT, index)
+
+    def _compile_reference(self, expression: AstNode):
+        if type(expression) is not Designator:
+            self._error("параметр VAR должен быть переменной")
+        if not expression.selectors:
+            opcode, slot = self._variable_slot(expression)
+            if opcode == Opcode.LOAD_REF:
+                # VAR-параметр передается дальше тем же адресом
+                self._emit(Opcode.LOAD_LOCAL, slot)
+                return
+        self._compile_address(expression)
+        self._emit(Opcode.MAKE_REF)
+
+    def _compile_assignment(self, designator: Designator, expression: AstNode):
+        target_type = self._designator_type(designator)
+        if is_structured(target_type):
+            self._compile_address(designator)
+            expression_type = self._compile_expression(expression)
+            self._emit(Opcode.STORE_COPY, self._constant(target_type))
+        elif not designator.selectors:
+            expression_type = self._compile_expression(expression)
+            self._compile_store(designator)
+        else:
+            self._compile_address(designator)
+            expression_type = self._compile_expression(expression)
+            self._emit(Opcode.STORE_ITEM)
+        if not TYPES.assignment_compatible(target_type, _value_type(expression, expression_type)):
+            self._error(f"несовместимые типы при присваивании {identifier_to_str(designator.name)}")
+
+    ######################################################
+    #                  ВЫРАЖЕНИЯ                         #
+    ######################################################
+
+    # Операции обходятся без рекурсии - стеком задач (узел, этап, данные),
+    # поэтому глубина выражения не ограничена стеком интерпретатора.
+    # Возвращается статический тип выражения (None, если неизвестен)
+    def _compile_expression(self, expression: AstNode) -> OberonType | None:
+        types: list[OberonType | None] = []
+        tasks: list[tuple[AstNode, int, int | None]] = [(expression, 0, None)]
+        while tasks:
+            node, stage, data = tasks.pop()
+            node_type = type(node)
+            if node_type is BinaryOperation:
+                operation = node.value
+                if stage == 0:
+                    tasks.append((node, 3 if operation == Operation.IS else 1, None))
+                    tasks.append((node.left, 0, None))
+                elif stage == 1:
+                    jump = None
+                    if operation == Operation.LOGICAL_AND:
+                        jump = self._emit(Opcode.JUMP_IF_FALSE_OR_POP)
+                    elif operation == Operation.LOGICAL_OR:
+                        jump = self._emit(Opcode.JUMP_IF_TRUE_OR_POP)
+                    tasks.append((node, 2, jump))
+                    tasks.append((node.right, 0, None))
+                elif stage == 2:
+                    right_type = types.pop()
+                    left_type = types.pop()
+                    if data is not None:
+                        self._patch(data, self._here())
+                        types.append(BOOLEAN_TYPE)
+                    else:
+                        types.append(self._emit_binary(operation, left_type, right_type))
+                else:
+                    types.pop()
+                    tested_type = node.right.entity if type(node.right) is Designator else None
+                    if not isinstance(tested_type, OberonType):
+                        self._error("справа от IS ожидался тип")
+                    self._emit(Opcode.IS, self._constant(_record_of(tested_type)))
+                    types.append(BOOLEAN_TYPE)
+            elif node_type is UnaryOperation:
+                if stage == 0:
+                    tasks.append((node, 1, None))
+                    tasks.append((node.operand, 0, None))
+                    continue
+                operand_type = types.pop()
+                if node.value == Operation.LOGICAL_NOT:
+                    self._emit(Opcode.NOT)
+                    operand_type = BOOLEAN_TYPE
+                elif node.value == Operation.minus:
+                    self._emit(Opcode.SET_COMPLEMENT if operand_type is SET_TYPE else Opcode.NEG)
+                types.append(operand_type)
+            else:
+                types.append(self._compile_operand(node))
+        return types[0]
+
+    def _emit_binary(self, operation: Operation, left_type, right_type) -> OberonType | None:
+        relation = _RELATIONS.get(operation)
+        if relation is not None:
+            if _is_text(left_type) or _is_text(right_type):
+                self._emit(Opcode.STR_COMPARE, relation)
+            else:
+                self._emit(relation)
+            return BOOLEAN_TYPE
+        if operation == Operation.IN:
+            self._emit(Opcode.IN)
+            return BOOLEAN_TYPE
+        if left_type is SET_TYPE or right_type is SET_TYPE:
+            opcode = _SET_OPERATIONS.get(operation)
+            if opcode is None:
+                self._error(f"операция {operation.value} неприменима к множествам")
+            self._emit(opcode)
+            return SET_TYPE
+        opcode = _ARITHMETIC.get(operation)
+        if opcode is None:
+            self._error(f"неподдерживаемая операция {operation.value}")
+        self._emit(opcode)
+        if operation == Operation.divide:
+            return REAL_TYPE
+        return left_type if left_type is not None else right_type
+
+    def _compile_operand(self, node: AstNode) -> OberonType | None:
+        match node:
+            case LiteralValue():
+                self._emit_literal(node.literal)
+                return constant_type(node.literal)
+            case Designator():
+                return self._compile_designator(node)
+            case FunctionCall():
+                return self._compile_call(node.procedure, node.actual_parameters)
+            case SetConstructor():
+                self._emit(Opcode.LOAD_CONST, self._constant(frozenset()))
+                for element in node.elements:
+                    if type(element) is SetRange:
+                        self._compile_expression(element.low)
+                        self._compile_expression(element.high)
+                        self._emit(Opcode.SET_ADD_RANGE)
+                    else:
+                        self._compile_expression(element)
+                        self._emit(Opcode.SET_ADD_ELEMENT)
+                return SET_TYPE
+            case _:
+                self._error(f"неподдерживаемое выражение {type(node).__name__}")
+
+    ######################################################
+    #                  ВЫЗОВЫ                            #
+    ######################################################
+
+    def _compile_arguments(self, parameters: list[ProcedureParameter],
+                           actual_parameters: list[ProcedureActualParameterCalculation], name: str):
+        if len(parameters) != len(actual_parameters):
+            self._error(f"неверное число параметров при вызове {name}")
+        for number, (parameter, actual) in enumerate(zip(parameters, actual_parameters), 1):
+            expression = actual.code
+            actual_type = None
+            if parameter.by_ref:
+                self._compile_reference(expression)
+                actual_type = self._designator_type(expression)
+            elif type(expression) is LiteralValue and isinstance(expression.literal, str) \
+                    and isinstance(parameter.param_type, ArrayType):
+                # строка, переданная как ARRAY OF CHAR, становится массивом символов;
+                # структурные параметры-значения только читаются, поэтому
+                # массив можно разделять между вызовами
+                self._emit(Opcode.LOAD_CONST, self._constant(list(expression.literal) + ["\0"]))
+            else:
+                actual_type = self._compile_expression(expression)
+            if not TYPES.parameter_compatible(parameter, _value_type(expression, actual_type)):
+                self._error(f"несовместимый тип параметра {number} при вызове {name}")
+
+    def _compile_call(self, designator: Designator,
+                      actual_parameters: list[ProcedureActualParameterCalculation]) -> OberonType | None:
+        entity = designator.entity
+        name = identifier_to_str(designator.name)
+        if isinstance(entity, StandardProcedure):
+            if not entity.is_function:
+                self._error(f"процедура {name} не возвращает значения")
+            return self._compile_standard_function(entity.head.name.name, actual_parameters)
+        if isinstance(entity, Procedure):
+            procedure_type = entity.head.procedure_type
+            if designator.name.child_name is not None:
+                module_name = self._parser.imported_modules[designator.name.parent_name]
+                self._compile_arguments(procedure_type.parameters, actual_parameters, name)
+                external = self._constant(ExternalProcedure(module_name, designator.name.child_name))
+                self._emit(Opcode.CALL_EXTERNAL, external * ARGUMENT_COUNT_BASE + len(actual_parameters))
+            else:
+                self._compile_arguments(procedure_type.parameters, actual_parameters, name)
+                self._emit(Opcode.CALL, self._function_index(entity))
+            return None if _is_no_return(procedure_type.return_type) else procedure_type.return_type
+        procedure_type = self._compile_designator(designator)
+        if not isinstance(procedure_type, ProcedureType):
+            self._error(f"{name} не является процедурой")
+        self._compile_arguments(procedure_type.parameters, actual_parameters, name)
+        self._emit(Opcode.CALL_VALUE, len(actual_parameters))
+        return None if _is_no_return(procedure_type.return_type) else procedure_type.return_type
+
+    def _compile_builtin(self, name: str, actual_parameters: list[ProcedureActualParameterCalculation],
+                         by_ref: tuple[int, ...] = ()):
+        for index, actual in enumerate(actual_parameters):
+            if index in by_ref:
+                self._compile_reference(actual.code)
+            else:
+                self._compile_expression(actual.code)
+        self._emit(Opcode.CALL_BUILTIN, BUILTINS.index(name) * ARGUMENT_COUNT_BASE + len(actual_parameters))
+
+    def _compile_standard_function(self, name: str,
+                                   actual_parameters: list[ProcedureActualParameterCalculation]) -> OberonType | None:
+        if name == "ABS":
+            if len(actual_parameters) != 1:
+                self._error("неверное число параметров при вызове ABS")
+            argument_type = self._compile_expression(actual_parameters[0].code)
+            self._emit(Opcode.CALL_BUILTIN, BUILTINS.index(name) * ARGUMENT_COUNT_BASE + 1)
+            return argument_type
+        self._compile_builtin(name, actual_parameters)
+        return _BUILTIN_RESULT_TYPES[name]
+
+    def _compile_standard_procedure(self, name: str, actual_parameters: list[ProcedureActualParameterCalculation]):
+        arguments = [actual.code for actual in actual_parameters]
+        if not arguments:
+            self._error(f"неверное число параметров при вызове {name}")
+        variable = arguments[0]
+        if name in ("INC", "DEC", "INCL", "EXCL", "NEW") and type(variable) is not Designator:
+            self._error(f"первый параметр {name} должен быть переменной")
+        if name in ("INC", "DEC"):
+            step = arguments[1] if len(arguments) > 1 else LiteralValue(1)
+            operation = Operation.plus if name == "INC" else Operation.minus
+            self._compile_assignment(variable, BinaryOperation(operation, variable, step))
+        elif name in ("INCL", "EXCL"):
+            operation = Operation.plus if name == "INCL" else Operation.minus
+            self._compile_assignment(variable, BinaryOperation(operation, variable, SetConstructor(arguments[1:2])))
+        elif name == "NEW":
+            pointer_type = self._designator_type(variable)
+            if not isinstance(pointer_type, PointerType) or not isinstance(pointer_type.type_of_pointer, RecordType):
+                self._error("параметр NEW должен быть указателем на запись")
+            self._compile_address(variable)
+            self._emit(Opcode.NEW_RECORD, self._constant(pointer_type.type_of_pointer))
+            self._emit(Opcode.STORE_ITEM)
+        elif name == "ASSERT":
+            self._compile_expression(variable)
+            self._emit(Opcode.ASSERT)
+        elif name == "PACK":
+            self._compile_builtin(name, actual_parameters, (0,))
+            self._emit(Opcode.POP)
+        elif name == "UNPK":
+            self._compile_builtin(name, actual_parameters, (0, 1))
+            self._emit(Opcode.POP)
+        else:
+            self._error(f"неподдерживаемая стандартная процедура {name}")
+
+
+def compile_module(parser) -> BytecodeModule:
+    return BytecodeCompiler(parser).compile()
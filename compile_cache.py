@@ -0,0 +1,85 @@
+import glob
+import hashlib
+import os
+import zlib
+
+
+DEFAULT_CACHE_DIR = ".oberon_cache"
+DEFAULT_CACHE_SIZE = 64 * 1024 * 1024
+CACHE_FILE_EXTENSION = ".bin"
+
+_compiler_fingerprint: str | None = None
+
+
+# Отпечаток компилятора - хеш его исходных текстов: любое изменение
+# компилятора делает недействительными все записи кеша
+def compiler_fingerprint() -> str:
+    global _compiler_fingerprint
+    if _compiler_fingerprint is None:
+        digest = hashlib.sha256()
+        compiler_dir = os.path.dirname(os.path.abspath(__file__))
+        for path in sorted(glob.glob(os.path.join(compiler_dir, "*.py"))):
+            with open(path, "rb") as f:
+                digest.update(f.read())
+        _compiler_fingerprint = digest.hexdigest()
+    return _compiler_fingerprint
+
+
+def make_cache_key(source_hash: str, imported_interface_hashes: list[tuple[str, str]]) -> str:
+    digest = hashlib.sha256()
+    digest.update(compiler_fingerprint().encode())
+    digest.update(source_hash.encode())
+    for module_name, interface_hash in sorted(imported_interface_hashes):
+        digest.update(f"\0{module_name}\0{interface_hash}".encode())
+    return digest.hexdigest()
+
+
+# Кеш результатов компиляции на диске: один сжатый файл на ключ.
+# Время последнего использования - mtime файла, при превышении
+# размера удаляются давно не использованные записи (LRU)
+class CompilationCache:
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_size: int = DEFAULT_CACHE_SIZE) -> None:
+        self._directory = directory
+        self._max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self._directory, key + CACHE_FILE_EXTENSION)
+
+    def get(self, key: str) -> bytes | None:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = zlib.decompress(f.read())
+            os.utime(path)
+        except (OSError, zlib.error):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return data
+
+    def put(self, key: str, data: bytes):
+        os.makedirs(self._directory, exist_ok=True)
+        path = self._path(key)
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "wb") as f:
+            f.write(zlib.compress(data))
+        os.replace(temporary_path, path)
+
+    def evict(self):
+        if not os.path.isdir(self._directory):
+            return
+        files = []
+        total_size = 0
+        for entry in os.scandir(self._directory):
+            if entry.is_file() and entry.name.endswith(CACHE_FILE_EXTENSION):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+                total_size += stat.st_size
+        files.sort()
+        for _, size, path in files:
+            if total_size <= self._max_size:
+                break
+            os.remove(path)
+            total_size -= size
@@ -0,0 +1,349 @@
+import argparse
+import asyncio
+import inspect
+import json
+import os
+import sys
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from build import (DEFAULT_SYMBOL_DIR, CompiledModule, ModuleInfo, add_library_modules, build_dependency_graph,
+                   compile_module_file, find_module_files, module_cache_key, scan_modules, topological_waves)
+from nametable import NameTableEntry
+from oberon_types import OberonType
+from symbol_file import decode_interface, symbol_file_path, write_symbol_file
+from syntax_analyzer import Parser
+
+
+# Сервер компиляции: долгоживущий процесс, который принимает запросы
+# JSON-RPC 2.0 (по одному сообщению JSON в строке) из stdin или через
+# Unix-сокет. Результаты компиляции модулей хранятся в памяти; при
+# повторном запросе перекомпилируются только модули, файлы которых
+# изменились на диске, или модули, интерфейсы импортов которых изменились.
+#
+# Методы:
+#   compile   {"paths": [...]}               -> {"results": {путь: ошибка или null}, ...}
+#   check     {"path": ..., "source": ...}    -> {"module": имя, "error": ошибка или null}
+#   interface {"module": имя}                -> {"module": имя, "entries": [{"name", "kind"}]}
+#   status    {}                             -> счетчики сервера
+#   shutdown  {}                             -> остановка сервера
+
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+SERVER_ERROR = -32000
+
+
+class RpcError(Exception):
+    def __init__(self, code: int, message: str) -> None:
+        super().__init__(message)
+        self.code = code
+
+
+# ожидаемые типы параметров методов: тип значения и тип элементов списка
+_PARAMETER_TYPES: dict[str, tuple[type, type | None]] = {
+    "paths": (list, str),
+    "path": (str, None),
+    "source": (str, None),
+    "module": (str, None),
+}
+
+
+def check_params(method, params: dict):
+    signature = inspect.signature(method)
+    try:
+        signature.bind(**params)
+    except TypeError as e:
+        raise RpcError(INVALID_PARAMS, str(e))
+    for name, value in params.items():
+        if value is None and signature.parameters[name].default is None:
+            continue
+        value_type, item_type = _PARAMETER_TYPES[name]
+        if not isinstance(value, value_type) or (
+                item_type is not None and not all(isinstance(item, item_type) for item in value)):
+            expected = value_type.__name__ if item_type is None else f"{value_type.__name__}[{item_type.__name__}]"
+            raise RpcError(INVALID_PARAMS, f"параметр {name} должен иметь тип {expected}")
+
+
+# Проверка текста, который может еще не быть сохранен (буфер редактора).
+# Интерфейсы скомпилированных модулей берутся из памяти сервера
+def check_source(source: str, symbol_dir: str,
+                 interfaces: dict[str, list[NameTableEntry]] | None = None) -> tuple[str | None, str | None]:
+    try:
+        parser = Parser(source, symbol_paths=[symbol_dir], interfaces=interfaces)
+    except Exception as e:
+        return None, str(e)
+    return parser.module_name, None
+
+
+class CompileServer:
+    def __init__(self, symbol_dir: str = DEFAULT_SYMBOL_DIR, jobs: int = 1) -> None:
+        self._symbol_dir = symbol_dir
+        # в одном процессе пул из одного потока: разбор не блокирует
+        # чтение следующих запросов
+        self._executor: Executor = ProcessPoolExecutor(jobs) if jobs > 1 else ThreadPoolExecutor(1)
+        # путь -> ((mtime, размер), сведения о модуле): неизменившиеся
+        # файлы не читаются повторно
+        self._scanned: dict[str, tuple[tuple[int, int], ModuleInfo]] = dict()
+        # путь -> (ключ кеша, результат компиляции)
+        self._compiled: dict[str, tuple[str, CompiledModule]] = dict()
+        # имя модуля -> записанный файл символов и его разобранные записи
+        # (для check)
+        self._written_interfaces: dict[str, bytes] = dict()
+        self._interfaces: dict[str, list[NameTableEntry]] = dict()
+        # сборки идут по одной: они пишут общие файлы символов
+        self._build_lock = asyncio.Lock()
+        self._stopped = asyncio.Event()
+        self.requests = 0
+        self.modules_compiled = 0
+        self.modules_reused = 0
+
+    def close(self):
+        self._executor.shutdown()
+
+    @property
+    def stopped(self) -> asyncio.Event:
+        return self._stopped
+
+    def _scan(self, files: list[str]) -> list[ModuleInfo]:
+        modules = []
+        for path in files:
+            status = os.stat(path)
+            stamp = (status.st_mtime_ns, status.st_size)
+            scanned = self._scanned.get(path)
+            if scanned is None or scanned[0] != stamp:
+                scanned = (stamp, scan_modules([path])[0])
+                self._scanned[path] = scanned
+            modules.append(scanned[1])
+        return modules
+
+    # Удаленные файлы забываются вместе с интерфейсами их модулей
+    def _drop_deleted(self):
+        for path in [path for path in self._compiled if not os.path.exists(path)]:
+            name = self._compiled.pop(path)[1].module_name
+            self._scanned.pop(path, None)
+            if name is None or any(compiled.module_name == name for _, compiled in self._compiled.values()):
+                continue
+            self._interfaces.pop(name, None)
+            if self._written_interfaces.pop(name, None) is not None:
+                try:
+                    os.remove(symbol_file_path(self._symbol_dir, name))
+                except OSError:
+                    pass
+
+    def _resolve_type(self, module_name: str, type_name: str) -> OberonType | None:
+        for entry in self._interfaces.get(module_name, ()):
+            if entry.name.name == type_name and isinstance(entry.entity, OberonType):
+                return entry.entity
+        return None
+
+    # Записи интерфейса разбираются заново, если изменился он сам или
+    # интерфейс импортируемого модуля (updated - имена таких модулей
+    # в этой сборке): записи ссылаются на типы импортов
+    def _write_interface(self, module: ModuleInfo, compiled_module: CompiledModule, updated: set[str]):
+        name = compiled_module.module_name
+        if self._written_interfaces.get(name) != compiled_module.interface:
+            write_symbol_file(self._symbol_dir, name, compiled_module.interface)
+            self._written_interfaces[name] = compiled_module.interface
+        elif name in self._interfaces and updated.isdisjoint(module.imports):
+            return
+        self._interfaces[name] = decode_interface(compiled_module.interface, self._resolve_type)[1]
+        updated.add(name)
+
+    async def compile(self, paths: list[str]) -> dict:
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        compiled_count = 0
+        async with self._build_lock:
+            self._drop_deleted()
+            modules = self._scan(find_module_files(paths))
+            all_modules = {module.path: module for module in add_library_modules(modules)}
+            graph = build_dependency_graph(list(all_modules.values()))
+            results: dict[str, str | None] = dict()
+            updated: set[str] = set()
+            for wave in topological_waves(graph):
+                ready = []
+                keys: dict[str, str] = dict()
+                for path in wave:
+                    failed = [dependency for dependency in graph[path] if results[dependency] is not None]
+                    if failed:
+                        results[path] = "не скомпилированы импортируемые модули: " + ", ".join(sorted(failed))
+                        continue
+                    keys[path] = module_cache_key(all_modules[path], self._symbol_dir)
+                    cached = self._compiled.get(path)
+                    if cached is not None and cached[0] == keys[path]:
+                        self.modules_reused += 1
+                        continue
+                    ready.append(path)
+                compiled_modules = await asyncio.gather(*(
+                    loop.run_in_executor(self._executor, compile_module_file, path, self._symbol_dir)
+                    for path in ready))
+                for path, (compiled_module, _) in zip(ready, compiled_modules):
+                    self._compiled[path] = (keys[path], compiled_module)
+                compiled_count += len(ready)
+                for path in keys:
+                    compiled_module = self._compiled[path][1]
+                    if compiled_module.interface is not None:
+                        self._write_interface(all_modules[path], compiled_module, updated)
+                    results[path] = compiled_module.error
+        self.modules_compiled += compiled_count
+        return {
+            "results": {module.path: results[module.path] for module in modules},
+            "compiled": compiled_count,
+            "seconds": time.perf_counter() - start,
+        }
+
+    async def check(self, path: str | None = None, source: str | None = None) -> dict:
+        if source is None:
+            if path is None:
+                raise RpcError(INVALID_PARAMS, "нужен путь к файлу или текст модуля")
+            with open(path) as f:
+                source = f.read()
+        loop = asyncio.get_running_loop()
+        # разобранные интерфейсы не передаются в процессы пула: проверка
+        # одного текста идет в потоке
+        module_name, error = await loop.run_in_executor(
+            None, check_source, source, self._symbol_dir, dict(self._interfaces))
+        return {"module": module_name, "error": error}
+
+    async def interface(self, module: str) -> dict:
+        async with self._build_lock:
+            self._drop_deleted()
+        for _, compiled_module in self._compiled.values():
+            if compiled_module.module_name == module and compiled_module.error is None:
+                entries = [{"name": exported.name, "kind": exported.kind} for exported in compiled_module.exports]
+                return {"module": module, "entries": entries}
+        raise RpcError(SERVER_ERROR, f"модуль {module} не скомпилирован")
+
+    async def status(self) -> dict:
+        return {
+            "requests": self.requests,
+            "modules_cached": len(self._compiled),
+            "modules_compiled": self.modules_compiled,
+            "modules_reused": self.modules_reused,
+        }
+
+    async def shutdown(self) -> None:
+        self._stopped.set()
+
+    _METHODS = ("compile", "check", "interface", "status", "shutdown")
+
+    # Ответ на одно сообщение (None для уведомлений - запросов без id)
+    async def handle_message(self, line: bytes | str) -> dict | None:
+        self.requests += 1
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            return {"jsonrpc": "2.0", "id": None, "error": {"code": PARSE_ERROR, "message": str(e)}}
+        request_id = request.get("id") if isinstance(request, dict) else None
+        try:
+            if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+                raise RpcError(INVALID_REQUEST, "ожидался объект с полем method")
+            if request["method"] not in self._METHODS:
+                raise RpcError(METHOD_NOT_FOUND, f"неизвестный метод {request['method']}")
+            params = request.get("params", {})
+            if not isinstance(params, dict):
+                raise RpcError(INVALID_PARAMS, "параметры передаются объектом")
+            method = getattr(self, request["method"])
+            check_params(method, params)
+            result = await method(**params)
+        except RpcError as e:
+            response = {"jsonrpc": "2.0", "id": request_id, "error": {"code": e.code, "message": str(e)}}
+        except Exception as e:
+            response = {"jsonrpc": "2.0", "id": request_id, "error": {"code": SERVER_ERROR, "message": str(e)}}
+        else:
+            response = {"jsonrpc": "2.0", "id": request_id, "result": result}
+        if isinstance(request, dict) and "id" not in request:
+            return None
+        return response
+
+
+# Каждый запрос обрабатывается отдельной задачей, поэтому ответы могут
+# приходить не в порядке запросов - их сопоставляют по id
+async def serve_stream(server: CompileServer, reader: asyncio.StreamReader, write):
+    tasks = set()
+
+    async def answer(line: bytes):
+        response = await server.handle_message(line)
+        if response is not None:
+            await write((json.dumps(response, ensure_ascii=False) + "\n").encode())
+
+    while not server.stopped.is_set():
+        read_line = asyncio.ensure_future(reader.readline())
+        stop = asyncio.ensure_future(server.stopped.wait())
+        done, _ = await asyncio.wait({read_line, stop}, return_when=asyncio.FIRST_COMPLETED)
+        stop.cancel()
+        if read_line not in done:
+            read_line.cancel()
+            break
+        line = read_line.result()
+        if not line:
+            break
+        if not line.strip():
+            continue
+        task = asyncio.create_task(answer(line))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    if tasks:
+        await asyncio.gather(*tasks)
+
+
+async def serve_stdio(server: CompileServer):
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=1 << 30)
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+
+    async def write(data: bytes):
+        sys.stdout.buffer.write(data)
+        sys.stdout.buffer.flush()
+
+    await serve_stream(server, reader, write)
+
+
+async def serve_socket(server: CompileServer, socket_path: str):
+    async def connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        async def write(data: bytes):
+            writer.write(data)
+            await writer.drain()
+
+        try:
+            await serve_stream(server, reader, write)
+        finally:
+            writer.close()
+
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    unix_server = await asyncio.start_unix_server(connection, socket_path, limit=1 << 30)
+    try:
+        async with unix_server:
+            await server.stopped.wait()
+    finally:
+        os.remove(socket_path)
+
+
+def main(argv: list[str] | None = None) -> int:
+    argument_parser = argparse.ArgumentParser(description="Сервер компиляции Оберона-07 (JSON-RPC)")
+    argument_parser.add_argument("--socket", help="путь Unix-сокета (по умолчанию - stdin/stdout)")
+    argument_parser.add_argument("--sym-dir", default=DEFAULT_SYMBOL_DIR,
+                                 help="каталог для файлов символов модулей")
+    argument_parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                                 help="число процессов для компиляции")
+    args = argument_parser.parse_args(argv)
+
+    async def run():
+        server = CompileServer(args.sym_dir, args.jobs)
+        try:
+            if args.socket is None:
+                await serve_stdio(server)
+            else:
+                await serve_socket(server, args.socket)
+        finally:
+            server.close()
+
+    asyncio.run(run())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
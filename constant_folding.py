@@ -0,0 +1,287 @@
+import math
+from typing import TypeAlias
+
+from ast_node import *
+from nametable import *
+from universe import BOOLEAN_TYPE, CHAR_TYPE, INTEGER_TYPE, REAL_TYPE, SET_TYPE, StandardProcedure
+from type_table import TYPES
+
+
+# Вычисление константных выражений во время компиляции. Свертка идет
+# снизу вверх по мере построения дерева: Parser вызывает fold_constant
+# для каждого нового узла, и если все его операнды уже свернуты в
+# LiteralValue, узел заменяется литералом. Поэтому вычисление одного
+# узла не требует обхода поддерева, а значения констант, объявленных
+# в CONST, запоминаются в таблице имен и повторно не вычисляются.
+
+ConstantValue: TypeAlias = int | float | bool | str | frozenset[int]
+
+# INTEGER - 32 бита, SET - множество чисел 0..31, CHAR - 0X..0FFX
+INTEGER_MIN = -2 ** 31
+INTEGER_MAX = 2 ** 31 - 1
+SET_MAX_ELEMENT = 31
+# сдвиги LSL и ASR - на 0..31 бит
+SHIFT_MAX = 31
+CHAR_MAX = 0xFF
+
+_FULL_SET = frozenset(range(SET_MAX_ELEMENT + 1))
+
+
+class ConstantError(Exception):
+    pass
+
+
+def constant_type(value: ConstantValue) -> OberonType | None:
+    if value is None:
+        return TYPES.nil
+    if isinstance(value, bool):
+        return BOOLEAN_TYPE
+    if isinstance(value, int):
+        return INTEGER_TYPE
+    if isinstance(value, float):
+        return REAL_TYPE
+    if isinstance(value, frozenset):
+        return SET_TYPE
+    if isinstance(value, str):
+        if len(value) == 1:
+            return CHAR_TYPE
+        return TYPES.string(len(value) + 1)
+    return None
+
+
+def _kind(value: ConstantValue) -> str:
+    if isinstance(value, bool):
+        return "BOOLEAN"
+    if isinstance(value, int):
+        return "INTEGER"
+    if isinstance(value, float):
+        return "REAL"
+    if isinstance(value, frozenset):
+        return "SET"
+    if isinstance(value, str):
+        return "CHAR" if len(value) == 1 else "STRING"
+    raise ConstantError("выражение не является константным")
+
+
+def _check_integer(value: int) -> int:
+    if value < INTEGER_MIN or value > INTEGER_MAX:
+        raise ConstantError(f"переполнение при вычислении константы: {value} вне диапазона INTEGER")
+    return value
+
+
+def _check_real(value: float) -> float:
+    if math.isinf(value) or math.isnan(value):
+        raise ConstantError("переполнение при вычислении вещественной константы")
+    return value
+
+
+def _check_set_element(value: ConstantValue) -> int:
+    if _kind(value) != "INTEGER":
+        raise ConstantError("элемент множества должен быть целым")
+    if value < 0 or value > SET_MAX_ELEMENT:
+        raise ConstantError(f"элемент множества {value} вне диапазона 0..{SET_MAX_ELEMENT}")
+    return value
+
+
+def _operation_error(operation: Operation, *kinds: str) -> ConstantError:
+    return ConstantError(f"операция {operation.value} неприменима к {', '.join(kinds)}")
+
+
+def _fold_unary(operation: Operation, operand: ConstantValue) -> ConstantValue:
+    kind = _kind(operand)
+    if operation == Operation.LOGICAL_NOT:
+        if kind == "BOOLEAN":
+            return not operand
+    elif operation == Operation.plus:
+        if kind in ("INTEGER", "REAL", "SET"):
+            return operand
+    elif operation == Operation.minus:
+        if kind == "INTEGER":
+            return _check_integer(-operand)
+        if kind == "REAL":
+            return -operand
+        if kind == "SET":
+            return _FULL_SET - operand
+    raise _operation_error(operation, kind)
+
+
+_ORDERED_KINDS = ("INTEGER", "REAL", "CHAR", "STRING")
+
+
+def _fold_relation(operation: Operation, left: ConstantValue, right: ConstantValue,
+                   left_kind: str, right_kind: str) -> bool:
+    if operation == Operation.IN:
+        if right_kind != "SET":
+            raise _operation_error(operation, left_kind, right_kind)
+        return _check_set_element(left) in right
+    # символ сравним со строкой, остальные типы - только с таким же
+    text_kinds = ("CHAR", "STRING")
+    if left_kind != right_kind and not (left_kind in text_kinds and right_kind in text_kinds):
+        raise _operation_error(operation, left_kind, right_kind)
+    if operation == Operation.equal:
+        return left == right
+    if operation == Operation.unequal:
+        return left != right
+    if left_kind not in _ORDERED_KINDS:
+        raise _operation_error(operation, left_kind, right_kind)
+    if operation == Operation.less:
+        return left < right
+    if operation == Operation.less_or_equal:
+        return left <= right
+    if operation == Operation.greater:
+        return left > right
+    return left >= right
+
+
+_RELATIONS = (Operation.equal, Operation.unequal, Operation.less, Operation.less_or_equal,
+              Operation.greater, Operation.greater_or_equal, Operation.IN)
+
+
+def _fold_binary(operation: Operation, left: ConstantValue, right: ConstantValue) -> ConstantValue:
+    left_kind = _kind(left)
+    right_kind = _kind(right)
+    if operation in _RELATIONS:
+        return _fold_relation(operation, left, right, left_kind, right_kind)
+    if left_kind != right_kind:
+        raise _operation_error(operation, left_kind, right_kind)
+    kind = left_kind
+    if kind == "BOOLEAN":
+        if operation == Operation.LOGICAL_OR:
+            return left or right
+        if operation == Operation.LOGICAL_AND:
+            return left and right
+    elif kind == "INTEGER":
+        if operation == Operation.plus:
+            return _check_integer(left + right)
+        if operation == Operation.minus:
+            return _check_integer(left - right)
+        if operation == Operation.multiple:
+            return _check_integer(left * right)
+        if operation in (Operation.DIV, Operation.MOD):
+            if right == 0:
+                raise ConstantError("деление на ноль в константном выражении")
+            # DIV и MOD Оберона округляют к минус бесконечности, как // и % в Python
+            return _check_integer(left // right if operation == Operation.DIV else left % right)
+    elif kind == "REAL":
+        if operation == Operation.plus:
+            return _check_real(left + right)
+        if operation == Operation.minus:
+            return _check_real(left - right)
+        if operation == Operation.multiple:
+            return _check_real(left * right)
+        if operation == Operation.divide:
+            if right == 0:
+                raise ConstantError("деление на ноль в константном выражении")
+            return _check_real(left / right)
+    elif kind == "SET":
+        if operation == Operation.plus:
+            return left | right
+        if operation == Operation.minus:
+            return left - right
+        if operation == Operation.multiple:
+            return left & right
+        if operation == Operation.divide:
+            return left ^ right
+    raise _operation_error(operation, left_kind, right_kind)
+
+
+def _to_unsigned(value: int) -> int:
+    return value & 0xFFFFFFFF
+
+
+def _to_signed(value: int) -> int:
+    value &= 0xFFFFFFFF
+    return value - 0x100000000 if value > INTEGER_MAX else value
+
+
+def _fold_standard_function(name: str, arguments: list[ConstantValue]) -> ConstantValue:
+    kinds = [_kind(argument) for argument in arguments]
+    if name in ("LSL", "ASR", "ROR"):
+        if kinds != ["INTEGER", "INTEGER"]:
+            raise ConstantError(f"неверные аргументы стандартной функции {name}")
+        x, n = arguments
+        if name == "LSL" or name == "ASR":
+            # проверка до сдвига: LSL(1, 1000000000) иначе строит огромное число
+            if n < 0 or n > SHIFT_MAX:
+                raise ConstantError(f"величина сдвига {n} в {name} вне диапазона 0..{SHIFT_MAX}")
+            return _check_integer(x << n) if name == "LSL" else x >> n
+        n %= 32
+        x = _to_unsigned(x)
+        return _to_signed((x >> n) | (x << (32 - n)))
+    if len(arguments) != 1:
+        raise ConstantError(f"неверное число аргументов стандартной функции {name}")
+    (x,) = arguments
+    (kind,) = kinds
+    if name == "ABS" and kind == "INTEGER":
+        return _check_integer(abs(x))
+    if name == "ABS" and kind == "REAL":
+        return abs(x)
+    if name == "ODD" and kind == "INTEGER":
+        return x % 2 == 1
+    if name == "FLOOR" and kind == "REAL":
+        return _check_integer(math.floor(x))
+    if name == "FLT" and kind == "INTEGER":
+        return float(x)
+    if name == "ORD":
+        if kind == "CHAR":
+            return ord(x)
+        if kind == "BOOLEAN":
+            return int(x)
+        if kind == "SET":
+            return _to_signed(sum(1 << element for element in x))
+    if name == "CHR" and kind == "INTEGER":
+        if x < 0 or x > CHAR_MAX:
+            raise ConstantError(f"переполнение при вычислении константы: CHR({x})")
+        return chr(x)
+    if name == "LEN" and kind in ("CHAR", "STRING"):
+        # длина строковой константы вместе с завершающим 0X
+        return len(x) + 1
+    raise ConstantError(f"неверные аргументы стандартной функции {name}")
+
+
+def _literal(node: AstNode) -> bool:
+    return type(node) is LiteralValue and node.literal is not None
+
+
+# Свертка одного узла, операнды которого уже свернуты. Возвращает
+# LiteralValue или None, если узел не константный
+def fold_constant(node: AstNode) -> LiteralValue | None:
+    node_type = type(node)
+    if node_type is LiteralValue:
+        return node
+    if node_type is BinaryOperation:
+        if _literal(node.left) and _literal(node.right):
+            return LiteralValue(_fold_binary(node.value, node.left.literal, node.right.literal))
+        return None
+    if node_type is UnaryOperation:
+        if _literal(node.operand):
+            return LiteralValue(_fold_unary(node.value, node.operand.literal))
+        return None
+    if node_type is Designator:
+        entity = node.entity
+        if isinstance(entity, Constant) and not node.selectors and entity.value is not None:
+            return LiteralValue(entity.value)
+        return None
+    if node_type is SetConstructor:
+        elements = set()
+        for element in node.elements:
+            if type(element) is SetRange:
+                if not (_literal(element.low) and _literal(element.high)):
+                    return None
+                low = _check_set_element(element.low.literal)
+                high = _check_set_element(element.high.literal)
+                elements.update(range(low, high + 1))
+            elif _literal(element):
+                elements.add(_check_set_element(element.literal))
+            else:
+                return None
+        return LiteralValue(frozenset(elements))
+    if node_type is FunctionCall:
+        procedure = node.procedure.entity
+        if not isinstance(procedure, StandardProcedure) or not procedure.is_function:
+            return None
+        if not all(_literal(parameter.code) for parameter in node.actual_parameters):
+            return None
+        arguments = [parameter.code.literal for parameter in node.actual_parameters]
+        return LiteralValue(_fold_standard_function(procedure.head.name.name, arguments))
+    return None
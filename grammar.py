@@ -0,0 +1,208 @@
+from lexer import Lex
+
+
+# Грамматика Оберона-07 (по сообщению о языке) в виде данных: правая
+# часть правила - лексема, имя другого правила, кортеж (последовательность)
+# или Alt, Opt ([...]), Rep ({...}). По ней при импорте вычисляются
+# множества FIRST и FOLLOW; множество лексем - целое число, в котором
+# установлены биты lex.bit (см. lexer.py).
+
+# простые классы, а не NamedTuple: grammar загружается при каждом
+# запуске компилятора, и создание классов кортежей заметно по времени
+class Alt:
+    __slots__ = ("alternatives",)
+
+    def __init__(self, alternatives: tuple) -> None:
+        self.alternatives = alternatives
+
+
+class Opt:
+    __slots__ = ("item",)
+
+    def __init__(self, item: object) -> None:
+        self.item = item
+
+
+class Rep:
+    __slots__ = ("item",)
+
+    def __init__(self, item: object) -> None:
+        self.item = item
+
+
+def alt(*alternatives) -> Alt:
+    return Alt(alternatives)
+
+
+GRAMMAR: dict[str, object] = {
+    "module": (Lex.MODULE, Lex.ident, Lex.semicollon, Opt("ImportList"), "DeclarationSequence",
+               Opt((Lex.BEGIN, "StatementSequence")), Lex.END, Lex.ident, Lex.dot),
+    "ImportList": (Lex.IMPORT, "import", Rep((Lex.comma, "import")), Lex.semicollon),
+    "import": (Lex.ident, Opt((Lex.assignment, Lex.ident))),
+    "qualident": (Lex.ident, Opt((Lex.dot, Lex.ident))),
+    "identdef": (Lex.ident, Opt(Lex.multiple)),
+
+    "DeclarationSequence": (Opt((Lex.CONST, Rep(("ConstDeclaration", Lex.semicollon)))),
+                            Opt((Lex.TYPE, Rep(("TypeDeclaration", Lex.semicollon)))),
+                            Opt((Lex.VAR, Rep(("VariableDeclaration", Lex.semicollon)))),
+                            Rep(("ProcedureDeclaration", Lex.semicollon))),
+    "ConstDeclaration": ("identdef", Lex.equal, "ConstExpression"),
+    "ConstExpression": "expression",
+    "TypeDeclaration": ("identdef", Lex.equal, "type"),
+    "VariableDeclaration": ("IdentList", Lex.colon, "type"),
+
+    "type": alt("qualident", "ArrayType", "RecordType", "PointerType", "ProcedureType"),
+    "ArrayType": (Lex.ARRAY, "length", Rep((Lex.comma, "length")), Lex.OF, "type"),
+    "length": "ConstExpression",
+    "RecordType": (Lex.RECORD, Opt((Lex.left_bracket, "BaseType", Lex.right_bracket)),
+                   Opt("FieldListSequence"), Lex.END),
+    "BaseType": "qualident",
+    "FieldListSequence": ("FieldList", Rep((Lex.semicollon, "FieldList"))),
+    "FieldList": ("IdentList", Lex.colon, "type"),
+    "IdentList": ("identdef", Rep((Lex.comma, "identdef"))),
+    "PointerType": (Lex.POINTER, Lex.TO, "type"),
+    "ProcedureType": (Lex.PROCEDURE, Opt("FormalParameters")),
+
+    "expression": ("SimpleExpression", Opt(("relation", "SimpleExpression"))),
+    "relation": alt(Lex.equal, Lex.hash, Lex.less, Lex.less_equal, Lex.greater, Lex.greater_equal,
+                    Lex.IN, Lex.IS),
+    "SimpleExpression": (Opt(alt(Lex.plus, Lex.minus)), "term", Rep(("AddOperator", "term"))),
+    "AddOperator": alt(Lex.plus, Lex.minus, Lex.OR),
+    "term": ("factor", Rep(("MulOperator", "factor"))),
+    "MulOperator": alt(Lex.multiple, Lex.divide, Lex.DIV, Lex.MOD, Lex.ampersand),
+    "factor": alt(Lex.number, Lex.string, Lex.NIL, Lex.TRUE, Lex.FALSE, "set",
+                  ("designator", Opt("ActualParameters")),
+                  (Lex.left_bracket, "expression", Lex.right_bracket), (Lex.tilde, "factor")),
+    "designator": ("qualident", Rep("selector")),
+    "selector": alt((Lex.dot, Lex.ident), (Lex.left_square_bracket, "ExpList", Lex.right_square_bracket),
+                    Lex.caret, (Lex.left_bracket, "qualident", Lex.right_bracket)),
+    "set": (Lex.left_curly_bracket, Opt(("element", Rep((Lex.comma, "element")))), Lex.right_curly_bracket),
+    "element": ("expression", Opt((Lex.double_dot, "expression"))),
+    "ExpList": ("expression", Rep((Lex.comma, "expression"))),
+    "ActualParameters": (Lex.left_bracket, Opt("ExpList"), Lex.right_bracket),
+
+    "statement": Opt(alt("assignment", "ProcedureCall", "IfStatement", "CaseStatement",
+                         "WhileStatement", "RepeatStatement", "ForStatement")),
+    "assignment": ("designator", Lex.assignment, "expression"),
+    "ProcedureCall": ("designator", Opt("ActualParameters")),
+    "StatementSequence": ("statement", Rep((Lex.semicollon, "statement"))),
+    "IfStatement": (Lex.IF, "expression", Lex.THEN, "StatementSequence",
+                    Rep((Lex.ELSIF, "expression", Lex.THEN, "StatementSequence")),
+                    Opt((Lex.ELSE, "StatementSequence")), Lex.END),
+    "CaseStatement": (Lex.CASE, "expression", Lex.OF, "case", Rep((Lex.vertical_line, "case")), Lex.END),
+    "case": Opt(("CaseLabelList", Lex.colon, "StatementSequence")),
+    "CaseLabelList": ("LabelRange", Rep((Lex.comma, "LabelRange"))),
+    "LabelRange": ("label", Opt((Lex.double_dot, "label"))),
+    "label": alt(Lex.number, Lex.string, "qualident"),
+    "WhileStatement": (Lex.WHILE, "expression", Lex.DO, "StatementSequence",
+                       Rep((Lex.ELSIF, "expression", Lex.DO, "StatementSequence")), Lex.END),
+    "RepeatStatement": (Lex.REPEAT, "StatementSequence", Lex.UNTIL, "expression"),
+    "ForStatement": (Lex.FOR, Lex.ident, Lex.assignment, "expression", Lex.TO, "expression",
+                     Opt((Lex.BY, "ConstExpression")), Lex.DO, "StatementSequence", Lex.END),
+
+    "ProcedureDeclaration": ("ProcedureHeading", Lex.semicollon, "ProcedureBody", Lex.ident),
+    "ProcedureHeading": (Lex.PROCEDURE, "identdef", Opt("FormalParameters")),
+    "ProcedureBody": ("DeclarationSequence", Opt((Lex.BEGIN, "StatementSequence")),
+                      Opt((Lex.RETURN, "expression")), Lex.END),
+    "FormalParameters": (Lex.left_bracket, Opt(("FPSection", Rep((Lex.semicollon, "FPSection")))),
+                         Lex.right_bracket, Opt((Lex.colon, "qualident"))),
+    "FPSection": (Opt(Lex.VAR), Lex.ident, Rep((Lex.comma, Lex.ident)), Lex.colon, "FormalType"),
+    "FormalType": (Rep((Lex.ARRAY, Lex.OF)), "qualident"),
+}
+
+START_SYMBOL = "module"
+
+
+def lex_set(*lexes: Lex) -> int:
+    result = 0
+    for lex in lexes:
+        result |= lex.bit
+    return result
+
+
+def lexes_in(lex_bits: int) -> list[Lex]:
+    return [lex for lex in Lex if lex.bit & lex_bits]
+
+
+# FIRST части правила: (множество, может ли она быть пустой)
+def _first(item, first: dict[str, int], nullable: dict[str, bool]) -> tuple[int, bool]:
+    if isinstance(item, Lex):
+        return item.bit, False
+    if isinstance(item, str):
+        if item not in first:
+            raise Exception(f"в грамматике нет правила {item}")
+        return first[item], nullable[item]
+    if isinstance(item, Alt):
+        result, empty = 0, False
+        for alternative in item.alternatives:
+            lex_bits, alternative_empty = _first(alternative, first, nullable)
+            result |= lex_bits
+            empty = empty or alternative_empty
+        return result, empty
+    if isinstance(item, (Opt, Rep)):
+        return _first(item.item, first, nullable)[0], True
+    result = 0
+    for part in item:
+        lex_bits, empty = _first(part, first, nullable)
+        result |= lex_bits
+        if not empty:
+            return result, False
+    return result, True
+
+
+def _compute_first(grammar: dict[str, object]) -> tuple[dict[str, int], dict[str, bool]]:
+    first = {name: 0 for name in grammar}
+    nullable = {name: False for name in grammar}
+    changed = True
+    while changed:
+        changed = False
+        for name, rule in grammar.items():
+            lex_bits, empty = _first(rule, first, nullable)
+            if (lex_bits, empty) != (first[name], nullable[name]):
+                first[name], nullable[name] = lex_bits, empty
+                changed = True
+    return first, nullable
+
+
+# after - множество лексем, которые могут идти сразу за item
+def _propagate_follow(item, after: int, follow: dict[str, int], first: dict[str, int],
+                      nullable: dict[str, bool]) -> bool:
+    if isinstance(item, Lex):
+        return False
+    if isinstance(item, str):
+        if follow[item] | after == follow[item]:
+            return False
+        follow[item] |= after
+        return True
+    if isinstance(item, Alt):
+        changed = False
+        for alternative in item.alternatives:
+            changed |= _propagate_follow(alternative, after, follow, first, nullable)
+        return changed
+    if isinstance(item, Opt):
+        return _propagate_follow(item.item, after, follow, first, nullable)
+    if isinstance(item, Rep):
+        return _propagate_follow(item.item, _first(item.item, first, nullable)[0] | after,
+                                 follow, first, nullable)
+    changed = False
+    for part in reversed(item):
+        changed |= _propagate_follow(part, after, follow, first, nullable)
+        lex_bits, empty = _first(part, first, nullable)
+        after = lex_bits | after if empty else lex_bits
+    return changed
+
+
+def _compute_follow(grammar: dict[str, object], first: dict[str, int],
+                    nullable: dict[str, bool]) -> dict[str, int]:
+    follow = {name: 0 for name in grammar}
+    follow[START_SYMBOL] = Lex.end_of_text.bit
+    changed = True
+    while changed:
+        changed = False
+        for name, rule in grammar.items():
+            changed |= _propagate_follow(rule, follow[name], follow, first, nullable)
+    return follow
+
+
+FIRST, NULLABLE = _compute_first(GRAMMAR)
+FOLLOW = _compute_follow(GRAMMAR, FIRST, NULLABLE)
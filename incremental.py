@@ -0,0 +1,215 @@
+from bisect import bisect_right
+
+from lexer import Lexer, Lex, WrapperForReceivingCharacters
+from nametable import Nametable, Procedure
+from syntax_analyzer import Parser
+
+
+# Блок модуля, который можно разобрать заново отдельно от остального
+# текста: тело процедуры верхнего уровня (от первой лексемы после
+# заголовка до ";" после "END имя") или тело модуля (до "."). visible -
+# сколько записей глобальной области было объявлено к началу блока:
+# при повторном разборе видны только они, как и при разборе всего модуля
+class ReparseUnit:
+    __slots__ = ("procedure", "start", "end", "visible")
+
+    def __init__(self, procedure: Procedure | None, start: int, visible: int) -> None:
+        self.procedure = procedure
+        self.start = start
+        self.end = start
+        self.visible = visible
+
+
+# Parser, который запоминает границы блоков и умеет разобрать один блок
+# заново. Ошибка разбора не выбрасывается, а сохраняется в error
+class _RecordingParser(Parser):
+    def __init__(self, program: str, symbol_paths: list[str] | None = None) -> None:
+        self.units: list[ReparseUnit] = []
+        # блок, при разборе которого произошла ошибка
+        self.failed_unit: ReparseUnit | None = None
+        self.error: str | None = None
+        try:
+            super().__init__(program, symbol_paths=symbol_paths)
+        except Exception as e:
+            self.error = str(e)
+
+    def _parse_procedure_rest(self, procedure: Procedure):
+        if self._nametable.scope_level != 0:
+            super()._parse_procedure_rest(procedure)
+            return
+        unit = ReparseUnit(procedure, self._lexer.start, self._nametable.global_scope_size())
+        self.failed_unit = unit
+        super()._parse_procedure_rest(procedure)
+        self._finish_unit(unit)
+
+    def _parse_module_rest(self):
+        unit = ReparseUnit(None, self._lexer.start, self._nametable.global_scope_size())
+        self.failed_unit = unit
+        super()._parse_module_rest()
+        self._finish_unit(unit)
+
+    def _finish_unit(self, unit: ReparseUnit):
+        unit.end = self._lexer.start
+        self.failed_unit = None
+        self.units.append(unit)
+
+    # Повторный разбор блока лексером, установленным на его начало, с
+    # таблицей имен, где видно только объявленное до блока. Открытые
+    # при ошибке области видимости закрываются
+    def reparse_unit(self, unit: ReparseUnit, lexer: Lexer, nametable: Nametable):
+        saved = self._lexer, self._nametable
+        self._lexer, self._nametable = lexer, nametable
+        try:
+            if unit.procedure is None:
+                Parser._parse_module_rest(self)
+            else:
+                Parser._parse_procedure_rest(self, unit.procedure)
+        finally:
+            while nametable.scope_level > 0:
+                nametable.close_scope()
+            self._lexer, self._nametable = saved
+
+
+# Модуль, открытый в редакторе: правка (смещение, длина удаленного,
+# вставленный текст) разбирается заново только в пределах блока, где она
+# сделана, - тела процедуры или тела модуля. Таблица имен и деревья
+# остальных блоков не меняются. Правки в заголовках процедур и в
+# глобальных объявлениях меняют то, что видят другие блоки, поэтому
+# после них модуль разбирается целиком.
+#
+# Текст хранится кусками: промежутки между блоками и сами блоки (с
+# закрывающей ";" и символом за ней, тело модуля - до конца текста),
+# поэтому правка копирует только текст своего блока, а весь текст
+# собирается по запросу
+class EditableModule:
+    def __init__(self, program: str, symbol_paths: list[str] | None = None) -> None:
+        self._symbol_paths = symbol_paths
+        self._full_parse(program)
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            parts = [self._gaps[0]]
+            for body, gap in zip(self._bodies, self._gaps[1:]):
+                parts.append(body)
+                parts.append(gap)
+            self._text = "".join(parts)
+        return self._text
+
+    @property
+    def parser(self) -> Parser:
+        return self._parser
+
+    @property
+    def error(self) -> str | None:
+        return self._parser.error
+
+    def _full_parse(self, program: str):
+        self._text = program
+        self._length = len(program)
+        self._parser = _RecordingParser(program, self._symbol_paths)
+        self.last_reparse = "module"
+        # таблица имен для последнего разобранного блока: (номер, таблица)
+        self._prefix_table: tuple[int, Nametable] | None = None
+        # границы известны для всех блоков, только если разбор дошел до конца
+        units = self._parser.units if self._parser.error is None else []
+        self._starts = [unit.start for unit in units]
+        # смещение закрывающей лексемы от начала блока
+        self._closings = [unit.end - unit.start for unit in units]
+        self._lines = []
+        self._gaps = []
+        self._bodies = []
+        position = 0
+        line = 1
+        for number, unit in enumerate(units):
+            # после ";" берется еще символ: от него зависит номер строки,
+            # на которой лексер останавливается после ";"
+            end = len(program) if unit.procedure is None else min(unit.end + 2, len(program))
+            self._gaps.append(program[position:unit.start])
+            self._bodies.append(program[unit.start:end])
+            line += program.count("\n", position, unit.start)
+            self._lines.append(line)
+            line += program.count("\n", unit.start, end)
+            position = end
+        self._gaps.append(program[position:])
+
+    def _find_unit(self, begin: int, end: int) -> int | None:
+        index = bisect_right(self._starts, begin) - 1
+        if index >= 0 and end <= self._starts[index] + self._closings[index]:
+            return index
+        return None
+
+    # Начало строки, в которой начинается блок, - оно нужно для текста
+    # строки в сообщениях об ошибках
+    def _line_prefix(self, index: int) -> str:
+        parts = []
+        for number in range(index, -1, -1):
+            gap = self._gaps[number]
+            newline = gap.rfind("\n")
+            parts.append(gap[newline + 1:])
+            if newline >= 0 or number == 0:
+                break
+            body = self._bodies[number - 1]
+            newline = body.rfind("\n")
+            parts.append(body[newline + 1:])
+            if newline >= 0:
+                break
+        return "".join(reversed(parts))
+
+    def _unit_nametable(self, index: int) -> Nametable:
+        unit = self._parser.units[index]
+        nametable = self._parser._nametable
+        if unit.visible == nametable.global_scope_size():
+            return nametable
+        if self._prefix_table is None or self._prefix_table[0] != index:
+            self._prefix_table = (index, nametable.global_prefix(unit.visible))
+        return self._prefix_table[1]
+
+    def apply_edit(self, offset: int, deleted: int, inserted: str) -> str | None:
+        if offset < 0 or deleted < 0 or offset + deleted > self._length:
+            raise Exception(f"правка за пределами текста: {offset}, {deleted}")
+        parser = self._parser
+        index = self._find_unit(offset, offset + deleted) if self._starts else None
+        if index is None or (parser.error is not None and parser.failed_unit is not parser.units[index]):
+            text = self.text
+            self._full_parse(text[:offset] + inserted + text[offset + deleted:])
+            return self.error
+        start = self._starts[index]
+        body = self._bodies[index]
+        removed = body[offset - start:offset - start + deleted]
+        body = body[:offset - start] + inserted + body[offset - start + deleted:]
+        self._bodies[index] = body
+        self._text = None
+        delta = len(inserted) - deleted
+        self._length += delta
+        if delta:
+            self._closings[index] += delta
+            self._starts[index + 1:] = [following + delta for following in self._starts[index + 1:]]
+        lines = inserted.count("\n") - removed.count("\n")
+        if lines:
+            self._lines[index + 1:] = [following + lines for following in self._lines[index + 1:]]
+
+        unit = parser.units[index]
+        self.last_reparse = "procedure" if unit.procedure is not None else "module body"
+        prefix = self._line_prefix(index)
+        characters = WrapperForReceivingCharacters(prefix + body, self._lines[index])
+        characters.seek(len(prefix))
+        lexer = Lexer(characters)
+        try:
+            parser.reparse_unit(unit, lexer, self._unit_nametable(index))
+        except Exception as e:
+            # блок дочитан до конца своего текста: правка (например,
+            # незакрытый комментарий) затрагивает и следующие блоки
+            if lexer.lex == Lex.end_of_text and unit.procedure is not None:
+                self._full_parse(self.text)
+                return self.error
+            parser.error = str(e)
+            parser.failed_unit = unit
+            return parser.error
+        closing = Lex.dot if unit.procedure is None else Lex.semicollon
+        if lexer.lex != closing or lexer.start != len(prefix) + self._closings[index]:
+            self._full_parse(self.text)
+            return self.error
+        parser.error = None
+        parser.failed_unit = None
+        return None
@@ -0,0 +1,241 @@
+from dataclasses import dataclass
+
+from oberon_types import OberonType
+
+
+# Промежуточное представление - трехадресный код в базовых блоках.
+# Операнд - константа Const, именованная переменная Var (переменная или
+# параметр Оберона, а также служебные переменные логических операций)
+# или временное значение Temp. Каждое Temp присваивается ровно один раз,
+# переменные - сколько угодно раз (представление не SSA).
+#
+# Команды:
+#   copy      result = a
+#   binary    result = a op b          (extra - Operation)
+#   unary     result = op a            (extra - Operation)
+#   builtin   result = F(a, ...)       (extra - имя стандартной функции)
+#   is        result = a IS T          (extra - имя типа)
+#   procedure result = ссылка на процедуру (extra - имя)
+#   load      result = a[b]            элемент массива или поле записи (b - Const(имя поля))
+#   guard     result = a(T)            охрана типа (extra - имя типа)
+#   address   result = адрес a[b]      для передачи элемента как VAR
+#   store     a[b] = c
+#   assign    a := b                   присваивание массива или записи целиком
+#   new       result = NEW(T)          (extra - имя типа)
+#   call      [result =] P(a, ...)     (extra - (имя, номера параметров VAR);
+#                                       у вызова процедурной переменной имя -
+#                                       None, а процедура - последний аргумент)
+#   jump      переход на блок extra
+#   branch    если a - на extra[0], иначе на extra[1]
+#   return    возврат [a]
+#   trap      аварийная остановка (extra - сообщение)
+
+
+# dataclass, а не NamedTuple: кортежи Const(1) и Temp(1) были бы равны
+@dataclass(frozen=True, slots=True)
+class Const:
+    value: object
+
+    def __str__(self) -> str:
+        if self.value is None:
+            return "NIL"
+        if isinstance(self.value, bool):
+            return "TRUE" if self.value else "FALSE"
+        if isinstance(self.value, frozenset):
+            return "{" + ", ".join(str(element) for element in sorted(self.value)) + "}"
+        return repr(self.value)
+
+
+@dataclass(frozen=True, slots=True)
+class Var:
+    name: str
+
+    def __str__(self) -> str:
+        return self.name
+
+
+@dataclass(frozen=True, slots=True)
+class Temp:
+    number: int
+
+    def __str__(self) -> str:
+        return f"t{self.number}"
+
+
+Operand = Const | Var | Temp
+
+TERMINATORS = frozenset(("jump", "branch", "return", "trap"))
+# команды без побочных эффектов: их можно удалять, если результат не нужен
+PURE_OPCODES = frozenset(("copy", "binary", "unary", "builtin", "is", "procedure", "load"))
+# команды, которые меняют память (элементы массивов, поля, переменные в памяти)
+MEMORY_WRITES = frozenset(("store", "assign", "new", "call"))
+
+
+def _operator(operation) -> str:
+    # у IN и IS значения в Operation - описания, а не знаки
+    return operation.name if operation.name in ("IN", "IS") else operation.value
+
+
+class Instruction:
+    __slots__ = ("opcode", "result", "arguments", "extra")
+
+    def __init__(self, opcode: str, result: Var | Temp | None = None,
+                 arguments: list[Operand] | None = None, extra=None) -> None:
+        self.opcode = opcode
+        self.result = result
+        self.arguments = arguments if arguments is not None else []
+        self.extra = extra
+
+    def __str__(self) -> str:
+        arguments = [str(argument) for argument in self.arguments]
+        opcode = self.opcode
+        if opcode == "copy":
+            text = arguments[0]
+        elif opcode == "binary":
+            text = f"{arguments[0]} {_operator(self.extra)} {arguments[1]}"
+        elif opcode == "unary":
+            text = f"{_operator(self.extra)}{arguments[0]}"
+        elif opcode == "builtin":
+            text = f"{self.extra}({', '.join(arguments)})"
+        elif opcode == "is":
+            text = f"{arguments[0]} IS {self.extra}"
+        elif opcode == "procedure":
+            text = f"PROCEDURE {self.extra}"
+        elif opcode == "load":
+            text = f"{arguments[0]}[{arguments[1]}]"
+        elif opcode == "guard":
+            text = f"{arguments[0]}({self.extra})"
+        elif opcode == "address":
+            text = f"ADR {arguments[0]}[{arguments[1]}]"
+        elif opcode == "new":
+            text = f"NEW {self.extra}"
+        elif opcode == "call":
+            name, by_ref = self.extra
+            if name is None:
+                name = arguments.pop()
+            text = f"call {name}({', '.join(('VAR ' if index in by_ref else '') + argument for index, argument in enumerate(arguments))})"
+        elif opcode == "store":
+            return f"{arguments[0]}[{arguments[1]}] = {arguments[2]}"
+        elif opcode == "assign":
+            return f"{arguments[0]} := {arguments[1]}"
+        elif opcode == "jump":
+            return f"jump B{self.extra}"
+        elif opcode == "branch":
+            return f"branch {arguments[0]} B{self.extra[0]} B{self.extra[1]}"
+        elif opcode == "return":
+            return "return " + arguments[0] if arguments else "return"
+        elif opcode == "trap":
+            return f"trap {self.extra!r}"
+        else:
+            text = f"{opcode} {', '.join(arguments)}"
+        return f"{self.result} = {text}" if self.result is not None else text
+
+    # номера аргументов, которые читаются как значения (не адреса VAR)
+    def value_arguments(self) -> list[int]:
+        if self.opcode == "call":
+            by_ref = self.extra[1]
+            return [index for index in range(len(self.arguments)) if index not in by_ref]
+        return list(range(len(self.arguments)))
+
+
+class BasicBlock:
+    __slots__ = ("label", "instructions")
+
+    def __init__(self, label: int) -> None:
+        self.label = label
+        self.instructions: list[Instruction] = []
+
+    @property
+    def terminator(self) -> Instruction | None:
+        if self.instructions and self.instructions[-1].opcode in TERMINATORS:
+            return self.instructions[-1]
+        return None
+
+    def successors(self) -> list[int]:
+        terminator = self.terminator
+        if terminator is None:
+            return []
+        if terminator.opcode == "jump":
+            return [terminator.extra]
+        if terminator.opcode == "branch":
+            return list(terminator.extra)
+        return []
+
+
+class IRFunction:
+    def __init__(self, name: str, parameters: list[Var]) -> None:
+        self.name = name
+        self.parameters = parameters
+        self.blocks: dict[int, BasicBlock] = dict()
+        self.entry = 0
+        # переменные в памяти: глобальные, параметры VAR и переменные,
+        # переданные как VAR. Запись в одну из них или вызов процедуры
+        # может изменить любую из них
+        self.memory_variables: set[Var] = set()
+        # типы локальных переменных: проходам они не нужны, по ним
+        # переменные создаются при исполнении (см. ir_interpreter.py)
+        self.variable_types: dict[str, OberonType] = dict()
+        self._next_label = 0
+        self._next_temp = 0
+
+    def new_block(self) -> BasicBlock:
+        block = BasicBlock(self._next_label)
+        self._next_label += 1
+        self.blocks[block.label] = block
+        return block
+
+    def new_temp(self) -> Temp:
+        self._next_temp += 1
+        return Temp(self._next_temp)
+
+    def predecessors(self) -> dict[int, list[int]]:
+        result = {label: [] for label in self.blocks}
+        for block in self.blocks.values():
+            for successor in block.successors():
+                result[successor].append(block.label)
+        return result
+
+    # блоки в порядке обхода в глубину от входа (обратный постпорядок)
+    def reverse_postorder(self) -> list[int]:
+        order = []
+        visited = {self.entry}
+        stack = [(self.entry, iter(self.blocks[self.entry].successors()))]
+        while stack:
+            label, successors = stack[-1]
+            for successor in successors:
+                if successor not in visited:
+                    visited.add(successor)
+                    stack.append((successor, iter(self.blocks[successor].successors())))
+                    break
+            else:
+                stack.pop()
+                order.append(label)
+        order.reverse()
+        return order
+
+    def instruction_count(self) -> int:
+        return sum(len(block.instructions) for block in self.blocks.values())
+
+    def __str__(self) -> str:
+        lines = [f"PROCEDURE {self.name}({', '.join(str(parameter) for parameter in self.parameters)})"]
+        for label in self.reverse_postorder():
+            lines.append(f"  B{label}:")
+            for instruction in self.blocks[label].instructions:
+                lines.append(f"    {instruction}")
+        return "\n".join(lines)
+
+
+# functions[0] - тело модуля. variable_types - типы глобальных переменных,
+# types - типы по именам из команд is, guard и new
+class IRModule:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.functions: list[IRFunction] = []
+        self.variable_types: dict[str, OberonType] = dict()
+        self.types: dict[str, OberonType] = dict()
+
+    def instruction_count(self) -> int:
+        return sum(function.instruction_count() for function in self.functions)
+
+    def __str__(self) -> str:
+        return "\n\n".join(str(function) for function in self.functions) + "\n"
@@ -0,0 +1,517 @@
+from ast_node import *
+from nametable import *
+from bytecode import is_structured
+from ir import *
+from syntax_analyzer import Parser
+from universe import UNIVERSE, StandardProcedure
+
+
+_CASE_TRAP = "нет подходящей метки в операторе CASE"
+
+
+def _entity_type(entity) -> OberonType | None:
+    if isinstance(entity, Variable):
+        return entity.variable_type
+    if isinstance(entity, ProcedureParameter):
+        return entity.param_type
+    return None
+
+
+def _type_name(oberon_type: OberonType | None) -> str:
+    if isinstance(oberon_type, PointerType) and oberon_type.type_name is None:
+        oberon_type = oberon_type.type_of_pointer
+    if oberon_type is not None and oberon_type.type_name is not None:
+        return oberon_type.type_name.name
+    return "?"
+
+
+# Построение промежуточного представления по дереву разобранного модуля:
+# по функции на каждую процедуру (включая вложенные) и на тело модуля
+class IRBuilder:
+    def __init__(self, parser: Parser) -> None:
+        self._parser = parser
+        self._module = IRModule(parser.module_name)
+        self._pending: list[Procedure] = []
+        self._seen: set[int] = set()
+        self._global_names: set[str] = set()
+        self._function: IRFunction | None = None
+        self._block: BasicBlock | None = None
+        self._logical_count = 0
+
+    def build(self) -> IRModule:
+        for entry in self._parser.nametable.get_global_scope_identifiers():
+            if not isinstance(entry.name, Identifier):
+                continue
+            if isinstance(entry.entity, Variable):
+                self._global_names.add(entry.entity.name)
+                self._module.variable_types[entry.entity.name] = entry.entity.variable_type
+            elif isinstance(entry.entity, Procedure) and not isinstance(entry.entity, StandardProcedure):
+                self._queue(entry.entity)
+        body = self._begin_function("<тело модуля>", [])
+        self._statements(self._parser.module_body)
+        self._terminate(Instruction("return"))
+        self._module.functions.append(body)
+        while self._pending:
+            self._build_procedure(self._pending.pop())
+        return self._module
+
+    def _queue(self, procedure: Procedure):
+        if id(procedure) not in self._seen:
+            self._seen.add(id(procedure))
+            self._pending.append(procedure)
+
+    def _begin_function(self, name: str, parameters: list[Var]) -> IRFunction:
+        function = IRFunction(name, parameters)
+        function.memory_variables.update(Var(name) for name in self._global_names)
+        self._function = function
+        self._block = function.new_block()
+        self._logical_count = 0
+        return function
+
+    def _build_procedure(self, procedure: Procedure):
+        parameters = procedure.head.procedure_type.parameters
+        function = self._begin_function(procedure.head.name.name,
+                                        [Var(parameter.name) for parameter in parameters])
+        for parameter in parameters:
+            # локальное имя скрывает глобальное
+            function.memory_variables.discard(Var(parameter.name))
+            if parameter.by_ref:
+                function.memory_variables.add(Var(parameter.name))
+        for variable in procedure.body.variables:
+            function.memory_variables.discard(Var(variable.name))
+            function.variable_types[variable.name] = variable.variable_type
+        self._statements(procedure.body.code)
+        if procedure.body.return_expression is not None:
+            self._terminate(Instruction("return", None, [self._expression(procedure.body.return_expression)]))
+        else:
+            self._terminate(Instruction("return"))
+        self._module.functions.append(function)
+
+    # имя типа для команд is, guard и new; сам тип запоминается в модуле
+    def _type_name(self, oberon_type: OberonType | None) -> str:
+        name = _type_name(oberon_type)
+        if isinstance(oberon_type, PointerType):
+            oberon_type = oberon_type.type_of_pointer
+        if oberon_type is not None:
+            self._module.types[name] = oberon_type
+        return name
+
+    def _emit(self, instruction: Instruction):
+        self._block.instructions.append(instruction)
+
+    def _terminate(self, terminator: Instruction):
+        self._emit(terminator)
+        # код после перехода попадает в новый (возможно, недостижимый) блок
+        self._block = self._function.new_block()
+
+    def _switch(self, block: BasicBlock):
+        self._block = block
+
+    ######################################################
+    #                  ОПЕРАТОРЫ                         #
+    ######################################################
+
+    def _statements(self, statements: list[Statement]):
+        for statement in statements:
+            self._statement(statement)
+
+    def _statement(self, statement: Statement):
+        match statement:
+            case Assignment():
+                self._assign(statement.var, self._expression(statement.expression))
+            case ProcedureCall():
+                entity = statement.procedure.entity
+                if isinstance(entity, StandardProcedure) and not entity.is_function:
+                    self._standard_procedure(entity.head.name.name, statement.actual_parameters)
+                else:
+                    self._call(statement.procedure, statement.actual_parameters, False)
+            case IF():
+                self._if(statement)
+            case WHILE():
+                header = self._function.new_block()
+                exit_block = self._function.new_block()
+                self._emit(Instruction("jump", extra=header.label))
+                self._switch(header)
+                for branch in statement.branches:
+                    body = self._function.new_block()
+                    next_test = self._function.new_block()
+                    condition = self._expression(branch.condition)
+                    self._emit(Instruction("branch", None, [condition], (body.label, next_test.label)))
+                    self._switch(body)
+                    self._statements(branch.code)
+                    self._emit(Instruction("jump", extra=header.label))
+                    self._switch(next_test)
+                self._emit(Instruction("jump", extra=exit_block.label))
+                self._switch(exit_block)
+            case REPEAT():
+                body = self._function.new_block()
+                exit_block = self._function.new_block()
+                self._emit(Instruction("jump", extra=body.label))
+                self._switch(body)
+                self._statements(statement.code)
+                condition = self._expression(statement.condition)
+                self._emit(Instruction("branch", None, [condition], (exit_block.label, body.label)))
+                self._switch(exit_block)
+            case FOR():
+                self._for(statement)
+            case CASE():
+                self._case(statement)
+            case _:
+                raise Exception(f"неизвестный оператор {type(statement).__name__}")
+
+    def _if(self, statement: IF):
+        exit_block = self._function.new_block()
+        while True:
+            then_block = self._function.new_block()
+            else_block = self._function.new_block()
+            condition = self._expression(statement.condition)
+            self._emit(Instruction("branch", None, [condition], (then_block.label, else_block.label)))
+            self._switch(then_block)
+            self._statements(statement.code)
+            self._emit(Instruction("jump", extra=exit_block.label))
+            self._switch(else_block)
+            else_code = statement.else_code
+            if else_code is not None and len(else_code) == 1 and type(else_code[0]) is IF:
+                statement = else_code[0]
+                continue
+            if else_code is not None:
+                self._statements(else_code)
+            self._emit(Instruction("jump", extra=exit_block.label))
+            break
+        self._switch(exit_block)
+
+    def _for(self, statement: FOR):
+        step = statement.step.literal if statement.step is not None else 1
+        self._assign(statement.variable, self._expression(statement.start))
+        limit = self._expression(statement.end)
+        if type(limit) is Var:
+            # граница вычисляется один раз, даже если переменная меняется в цикле
+            copy = self._function.new_temp()
+            self._emit(Instruction("copy", copy, [limit]))
+            limit = copy
+        header = self._function.new_block()
+        body = self._function.new_block()
+        exit_block = self._function.new_block()
+        self._emit(Instruction("jump", extra=header.label))
+        self._switch(header)
+        condition = self._function.new_temp()
+        variable = self._designator(statement.variable)
+        relation = Operation.less_or_equal if step > 0 else Operation.greater_or_equal
+        self._emit(Instruction("binary", condition, [variable, limit], relation))
+        self._emit(Instruction("branch", None, [condition], (body.label, exit_block.label)))
+        self._switch(body)
+        self._statements(statement.code)
+        next_value = self._function.new_temp()
+        self._emit(Instruction("binary", next_value, [self._designator(statement.variable), Const(step)], Operation.plus))
+        self._assign(statement.variable, next_value)
+        self._emit(Instruction("jump", extra=header.label))
+        self._switch(exit_block)
+
+    def _case(self, statement: CASE):
+        value = self._expression(statement.expression)
+        exit_block = self._function.new_block()
+        for branch in statement.branches:
+            body = self._function.new_block()
+            for label in branch.labels:
+                next_test = self._function.new_block()
+                label_value = label.value
+                test = self._function.new_temp()
+                if isinstance(label_value, OberonType):
+                    self._emit(Instruction("is", test, [value], self._type_name(label_value)))
+                elif isinstance(label_value, IntRange):
+                    low = self._function.new_temp()
+                    high = self._function.new_temp()
+                    self._emit(Instruction("binary", low, [value, Const(label_value.start)], Operation.greater_or_equal))
+                    self._emit(Instruction("binary", high, [value, Const(label_value.end)], Operation.less_or_equal))
+                    self._emit(Instruction("binary", test, [low, high], Operation.LOGICAL_AND))
+                else:
+                    self._emit(Instruction("binary", test, [value, Const(label_value)], Operation.equal))
+                self._emit(Instruction("branch", None, [test], (body.label, next_test.label)))
+                self._switch(next_test)
+            otherwise = self._block
+            self._switch(body)
+            self._statements(branch.code)
+            self._emit(Instruction("jump", extra=exit_block.label))
+            self._switch(otherwise)
+        self._terminate(Instruction("trap", extra=_CASE_TRAP))
+        self._switch(exit_block)
+
+    ######################################################
+    #                  ПЕРЕМЕННЫЕ                        #
+    ######################################################
+
+    def _selectors(self, designator: Designator, selectors: list[AstNode]) -> Operand:
+        entity = designator.entity
+        if isinstance(entity, Constant):
+            base = Const(entity.value)
+        else:
+            base = Var(identifier_to_str(designator.name))
+        for selector in selectors:
+            match selector:
+                case IndexSelector():
+                    for index in selector.indexes:
+                        result = self._function.new_temp()
+                        self._emit(Instruction("load", result, [base, self._expression(index)]))
+                        base = result
+                case FieldSelector():
+                    result = self._function.new_temp()
+                    self._emit(Instruction("load", result, [base, Const(selector.field_name)]))
+                    base = result
+                case TypeGuardSelector():
+                    result = self._function.new_temp()
+                    self._emit(Instruction("guard", result, [base], self._type_name(selector.guard_type)))
+                    base = result
+        return base
+
+    def _designator(self, designator: Designator) -> Operand:
+        entity = designator.entity
+        if isinstance(entity, Procedure):
+            if not isinstance(entity, StandardProcedure) and designator.name.child_name is None:
+                self._queue(entity)
+            result = self._function.new_temp()
+            self._emit(Instruction("procedure", result, extra=identifier_to_str(designator.name)))
+            return result
+        return self._selectors(designator, designator.selectors)
+
+    # последний селектор (индекс или поле) - место записи, остальные вычисляются
+    def _split_target(self, designator: Designator) -> tuple[Operand, Operand] | None:
+        selectors = designator.selectors
+        last = len(selectors) - 1
+        while last >= 0 and type(selectors[last]) in (DereferenceSelector, TypeGuardSelector):
+            last -= 1
+        if last < 0:
+            return None
+        selector = selectors[last]
+        if type(selector) is IndexSelector:
+            base = self._selectors(designator, selectors[:last] + [IndexSelector(selector.indexes[:-1])])
+            return base, self._expression(selector.indexes[-1])
+        return self._selectors(designator, selectors[:last]), Const(selector.field_name)
+
+    def _assign(self, designator: Designator, value: Operand):
+        target_type = self._target_type(designator)
+        target = self._split_target(designator)
+        if is_structured(target_type):
+            if target is None:
+                destination = Var(identifier_to_str(designator.name))
+            else:
+                destination = self._function.new_temp()
+                self._emit(Instruction("load", destination, list(target)))
+            self._emit(Instruction("assign", None, [destination, value]))
+        elif target is not None:
+            self._emit(Instruction("store", None, [target[0], target[1], value]))
+        else:
+            variable = Var(identifier_to_str(designator.name))
+            instructions = self._block.instructions
+            if type(value) is Temp and instructions and instructions[-1].result == value \
+                    and instructions[-1].opcode in PURE_OPCODES:
+                # результат последней команды сразу записывается в переменную
+                instructions[-1].result = variable
+            else:
+                self._emit(Instruction("copy", variable, [value]))
+
+    def _target_type(self, designator: Designator) -> OberonType | None:
+        current_type = _entity_type(designator.entity)
+        for selector in designator.selectors:
+            if isinstance(current_type, PointerType):
+                current_type = current_type.type_of_pointer
+            match selector:
+                case IndexSelector():
+                    for _ in selector.indexes:
+                        current_type = current_type.element_type if isinstance(current_type, ArrayType) else None
+                case FieldSelector():
+                    field_type = None
+                    while isinstance(current_type, RecordType) and field_type is None:
+                        for field in current_type.fields:
+                            if field.identifier.name == selector.field_name:
+                                field_type = field.field_type
+                        current_type = current_type.base_type
+                    current_type = field_type
+                case TypeGuardSelector():
+                    current_type = selector.guard_type
+        if isinstance(current_type, PointerType) and designator.selectors \
+                and type(designator.selectors[-1]) is DereferenceSelector:
+            current_type = current_type.type_of_pointer
+        return current_type
+
+    ######################################################
+    #                  ВЫРАЖЕНИЯ                         #
+    ######################################################
+
+    # Выражение вычисляется без рекурсии. Логические & и OR вычисляются
+    # сокращенно, поэтому порождают ветвление и служебную переменную
+    def _expression(self, expression: AstNode) -> Operand:
+        results: list[Operand] = []
+        tasks: list[tuple[AstNode, int, object]] = [(expression, 0, None)]
+        while tasks:
+            node, stage, data = tasks.pop()
+            node_type = type(node)
+            if node_type is BinaryOperation:
+                operation = node.value
+                if stage == 0:
+                    tasks.append((node, 1, None))
+                    tasks.append((node.left, 0, None))
+                    continue
+                if operation == Operation.IS:
+                    result = self._function.new_temp()
+                    self._emit(Instruction("is", result, [results.pop()], self._type_name(node.right.entity)))
+                    results.append(result)
+                elif operation in (Operation.LOGICAL_AND, Operation.LOGICAL_OR):
+                    if stage == 1:
+                        self._logical_count += 1
+                        variable = Var(f"%c{self._logical_count}")
+                        self._emit(Instruction("copy", variable, [results.pop()]))
+                        right_block = self._function.new_block()
+                        join = self._function.new_block()
+                        targets = (right_block.label, join.label) if operation == Operation.LOGICAL_AND \
+                            else (join.label, right_block.label)
+                        self._emit(Instruction("branch", None, [variable], targets))
+                        self._switch(right_block)
+                        tasks.append((node, 2, (variable, join)))
+                        tasks.append((node.right, 0, None))
+                    else:
+                        variable, join = data
+                        self._emit(Instruction("copy", variable, [results.pop()]))
+                        self._emit(Instruction("jump", extra=join.label))
+                        self._switch(join)
+                        results.append(variable)
+                elif stage == 1:
+                    tasks.append((node, 2, None))
+                    tasks.append((node.right, 0, None))
+                else:
+                    right = results.pop()
+                    left = results.pop()
+                    result = self._function.new_temp()
+                    self._emit(Instruction("binary", result, [left, right], operation))
+                    results.append(result)
+            elif node_type is UnaryOperation:
+                if stage == 0:
+                    tasks.append((node, 1, None))
+                    tasks.append((node.operand, 0, None))
+                    continue
+                operand = results.pop()
+                if node.value == Operation.plus:
+                    results.append(operand)
+                else:
+                    result = self._function.new_temp()
+                    self._emit(Instruction("unary", result, [operand], node.value))
+                    results.append(result)
+            else:
+                results.append(self._operand(node))
+        return results[0]
+
+    def _operand(self, node: AstNode) -> Operand:
+        match node:
+            case LiteralValue():
+                return Const(node.literal)
+            case Designator():
+                return self._designator(node)
+            case FunctionCall():
+                return self._call(node.procedure, node.actual_parameters, True)
+            case SetConstructor():
+                result: Operand = Const(frozenset())
+                for element in node.elements:
+                    if type(element) is SetRange:
+                        part = self._function.new_temp()
+                        low = self._expression(element.low)
+                        high = self._expression(element.high)
+                        self._emit(Instruction("builtin", part, [low, high], "SET_RANGE"))
+                    else:
+                        part = self._function.new_temp()
+                        self._emit(Instruction("builtin", part, [self._expression(element)], "SET_ELEMENT"))
+                    union = self._function.new_temp()
+                    self._emit(Instruction("binary", union, [result, part], Operation.plus))
+                    result = union
+                return result
+            case _:
+                raise Exception(f"неподдерживаемое выражение {type(node).__name__}")
+
+    ######################################################
+    #                  ВЫЗОВЫ                            #
+    ######################################################
+
+    def _reference(self, expression: AstNode) -> Operand:
+        if type(expression) is not Designator:
+            raise Exception("параметр VAR должен быть переменной")
+        target = self._split_target(expression)
+        if target is None or is_structured(self._target_type(expression)):
+            if target is None:
+                variable = Var(identifier_to_str(expression.name))
+                if not is_structured(_entity_type(expression.entity)):
+                    # переменная, переданная как VAR, может измениться при вызове
+                    self._function.memory_variables.add(variable)
+                return variable
+            result = self._function.new_temp()
+            self._emit(Instruction("load", result, list(target)))
+            return result
+        result = self._function.new_temp()
+        self._emit(Instruction("address", result, list(target)))
+        return result
+
+    def _call(self, designator: Designator, actual_parameters: list[ProcedureActualParameterCalculation],
+              returns_value: bool) -> Operand | None:
+        entity = designator.entity
+        name = identifier_to_str(designator.name)
+        if isinstance(entity, StandardProcedure):
+            arguments = [self._expression(actual.code) for actual in actual_parameters]
+            result = self._function.new_temp()
+            self._emit(Instruction("builtin", result, arguments, name))
+            return result
+        procedure = None
+        if isinstance(entity, Procedure):
+            if name == entity.head.name.name:
+                self._queue(entity)
+        else:
+            procedure = self._designator(designator)
+            name = None
+        arguments = []
+        by_ref = []
+        for index, actual in enumerate(actual_parameters):
+            if actual.by_ref:
+                by_ref.append(index)
+                arguments.append(self._reference(actual.code))
+            else:
+                arguments.append(self._expression(actual.code))
+        if procedure is not None:
+            # процедурная переменная - обычный аргумент: проходы видят ее использование
+            arguments.append(procedure)
+        result = self._function.new_temp() if returns_value else None
+        self._emit(Instruction("call", result, arguments, (name, tuple(by_ref))))
+        return result
+
+    def _standard_procedure(self, name: str, actual_parameters: list[ProcedureActualParameterCalculation]):
+        arguments = [actual.code for actual in actual_parameters]
+        if name in ("INC", "DEC"):
+            step = self._expression(arguments[1]) if len(arguments) > 1 else Const(1)
+            result = self._function.new_temp()
+            operation = Operation.plus if name == "INC" else Operation.minus
+            self._emit(Instruction("binary", result, [self._designator(arguments[0]), step], operation))
+            self._assign(arguments[0], result)
+        elif name in ("INCL", "EXCL"):
+            element = self._function.new_temp()
+            self._emit(Instruction("builtin", element, [self._expression(arguments[1])], "SET_ELEMENT"))
+            result = self._function.new_temp()
+            operation = Operation.plus if name == "INCL" else Operation.minus
+            self._emit(Instruction("binary", result, [self._designator(arguments[0]), element], operation))
+            self._assign(arguments[0], result)
+        elif name == "NEW":
+            result = self._function.new_temp()
+            self._emit(Instruction("new", result, extra=self._type_name(self._target_type(arguments[0]))))
+            self._assign(arguments[0], result)
+        elif name == "ASSERT":
+            condition = self._expression(arguments[0])
+            continue_block = self._function.new_block()
+            trap_block = self._function.new_block()
+            self._emit(Instruction("branch", None, [condition], (continue_block.label, trap_block.label)))
+            self._switch(trap_block)
+            self._emit(Instruction("trap", extra="нарушено утверждение ASSERT"))
+            self._switch(continue_block)
+        else:
+            # PACK и UNPK меняют свои параметры VAR
+            by_ref = UNIVERSE[name].entity.var_parameters
+            values = [self._reference(argument) if index in by_ref else self._expression(argument)
+                      for index, argument in enumerate(arguments)]
+            self._emit(Instruction("call", None, values, (name, by_ref)))
+
+
+def build_ir(parser: Parser) -> IRModule:
+    return IRBuilder(parser).build()
@@ -0,0 +1,287 @@
+import sys
+
+from ast_node import Operation
+from bytecode import record_layout
+from ir import *
+from oberon_types import RecordType
+from type_table import TYPES
+from vm import BUILTIN_FUNCTIONS, OberonTrap, checked_integer, copy_into, log_library, make_value, text
+
+
+# Исполнение промежуточного представления (см. ir.py) - для проверки
+# оптимизирующих проходов: программа до и после проходов должна давать
+# тот же результат, что и на виртуальной машине.
+#
+# Значения - как в vm.py, кроме указателей: указатель - объект Pointer,
+# а не сама запись, потому что представление не различает присваивание
+# указателя и записи, на которую он указывает. Переменная, переданная
+# как VAR, - пара (словарь или список, ключ), ее значение читается и
+# пишется через эту пару.
+
+_FULL_SET = frozenset(range(32))
+
+
+class Pointer:
+    __slots__ = ("record",)
+
+    def __init__(self, record: list) -> None:
+        self.record = record
+
+
+def _record(value) -> list:
+    if value is None:
+        raise OberonTrap("обращение по указателю NIL")
+    return value.record if type(value) is Pointer else value
+
+
+def _is_extension(value, oberon_type) -> bool:
+    return TYPES.is_extension(_record(value)[0], oberon_type)
+
+
+def _copy_into(target, source):
+    target = _record(target)
+    source = _record(source)
+    if isinstance(source, str):
+        copy_into(target, source, None)
+        return
+    if target and isinstance(target[0], RecordType):
+        # запись-расширение присваивается базовой записи по полям базы
+        items = range(1, len(target))
+    elif len(source) > len(target):
+        raise OberonTrap("присваивание массива большей длины")
+    else:
+        items = range(len(source))
+    for index in items:
+        item = source[index]
+        if type(item) is list:
+            _copy_into(target[index], item)
+        else:
+            target[index] = item
+
+
+def _binary(operation: Operation, left, right):
+    if operation == Operation.plus:
+        return left | right if isinstance(left, frozenset) else checked_integer(left + right)
+    if operation == Operation.minus:
+        return left - right if isinstance(left, frozenset) else checked_integer(left - right)
+    if operation == Operation.multiple:
+        return left & right if isinstance(left, frozenset) else checked_integer(left * right)
+    if operation == Operation.divide:
+        if isinstance(left, frozenset):
+            return left ^ right
+        if right == 0:
+            raise OberonTrap("деление на ноль")
+        return left / right
+    if operation in (Operation.DIV, Operation.MOD):
+        if right == 0:
+            raise OberonTrap("деление на ноль")
+        return checked_integer(left // right) if operation == Operation.DIV else left % right
+    if operation == Operation.LOGICAL_AND:
+        return left and right
+    if operation == Operation.LOGICAL_OR:
+        return left or right
+    if operation == Operation.IN:
+        return left in right
+    if isinstance(left, list) or isinstance(right, list):
+        # массивы литер сравниваются как строки
+        left, right = text(left), text(right)
+    if operation == Operation.equal:
+        return left == right
+    if operation == Operation.unequal:
+        return left != right
+    if operation == Operation.less:
+        return left < right
+    if operation == Operation.less_or_equal:
+        return left <= right
+    if operation == Operation.greater:
+        return left > right
+    if operation == Operation.greater_or_equal:
+        return left >= right
+    raise Exception(f"неизвестная операция {operation}")
+
+
+def _unary(operation: Operation, value):
+    if operation == Operation.LOGICAL_NOT:
+        return not value
+    if operation == Operation.minus:
+        return _FULL_SET - value if isinstance(value, frozenset) else checked_integer(-value)
+    raise Exception(f"неизвестная операция {operation}")
+
+
+def _builtin(name: str, values: list):
+    if name == "SET_ELEMENT":
+        if not 0 <= values[0] <= 31:
+            raise OberonTrap(f"элемент множества {values[0]} вне диапазона 0..31")
+        return frozenset((values[0],))
+    if name == "SET_RANGE":
+        low, high = values
+        if low < 0 or high > 31:
+            raise OberonTrap(f"диапазон множества {low}..{high} вне диапазона 0..31")
+        return frozenset(range(low, high + 1))
+    return BUILTIN_FUNCTIONS[name](*values)
+
+
+class IRInterpreter:
+    def __init__(self, module: IRModule, output=None, library: dict[str, dict] | None = None) -> None:
+        if output is None:
+            output = sys.stdout
+        if library is None:
+            library = {"Log": log_library(output)}
+        self._module = module
+        self._library = library
+        self._functions = {function.name: function for function in module.functions[1:]}
+        self._field_indexes: dict[int, dict[str, int]] = dict()
+        self.globals = {name: make_value(oberon_type) for name, oberon_type in module.variable_types.items()}
+
+    def run(self):
+        return self._execute(self._module.functions[0], [])
+
+    def call(self, name: str, *arguments):
+        function = self._functions.get(name)
+        if function is None:
+            raise Exception(f"в модуле {self._module.name} нет процедуры {name}")
+        return self._execute(function, list(arguments))
+
+    def _execute(self, function: IRFunction, arguments: list):
+        frame: dict = dict(zip((parameter.name for parameter in function.parameters), arguments))
+        for name, oberon_type in function.variable_types.items():
+            frame[name] = make_value(oberon_type)
+        label = function.entry
+        while True:
+            for instruction in function.blocks[label].instructions:
+                opcode = instruction.opcode
+                if opcode == "jump":
+                    label = instruction.extra
+                    break
+                if opcode == "branch":
+                    label = instruction.extra[0] if self._read(frame, instruction.arguments[0]) \
+                        else instruction.extra[1]
+                    break
+                if opcode == "return":
+                    return self._read(frame, instruction.arguments[0]) if instruction.arguments else None
+                if opcode == "trap":
+                    raise OberonTrap(instruction.extra)
+                self._instruction(frame, instruction)
+            else:
+                raise Exception(f"блок B{label} процедуры {function.name} не заканчивается переходом")
+
+    def _read(self, frame: dict, operand: Operand):
+        operand_type = type(operand)
+        if operand_type is Const:
+            return operand.value
+        if operand_type is Temp:
+            return frame[operand]
+        value = frame[operand.name] if operand.name in frame else self.globals[operand.name]
+        if type(value) is tuple:
+            container, key = value
+            return container[key]
+        return value
+
+    def _write(self, frame: dict, result: Var | Temp, value):
+        if type(result) is Temp:
+            frame[result] = value
+            return
+        scope = frame if result.name in frame or result.name not in self.globals else self.globals
+        current = scope.get(result.name)
+        if type(current) is tuple:
+            container, key = current
+            container[key] = value
+        else:
+            scope[result.name] = value
+
+    # место элемента массива или поля записи: (список, номер)
+    def _location(self, base, key) -> tuple[list, int]:
+        container = _record(base)
+        if isinstance(key, str):
+            record_type = container[0]
+            indexes = self._field_indexes.get(id(record_type))
+            if indexes is None:
+                indexes = {name: index for index, (name, _) in enumerate(record_layout(record_type), 1)}
+                self._field_indexes[id(record_type)] = indexes
+            return container, indexes[key]
+        if key < 0 or key >= len(container):
+            raise OberonTrap("индекс вне границ массива")
+        return container, key
+
+    def _reference(self, frame: dict, operand: Operand):
+        if type(operand) is Var:
+            scope = frame if operand.name in frame else self.globals
+            value = scope[operand.name]
+            # массив или запись передаются сами, ссылка - дальше как есть
+            return value if type(value) in (list, tuple) else (scope, operand.name)
+        value = self._read(frame, operand)
+        return value.record if type(value) is Pointer else value
+
+    def _instruction(self, frame: dict, instruction: Instruction):
+        opcode = instruction.opcode
+        arguments = instruction.arguments
+        if opcode == "copy":
+            value = self._read(frame, arguments[0])
+        elif opcode == "binary":
+            value = _binary(instruction.extra, self._read(frame, arguments[0]), self._read(frame, arguments[1]))
+        elif opcode == "unary":
+            value = _unary(instruction.extra, self._read(frame, arguments[0]))
+        elif opcode == "builtin":
+            value = _builtin(instruction.extra, [self._read(frame, argument) for argument in arguments])
+        elif opcode == "is":
+            value = self._read(frame, arguments[0])
+            value = value is not None and _is_extension(value, self._module.types[instruction.extra])
+        elif opcode == "guard":
+            value = self._read(frame, arguments[0])
+            if value is None or not _is_extension(value, self._module.types[instruction.extra]):
+                raise OberonTrap("охрана типа не выполнена")
+        elif opcode == "procedure":
+            value = instruction.extra
+        elif opcode == "load":
+            base = self._read(frame, arguments[0])
+            key = self._read(frame, arguments[1])
+            if isinstance(base, str):
+                # литера строковой константы; за последней - 0X
+                if key < 0 or key > len(base):
+                    raise OberonTrap("индекс вне границ массива")
+                value = base[key] if key < len(base) else "\0"
+            else:
+                container, index = self._location(base, key)
+                value = container[index]
+        elif opcode == "address":
+            value = self._location(self._read(frame, arguments[0]), self._read(frame, arguments[1]))
+        elif opcode == "store":
+            container, index = self._location(self._read(frame, arguments[0]), self._read(frame, arguments[1]))
+            container[index] = self._read(frame, arguments[2])
+            return
+        elif opcode == "assign":
+            _copy_into(self._read(frame, arguments[0]), self._read(frame, arguments[1]))
+            return
+        elif opcode == "new":
+            value = Pointer(make_value(self._module.types[instruction.extra]))
+        elif opcode == "call":
+            value = self._call(frame, instruction)
+            if instruction.result is None:
+                return
+        else:
+            raise Exception(f"неизвестная команда {opcode}")
+        self._write(frame, instruction.result, value)
+
+    def _call(self, frame: dict, instruction: Instruction):
+        name, by_ref = instruction.extra
+        arguments = instruction.arguments
+        if name is None:
+            name = self._read(frame, arguments[-1])
+            if name is None:
+                raise OberonTrap("вызов процедурной переменной со значением NIL")
+            arguments = arguments[:-1]
+        values = [self._reference(frame, argument) if index in by_ref else self._read(frame, argument)
+                  for index, argument in enumerate(arguments)]
+        function = self._functions.get(name)
+        if function is not None:
+            try:
+                return self._execute(function, values)
+            except RecursionError:
+                raise OberonTrap("слишком глубокая рекурсия") from None
+        if name in BUILTIN_FUNCTIONS:
+            return BUILTIN_FUNCTIONS[name](*values)
+        module_name, _, procedure_name = name.partition(".")
+        procedure = self._library.get(module_name, {}).get(procedure_name)
+        if procedure is None:
+            raise Exception(f"нет реализации процедуры {name}")
+        return procedure(*values)
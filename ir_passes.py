@@ -0,0 +1,559 @@
+import time
+from typing import NamedTuple
+
+from ast_node import *
+from constant_folding import ConstantError, fold_constant
+from ir import *
+from universe import UNIVERSE
+
+
+# Оптимизирующие проходы над промежуточным представлением (см. ir.py).
+# Проход - объект с именем и методом run(function), который меняет
+# функцию на месте. PassManager запускает проходы по очереди для всех
+# функций модуля и для каждого прохода запоминает время и число команд
+# до и после.
+
+class Pass:
+    name = "pass"
+
+    def run(self, function: IRFunction):
+        raise NotImplementedError
+
+
+class PassReport(NamedTuple):
+    name: str
+    seconds: float
+    instructions_before: int
+    instructions_after: int
+
+
+######################################################
+#                  ОБЩИЕ ФУНКЦИИ                     #
+######################################################
+
+def _used_operands(instruction: Instruction) -> list[Operand]:
+    return [argument for argument in instruction.arguments if type(argument) is not Const]
+
+
+def _clobbers_memory(function: IRFunction, instruction: Instruction) -> bool:
+    # запись в память или в переменную, которая может быть псевдонимом
+    return instruction.opcode in MEMORY_WRITES or instruction.result in function.memory_variables
+
+
+# Операции, которые не могут вызвать аварийную остановку: их можно
+# вычислить до цикла, даже если цикл не выполнится ни разу, и удалить,
+# если результат не нужен. Целочисленная арифметика может переполниться
+# (см. vm.checked_integer), поэтому безопасна, только если по константе
+# видно, что операнды - REAL или SET
+_SAFE_BUILTINS = frozenset(("ODD", "ORD", "FLT", "ASR", "ROR", "LEN"))
+_SAFE_OPERATIONS = frozenset((Operation.equal, Operation.unequal, Operation.less, Operation.less_or_equal,
+                              Operation.greater, Operation.greater_or_equal, Operation.IN,
+                              Operation.LOGICAL_AND, Operation.LOGICAL_OR))
+_ARITHMETIC = frozenset((Operation.plus, Operation.minus, Operation.multiple))
+
+
+def _cannot_trap(instruction: Instruction) -> bool:
+    opcode = instruction.opcode
+    if opcode in ("is", "procedure", "copy"):
+        return True
+    if opcode == "builtin":
+        return instruction.extra in _SAFE_BUILTINS
+    operation = instruction.extra
+    if opcode == "unary":
+        return operation == Operation.LOGICAL_NOT
+    if opcode == "binary":
+        if operation in _SAFE_OPERATIONS:
+            return True
+        constants = [argument.value for argument in instruction.arguments if type(argument) is Const]
+        if operation in _ARITHMETIC:
+            return any(isinstance(value, (float, frozenset)) for value in constants)
+        if operation == Operation.divide:
+            divisor = instruction.arguments[1]
+            return any(isinstance(value, frozenset) for value in constants) or (
+                type(divisor) is Const and isinstance(divisor.value, float) and divisor.value != 0)
+        if operation in (Operation.DIV, Operation.MOD):
+            # MIN(INTEGER) DIV -1 переполняется
+            divisor = instruction.arguments[1]
+            return type(divisor) is Const and type(divisor.value) is int and divisor.value not in (0, -1)
+    return False
+
+
+def remove_unreachable_blocks(function: IRFunction):
+    reachable = set(function.reverse_postorder())
+    for label in list(function.blocks):
+        if label not in reachable:
+            del function.blocks[label]
+
+
+def _retarget(instruction: Instruction, old: int, new: int):
+    if instruction.opcode == "jump":
+        instruction.extra = new
+    elif instruction.opcode == "branch":
+        instruction.extra = tuple(new if target == old else target for target in instruction.extra)
+
+
+# Упрощение графа: удаление недостижимых блоков, переходы в обход
+# пустых блоков, слияние блока с единственным преемником
+def simplify_cfg(function: IRFunction):
+    remove_unreachable_blocks(function)
+    changed = True
+    while changed:
+        changed = False
+        for block in list(function.blocks.values()):
+            terminator = block.terminator
+            if terminator is None:
+                continue
+            if terminator.opcode == "branch" and terminator.extra[0] == terminator.extra[1]:
+                block.instructions[-1] = Instruction("jump", extra=terminator.extra[0])
+                changed = True
+            for successor in block.successors():
+                target = function.blocks[successor]
+                if len(target.instructions) == 1 and target.instructions[0].opcode == "jump" \
+                        and target.instructions[0].extra != successor:
+                    _retarget(block.instructions[-1], successor, target.instructions[0].extra)
+                    changed = True
+        predecessors = function.predecessors()
+        for block in list(function.blocks.values()):
+            if block.label not in function.blocks:
+                continue
+            terminator = block.terminator
+            if terminator is None or terminator.opcode != "jump":
+                continue
+            successor = terminator.extra
+            if successor == block.label or successor == function.entry or predecessors[successor] != [block.label]:
+                continue
+            block.instructions.pop()
+            block.instructions.extend(function.blocks[successor].instructions)
+            del function.blocks[successor]
+            predecessors = function.predecessors()
+            changed = True
+        remove_unreachable_blocks(function)
+
+
+def _literal_function_call(name: str, values: list) -> AstNode:
+    designator = Designator(CompositeIdentifier(name, None), UNIVERSE[name].entity)
+    return FunctionCall(designator, [ProcedureActualParameterCalculation(False, LiteralValue(value))
+                                     for value in values])
+
+
+# Значение команды с константными аргументами или None, если команда
+# не сворачивается (в том числе при ошибке вычисления - она остается
+# до времени исполнения)
+def _fold(instruction: Instruction) -> Const | None:
+    values = [argument.value for argument in instruction.arguments]
+    opcode = instruction.opcode
+    if opcode == "copy":
+        return instruction.arguments[0]
+    if any(value is None for value in values):
+        return None
+    if opcode == "binary":
+        node = BinaryOperation(instruction.extra, LiteralValue(values[0]), LiteralValue(values[1]))
+    elif opcode == "unary":
+        node = UnaryOperation(instruction.extra, LiteralValue(values[0]))
+    elif opcode == "builtin" and instruction.extra == "SET_ELEMENT":
+        node = SetConstructor([LiteralValue(values[0])])
+    elif opcode == "builtin" and instruction.extra == "SET_RANGE":
+        node = SetConstructor([SetRange(LiteralValue(values[0]), LiteralValue(values[1]))])
+    elif opcode == "builtin" and instruction.extra in UNIVERSE and UNIVERSE[instruction.extra].entity.is_function:
+        node = _literal_function_call(instruction.extra, values)
+    else:
+        return None
+    try:
+        folded = fold_constant(node)
+    except ConstantError:
+        return None
+    if folded is None:
+        return None
+    return Const(folded.literal)
+
+
+######################################################
+#                  РАСПРОСТРАНЕНИЕ КОНСТАНТ          #
+######################################################
+
+# Прямой анализ потока данных: для каждого блока - какие переменные и
+# временные значения на входе заведомо равны константам. На слиянии
+# остаются только одинаковые у всех предшественников значения. После
+# анализа константы подставляются в команды, команды с константными
+# аргументами сворачиваются, ветвления по константе становятся переходами
+class ConstantPropagation(Pass):
+    name = "constprop"
+
+    def run(self, function: IRFunction):
+        order = function.reverse_postorder()
+        predecessors = function.predecessors()
+        states: dict[int, dict[Operand, Const] | None] = {label: None for label in order}
+        changed = True
+        while changed:
+            changed = False
+            for label in order:
+                state = self._entry_state(function, label, predecessors, states)
+                state = self._transfer(function, function.blocks[label], state, False)
+                if state != states[label]:
+                    states[label] = state
+                    changed = True
+        for label in order:
+            state = self._entry_state(function, label, predecessors, states)
+            self._transfer(function, function.blocks[label], state, True)
+        remove_unreachable_blocks(function)
+
+    def _entry_state(self, function: IRFunction, label: int, predecessors: dict[int, list[int]],
+                     states: dict) -> dict[Operand, Const]:
+        if label == function.entry:
+            return dict()
+        result = None
+        for predecessor in predecessors[label]:
+            state = states.get(predecessor)
+            if state is None:
+                # предшественник еще не обработан (обратная дуга цикла)
+                continue
+            if result is None:
+                result = dict(state)
+            else:
+                for operand in list(result):
+                    value = state.get(operand)
+                    # сравниваются и типы: 1 и TRUE, 1 и 1.0 - разные константы
+                    if value is None or type(value.value) is not type(result[operand].value) \
+                            or value.value != result[operand].value:
+                        del result[operand]
+        return result if result is not None else dict()
+
+    def _transfer(self, function: IRFunction, block: BasicBlock, state: dict[Operand, Const],
+                  rewrite: bool) -> dict[Operand, Const]:
+        memory_variables = function.memory_variables
+        for position, instruction in enumerate(block.instructions):
+            arguments = instruction.arguments
+            if rewrite:
+                for index in instruction.value_arguments():
+                    value = state.get(arguments[index])
+                    if value is not None:
+                        arguments[index] = value
+                values = arguments
+            else:
+                values = [state.get(argument, argument) for argument in arguments]
+            result = instruction.result
+            folded = None
+            if result is not None and all(type(value) is Const for value in values):
+                folded = _fold(Instruction(instruction.opcode, result, values, instruction.extra))
+            if _clobbers_memory(function, instruction):
+                for variable in state.keys() & memory_variables:
+                    del state[variable]
+                if instruction.opcode == "call":
+                    for index in instruction.extra[1]:
+                        state.pop(arguments[index], None)
+            if result is not None:
+                if folded is not None:
+                    state[result] = folded
+                    if rewrite and instruction.opcode != "copy":
+                        block.instructions[position] = Instruction("copy", result, [folded])
+                else:
+                    state.pop(result, None)
+            if rewrite and instruction.opcode == "branch" and type(values[0]) is Const \
+                    and isinstance(values[0].value, bool):
+                target = instruction.extra[0] if values[0].value else instruction.extra[1]
+                block.instructions[position] = Instruction("jump", extra=target)
+        return state
+
+
+######################################################
+#                  УДАЛЕНИЕ МЕРТВОГО КОДА            #
+######################################################
+
+# Живые на выходе блока переменные и временные значения (обратный
+# анализ потока данных). Переменные в памяти считаются живыми всегда
+def _liveness(function: IRFunction) -> dict[int, set[Operand]]:
+    order = function.reverse_postorder()
+    live_in: dict[int, set[Operand]] = {label: set() for label in order}
+    live_out: dict[int, set[Operand]] = {label: set() for label in order}
+    changed = True
+    while changed:
+        changed = False
+        for label in reversed(order):
+            block = function.blocks[label]
+            live = set()
+            for successor in block.successors():
+                live |= live_in[successor]
+            live_out[label] = set(live)
+            for instruction in reversed(block.instructions):
+                if instruction.result is not None:
+                    live.discard(instruction.result)
+                live.update(_used_operands(instruction))
+            if live != live_in[label]:
+                live_in[label] = live
+                changed = True
+    return live_out
+
+
+class DeadCodeElimination(Pass):
+    name = "dce"
+
+    def run(self, function: IRFunction):
+        simplify_cfg(function)
+        memory_variables = function.memory_variables
+        removed = True
+        while removed:
+            removed = False
+            live_out = _liveness(function)
+            for label, block in function.blocks.items():
+                live = set(live_out[label])
+                kept = []
+                for instruction in reversed(block.instructions):
+                    result = instruction.result
+                    # ненужная команда, которая может вызвать аварийную
+                    # остановку, остается: остановка - наблюдаемое поведение
+                    if instruction.opcode in PURE_OPCODES and result not in live \
+                            and result not in memory_variables and _cannot_trap(instruction):
+                        removed = True
+                        continue
+                    if result is not None:
+                        live.discard(result)
+                    live.update(_used_operands(instruction))
+                    kept.append(instruction)
+                kept.reverse()
+                block.instructions = kept
+        simplify_cfg(function)
+
+
+######################################################
+#                  ОБЩИЕ ПОДВЫРАЖЕНИЯ                #
+######################################################
+
+_COMMUTATIVE = frozenset((Operation.plus, Operation.multiple, Operation.equal, Operation.unequal))
+_CSE_OPCODES = frozenset(("binary", "unary", "builtin", "is", "procedure", "load"))
+
+
+# Нумерация значений внутри базового блока: повторное вычисление того же
+# выражения от тех же операндов заменяется копией первого результата.
+# Копии временных значений затем подставляются во все использования
+# (временное значение присваивается один раз, поэтому это безопасно)
+class CommonSubexpressionElimination(Pass):
+    name = "cse"
+
+    def run(self, function: IRFunction):
+        replacements: dict[Temp, Operand] = dict()
+        memory_variables = function.memory_variables
+        for label in function.reverse_postorder():
+            available: dict[tuple, Operand] = dict()
+            # операнд -> ключи выражений, которые от него зависят
+            dependents: dict[Operand, list[tuple]] = dict()
+            memory_keys: list[tuple] = []
+            for position, instruction in enumerate(function.blocks[label].instructions):
+                arguments = instruction.arguments
+                for index in instruction.value_arguments():
+                    replacement = replacements.get(arguments[index])
+                    if replacement is not None:
+                        arguments[index] = replacement
+                result = instruction.result
+                key = None
+                if instruction.opcode in _CSE_OPCODES:
+                    operands = tuple(arguments)
+                    if instruction.opcode == "binary" and instruction.extra in _COMMUTATIVE:
+                        operands = tuple(sorted(operands, key=repr))
+                    key = (instruction.opcode, instruction.extra, operands)
+                    previous = available.get(key)
+                    if previous is not None:
+                        instruction = Instruction("copy", result, [previous])
+                        function.blocks[label].instructions[position] = instruction
+                        key = None
+                if instruction.opcode == "copy" and type(result) is Temp \
+                        and type(instruction.arguments[0]) is not Var:
+                    replacements[result] = instruction.arguments[0]
+                if result is not None:
+                    self._invalidate(available, dependents, result)
+                if _clobbers_memory(function, instruction):
+                    for memory_key in memory_keys:
+                        available.pop(memory_key, None)
+                    memory_keys.clear()
+                if key is not None and result is not None and result not in key[2]:
+                    available[key] = result
+                    dependents.setdefault(result, []).append(key)
+                    for operand in key[2]:
+                        if type(operand) is not Const:
+                            dependents.setdefault(operand, []).append(key)
+                    # выражения от памяти теряют силу при любой записи в память
+                    if instruction.opcode == "load" or result in memory_variables \
+                            or any(operand in memory_variables for operand in key[2]):
+                        memory_keys.append(key)
+
+    def _invalidate(self, available: dict, dependents: dict, operand: Operand):
+        for key in dependents.pop(operand, ()):
+            available.pop(key, None)
+
+
+######################################################
+#                  ВЫНОС ИНВАРИАНТОВ ЦИКЛОВ          #
+######################################################
+
+# Непосредственные доминаторы (алгоритм Купера - Харви - Кеннеди)
+def immediate_dominators(function: IRFunction) -> dict[int, int]:
+    order = function.reverse_postorder()
+    index = {label: position for position, label in enumerate(order)}
+    predecessors = function.predecessors()
+    dominators = {function.entry: function.entry}
+    changed = True
+    while changed:
+        changed = False
+        for label in order[1:]:
+            new_dominator = None
+            for predecessor in predecessors[label]:
+                if predecessor not in dominators:
+                    continue
+                if new_dominator is None:
+                    new_dominator = predecessor
+                    continue
+                first, second = predecessor, new_dominator
+                while first != second:
+                    while index[first] > index[second]:
+                        first = dominators[first]
+                    while index[second] > index[first]:
+                        second = dominators[second]
+                new_dominator = first
+            if dominators.get(label) != new_dominator:
+                dominators[label] = new_dominator
+                changed = True
+    return dominators
+
+
+def _dominates(dominators: dict[int, int], dominator: int, label: int) -> bool:
+    while True:
+        if label == dominator:
+            return True
+        parent = dominators[label]
+        if parent == label:
+            return False
+        label = parent
+
+
+# Естественные циклы: заголовок -> блоки цикла. Циклы WHILE, REPEAT и
+# FOR дают по обратной дуге в свой заголовок
+def natural_loops(function: IRFunction) -> dict[int, set[int]]:
+    dominators = immediate_dominators(function)
+    predecessors = function.predecessors()
+    loops: dict[int, set[int]] = dict()
+    for label in dominators:
+        for successor in function.blocks[label].successors():
+            if successor in dominators and _dominates(dominators, successor, label):
+                body = loops.setdefault(successor, {successor})
+                stack = [label]
+                while stack:
+                    current = stack.pop()
+                    if current not in body:
+                        body.add(current)
+                        stack.extend(predecessors[current])
+    return loops
+
+
+class LoopInvariantCodeMotion(Pass):
+    name = "licm"
+
+    def run(self, function: IRFunction):
+        loops = natural_loops(function)
+        # сначала внутренние циклы: вынесенное из них может выйти и из внешних
+        for header, body in sorted(loops.items(), key=lambda item: len(item[1])):
+            self._hoist(function, header, body)
+
+    def _hoist(self, function: IRFunction, header: int, body: set[int]):
+        changed_variables: set[Operand] = set()
+        loop_temps: set[Operand] = set()
+        for label in body:
+            for instruction in function.blocks[label].instructions:
+                result = instruction.result
+                if type(result) is Var:
+                    changed_variables.add(result)
+                elif type(result) is Temp:
+                    loop_temps.add(result)
+                if instruction.opcode == "call":
+                    changed_variables.update(instruction.arguments[index] for index in instruction.extra[1])
+                if _clobbers_memory(function, instruction):
+                    changed_variables |= function.memory_variables
+        hoisted: list[Instruction] = []
+        invariant: set[Operand] = set()
+        order = [label for label in function.reverse_postorder() if label in body]
+        changed = True
+        while changed:
+            changed = False
+            for label in order:
+                for instruction in function.blocks[label].instructions:
+                    result = instruction.result
+                    if type(result) is not Temp or result in invariant or not _cannot_trap(instruction):
+                        continue
+                    if all(type(argument) is Const
+                           or (type(argument) is Temp and (argument not in loop_temps or argument in invariant))
+                           or (type(argument) is Var and argument not in changed_variables)
+                           for argument in instruction.arguments):
+                        hoisted.append(instruction)
+                        invariant.add(result)
+                        changed = True
+        if not hoisted:
+            return
+        hoisted_ids = {id(instruction) for instruction in hoisted}
+        for label in body:
+            block = function.blocks[label]
+            block.instructions = [instruction for instruction in block.instructions
+                                  if id(instruction) not in hoisted_ids]
+        preheader = self._preheader(function, header, body)
+        preheader.instructions[-1:-1] = hoisted
+
+    def _preheader(self, function: IRFunction, header: int, body: set[int]) -> BasicBlock:
+        outside = [label for label in function.predecessors()[header] if label not in body]
+        if len(outside) == 1:
+            block = function.blocks[outside[0]]
+            if block.terminator is not None and block.terminator.opcode == "jump":
+                return block
+        preheader = function.new_block()
+        preheader.instructions.append(Instruction("jump", extra=header))
+        for label in outside:
+            _retarget(function.blocks[label].instructions[-1], header, preheader.label)
+        if header == function.entry:
+            function.entry = preheader.label
+        return preheader
+
+
+######################################################
+#                  МЕНЕДЖЕР ПРОХОДОВ                 #
+######################################################
+
+PASSES: dict[str, type[Pass]] = {
+    ConstantPropagation.name: ConstantPropagation,
+    DeadCodeElimination.name: DeadCodeElimination,
+    CommonSubexpressionElimination.name: CommonSubexpressionElimination,
+    LoopInvariantCodeMotion.name: LoopInvariantCodeMotion,
+}
+DEFAULT_PIPELINE = ("constprop", "cse", "licm", "dce")
+
+
+class PassManager:
+    def __init__(self, passes: list[Pass] | None = None) -> None:
+        self.passes: list[Pass] = list(passes) if passes is not None else []
+
+    @classmethod
+    def from_names(cls, names: list[str] | tuple[str, ...] = DEFAULT_PIPELINE) -> "PassManager":
+        passes = []
+        for name in names:
+            pass_class = PASSES.get(name)
+            if pass_class is None:
+                raise Exception(f"неизвестный проход оптимизации {name}; известны: {', '.join(PASSES)}")
+            passes.append(pass_class())
+        return cls(passes)
+
+    def add(self, optimization_pass: Pass):
+        self.passes.append(optimization_pass)
+
+    def run(self, module: IRModule) -> list[PassReport]:
+        reports = []
+        for optimization_pass in self.passes:
+            before = module.instruction_count()
+            start = time.perf_counter()
+            for function in module.functions:
+                optimization_pass.run(function)
+            elapsed = time.perf_counter() - start
+            reports.append(PassReport(optimization_pass.name, elapsed, before, module.instruction_count()))
+        return reports
+
+
+def format_reports(reports: list[PassReport]) -> str:
+    lines = [f"{'проход':<10} {'время, мс':>10} {'команд до':>10} {'после':>8}"]
+    for report in reports:
+        lines.append(f"{report.name:<10} {report.seconds * 1000:>10.2f} "
+                     f"{report.instructions_before:>10} {report.instructions_after:>8}")
+    return "\n".join(lines)
@@ -1,31 +1,59 @@
+import re
 from enum import Enum, auto, unique
 
 class WrapperForReceivingCharacters:
     EOT = chr(4)
 
-    def __init__(self, s: str) -> None:
+    # first_line - номер первой строки s, если s - часть большего текста
+    def __init__(self, s: str, first_line: int = 1) -> None:
         self._data = s
-        self.ch = ''
+        self._length = len(s)
+        self._first_line = first_line
+        # позиция текущего символа ch в исходном тексте
         self._index = 0
-        self.current_line = ""
-        self.current_line_number = 1
-        self.get_next()
-    
-    def get_next(self):
-        if self._index >= len(self._data):
-            self.ch = self.EOT
-            return
-        self.ch = self._data[self._index]
-        self._index += 1
+        # позиция начала текущей строки, сам текст строки
+        # собирается только по запросу (см. current_line)
+        self._line_start = 0
+        self.current_line_number = first_line
+        self.ch = s[0] if s else self.EOT
         if self.ch == "\n":
             self.current_line_number += 1
-            self.current_line = ""
+            self._line_start = 1
+
+    @property
+    def current_line(self) -> str:
+        return self._data[self._line_start:min(self._index + 1, self._length)]
+
+    def get_next(self):
+        self.move_to(self._index + 1)
+
+    # строка и колонка (с 1) символа index, не дальше текущей позиции
+    def line_and_column(self, index: int) -> tuple[int, int]:
+        line = self.current_line_number - self._data.count("\n", index, self._index + 1)
+        return line, index - self._data.rfind("\n", 0, index)
+
+    # переход к произвольной позиции, в том числе назад
+    def seek(self, index: int):
+        index = min(index, self._length)
+        # переводы строк считаются только между старой и новой позицией
+        if index <= self._index:
+            self.current_line_number -= self._data.count("\n", index + 1, self._index + 1)
         else:
-            self.current_line += self.ch
+            self.current_line_number += self._data.count("\n", self._index + 1, index + 1)
+        self._line_start = self._data.rfind("\n", 0, index + 1) + 1
+        self._index = index
+        self.ch = self._data[index] if index < self._length else self.EOT
+
+    def move_to(self, index: int):
+        if index > self._length:
+            index = self._length
+        newlines = self._data.count("\n", self._index + 1, index + 1)
+        if newlines:
+            self.current_line_number += newlines
+            self._line_start = self._data.rfind("\n", self._index + 1, index + 1) + 1
+        self._index = index
+        self.ch = self._data[index] if index < self._length else self.EOT
 
-    def is_ch_hex_digit(self) -> bool:
-        return self.ch in ['A', 'B', 'C', 'D', 'E', 'F']
-    
 
 # значения используются и для определения ключевых слов
 # и для вывода на печать, поэтому где не ключ. слово, там 
@@ -98,125 +126,201 @@ class Lex(Enum):
     end_of_text = "_конец текста_",
 
 
+# таблицы для быстрого разбора: ключевые слова ищутся по хешу,
+# операторы - по первому символу (с возможным вторым символом)
+_KEYWORDS: dict[str, Lex] = {
+    lex.value[0]: lex for lex in Lex if lex.value[0].isalpha()
+}
+
+_OPERATORS: dict[str, tuple[Lex, dict[str, Lex]]] = {}
+for _lex in Lex:
+    _text = _lex.value[0]
+    if len(_text) == 1 and not _text.isalpha():
+        _OPERATORS[_text] = (_lex, {})
+for _lex in Lex:
+    _text = _lex.value[0]
+    if len(_text) == 2 and not _text.isalpha():
+        _OPERATORS[_text[0]][1][_text[1]] = _lex
+del _lex, _text
+
+# порядковый номер лексемы и ее бит: множества лексем (FIRST, FOLLOW
+# в grammar.py) - целые числа, проверка принадлежности - lex.bit & set
+for _ordinal, _lex in enumerate(Lex):
+    _lex.ordinal = _ordinal
+    _lex.bit = 1 << _ordinal
+del _ordinal, _lex
+
+_ASCII_LETTERS = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz")
+_ASCII_DIGITS = frozenset("0123456789")
+_ASCII_ALNUM = _ASCII_LETTERS | _ASCII_DIGITS
+_HEX_DIGITS = _ASCII_DIGITS | frozenset("ABCDEF")
+_ASCII_SPACES = frozenset(" \t\n\r\v\f")
+
+
+def _is_space(ch: str) -> bool:
+    return ch in _ASCII_SPACES or (ch > "\x7f" and ch.isspace())
+
+
+def _is_digit(ch: str) -> bool:
+    return ch in _ASCII_DIGITS or (ch > "\x7f" and ch.isnumeric())
+
+
+def _is_letter(ch: str) -> bool:
+    return ch in _ASCII_LETTERS or (ch > "\x7f" and ch.isalpha())
+
+
+# Быстрый пропуск тела процедуры или модуля без разбора: в тексте ищутся
+# только пары "PROCEDURE имя" и "END имя" (между ними могут быть
+# комментарии; имя проверяется заглядыванием вперед, чтобы в "END END имя"
+# не потерять второй END), комментарии и строки пропускаются целиком. Других
+# "END имя" в Обероне нет: после END операторов и записей имя не стоит,
+# а за PROCEDURE в процедурном типе идет "(" или конец типа - в том числе
+# END записи, поэтому ключевые слова именами не считаются.
+# Незакрытые комментарий или строка означают конец текста, как в Lexer.
+_BLOCK_BOUNDARIES = re.compile(
+    r'\(\*.*?\*\)|"[^"]*"|\b(PROCEDURE|END)(?=(?:\s|\(\*.*?\*\))+([^\W\d_][^\W_]*))|(\(\*|")',
+    re.DOTALL)
+
+
+# Смещение конца "END name", закрывающего блок, который начинается
+# с offset, или None, если такого нет. Вложенные процедуры со своими
+# "END имя" пропускаются
+def find_block_end(data: str, offset: int, name: str) -> int | None:
+    nested: list[str] = []
+    for match in _BLOCK_BOUNDARIES.finditer(data, offset):
+        keyword = match.group(1)
+        if match.group(3) is not None:
+            return None
+        if keyword is None or match.group(2) in _KEYWORDS:
+            continue
+        if keyword == "PROCEDURE":
+            nested.append(match.group(2))
+        elif nested and nested[-1] == match.group(2):
+            nested.pop()
+        elif not nested and match.group(2) == name:
+            return match.end(2)
+    return None
+
+
 class Lexer:
-    def __init__(self, s: str) -> None:
-        self._wrap = WrapperForReceivingCharacters(s)
+    def __init__(self, s: str | WrapperForReceivingCharacters) -> None:
+        self._wrap = s if isinstance(s, WrapperForReceivingCharacters) else WrapperForReceivingCharacters(s)
         self.value = ""
         self.lex = Lex.unknown_lex
+        # смещение начала текущей лексемы в исходном тексте
+        self.start = 0
         self.get_next()
 
     def get_context(self):
         return f"{self._wrap.current_line_number}) {self._wrap.current_line}"
 
+    # строка и колонка начала текущей лексемы
+    def line_and_column(self) -> tuple[int, int]:
+        return self._wrap.line_and_column(self.start)
+
+    # позиция для возврата - смещение текущей лексемы
+    def mark(self) -> int:
+        return self.start
+
+    def reset(self, mark: int = 0):
+        self._wrap.seek(mark)
+        self.get_next()
+
+    # пропуск блока до "END name" включительно; текущей становится
+    # лексема после имени. Возвращает смещение конца имени или None,
+    # если конца блока нет
+    def skip_block(self, name: str) -> int | None:
+        end = find_block_end(self._wrap._data, self.start, name)
+        if end is not None:
+            self._wrap.move_to(end)
+            self.get_next()
+        return end
+
     def get_next(self):
-        while self._wrap.ch.isspace():
-            self._wrap.get_next()
-        if self._wrap.ch == self._wrap.EOT:
-            self.lex = Lex.end_of_text
-        elif self._wrap.ch.isnumeric():
-            number_str = self._wrap.ch
-            self._wrap.get_next()
-            while self._wrap.ch.isnumeric() or self._wrap.is_ch_hex_digit():
-                number_str += self._wrap.ch
-                self._wrap.get_next()
-            if self._wrap.ch == 'H':
-                self._wrap.get_next()
+        wrap = self._wrap
+        data = wrap._data
+        length = wrap._length
+        i = wrap._index
+        while True:
+            while i < length and _is_space(data[i]):
+                i += 1
+            if i >= length:
+                wrap.move_to(length)
+                self.start = length
+                self.lex = Lex.end_of_text
+                return
+            if data.startswith("(*", i):
+                end = data.find("*)", i + 2)
+                if end == -1:
+                    wrap.move_to(length)
+                    self.start = length
+                    self.lex = Lex.end_of_text
+                    return
+                i = end + 2
+                continue
+            break
+        self.start = start = i
+        ch = data[i]
+        if _is_digit(ch):
+            i += 1
+            while i < length and (data[i] in _HEX_DIGITS or _is_digit(data[i])):
+                i += 1
+            suffix = data[i] if i < length else wrap.EOT
+            if suffix == 'H':
                 self.lex = Lex.number
-                self.value = int(number_str, base=16)
-            elif self._wrap.ch == 'X':
-                self._wrap.get_next()
+                self.value = int(data[start:i], base=16)
+                i += 1
+            elif suffix == 'X':
                 self.lex = Lex.string
-                self.value = chr(int(number_str, base=16))
-            elif self._wrap.ch == '.':
-                number_str += self._wrap.ch
-                self._wrap.get_next()
-                while self._wrap.ch.isnumeric():
-                    number_str += self._wrap.ch
-                    self._wrap.get_next()
-                if self._wrap.ch == "E":
-                    number_str += self._wrap.ch
-                    self._wrap.get_next()
-                    if self._wrap.ch in ['+', '-']:
-                        number_str += self._wrap.ch
-                        self._wrap.get_next()
-                    if not self._wrap.ch.isnumeric():
+                self.value = chr(int(data[start:i], base=16))
+                i += 1
+            elif suffix == '.' and not data.startswith("..", i):
+                i += 1
+                while i < length and _is_digit(data[i]):
+                    i += 1
+                if i < length and data[i] == "E":
+                    i += 1
+                    if i < length and data[i] in ['+', '-']:
+                        i += 1
+                    if i >= length or not _is_digit(data[i]):
+                        wrap.move_to(i)
                         raise Exception("ожидалась цифра после E [+ | -] в дроби")
-                    number_str += self._wrap.ch
-                    self._wrap.get_next()
-                    while self._wrap.ch.isnumeric():
-                        number_str += self._wrap.ch
-                        self._wrap.get_next()
+                    while i < length and _is_digit(data[i]):
+                        i += 1
                 self.lex = Lex.number
-                value = float(number_str)
+                self.value = float(data[start:i])
             else:
                 self.lex = Lex.number
-                self.value = int(number_str, base=10)
-        elif self._wrap.ch.isalpha():
-            ident = self._wrap.ch
-            self._wrap.get_next()
-            while self._wrap.ch.isalpha() or self._wrap.ch.isnumeric():
-                ident += self._wrap.ch
-                self._wrap.get_next()
-            self.lex = Lex.ident
+                self.value = int(data[start:i], base=10)
+        elif _is_letter(ch):
+            i += 1
+            while i < length and (data[i] in _ASCII_ALNUM or _is_letter(data[i]) or _is_digit(data[i])):
+                i += 1
+            ident = data[start:i]
+            self.lex = _KEYWORDS.get(ident, Lex.ident)
             self.value = ident
-            for lex in Lex.__members__.values():
-                if lex.value[0] == ident:
-                    self.lex = lex
-                    break
-        elif self._wrap.ch == '"':
-            self._wrap.get_next()
-            string = ""
-            while self._wrap.ch not in ['"', self._wrap.EOT]:
-                string += self._wrap.ch
-                self._wrap.get_next()
-            if self._wrap.ch == '"':
-                self.lex = Lex.string
-                self._wrap.get_next()
-            else:
+        elif ch == '"':
+            end = data.find('"', i + 1)
+            if end == -1:
                 self.lex = Lex.end_of_text
+                i = length
+            else:
+                self.lex = Lex.string
+                self.value = data[i + 1:end]
+                i = end + 1
         else:
-            self.lex = Lex.unknown_lex
-            for lex in Lex.__members__.values():
-                if lex.value[0] == self._wrap.ch:
-                    self.lex = lex
-                    self._wrap.get_next()
-                    break
-            if self.lex == Lex.dot:
-                if self._wrap.ch == '.':
-                    self.lex = Lex.double_dot
-                    self._wrap.get_next()
-            elif self.lex == Lex.less:
-                if self._wrap.ch == '=':
-                    self.lex = Lex.less_equal
-                    self._wrap.get_next()
-            elif self.lex == Lex.greater:
-                if self._wrap.ch == '=':
-                    self.lex = Lex.greater_equal
-                    self._wrap.get_next()
-            elif self.lex == Lex.colon:
-                if self._wrap.ch == '=':
-                    self.lex = Lex.assignment
-                    self._wrap.get_next()
-            elif self.lex == Lex.left_bracket:
-                if self._wrap.ch == '*':
-                    self._wrap.get_next()
-                    while True:
-                        if self._wrap.ch == self._wrap.EOT:
-                            self.lex = Lex.end_of_text
-                            return
-                        if self._wrap.ch == '*':
-                            self._wrap.get_next()
-                            if self._wrap.ch == ')':
-                                self._wrap.get_next()
-                                break
-                        else:
-                            self._wrap.get_next()
-                    self.get_next()
-        return
-        if self.lex == Lex.ident:
-            print(f"идентификатор: {self.value}")
-        else:
-            print(self.lex.value[0])
-
-                
-            
+            operator = _OPERATORS.get(ch)
+            if operator is None:
+                # неизвестный символ - отдельная лексема: разбор с
+                # восстановлением сообщает о нем и продолжается после него
+                self.lex = Lex.unknown_lex
+                self.value = ch
+                i += 1
+            else:
+                i += 1
+                self.lex, continuations = operator
+                if i < length and data[i] in continuations:
+                    self.lex = continuations[data[i]]
+                    i += 1
+                self.value = data[start:i]
+        wrap.move_to(i)
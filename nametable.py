@@ -1,12 +1,13 @@
 from oberon_types import *
 from ast_node import *
 from dataclasses import dataclass
-from typing import TypeAlias
+from itertools import islice
+from typing import Mapping, TypeAlias
 
 
 class Constant(NamedTuple):
     name: str
-    value: int | float | bool | str
+    value: int | float | bool | str | frozenset[int]
     constant_type: OberonType
 
 
@@ -17,7 +18,9 @@ class Variable(NamedTuple):
 
 class ProcedureHead:
     def __init__(self, procedure_type=None, name=None) -> None:
-        self.procedure_type: ProcedureType = ProcedureType(None, None, NoReturnType, list())
+        if procedure_type is None:
+            procedure_type = ProcedureType(None, None, NoReturnType, list())
+        self.procedure_type: ProcedureType = procedure_type
         self.name: Identifier = name
 
     def __str__(self) -> str:
@@ -36,11 +39,12 @@ class ProcedureHead:
 
 
 class ProcedureBody:
-    def __init__(self, code=None, variables=list(), constants=list(), types=list()) -> None:
-        self.code: AstNode = code
-        self.variables: list[Variable] = variables
-        self.constants: list[Constant] = constants
-        self.types: list[OberonType] = types
+    def __init__(self, code=None, variables=None, constants=None, types=None, return_expression=None) -> None:
+        self.code: list[Statement] = code if code is not None else list()
+        self.variables: list[Variable] = variables if variables is not None else list()
+        self.constants: list[Constant] = constants if constants is not None else list()
+        self.types: list[OberonType] = types if types is not None else list()
+        self.return_expression: AstNode = return_expression
 
 
 class Procedure:
@@ -51,90 +55,82 @@ class Procedure:
         return f"{str(self.head)}"
 
 
-class ScopeOpen:
-    pass
-
-class ScopeClose:
-    pass
-
-
 @dataclass
 class NameTableEntry:
     name: Identifier | CompositeIdentifier
-    entity: Procedure | Constant | Variable | OberonType | ScopeOpen | ScopeClose | ProcedureParameter
+    entity: Procedure | Constant | Variable | OberonType | ProcedureParameter
     def __str__(self) -> str:
         return str(self.entity)
 
 
+def entry_key(name: Identifier | CompositeIdentifier | str) -> str:
+    if isinstance(name, str):
+        return name
+    return identifier_to_str(name)
+
+
+# Таблица имен - стек областей видимости, каждая область - словарь
+# "имя -> запись". Поиск идет от самой вложенной области к глобальной,
+# открытие и закрытие области - добавление и снятие словаря со стека.
+# Под глобальной областью может лежать общая для всех таблиц область
+# предопределенных имен (см. universe.py), она только читается.
 class Nametable:
-    def __init__(self: str) -> None:
-        self._entries: list[NameTableEntry] = list()
+    def __init__(self, universe: Mapping[str, NameTableEntry] | None = None) -> None:
+        self._universe: Mapping[str, NameTableEntry] = universe if universe is not None else dict()
+        self._scopes: list[dict[str, NameTableEntry]] = list()
         self.open_scope()
 
+    @property
+    def scope_level(self) -> int:
+        return len(self._scopes) - 1
+
+    def lookup(self, name: Identifier | CompositeIdentifier | str) -> NameTableEntry | None:
+        key = entry_key(name)
+        for scope in reversed(self._scopes):
+            entry = scope.get(key)
+            if entry is not None:
+                return entry
+        return self._universe.get(key)
+
+    def lookup_in_current_scope(self, name: Identifier | CompositeIdentifier | str) -> NameTableEntry | None:
+        return self._scopes[-1].get(entry_key(name))
+
     def get_global_scope_identifiers(self) -> list[NameTableEntry]:
-        print(self)
-        def skip_local_scope(nametable: Nametable, index: int) -> int:
-            if not isinstance(nametable._entries[index].entity, ScopeOpen):
-                raise Exception("ожидалось ScopeOpen")
-            index += 1
-            while index < len(nametable._entries) and not isinstance(nametable._entries[index].entity, ScopeClose):
-                index += 1
-            if index < len(nametable._entries):
-                index += 1
-            return index
-
-        if len(self._entries) == 1:
-            return []
-        identifiers = []
-        i = 1
-        while i < len(self._entries):
-            if isinstance(self._entries[i].entity, ScopeOpen):
-                i = skip_local_scope(self, i)
-            if i >= len(self._entries):
-                return identifiers
-            if isinstance(self._entries[i].entity, ScopeClose):
-                return identifiers
-            identifiers.append(self._entries[i])
-            i += 1
-        return identifiers
+        return list(self._scopes[0].values())
 
     def get_local_scope_identifiers(self) -> list[NameTableEntry]:
-        if len(self._entries) == 1:
+        if len(self._scopes) == 1:
             return []
-        i = len(self._entries) - 1
-        if type(self._entries[i].entity) is ScopeClose:
-            i -= 1
-        identifiers = []
-        while i > 0 and not isinstance(self._entries[i].entity, ScopeOpen):
-            if not isinstance(self._entries[i].entity, ScopeClose):
-                identifiers.append(self._entries[i]) 
-            i -= 1
-        return identifiers
+        return list(self._scopes[-1].values())
+
+    def global_scope_size(self) -> int:
+        return len(self._scopes[0])
+
+    # Таблица только с первыми count записями глобальной области - то,
+    # что было объявлено к некоторому месту модуля
+    def global_prefix(self, count: int) -> "Nametable":
+        table = Nametable(self._universe)
+        table._scopes[0] = dict(islice(self._scopes[0].items(), count))
+        return table
 
     def get_all_identifiers_for_current_scope(self) -> list[NameTableEntry]:
         return self.get_global_scope_identifiers() + self.get_local_scope_identifiers()
     
     def open_scope(self):
-        self._entries.append(NameTableEntry(None, ScopeOpen()))
+        self._scopes.append(dict())
 
     def close_scope(self):
-        self._entries.append(NameTableEntry(None, ScopeClose()))
+        if len(self._scopes) == 1:
+            raise Exception("попытка закрыть глобальную область видимости")
+        self._scopes.pop()
 
     def add_entry(self, new_entry: NameTableEntry):
-        self._entries.append(new_entry)
+        self._scopes[-1][entry_key(new_entry.name)] = new_entry
 
     def __str__(self) -> str:
         result = "--------------------------------------------\n"
-        tab_index = -1
-        for entry in self._entries:
-            if isinstance(entry.entity, ScopeOpen):
-                tab_index += 1
-            elif isinstance(entry.entity, ScopeClose):
-                tab_index -= 1
-            else:
+        for tab_index, scope in enumerate(self._scopes):
+            for entry in scope.values():
                 result += "  " * tab_index  + str(entry) + "\n"
-        
         result += "--------------------------------------------\n"
         return result
-
-
@@ -1,21 +1,191 @@
-from syntax_analyzer import Parser
+import argparse
 import os
+import sys
+from typing import TYPE_CHECKING
 
-def compile(program: str):
-    parser = Parser(program)
+if TYPE_CHECKING:
+    from compile_cache import CompilationCache
 
+# Точка входа командной строки. При импорте ничего не выполняется, а
+# модули компилятора загружаются внутри команд: проверка синтаксиса
+# (check) не тянет за собой сборку, кеш, бэкенды и замеры.
+#
+#   check FILE...   - синтаксическая проверка без записи файлов символов
+#   build [PATH...] - сборка (команда по умолчанию)
+#   bench ...       - замеры производительности (benchmarks/run.py)
 
+COMMANDS = ("check", "build", "bench")
+# то же, что build.DEFAULT_SYMBOL_DIR: check не загружает build ради константы
+DEFAULT_SYMBOL_DIR = ".oberon_sym"
 
-def _compile_one_module(path_to_file: str):
-    f = open(path_to_file)
-    program = f.read()
-    f.close()
+
+# Модуль заново разбирается с уже записанными файлами символов
+# импортируемых модулей и переводится в байт-код. passes - проходы
+# оптимизации промежуточного представления (для show_ir и engine="ir")
+def execute_module(path_to_file: str, symbol_dir: str, run: bool, show_bytecode: bool,
+                   engine: str = "vm", cache: "CompilationCache | None" = None,
+                   passes: list[str] | None = None, show_ir: bool = False) -> int:
+    from syntax_analyzer import Parser
+    from bytecode import disassemble
+    from bytecode_compiler import compile_module
+    from vm import VM, OberonTrap
     try:
-        compile(program)
-        print(f"{path_to_file}: успешно скомпилировано")
-    except Exception as e:
-        raise e
-    
-
-for file in os.listdir("code_samples"):
-    _compile_one_module("code_samples" + "/" + file)
\ No newline at end of file
+        with open(path_to_file) as f:
+            program = f.read()
+        # модуль разбирается заново для каждого вывода: лексемы - одни
+        source = program
+        if cache is not None:
+            from build import tokenize_source
+            source = tokenize_source(program, cache)
+        if show_bytecode:
+            print(disassemble(compile_module(Parser(source, symbol_paths=[symbol_dir]))))
+        if show_ir or (run and engine == "ir"):
+            from ir_builder import build_ir
+            from ir_passes import PassManager, format_reports
+            module = build_ir(Parser(source, symbol_paths=[symbol_dir]))
+            reports = PassManager.from_names(passes or []).run(module)
+            if show_ir:
+                print(module)
+                print(format_reports(reports))
+        if run and engine == "python":
+            from transpiler import PythonModule, load_code
+            PythonModule(load_code(program, [symbol_dir], cache)).run()
+            sys.stdout.flush()
+        elif run and engine == "ir":
+            from ir_interpreter import IRInterpreter
+            IRInterpreter(module).run()
+            sys.stdout.flush()
+        elif run:
+            VM(compile_module(Parser(source, symbol_paths=[symbol_dir]))).run()
+            sys.stdout.flush()
+    except OberonTrap as error:
+        print(f"{path_to_file}: аварийное завершение: {error}")
+        return 1
+    except Exception as error:
+        print(f"{path_to_file}: {error}")
+        return 1
+    return 0
+
+
+def check_command(args: argparse.Namespace) -> int:
+    from syntax_analyzer import Parser
+    exit_code = 0
+    for path_to_file in args.files:
+        try:
+            with open(path_to_file) as f:
+                parser = Parser(f.read(), symbol_paths=[args.sym_dir], recover=True)
+        except Exception as error:
+            print(f"{path_to_file}: {error}")
+            exit_code = 1
+            continue
+        if not parser.diagnostics:
+            print(f"{path_to_file}: ошибок нет")
+            continue
+        for diagnostic in parser.diagnostics:
+            print(f"{path_to_file}:{diagnostic.line}:{diagnostic.column}: {diagnostic.message}")
+        exit_code = 1
+    return exit_code
+
+
+def build_command(args: argparse.Namespace) -> int:
+    if args.watch:
+        from watch import Watcher
+        Watcher(args.paths, args.sym_dir, args.jobs).watch(args.watch_interval)
+        return 0
+    from build import build
+    from compile_cache import CompilationCache, DEFAULT_CACHE_DIR, DEFAULT_CACHE_SIZE
+    cache = None
+    if not args.no_cache:
+        cache_size = DEFAULT_CACHE_SIZE if args.cache_size is None else args.cache_size * 1024 * 1024
+        cache = CompilationCache(args.cache_dir or DEFAULT_CACHE_DIR, cache_size)
+    stats = None
+    if args.stats:
+        from stats import CompileStats
+        stats = CompileStats()
+    results = build(args.paths, args.jobs, args.sym_dir, cache, stats)
+    exit_code = 0
+    for path_to_file, error in results.items():
+        if error is None:
+            print(f"{path_to_file}: успешно скомпилировано")
+            if args.run or args.disassemble or args.ir:
+                passes = [name for name in args.passes.split(",") if name]
+                exit_code |= execute_module(path_to_file, args.sym_dir, args.run, args.disassemble,
+                                            args.engine, cache, passes, args.ir)
+        else:
+            print(f"{path_to_file}: {error}")
+            exit_code = 1
+    if stats is not None:
+        import json
+        report = json.dumps(stats.to_dict(), indent=2, ensure_ascii=False)
+        if args.stats == "-":
+            print(report, file=sys.stderr)
+        else:
+            with open(args.stats, "w") as f:
+                f.write(report + "\n")
+    return exit_code
+
+
+def bench_command(args: argparse.Namespace) -> int:
+    from benchmarks.run import main as run_benchmarks
+    return run_benchmarks(args.arguments)
+
+
+def main(argv: list[str] | None = None) -> int:
+    argv = sys.argv[1:] if argv is None else list(argv)
+    # без команды - сборка, как в прежнем интерфейсе: oberon.py [PATH...] [--run]
+    if not argv or (argv[0] not in COMMANDS and argv[0] not in ("-h", "--help")):
+        argv = ["build"] + argv
+    argument_parser = argparse.ArgumentParser(description="Компилятор Оберона-07")
+    commands = argument_parser.add_subparsers(dest="command", required=True)
+
+    check_parser = commands.add_parser("check", help="проверить синтаксис модулей, ничего не записывая")
+    check_parser.add_argument("files", nargs="+", help="файлы модулей")
+    check_parser.add_argument("--sym-dir", default=DEFAULT_SYMBOL_DIR,
+                              help="каталог файлов символов импортируемых модулей")
+    check_parser.set_defaults(handler=check_command)
+
+    # параметры замеров разбирает сам benchmarks/run.py
+    bench_parser = commands.add_parser("bench", add_help=False,
+                                       help="замеры производительности (параметры benchmarks/run.py)")
+    bench_parser.set_defaults(handler=bench_command)
+
+    build_parser = commands.add_parser("build", help="собрать модули (команда по умолчанию)")
+    build_parser.set_defaults(handler=build_command)
+    build_parser.add_argument("paths", nargs="*", default=["code_samples"],
+                              help="файлы модулей или каталоги с ними")
+    build_parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                              help="число процессов для параллельной компиляции")
+    build_parser.add_argument("--sym-dir", default=DEFAULT_SYMBOL_DIR,
+                              help="каталог для файлов символов модулей")
+    build_parser.add_argument("--cache-dir", help="каталог кеша компиляции")
+    build_parser.add_argument("--cache-size", type=int,
+                              help="предельный размер кеша компиляции, МБ")
+    build_parser.add_argument("--no-cache", action="store_true",
+                              help="не использовать кеш компиляции")
+    build_parser.add_argument("--stats", nargs="?", const="-", metavar="FILE",
+                              help="вывести статистику компиляции в JSON (в stderr или в файл)")
+    build_parser.add_argument("--run", action="store_true",
+                              help="исполнить скомпилированные модули на виртуальной машине")
+    build_parser.add_argument("--disassemble", action="store_true",
+                              help="вывести байт-код скомпилированных модулей")
+    build_parser.add_argument("--engine", choices=["vm", "python", "ir"], default="vm",
+                              help="чем исполнять модули: виртуальной машиной, трансляцией в Python "
+                                   "или интерпретатором промежуточного представления (после проходов --passes)")
+    build_parser.add_argument("--ir", action="store_true",
+                              help="вывести оптимизированное промежуточное представление и отчет о проходах")
+    build_parser.add_argument("--passes", default="constprop,cse,licm,dce",
+                              help="проходы оптимизации через запятую для --ir и --engine ir "
+                                   "(пустая строка - без оптимизации)")
+    build_parser.add_argument("--watch", action="store_true",
+                              help="следить за файлами и перекомпилировать измененные модули")
+    build_parser.add_argument("--watch-interval", type=float, default=0.5, metavar="SECONDS",
+                              help="период опроса файлов в режиме наблюдения")
+    args, arguments = argument_parser.parse_known_args(argv)
+    if arguments and args.command != "bench":
+        argument_parser.error("неизвестные параметры: " + " ".join(arguments))
+    args.arguments = arguments
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -16,6 +16,17 @@ class OberonType:
     module_name: str
     type_name: Identifier
 
+    # Канонический экземпляр типа (см. type_table.py) запоминается в
+    # самом объекте. Канонические экземпляры разделяются всеми
+    # объявлениями с той же структурой, поэтому изменять их нельзя.
+    canonical_type = None
+    _interned = False
+
+    def __setattr__(self, name, value) -> None:
+        if self._interned:
+            raise AttributeError(f"канонический тип нельзя изменять (атрибут {name})")
+        super().__setattr__(name, value)
+
 
 @dataclass
 class ArrayType(OberonType):
@@ -29,11 +40,18 @@ class BasicTypesEnum(Enum):
     INTEGER = "INTEGER",
     REAL = "REAL",
     BYTE = "BYTE",
-    SET = "SET"
+    SET = "SET",
 
 
+# тип строковой константы: ARRAY n OF CHAR, где n - длина строки вместе с 0X
+@dataclass
+class StringType(ArrayType):
+    pass
+
+
+@dataclass
 class BasicType(OberonType):
-    basic_type: BasicTypesEnum
+    basic_type: BasicTypesEnum = None
 
 
 @dataclass
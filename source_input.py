@@ -0,0 +1,171 @@
+import codecs
+import hashlib
+import io
+import locale
+import mmap
+import os
+from typing import Iterable, Iterator
+
+from lexer import Lex, Lexer, WrapperForReceivingCharacters
+
+
+# Потоковое чтение исходного текста для очень больших модулей: файл
+# читается кусками (через mmap или обычным чтением), декодируется по мере
+# надобности, а лексер видит только окно - конец текущей строки (не
+# длиннее LINE_CONTEXT_LIMIT) и следующий кусок. Память на входной текст
+# не зависит ни от размера файла, ни от длины строк.
+
+DEFAULT_CHUNK_SIZE = 1 << 20
+# сколько символов текущей строки перед лексемой остается в окне
+# для сообщений об ошибках
+LINE_CONTEXT_LIMIT = 1 << 12
+# файлы больше этого размера компилируются с потоковым чтением
+STREAMING_THRESHOLD = 64 << 20
+
+
+def file_chunks(path_to_file: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                use_mmap: bool = True) -> Iterator[bytes]:
+    with open(path_to_file, "rb") as f:
+        if not use_mmap or os.fstat(f.fileno()).st_size == 0:
+            chunk = f.read(chunk_size)
+            while chunk:
+                yield chunk
+                chunk = f.read(chunk_size)
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for position in range(0, len(mapped), chunk_size):
+                yield mapped[position:position + chunk_size]
+
+
+# Декодирование кусков байтов так же, как при open(path) в текстовом
+# режиме: кодировка по умолчанию и перевод "\r\n" и "\r" в "\n".
+# Многобайтовый символ на границе кусков собирает инкрементный декодер
+def decode_chunks(chunks: Iterable[bytes], encoding: str | None = None) -> Iterator[str]:
+    decoder_class = codecs.getincrementaldecoder(encoding or locale.getpreferredencoding(False))
+    decoder = io.IncrementalNewlineDecoder(decoder_class(), translate=True)
+    for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    text = decoder.decode(b"", final=True)
+    if text:
+        yield text
+
+
+def source_chunks(path_to_file: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                  use_mmap: bool = True) -> Iterator[str]:
+    return decode_chunks(file_chunks(path_to_file, chunk_size, use_mmap))
+
+
+def file_hash(path_to_file: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> str:
+    digest = hashlib.sha256()
+    for chunk in file_chunks(path_to_file, chunk_size):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_large_source(path_to_file: str) -> bool:
+    return os.path.getsize(path_to_file) >= STREAMING_THRESHOLD
+
+
+# Окно текста вместо всего текста. Позиции (_index, _line_start) -
+# внутри окна, _base - смещение начала окна в тексте, _window_line_start -
+# смещение в тексте начала строки, в которой начинается окно (окно может
+# начинаться с середины длинной строки)
+class ChunkedCharacters(WrapperForReceivingCharacters):
+    def __init__(self, chunks: Iterable[str]) -> None:
+        self._chunks = iter(chunks)
+        self._base = 0
+        self._window_line_start = 0
+        self.exhausted = False
+        super().__init__(self._read(1))
+
+    def _read(self, size: int) -> str:
+        parts = []
+        read = 0
+        while read < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self.exhausted = True
+                break
+            parts.append(chunk)
+            read += len(chunk)
+        return "".join(parts)
+
+    # Окно сдвигается к началу текущей строки (она нужна для сообщений
+    # об ошибках), но не дальше LINE_CONTEXT_LIMIT символов от текущей
+    # позиции, и дополняется следующими кусками. Дочитывается не меньше
+    # недочитанной лексемы: длинная лексема (комментарий, строка)
+    # собирается за логарифмическое число повторов, а обычно читается
+    # один кусок
+    def refill(self):
+        drop = max(min(self._line_start, self._index), self._index - LINE_CONTEXT_LIMIT)
+        if drop >= self._line_start:
+            # окно начинается в текущей строке; _line_start == 0 - строка
+            # началась еще до окна
+            if self._line_start:
+                self._window_line_start = self._base + self._line_start
+            self._line_start = 0
+        else:
+            self._line_start -= drop
+        kept = self._data[drop:]
+        self._data = kept + self._read(max(self._length - self._index, 1))
+        self._length = len(self._data)
+        self._base += drop
+        self._index -= drop
+        self.ch = self._data[self._index] if self._index < self._length else self.EOT
+
+    def line_and_column(self, index: int) -> tuple[int, int]:
+        line, column = super().line_and_column(index)
+        if self._data.rfind("\n", 0, index) < 0:
+            column = self._base + index - self._window_line_start + 1
+        return line, column
+
+
+# Лексер над потоком кусков текста. Лексема, дошедшая до конца окна,
+# могла продолжаться в следующем куске, поэтому она разбирается заново
+# после дочитывания. start - смещение лексемы от начала всего текста
+class StreamingLexer(Lexer):
+    def __init__(self, chunks: Iterable[str]) -> None:
+        super().__init__(ChunkedCharacters(chunks))
+
+    def get_next(self):
+        wrap = self._wrap
+        while True:
+            state = (wrap._index, wrap._line_start, wrap.current_line_number)
+            try:
+                super().get_next()
+            except Exception:
+                if wrap.exhausted:
+                    raise
+            else:
+                # после лексемы нужен запас в символ для ":=", ".." и т.п.
+                if wrap.exhausted or wrap._index + 1 < wrap._length:
+                    self.start += wrap._base
+                    return
+            wrap._index, wrap._line_start, wrap.current_line_number = state
+            wrap.refill()
+
+    def line_and_column(self) -> tuple[int, int]:
+        return self._wrap.line_and_column(self.start - self._wrap._base)
+
+    def reset(self, mark: int = 0):
+        raise Exception("повторный разбор невозможен при потоковом чтении исходного текста")
+
+    # то же, что find_block_end, но по лексемам: окно не содержит всего тела
+    def skip_block(self, name: str) -> int | None:
+        nested: list[str] = []
+        while self.lex != Lex.end_of_text:
+            lex = self.lex
+            self.get_next()
+            if lex not in (Lex.PROCEDURE, Lex.END) or self.lex != Lex.ident:
+                continue
+            if lex == Lex.PROCEDURE:
+                nested.append(self.value)
+            elif nested and nested[-1] == self.value:
+                nested.pop()
+            elif not nested and self.value == name:
+                end = self._wrap._base + self._wrap._index
+                self.get_next()
+                return end
+        return None
@@ -0,0 +1,116 @@
+import sys
+import time
+from contextlib import contextmanager
+
+from lexer import Lex
+from nametable import *
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+# Статистика компиляции. Собирается только если объект передан
+# в Parser/build; без него компилятор не делает лишней работы.
+class CompileStats:
+    def __init__(self) -> None:
+        self.phase_seconds: dict[str, float] = dict()
+        self.token_counts: dict[str, int] = dict()
+        self.nametable_lookups = 0
+        self.nametable_misses = 0
+        self.nametable_scopes_scanned = 0
+        self.nametable_max_scan_length = 0
+        self.modules_compiled = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.peak_memory_bytes = 0
+
+    def add_time(self, phase: str, seconds: float):
+        self.phase_seconds[phase] = self.phase_seconds.get(phase, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def count_tokens(self, kind_counts: dict[Lex, int]):
+        for lex, count in kind_counts.items():
+            self.token_counts[lex.name] = self.token_counts.get(lex.name, 0) + count
+
+    def record_peak_memory(self):
+        if resource is None:
+            return
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # в Linux ru_maxrss в килобайтах, в macOS - в байтах
+        if sys.platform != "darwin":
+            peak *= 1024
+        self.peak_memory_bytes = max(self.peak_memory_bytes, peak)
+
+    def to_dict(self) -> dict:
+        return {
+            "phases": dict(self.phase_seconds),
+            "tokens": {
+                "total": sum(self.token_counts.values()),
+                "by_kind": dict(sorted(self.token_counts.items())),
+            },
+            "nametable": {
+                "lookups": self.nametable_lookups,
+                "misses": self.nametable_misses,
+                "scopes_scanned": self.nametable_scopes_scanned,
+                "max_scan_length": self.nametable_max_scan_length,
+            },
+            "modules_compiled": self.modules_compiled,
+            "cache": {"hits": self.cache_hits, "misses": self.cache_misses},
+            "peak_memory_bytes": self.peak_memory_bytes,
+        }
+
+    # объединение со статистикой, полученной из другого процесса
+    def merge(self, other: dict):
+        for phase, seconds in other["phases"].items():
+            self.add_time(phase, seconds)
+        for kind, count in other["tokens"]["by_kind"].items():
+            self.token_counts[kind] = self.token_counts.get(kind, 0) + count
+        nametable = other["nametable"]
+        self.nametable_lookups += nametable["lookups"]
+        self.nametable_misses += nametable["misses"]
+        self.nametable_scopes_scanned += nametable["scopes_scanned"]
+        self.nametable_max_scan_length = max(self.nametable_max_scan_length, nametable["max_scan_length"])
+        self.modules_compiled += other["modules_compiled"]
+        self.cache_hits += other["cache"]["hits"]
+        self.cache_misses += other["cache"]["misses"]
+        self.peak_memory_bytes = max(self.peak_memory_bytes, other["peak_memory_bytes"])
+
+
+# Таблица имен, считающая обращения. Используется вместо Nametable
+# только при сборе статистики, поэтому обычный поиск не замедляется
+class InstrumentedNametable(Nametable):
+    def __init__(self, universe: Mapping[str, NameTableEntry] | None, stats: CompileStats) -> None:
+        super().__init__(universe)
+        self._stats = stats
+
+    def lookup(self, name: Identifier | CompositeIdentifier | str) -> NameTableEntry | None:
+        start = time.perf_counter()
+        key = entry_key(name)
+        scan_length = 0
+        result = None
+        for scope in reversed(self._scopes):
+            scan_length += 1
+            result = scope.get(key)
+            if result is not None:
+                break
+        else:
+            scan_length += 1
+            result = self._universe.get(key)
+        stats = self._stats
+        stats.nametable_lookups += 1
+        stats.nametable_scopes_scanned += scan_length
+        if scan_length > stats.nametable_max_scan_length:
+            stats.nametable_max_scan_length = scan_length
+        if result is None:
+            stats.nametable_misses += 1
+        stats.add_time("resolve", time.perf_counter() - start)
+        return result
@@ -0,0 +1,411 @@
+import os
+import struct
+from typing import Callable
+
+from nametable import *
+from universe import BASIC_TYPES
+
+
+# Файл символов хранит интерфейс модуля: экспортированные константы,
+# типы, переменные и заголовки процедур. Формат двоичный:
+#   "OSYM", версия, имя модуля, число скрытых типов, скрытые типы
+#   (имя + структура), число записей, записи.
+# Скрытые типы - неэкспортированные типы модуля, на которые ссылаются
+# экспортированные объявления (VAR v*: Hidden). Целые числа записываются
+# как varint (zigzag), строки - длина + utf-8.
+
+SYMBOL_FILE_MAGIC = b"OSYM"
+SYMBOL_FILE_VERSION = 2
+SYMBOL_FILE_EXTENSION = ".sym"
+
+# каталог с исходными текстами библиотечных модулей (например, Log)
+LIBRARY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lib")
+
+_ENTRY_CONSTANT = 1
+_ENTRY_TYPE = 2
+_ENTRY_VARIABLE = 3
+_ENTRY_PROCEDURE = 4
+
+_TYPE_NONE = 0
+_TYPE_NO_RETURN = 1
+_TYPE_BASIC = 2
+_TYPE_REFERENCE = 3
+_TYPE_ARRAY = 4
+_TYPE_RECORD = 5
+_TYPE_POINTER = 6
+_TYPE_PROCEDURE = 7
+
+_VALUE_NONE = 0
+_VALUE_INT = 1
+_VALUE_FLOAT = 2
+_VALUE_BOOL = 3
+_VALUE_STR = 4
+_VALUE_SET = 5
+
+_BASIC_TYPES = list(BasicTypesEnum)
+
+# (имя модуля, имя типа) -> тип; нужна для ссылок на типы других модулей
+TypeResolver = Callable[[str, str], OberonType | None]
+
+
+class _Writer:
+    def __init__(self, module_name: str) -> None:
+        self.module_name = module_name
+        self.buffer = bytearray()
+
+    def write_byte(self, value: int):
+        self.buffer.append(value)
+
+    def write_int(self, value: int):
+        value = -value * 2 - 1 if value < 0 else value * 2
+        while value >= 0x80:
+            self.buffer.append((value & 0x7F) | 0x80)
+            value >>= 7
+        self.buffer.append(value)
+
+    def write_str(self, value: str):
+        data = value.encode("utf-8")
+        self.write_int(len(data))
+        self.buffer += data
+
+    def write_value(self, value: int | float | bool | str | frozenset[int] | None):
+        if isinstance(value, bool):
+            self.write_byte(_VALUE_BOOL)
+            self.write_byte(int(value))
+        elif isinstance(value, int):
+            self.write_byte(_VALUE_INT)
+            self.write_int(value)
+        elif isinstance(value, float):
+            self.write_byte(_VALUE_FLOAT)
+            self.buffer += struct.pack("<d", value)
+        elif isinstance(value, str):
+            self.write_byte(_VALUE_STR)
+            self.write_str(value)
+        elif isinstance(value, frozenset):
+            # множество записывается битовой маской
+            self.write_byte(_VALUE_SET)
+            self.write_int(sum(1 << element for element in value))
+        else:
+            self.write_byte(_VALUE_NONE)
+
+    def write_type(self, oberon_type: OberonType | None, is_declaration: bool = False):
+        if oberon_type is None:
+            self.write_byte(_TYPE_NONE)
+        elif oberon_type is NoReturnType or isinstance(oberon_type, NoReturnType):
+            self.write_byte(_TYPE_NO_RETURN)
+        elif isinstance(oberon_type, BasicType):
+            self.write_byte(_TYPE_BASIC)
+            self.write_byte(_BASIC_TYPES.index(oberon_type.basic_type))
+        elif not is_declaration and oberon_type.type_name is not None:
+            # именованный тип записывается ссылкой, а не структурой
+            self.write_byte(_TYPE_REFERENCE)
+            self.write_str(oberon_type.module_name or self.module_name)
+            self.write_str(oberon_type.type_name.name)
+        elif isinstance(oberon_type, ArrayType):
+            self.write_byte(_TYPE_ARRAY)
+            self.write_int(-1 if oberon_type.size is None else oberon_type.size)
+            self.write_type(oberon_type.element_type)
+        elif isinstance(oberon_type, RecordType):
+            self.write_byte(_TYPE_RECORD)
+            self.write_type(oberon_type.base_type)
+            self.write_int(len(oberon_type.fields))
+            for field in oberon_type.fields:
+                self.write_str(field.identifier.name)
+                self.write_byte(int(field.identifier.is_exported))
+                self.write_type(field.field_type)
+        elif isinstance(oberon_type, PointerType):
+            self.write_byte(_TYPE_POINTER)
+            self.write_type(oberon_type.type_of_pointer)
+        elif isinstance(oberon_type, ProcedureType):
+            self.write_byte(_TYPE_PROCEDURE)
+            self.write_type(oberon_type.return_type)
+            self.write_int(len(oberon_type.parameters))
+            for parameter in oberon_type.parameters:
+                self.write_str(parameter.name)
+                self.write_byte(int(parameter.by_ref))
+                self.write_type(parameter.param_type)
+        else:
+            raise ValueError(f"неподдерживаемый тип в файле символов: {oberon_type}")
+
+
+# Ссылка на тип своего модуля при чтении: тип может быть объявлен ниже
+# (Node* = POINTER TO NodeDesc), поэтому ссылки заменяются типами
+# после чтения всего файла (см. _Reader.resolve_references)
+class _TypeReference:
+    __slots__ = ("type_name",)
+
+    def __init__(self, type_name: str) -> None:
+        self.type_name = type_name
+
+
+class _Reader:
+    def __init__(self, data: bytes, resolve_type: TypeResolver | None) -> None:
+        self._data = data
+        self._position = 0
+        self._resolve_type = resolve_type
+        self.module_name = ""
+        self.types: dict[str, OberonType] = dict()
+        # прочитанные составные типы, в которых могут быть ссылки
+        self._composite_types: list[OberonType] = []
+
+    def resolve(self, oberon_type: OberonType | _TypeReference | None) -> OberonType | None:
+        if isinstance(oberon_type, _TypeReference):
+            if oberon_type.type_name not in self.types:
+                raise Exception(f"повреждённый файл символов модуля {self.module_name}: "
+                                f"нет типа {oberon_type.type_name}")
+            return self.types[oberon_type.type_name]
+        return oberon_type
+
+    def resolve_references(self):
+        for oberon_type in self._composite_types:
+            if isinstance(oberon_type, ArrayType):
+                oberon_type.element_type = self.resolve(oberon_type.element_type)
+            elif isinstance(oberon_type, RecordType):
+                oberon_type.base_type = self.resolve(oberon_type.base_type)
+                for field in oberon_type.fields:
+                    field.field_type = self.resolve(field.field_type)
+            elif isinstance(oberon_type, PointerType):
+                oberon_type.type_of_pointer = self.resolve(oberon_type.type_of_pointer)
+            elif isinstance(oberon_type, ProcedureType):
+                oberon_type.return_type = self.resolve(oberon_type.return_type)
+                for parameter in oberon_type.parameters:
+                    parameter.param_type = self.resolve(parameter.param_type)
+
+    def read_byte(self) -> int:
+        value = self._data[self._position]
+        self._position += 1
+        return value
+
+    def read_int(self) -> int:
+        value = 0
+        shift = 0
+        while True:
+            byte = self.read_byte()
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                break
+            shift += 7
+        return -((value + 1) >> 1) if value & 1 else value >> 1
+
+    def read_str(self) -> str:
+        length = self.read_int()
+        value = self._data[self._position:self._position + length].decode("utf-8")
+        self._position += length
+        return value
+
+    def read_value(self) -> int | float | bool | str | frozenset[int] | None:
+        tag = self.read_byte()
+        if tag == _VALUE_BOOL:
+            return bool(self.read_byte())
+        if tag == _VALUE_INT:
+            return self.read_int()
+        if tag == _VALUE_FLOAT:
+            (value,) = struct.unpack_from("<d", self._data, self._position)
+            self._position += 8
+            return value
+        if tag == _VALUE_STR:
+            return self.read_str()
+        if tag == _VALUE_SET:
+            mask = self.read_int()
+            return frozenset(element for element in range(mask.bit_length()) if mask >> element & 1)
+        return None
+
+    def read_type(self) -> OberonType | None:
+        tag = self.read_byte()
+        if tag == _TYPE_NONE:
+            return None
+        if tag == _TYPE_NO_RETURN:
+            return NoReturnType(None, None)
+        if tag == _TYPE_BASIC:
+            return BASIC_TYPES[_BASIC_TYPES[self.read_byte()]]
+        if tag == _TYPE_REFERENCE:
+            module_name = self.read_str()
+            type_name = self.read_str()
+            if module_name == self.module_name:
+                return _TypeReference(type_name)
+            if self._resolve_type is None:
+                return None
+            return self._resolve_type(module_name, type_name)
+        if tag == _TYPE_ARRAY:
+            size = self.read_int()
+            element_type = self.read_type()
+            return self._composite(ArrayType(self.module_name, None, element_type, None if size < 0 else size))
+        if tag == _TYPE_RECORD:
+            base_type = self.read_type()
+            fields = []
+            for _ in range(self.read_int()):
+                identifier = Identifier(self.read_str(), bool(self.read_byte()))
+                fields.append(RecordField(identifier, self.read_type()))
+            return self._composite(RecordType(self.module_name, None, base_type, fields))
+        if tag == _TYPE_POINTER:
+            return self._composite(PointerType(self.module_name, None, self.read_type()))
+        if tag == _TYPE_PROCEDURE:
+            return_type = self.read_type()
+            parameters = []
+            for _ in range(self.read_int()):
+                name = self.read_str()
+                by_ref = bool(self.read_byte())
+                parameters.append(ProcedureParameter(name, self.read_type(), by_ref))
+            return self._composite(ProcedureType(self.module_name, None, return_type, parameters))
+        raise Exception(f"повреждённый файл символов модуля {self.module_name}")
+
+    def _composite(self, oberon_type: OberonType) -> OberonType:
+        self._composite_types.append(oberon_type)
+        return oberon_type
+
+    # объявление типа: имя + структура
+    def read_type_declaration(self, identifier: Identifier) -> OberonType:
+        oberon_type = self.read_type()
+        if isinstance(oberon_type, _TypeReference) or oberon_type is None:
+            raise Exception(f"повреждённый файл символов модуля {self.module_name}")
+        if oberon_type.type_name is None:
+            oberon_type.type_name = identifier
+        self.types[identifier.name] = oberon_type
+        return oberon_type
+
+
+def symbol_file_path(directory: str, module_name: str) -> str:
+    return os.path.join(directory, module_name + SYMBOL_FILE_EXTENSION)
+
+
+def find_symbol_file(module_name: str, symbol_paths: list[str]) -> str | None:
+    for directory in symbol_paths:
+        path = symbol_file_path(directory, module_name)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def _entry_types(entity) -> list[OberonType | None]:
+    if isinstance(entity, Constant):
+        return [entity.constant_type]
+    if isinstance(entity, Variable):
+        return [entity.variable_type]
+    if isinstance(entity, Procedure):
+        return [entity.head.procedure_type]
+    if isinstance(entity, OberonType):
+        return [entity]
+    return []
+
+
+# Неэкспортированные именованные типы модуля, достижимые из записей
+# интерфейса, в порядке обхода. Типы других модулей записываются
+# ссылками и не обходятся
+def _hidden_types(module_name: str, entries: list[NameTableEntry]) -> list[OberonType]:
+    exported = {id(entry.entity) for entry in entries if isinstance(entry.entity, OberonType)}
+    visited: set[int] = set()
+    hidden = []
+    pending = [oberon_type for entry in entries for oberon_type in _entry_types(entry.entity)]
+    while pending:
+        oberon_type = pending.pop()
+        if (oberon_type is None or oberon_type is NoReturnType or isinstance(oberon_type, (BasicType, NoReturnType))
+                or id(oberon_type) in visited):
+            continue
+        visited.add(id(oberon_type))
+        if oberon_type.type_name is not None and id(oberon_type) not in exported:
+            if (oberon_type.module_name or module_name) != module_name:
+                continue
+            hidden.append(oberon_type)
+        if isinstance(oberon_type, ArrayType):
+            pending.append(oberon_type.element_type)
+        elif isinstance(oberon_type, RecordType):
+            pending.append(oberon_type.base_type)
+            pending.extend(field.field_type for field in oberon_type.fields)
+        elif isinstance(oberon_type, PointerType):
+            pending.append(oberon_type.type_of_pointer)
+        elif isinstance(oberon_type, ProcedureType):
+            pending.append(oberon_type.return_type)
+            pending.extend(parameter.param_type for parameter in oberon_type.parameters)
+    return hidden
+
+
+def encode_interface(module_name: str, entries: list[NameTableEntry]) -> bytes:
+    writer = _Writer(module_name)
+    writer.buffer += SYMBOL_FILE_MAGIC
+    writer.write_byte(SYMBOL_FILE_VERSION)
+    writer.write_str(module_name)
+    hidden_types = _hidden_types(module_name, entries)
+    writer.write_int(len(hidden_types))
+    for oberon_type in hidden_types:
+        writer.write_str(oberon_type.type_name.name)
+        writer.write_type(oberon_type, is_declaration=True)
+    writer.write_int(len(entries))
+    for entry in entries:
+        entity = entry.entity
+        if isinstance(entity, Constant):
+            writer.write_byte(_ENTRY_CONSTANT)
+            writer.write_str(entry.name.name)
+            writer.write_value(entity.value)
+            writer.write_type(entity.constant_type)
+        elif isinstance(entity, Variable):
+            writer.write_byte(_ENTRY_VARIABLE)
+            writer.write_str(entry.name.name)
+            writer.write_type(entity.variable_type)
+        elif isinstance(entity, Procedure):
+            writer.write_byte(_ENTRY_PROCEDURE)
+            writer.write_str(entry.name.name)
+            writer.write_type(entity.head.procedure_type, is_declaration=True)
+        elif isinstance(entity, OberonType):
+            writer.write_byte(_ENTRY_TYPE)
+            writer.write_str(entry.name.name)
+            writer.write_type(entity, is_declaration=True)
+        else:
+            raise ValueError(f"неподдерживаемая запись в файле символов: {entry}")
+    return bytes(writer.buffer)
+
+
+def decode_interface(data: bytes, resolve_type: TypeResolver | None = None) -> tuple[str, list[NameTableEntry]]:
+    if data[:len(SYMBOL_FILE_MAGIC)] != SYMBOL_FILE_MAGIC:
+        raise Exception("файл символов повреждён или имеет неизвестный формат")
+    reader = _Reader(data, resolve_type)
+    reader._position = len(SYMBOL_FILE_MAGIC)
+    version = reader.read_byte()
+    if version != SYMBOL_FILE_VERSION:
+        raise Exception(f"неподдерживаемая версия файла символов: {version}")
+    reader.module_name = reader.read_str()
+    for _ in range(reader.read_int()):
+        reader.read_type_declaration(Identifier(reader.read_str(), False))
+    entries = []
+    for _ in range(reader.read_int()):
+        kind = reader.read_byte()
+        identifier = Identifier(reader.read_str(), True)
+        if kind == _ENTRY_CONSTANT:
+            value = reader.read_value()
+            entity = Constant(identifier.name, value, reader.read_type())
+        elif kind == _ENTRY_VARIABLE:
+            entity = Variable(identifier.name, reader.read_type())
+        elif kind == _ENTRY_PROCEDURE:
+            procedure_type = reader.read_type()
+            entity = Procedure(ProcedureHead(procedure_type, identifier), ProcedureBody())
+        elif kind == _ENTRY_TYPE:
+            entity = reader.read_type_declaration(identifier)
+        else:
+            raise Exception(f"повреждённый файл символов модуля {reader.module_name}")
+        entries.append(NameTableEntry(identifier, entity))
+    reader.resolve_references()
+    for entry in entries:
+        if isinstance(entry.entity, Constant):
+            entry.entity = entry.entity._replace(constant_type=reader.resolve(entry.entity.constant_type))
+        elif isinstance(entry.entity, Variable):
+            entry.entity = entry.entity._replace(variable_type=reader.resolve(entry.entity.variable_type))
+    return reader.module_name, entries
+
+
+def write_symbol_file(directory: str, module_name: str, data: bytes) -> str:
+    # файл не перезаписывается, если интерфейс не изменился
+    path = symbol_file_path(directory, module_name)
+    try:
+        with open(path, "rb") as f:
+            if f.read() == data:
+                return path
+    except OSError:
+        pass
+    os.makedirs(directory, exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+def read_symbol_file(path: str, resolve_type: TypeResolver | None = None) -> tuple[str, list[NameTableEntry]]:
+    with open(path, "rb") as f:
+        return decode_interface(f.read(), resolve_type)
@@ -1,36 +1,325 @@
+import dataclasses
+import os
+import time
+from typing import TYPE_CHECKING, NamedTuple
+
 from lexer import Lexer, Lex
+from token_stream import TokenStream
+from grammar import FIRST, FOLLOW, lex_set
 from oberon_types import *
-from ast_node import AstNode
+from ast_node import *
+from constant_folding import ConstantError, constant_type, fold_constant
 from nametable import *
+from universe import UNIVERSE, StandardProcedure
+from type_table import TYPES
+
+if TYPE_CHECKING:
+    from stats import CompileStats
+
+
+# интерфейсы библиотечных модулей, собранные из исходных текстов
+# (когда файла символов нет), запоминаются на время работы процесса
+_library_interfaces: dict[str, list[NameTableEntry]] = dict()
+
+
+def load_module_interface(module_name: str, symbol_paths: list[str]) -> list[NameTableEntry]:
+    # файлы символов нужны только модулям с импортом, поэтому
+    # symbol_file не загружается при запуске (см. oberon.py check)
+    from symbol_file import LIBRARY_DIR, find_symbol_file, read_symbol_file
+
+    def resolve_type(type_module_name: str, type_name: str) -> OberonType | None:
+        for entry in load_module_interface(type_module_name, symbol_paths):
+            if entry.name.name == type_name and isinstance(entry.entity, OberonType):
+                return entry.entity
+        return None
+
+    # файл символов, который не читается (например, записан прежней
+    # версией компилятора), считается отсутствующим: интерфейс
+    # библиотечного модуля собирается из исходного текста
+    path = find_symbol_file(module_name, symbol_paths)
+    unreadable = None
+    if path is not None:
+        try:
+            return read_symbol_file(path, resolve_type)[1]
+        except Exception as e:
+            unreadable = e
+    if module_name in _library_interfaces:
+        return _library_interfaces[module_name]
+    library_source = os.path.join(LIBRARY_DIR, module_name + ".oberon07")
+    if os.path.isfile(library_source):
+        with open(library_source) as f:
+            parser = Parser(f.read(), symbol_paths=symbol_paths, interface_only=True)
+        _library_interfaces[module_name] = parser.exported_entries()
+        return _library_interfaces[module_name]
+    if unreadable is not None:
+        raise Exception(f"не читается файл символов модуля {module_name} ({unreadable}): "
+                        f"перекомпилируйте модуль {module_name}")
+    raise Exception(f"не найден файл символов модуля {module_name}")
+
+
+# Таблица бинарных операций выражений: лексема -> (приоритет, операция).
+# Приоритеты Оберона-07: отношения < операции сложения < операции умножения.
+_RELATION_PRECEDENCE = 1
+_ADDITION_PRECEDENCE = 2
+_MULTIPLICATION_PRECEDENCE = 3
+
+_BINARY_OPERATORS: dict[Lex, tuple[int, Operation]] = {
+    Lex.equal: (_RELATION_PRECEDENCE, Operation.equal),
+    Lex.hash: (_RELATION_PRECEDENCE, Operation.unequal),
+    Lex.less: (_RELATION_PRECEDENCE, Operation.less),
+    Lex.less_equal: (_RELATION_PRECEDENCE, Operation.less_or_equal),
+    Lex.greater: (_RELATION_PRECEDENCE, Operation.greater),
+    Lex.greater_equal: (_RELATION_PRECEDENCE, Operation.greater_or_equal),
+    Lex.IN: (_RELATION_PRECEDENCE, Operation.IN),
+    Lex.IS: (_RELATION_PRECEDENCE, Operation.IS),
+    Lex.plus: (_ADDITION_PRECEDENCE, Operation.plus),
+    Lex.minus: (_ADDITION_PRECEDENCE, Operation.minus),
+    Lex.OR: (_ADDITION_PRECEDENCE, Operation.LOGICAL_OR),
+    Lex.multiple: (_MULTIPLICATION_PRECEDENCE, Operation.multiple),
+    Lex.divide: (_MULTIPLICATION_PRECEDENCE, Operation.divide),
+    Lex.DIV: (_MULTIPLICATION_PRECEDENCE, Operation.DIV),
+    Lex.MOD: (_MULTIPLICATION_PRECEDENCE, Operation.MOD),
+    Lex.ampersand: (_MULTIPLICATION_PRECEDENCE, Operation.LOGICAL_AND),
+}
+
+# Унарный знак относится ко всему первому слагаемому (-a * b = -(a * b)),
+# поэтому его приоритет равен приоритету сложения; "~" относится
+# только к следующему множителю. Открывающая скобка имеет нулевой
+# приоритет и не снимается со стека при свертке по приоритету.
+# Унарные операции отличаются от бинарных третьим элементом
+_UNARY_PLUS = (_ADDITION_PRECEDENCE, Operation.plus, True)
+_UNARY_MINUS = (_ADDITION_PRECEDENCE, Operation.minus, True)
+_LOGICAL_NOT = (_MULTIPLICATION_PRECEDENCE + 1, Operation.LOGICAL_NOT, True)
+_PARENTHESIS = (0, None)
+
+
+# Множества лексем для выбора продукции (биты lex.bit, см. grammar.py):
+# проверка lex.bit & множество не строит список и не вычисляет хеш Lex
+# (совпадение с таблицей _BINARY_OPERATORS проверяет tests/test_grammar.py)
+_BINARY_OPERATOR_START = FIRST["relation"] | FIRST["AddOperator"] | FIRST["MulOperator"]
+_SIGNS = lex_set(Lex.plus, Lex.minus)
+# лексемы, с которых начинается операнд с префиксом: "(", "~", знак
+_OPERAND_PREFIXES = lex_set(Lex.left_bracket, Lex.tilde) | _SIGNS
+_SELECTOR_START = FIRST["selector"]
+_LABEL_START = FIRST["label"]
+_STATEMENT_START = FIRST["statement"]
+_TEXT_END = lex_set(Lex.end_of_text)
+
+# Восстановление после ошибок: разбор продолжается с ближайшей лексемы
+# синхронизации. Для операторов это ";" и лексемы, которыми кончается
+# последовательность операторов, для объявлений - ";" и начала разделов.
+# При пропуске учитывается вложенность IF/CASE/WHILE/FOR/RECORD ... END
+# и REPEAT ... UNTIL, чтобы не остановиться на чужом END
+_STATEMENT_SYNC = Lex.semicollon.bit | FOLLOW["StatementSequence"] | lex_set(Lex.PROCEDURE, Lex.BEGIN)
+_DECLARATION_SYNC = Lex.semicollon.bit | FIRST["DeclarationSequence"] | FOLLOW["DeclarationSequence"]
+_PROCEDURE_SYNC = lex_set(Lex.semicollon, Lex.PROCEDURE) | FOLLOW["DeclarationSequence"]
+_BLOCK_OPENERS = lex_set(Lex.IF, Lex.CASE, Lex.WHILE, Lex.FOR, Lex.REPEAT, Lex.RECORD)
+_BLOCK_CLOSERS = lex_set(Lex.END, Lex.UNTIL)
+
+
+# Ошибка разбора: строка и колонка лексемы, на которой она обнаружена,
+# и текст сообщения (как у исключения без восстановления)
+class Diagnostic(NamedTuple):
+    line: int
+    column: int
+    message: str
+
+
+# Восстановиться после ошибки нельзя (ошибка в лексере, конец текста):
+# разбор прекращается, ошибки до этого места уже собраны
+class _ParsingAborted(Exception):
+    pass
+
+
+# Тело процедуры или модуля, пропущенное в режиме разбора интерфейса:
+# mark - позиция лексера для разбора по требованию, start и end -
+# смещения в тексте от первой лексемы тела до конца "END имя"
+class SkippedBody(NamedTuple):
+    name: str
+    mark: int
+    start: int
+    end: int
 
 
 class Parser:
-    def __init__(self, program: str) -> None:
-        self._lexer = Lexer(program)
+    # interface_only - разбираются только объявления: тела процедур
+    # верхнего уровня и модуля пропускаются без разбора и могут быть
+    # разобраны потом (parse_procedure_body, parse_module_body).
+    # recover - ошибки не прерывают разбор, а собираются в diagnostics
+    # (при потоковом чтении отката нет, и разбор кончается на первой ошибке).
+    # interfaces - уже загруженные интерфейсы модулей по именам (например,
+    # в памяти сервера компиляции); остальные ищутся в symbol_paths
+    def __init__(self, program: str | TokenStream | Lexer, pretokenized: bool = False,
+                 symbol_paths: list[str] | None = None, stats: "CompileStats | None" = None,
+                 interface_only: bool = False, recover: bool = False,
+                 interfaces: dict[str, list[NameTableEntry]] | None = None) -> None:
+        if stats is not None and isinstance(program, str):
+            # при сборе статистики текст разбирается на лексемы заранее,
+            # чтобы время лексического и синтаксического анализа не смешивалось
+            with stats.phase("lex"):
+                program = TokenStream(program)
+        if isinstance(program, TokenStream):
+            program.reset()
+            self._lexer = program
+        elif isinstance(program, Lexer):
+            # готовый лексер, например потоковый (см. source_input.py)
+            self._lexer = program
+        elif pretokenized:
+            self._lexer = TokenStream(program)
+        else:
+            self._lexer = Lexer(program)
         self._module_name = None
-        self._nametable = Nametable()
-        ### DEBUG
-        self._nametable.add_entry(NameTableEntry(CompositeIdentifier("Log", "String"), Procedure()))
-        self._nametable.add_entry(NameTableEntry(CompositeIdentifier("Log", "Clear"), Procedure()))
-        self._nametable.add_entry(NameTableEntry(CompositeIdentifier("Log", "Ln"), Procedure()))
-        self._nametable.add_entry(NameTableEntry(CompositeIdentifier("INTEGER", None), BasicType(None, Identifier("INTEGER", False))))
-        self._nametable.add_entry(NameTableEntry(CompositeIdentifier("REAL", None), BasicType(None, Identifier("REAL", False))))
-        self._nametable.add_entry(NameTableEntry(CompositeIdentifier("BOOLEAN", None), BasicType(None, Identifier("BOOLEAN", False))))
-        self._nametable.add_entry(NameTableEntry(CompositeIdentifier("ASSERT", None),  Procedure()))
-        ### NO_DEBUG
-        self._parse_module()
+        self._symbol_paths = symbol_paths if symbol_paths is not None else []
+        self._interfaces = interfaces if interfaces is not None else dict()
+        self._imported_modules: dict[str, str] = dict()
+        self._module_body: list[Statement] = list()
+        # указатели на записи, объявленные ниже в том же разделе TYPE
+        self._forward_pointers: list[tuple[PointerType, CompositeIdentifier]] = list()
+        self._interface_only = interface_only
+        self._skipped_procedures: dict[str, tuple[Procedure, SkippedBody]] = dict()
+        self._skipped_module_body: SkippedBody | None = None
+        self._diagnostics: list[Diagnostic] | None = [] if recover else None
+        if stats is None:
+            self._nametable = Nametable(UNIVERSE)
+            self._parse_compilation_unit()
+        else:
+            from stats import InstrumentedNametable
+            if isinstance(self._lexer, TokenStream):
+                stats.count_tokens(self._lexer.kind_counts())
+            self._nametable = InstrumentedNametable(UNIVERSE, stats)
+            self._parse_module_with_stats(stats)
+
+    def _parse_module_with_stats(self, stats: "CompileStats"):
+        # время поиска имен учитывается отдельно от времени разбора
+        resolve_before = stats.phase_seconds.get("resolve", 0.0)
+        start = time.perf_counter()
+        try:
+            self._parse_compilation_unit()
+        finally:
+            elapsed = time.perf_counter() - start
+            stats.add_time("parse", elapsed - (stats.phase_seconds.get("resolve", 0.0) - resolve_before))
+            stats.record_peak_memory()
+
+    @property
+    def module_name(self) -> str:
+        return self._module_name
+
+    @property
+    def nametable(self) -> Nametable:
+        return self._nametable
+
+    @property
+    def imported_modules(self) -> dict[str, str]:
+        return self._imported_modules
+
+    @property
+    def module_body(self) -> list[Statement]:
+        return self._module_body
+
+    @property
+    def diagnostics(self) -> list[Diagnostic]:
+        return self._diagnostics if self._diagnostics is not None else []
+
+    @property
+    def skipped_bodies(self) -> list[SkippedBody]:
+        bodies = [span for _, span in self._skipped_procedures.values()]
+        if self._skipped_module_body is not None:
+            bodies.append(self._skipped_module_body)
+        return bodies
+
+    def parse_procedure_body(self, name: str) -> ProcedureBody:
+        if name not in self._skipped_procedures:
+            raise Exception(f"тело процедуры {name} не пропускалось")
+        procedure, span = self._skipped_procedures.pop(name)
+        self._lexer.reset(span.mark)
+        self._parse_procedure_rest(procedure)
+        return procedure.body
+
+    def parse_module_body(self) -> list[Statement]:
+        if self._skipped_module_body is None:
+            raise Exception(f"тело модуля {self._module_name} не пропускалось")
+        self._lexer.reset(self._skipped_module_body.mark)
+        self._skipped_module_body = None
+        self._parse_module_rest()
+        return self._module_body
+
+    def exported_entries(self) -> list[NameTableEntry]:
+        return [entry for entry in self._nametable.get_global_scope_identifiers()
+                if isinstance(entry.name, Identifier) and entry.name.is_exported]
+
+    def _add_diagnostic(self, error: Exception):
+        line, column = self._lexer.line_and_column()
+        self._diagnostics.append(Diagnostic(line, column, str(error)))
+
+    def _begin_recovery(self, error: Exception) -> int:
+        if isinstance(error, _ParsingAborted):
+            raise error
+        self._add_diagnostic(error)
+        return self._lexer.start
+
+    # пропуск до лексемы из stop вне вложенных блоков, не раньше error_start.
+    # Неизвестные символы после места ошибки - тоже ошибки: они
+    # записываются и пропускаются
+    def _skip_to(self, stop: int, error_start: int):
+        lexer = self._lexer
+        depth = 0
+        while depth > 0 or not lexer.lex.bit & stop or lexer.start < error_start:
+            bit = lexer.lex.bit
+            if bit & _TEXT_END:
+                raise _ParsingAborted()
+            if lexer.lex == Lex.unknown_lex and lexer.start > error_start:
+                self._add_diagnostic(self._unknown_symbol_error())
+            elif bit & _BLOCK_OPENERS:
+                depth += 1
+            elif bit & _BLOCK_CLOSERS and depth > 0:
+                depth -= 1
+            lexer.get_next()
+
+    def _unknown_symbol_error(self) -> Exception:
+        return Exception(f"{self._lexer.get_context()}\nНеизвестный символ {self._lexer.value}")
+
+    # Ошибка записывается, лексер переходит от mark (начала оператора или
+    # объявления) к лексеме синхронизации после места ошибки.
+    # True - это была ";", и она пропущена
+    def _recover(self, error: Exception, mark: int, stop: int) -> bool:
+        error_start = self._begin_recovery(error)
+        try:
+            self._lexer.reset(mark)
+            self._skip_to(stop, error_start)
+        except Exception as e:
+            raise _ParsingAborted() from e
+        if self._lexer.lex != Lex.semicollon:
+            return False
+        self._lexer.get_next()
+        return True
+
+    # Процедура с ошибкой, которую не удалось обойти внутри нее (в
+    # заголовке, в "END имя"), пропускается до своего "END имя", а если его
+    # не найти - до следующей лексемы синхронизации после места ошибки
+    def _recover_procedure(self, error: Exception, mark: int, scope_level: int):
+        error_start = self._begin_recovery(error)
+        while self._nametable.scope_level > scope_level:
+            self._nametable.close_scope()
+        lexer = self._lexer
+        try:
+            lexer.reset(mark)
+            lexer.get_next()
+            if lexer.lex != Lex.ident or lexer.skip_block(lexer.value) is None:
+                lexer.reset(mark)
+            self._skip_to(_PROCEDURE_SYNC, error_start)
+        except Exception as e:
+            raise _ParsingAborted() from e
+        if lexer.lex == Lex.semicollon:
+            lexer.get_next()
 
     def _raise_expected_exception(self, expected: str):
         raise Exception(f"{self._lexer.get_context()}\nОжидалось {expected}, но {self._lexer.lex.value[0]}")
 
     def resolve_type(self, typename: Identifier | CompositeIdentifier) -> OberonType:
-        nametable_entries = self._nametable.get_all_identifiers_for_current_scope()
-        for entry in nametable_entries:
-            if not issubclass(type(entry.entity), OberonType):
-                continue
-            if entry.name == typename:
-                return entry.entity
-        raise Exception(f"неизвестные тип {identifier_to_str(typename)}")
+        entry = self._nametable.lookup(typename)
+        if entry is None or not isinstance(entry.entity, OberonType):
+            raise Exception(f"неизвестные тип {entry_key(typename)}")
+        return entry.entity
 
     def _check(self, lex: Lex):
         if self._lexer.lex != lex:
@@ -77,22 +366,23 @@ class Parser:
     def _parse_const_declaration(self) -> Constant:
         const_identifier = self._parse_identdef()
         self._check(Lex.equal)
-        value = self._parse_const_expression()
-        const_type: OberonType = None
-        if isinstance(value, int):
-            const_type = self.resolve_type("INTEGER")
-        elif isinstance(value, float):
-                const_type = self.resolve_type("REAL")
-        elif isinstance(value, str):
-            if len(str) == 1:
-                const_type = self.resolve_type("CHAR")
-            else:
-                const_type = self.resolve_type("STRING")
-        self._nametable.add_entry(NameTableEntry(const_identifier, Constant(const_identifier.name, value, const_type)))
+        # значение вычисляется один раз и хранится в таблице имен,
+        # ссылки на константу в других выражениях заменяются литералом
+        value = self._parse_const_expression().literal
+        self._nametable.add_entry(NameTableEntry(const_identifier, Constant(const_identifier.name, value, constant_type(value))))
 
+    def _parse_const_expression(self) -> LiteralValue:
+        expression = self._parse_expression()
+        if type(expression) is not LiteralValue:
+            self._raise_expected_exception("константное выражение")
+        return expression
 
-    def _parse_const_expression(self):
-        self._parse_expression()
+    def _fold(self, node: AstNode) -> AstNode:
+        try:
+            folded = fold_constant(node)
+        except ConstantError as e:
+            raise Exception(f"{self._lexer.get_context()}\n{e}")
+        return node if folded is None else folded
 
     ######################################################
     #                  TYPE DECLARATIONS RULES           #
@@ -102,12 +392,21 @@ class Parser:
         identifier = self._parse_identdef()
         self._check(Lex.equal)
         oberon_type = self._parse_type()
+        if oberon_type is None:
+            return
+        if oberon_type.type_name is None:
+            if oberon_type._interned:
+                # канонический экземпляр общий, имя получает его копия
+                oberon_type = dataclasses.replace(oberon_type, module_name=self._module_name, type_name=identifier)
+            else:
+                oberon_type.module_name = self._module_name
+                oberon_type.type_name = identifier
+        self._nametable.add_entry(NameTableEntry(identifier, oberon_type))
     
     def _parse_type(self) -> OberonType:
         match self._lexer.lex:
             case Lex.ident:
-                composite_ident = self._parse_qualident()
-                #ToDo resolve_type
+                return self._resolve_type_name(self._parse_qualident())
             case Lex.ARRAY:
                 array_type = self._parse_array_type()
                 return array_type
@@ -123,10 +422,17 @@ class Parser:
             case _:
                 self._raise_expected_exception("тип")
     
+    def _resolve_type_name(self, composite_identifier: CompositeIdentifier) -> OberonType | None:
+        # неизвестные имена типов пока допускаются (например, STRING в примерах)
+        entry = self._nametable.lookup(composite_identifier)
+        if entry is None or not isinstance(entry.entity, OberonType):
+            return None
+        return entry.entity
+
     def _calculate_array_type(self, array_sizes: list[int], element_type: OberonType) -> ArrayType:
-        if len(array_sizes) == 1:
-            return ArrayType(self._module_name, None, element_type, array_sizes[0])
-        return ArrayType(self._module_name, None, self._calculate_array_type(array_sizes[1:], element_type), array_sizes[0])
+        for size in reversed(array_sizes):
+            element_type = TYPES.array(element_type, size)
+        return element_type
 
     def _parse_array_type(self) -> ArrayType:
         self._check(Lex.ARRAY)
@@ -140,7 +446,10 @@ class Parser:
         return self._calculate_array_type(array_lengths, array_element_type)
 
     def _parse_length(self) -> int:
-        return self._parse_const_expression()
+        length = self._parse_const_expression().literal
+        if type(length) is not int or length <= 0:
+            self._raise_expected_exception("положительная целая длина массива")
+        return length
     
     def _parse_record_type(self) -> RecordType:
         self._check(Lex.RECORD)
@@ -156,8 +465,7 @@ class Parser:
         return RecordType(None, None, base_type, record_fields)
 
     def _parse_base_type(self) -> OberonType:
-        composite_identifier = self._parse_qualident()
-        # Todo: type resolve
+        return self._resolve_type_name(self._parse_qualident())
 
     def _parse_field_list_sequence(self) -> list[RecordField]:
         all_record_fields = []
@@ -184,7 +492,21 @@ class Parser:
     def _parse_pointer_type(self) -> PointerType:
         self._check(Lex.POINTER)
         self._check(Lex.TO)
-        return PointerType(self._parse_type)
+        if self._lexer.lex == Lex.ident:
+            type_name = self._parse_qualident()
+            type_of_pointer = self._resolve_type_name(type_name)
+            if type_of_pointer is None:
+                # базовый тип будет подставлен в конце раздела TYPE
+                pointer_type = PointerType(None, None, None)
+                self._forward_pointers.append((pointer_type, type_name))
+                return pointer_type
+            return TYPES.pointer(type_of_pointer)
+        return TYPES.pointer(self._parse_type())
+
+    def _resolve_forward_pointers(self):
+        for pointer_type, type_name in self._forward_pointers:
+            pointer_type.type_of_pointer = self._resolve_type_name(type_name)
+        self._forward_pointers.clear()
 
     def _parse_procedure_type(self) -> ProcedureType:
         self._check(Lex.PROCEDURE)
@@ -207,114 +529,213 @@ class Parser:
     #                  EXPRESSION RULES                  #
     ######################################################
 
+    # Выражения разбираются методом предшествования операций с явными
+    # стеками операндов и операций: вложенность скобок не расходует
+    # стек интерпретатора, а на каждую лексему приходится один проход цикла.
+    # Унарный знак допустим только в начале простого выражения (после
+    # начала выражения, "(" или отношения), отношение - не более одного
+    # на уровень скобок.
     def _parse_expression(self) -> AstNode:
-        self._parse_simple_expression()
-        if self._lexer.lex in [Lex.equal, Lex.hash, Lex.less,
-                               Lex.less_equal, Lex.greater,
-                               Lex.greater_equal, Lex.IN, Lex.IS]:
-            self._lexer.get_next()
-            self._parse_simple_expression()
-    
-    def _parse_simple_expression(self) -> AstNode:
-        if self._lexer.lex in [Lex.plus, Lex.minus]:
-            self._lexer.get_next()
-        self._parse_term()
-        while self._lexer.lex in [Lex.plus, Lex.minus, Lex.OR]:
-            self._lexer.get_next()
-            self._parse_term()
+        lexer = self._lexer
+        binary_operators = _BINARY_OPERATORS
+        operands: list[AstNode] = []
+        # элемент стека операций: (приоритет, операция) для бинарной
+        # операции и скобки, (приоритет, операция, True) для унарной
+        operators: list[tuple] = []
+        # для каждой открытой скобки - было ли уже отношение внутри нее
+        relation_seen = [False]
+        sign_allowed = True
+        while True:
+            # ожидается операнд
+            lex = lexer.lex
+            if lex.bit & _OPERAND_PREFIXES:
+                if lex == Lex.left_bracket:
+                    lexer.get_next()
+                    operators.append(_PARENTHESIS)
+                    relation_seen.append(False)
+                    sign_allowed = True
+                    continue
+                if lex == Lex.tilde:
+                    lexer.get_next()
+                    operators.append(_LOGICAL_NOT)
+                    sign_allowed = False
+                    continue
+                if sign_allowed:
+                    lexer.get_next()
+                    operators.append(_UNARY_PLUS if lex == Lex.plus else _UNARY_MINUS)
+                    sign_allowed = False
+                    continue
+            operands.append(self._parse_operand())
+            # ожидается операция, закрывающая скобка или конец выражения
+            while True:
+                lex = lexer.lex
+                if lex.bit & _BINARY_OPERATOR_START:
+                    operator = binary_operators[lex]
+                    precedence = operator[0]
+                    if precedence != _RELATION_PRECEDENCE or not relation_seen[-1]:
+                        break
+                elif lex == Lex.right_bracket and len(relation_seen) > 1:
+                    lexer.get_next()
+                    while operators[-1] is not _PARENTHESIS:
+                        self._reduce_operation(operands, operators.pop())
+                    operators.pop()
+                    relation_seen.pop()
+                    continue
+                if len(relation_seen) > 1:
+                    self._check(Lex.right_bracket)
+                while operators:
+                    self._reduce_operation(operands, operators.pop())
+                return operands[0]
+            while operators and operators[-1][0] >= precedence:
+                self._reduce_operation(operands, operators.pop())
+            lexer.get_next()
+            operators.append(operator)
+            sign_allowed = precedence == _RELATION_PRECEDENCE
+            if sign_allowed:
+                relation_seen[-1] = True
 
-    def _parse_term(self) -> AstNode:
-        self._parse_factor()
-        while self._lexer.lex in [Lex.multiple, Lex.divide, Lex.DIV, 
-                                  Lex.MOD, Lex.ampersand]:
-            self._lexer.get_next()
-            self._parse_factor()
-    
-    def _parse_factor(self) -> AstNode:
-        if self._lexer.lex in [Lex.number, Lex.string, Lex.NIL, Lex.TRUE,
-                               Lex.FALSE]:
-            self._lexer.get_next()
-        elif self._lexer.lex == Lex.left_curly_bracket:
-            self._parse_set()
-        elif self._lexer.lex == Lex.ident:
-            self._parse_designator()
-            if self._lexer.lex == Lex.left_bracket:
-                self._parse_actual_parameters()
-        elif self._lexer.lex == Lex.left_bracket:
-            self._lexer.get_next()
-            self._parse_expression()
-            self._check(Lex.right_bracket)
-        elif self._lexer.lex == Lex.tilde:
-            self._lexer.get_next()
-            self._parse_factor()
+    def _reduce_operation(self, operands: list[AstNode], operator: tuple):
+        # операция над литералами сразу сворачивается в литерал
+        if len(operator) == 3:
+            operand = operands[-1]
+            node = UnaryOperation(operator[1], operand)
+            operands[-1] = self._fold(node) if type(operand) is LiteralValue else node
         else:
-            self._raise_expected_exception("число, строка, NIL, TRUE, FALSE, множество, вызов процедуры, переменная, (выражение), ~")
-    
-    def _is_procedure(self, composite_identifier: CompositeIdentifier) -> bool:
-        ident_str = identifier_to_str(composite_identifier)
-        nametable_entries = self._nametable.get_all_identifiers_for_current_scope()
-        for entry in nametable_entries:
-            print(f"DEBUG: {identifier_to_str(entry.name)}")
-            if ident_str == identifier_to_str(entry.name):
-                if isinstance(entry.entity, Procedure):
-                    return True
-                else:
-                    return False
-        for n in self._nametable._entries:
-            print(n.name)
-        raise Exception("неизвестный идентификатор " + ident_str)
-
-    def _parse_designator(self):
-        composite_identifier = self._parse_qualident()
-        if self._is_procedure(composite_identifier):
-            return
-        while self._lexer.lex in [Lex.dot, Lex.left_square_bracket, Lex.caret, Lex.left_bracket]:
-            self._parse_selector()
+            right = operands.pop()
+            left = operands[-1]
+            node = BinaryOperation(operator[1], left, right)
+            if type(left) is LiteralValue and type(right) is LiteralValue:
+                node = self._fold(node)
+            operands[-1] = node
+
+    def _parse_operand(self) -> AstNode:
+        # самые частые операнды - имена, они проверяются первыми
+        match self._lexer.lex:
+            case Lex.ident:
+                designator = self._parse_designator()
+                if self._lexer.lex == Lex.left_bracket:
+                    return self._fold(FunctionCall(designator, self._parse_actual_parameters(designator)))
+                if type(designator.entity) is Constant:
+                    return self._fold(designator)
+                return designator
+            case Lex.number | Lex.string:
+                literal = LiteralValue(self._lexer.value)
+                self._lexer.get_next()
+                return literal
+            case Lex.NIL:
+                self._lexer.get_next()
+                return LiteralValue(None)
+            case Lex.TRUE | Lex.FALSE:
+                literal = LiteralValue(self._lexer.lex == Lex.TRUE)
+                self._lexer.get_next()
+                return literal
+            case Lex.left_curly_bracket:
+                return self._fold(self._parse_set())
+            case _:
+                self._raise_expected_exception("число, строка, NIL, TRUE, FALSE, множество, вызов процедуры, переменная, (выражение), ~")
+
+    def _is_callable(self, designator: Designator) -> bool:
+        # круглые скобки после процедуры - вызов, после остальных - охрана типа
+        if designator.selectors:
+            return False
+        entity = designator.entity
+        if isinstance(entity, Procedure):
+            return True
+        if isinstance(entity, Variable):
+            return isinstance(entity.variable_type, ProcedureType)
+        if isinstance(entity, ProcedureParameter):
+            return isinstance(entity.param_type, ProcedureType)
+        return False
+
+    def _parse_designator(self) -> Designator:
+        name = self._parse_ident()
+        composite_identifier = CompositeIdentifier(name, None)
+        # qualident только для имен импортированных модулей,
+        # иначе точка - доступ к полю записи
+        if name in self._imported_modules and self._lexer.lex == Lex.dot:
+            self._lexer.get_next()
+            composite_identifier = CompositeIdentifier(name, self._parse_ident())
+        entry = self._nametable.lookup(composite_identifier)
+        if entry is None:
+            raise Exception("неизвестный идентификатор " + identifier_to_str(composite_identifier))
+        designator = Designator(composite_identifier, entry.entity)
+        if isinstance(entry.entity, Constant):
+            designator.value = Operation.get_const_value
+        while self._lexer.lex.bit & _SELECTOR_START:
+            if self._lexer.lex == Lex.left_bracket and self._is_callable(designator):
+                break
+            designator.selectors.append(self._parse_selector())
+        return designator
     
-    def _parse_selector(self):
+    def _parse_selector(self) -> AstNode:
         match self._lexer.lex:
             case Lex.dot:
                 self._lexer.get_next()
-                self._parse_ident()
+                return FieldSelector(self._parse_ident())
             case Lex.left_square_bracket:
                 self._lexer.get_next()
-                self._parse_exp_list()
+                indexes = self._parse_exp_list()
                 self._check(Lex.right_square_bracket)
+                return IndexSelector(indexes)
             case Lex.caret:
                 self._lexer.get_next()
+                return DereferenceSelector()
             case Lex.left_bracket:
                 self._lexer.get_next()
-                self._parse_qualident()
+                type_name = self._parse_qualident()
                 self._check(Lex.right_bracket)
+                return TypeGuardSelector(type_name, self._resolve_type_name(type_name))
             case _:
                 self._raise_expected_exception(".идентификатор, [список выражений], ^, (составной идентификатор)")
     
-    def _parse_set(self):
+    def _parse_set(self) -> SetConstructor:
         self._check(Lex.left_curly_bracket)
+        elements = []
         if self._lexer.lex != Lex.right_curly_bracket:
-            self._parse_element()
+            elements.append(self._parse_element())
             while self._lexer.lex == Lex.comma:
                 self._lexer.get_next()
-                self._parse_element()
+                elements.append(self._parse_element())
         self._check(Lex.right_curly_bracket)
+        return SetConstructor(elements)
 
-    def _parse_element(self):
-        self._parse_expression()
+    def _parse_element(self) -> AstNode:
+        element = self._parse_expression()
         if self._lexer.lex == Lex.double_dot:
             self._lexer.get_next()
-            self._parse_expression()
+            element = SetRange(element, self._parse_expression())
+        return element
 
-    def _parse_exp_list(self):
-        self._parse_expression()
+    def _parse_exp_list(self) -> list[AstNode]:
+        expressions = [self._parse_expression()]
         while self._lexer.lex == Lex.comma:
             self._lexer.get_next()
-            self._parse_expression()
+            expressions.append(self._parse_expression())
+        return expressions
+
+    def _formal_parameters(self, designator: Designator) -> list[ProcedureParameter]:
+        entity = designator.entity
+        if isinstance(entity, Procedure):
+            return entity.head.procedure_type.parameters
+        if isinstance(entity, Variable) and isinstance(entity.variable_type, ProcedureType):
+            return entity.variable_type.parameters
+        if isinstance(entity, ProcedureParameter) and isinstance(entity.param_type, ProcedureType):
+            return entity.param_type.parameters
+        return []
 
-    def _parse_actual_parameters(self):
+    def _parse_actual_parameters(self, designator: Designator) -> list[ProcedureActualParameterCalculation]:
         self._check(Lex.left_bracket)
+        expressions = []
         if self._lexer.lex != Lex.right_bracket:
-            self._parse_exp_list()
+            expressions = self._parse_exp_list()
         self._check(Lex.right_bracket)
+        entity = designator.entity
+        if isinstance(entity, StandardProcedure):
+            return [ProcedureActualParameterCalculation(i in entity.var_parameters, expression)
+                    for i, expression in enumerate(expressions)]
+        formal_parameters = self._formal_parameters(designator)
+        return [ProcedureActualParameterCalculation(i < len(formal_parameters) and formal_parameters[i].by_ref, expression)
+                for i, expression in enumerate(expressions)]
 
     ######################################################
     #                  EXPRESSION RULES END              #
@@ -324,117 +745,178 @@ class Parser:
     #                  STATEMENT RULES                   #
     ######################################################
 
-    def _parse_statement(self):
+    def _parse_statement(self) -> Statement:
         match self._lexer.lex:
             case Lex.ident:
-                self._parse_designator()
+                designator = self._parse_designator()
                 if self._lexer.lex == Lex.assignment:
                     self._lexer.get_next()
-                    self._parse_expression()
-                else:
-                    if self._lexer.lex == Lex.left_bracket:
-                        self._parse_actual_parameters()
+                    return Assignment(designator, self._parse_expression())
+                actual_parameters = []
+                if self._lexer.lex == Lex.left_bracket:
+                    actual_parameters = self._parse_actual_parameters(designator)
+                return ProcedureCall(designator, actual_parameters)
             case Lex.IF:
-                self._parse_if_statement()
+                return self._parse_if_statement()
             case Lex.CASE:
-                self._parse_case_statement()
+                return self._parse_case_statement()
             case Lex.WHILE:
-                self._parse_while_statement()
+                return self._parse_while_statement()
             case Lex.REPEAT:
-                self._parse_repeat_statement()
+                return self._parse_repeat_statement()
             case Lex.FOR:
-                self._parse_for_statement()
+                return self._parse_for_statement()
             case _:
                 self._raise_expected_exception("оператор")
 
-    def _parse_statement_sequence(self):
-        self._parse_statement()
-        while self._lexer.lex == Lex.semicollon:
-            self._lexer.get_next()
-            self._parse_statement()
+    def _parse_statement_sequence(self) -> list[Statement]:
+        statements = []
+        while True:
+            mark = self._lexer.mark()
+            try:
+                statements.append(self._parse_statement())
+            except Exception as e:
+                if self._diagnostics is None:
+                    raise
+                if self._recover(e, mark, _STATEMENT_SYNC):
+                    continue
+                return statements
+            if self._lexer.lex == Lex.semicollon:
+                self._lexer.get_next()
+            elif self._diagnostics is not None and self._lexer.lex.bit & _STATEMENT_START:
+                # пропущенная ";" между операторами
+                try:
+                    self._raise_expected_exception(Lex.semicollon.value[0])
+                except Exception as e:
+                    self._add_diagnostic(e)
+            elif self._diagnostics is not None and self._lexer.lex == Lex.unknown_lex:
+                # неизвестный символ после оператора: ошибка, пропуск до ";"
+                # или до конца последовательности
+                mark = self._lexer.mark()
+                try:
+                    self._raise_expected_exception(Lex.semicollon.value[0])
+                except Exception as e:
+                    if not self._recover(e, mark, _STATEMENT_SYNC):
+                        return statements
+            else:
+                return statements
 
-    def _parse_if_statement(self):
+    def _parse_if_statement(self) -> IF:
         self._check(Lex.IF)
-        self._parse_expression()
+        condition = self._parse_expression()
         self._check(Lex.THEN)
-        self._parse_statement_sequence()
+        if_statement = IF(condition, self._parse_statement_sequence())
+        last = if_statement
         while self._lexer.lex == Lex.ELSIF:
             self._lexer.get_next()
-            self._parse_expression()
+            condition = self._parse_expression()
             self._check(Lex.THEN)
-            self._parse_statement_sequence
+            elsif_statement = IF(condition, self._parse_statement_sequence())
+            last.else_code = [elsif_statement]
+            last = elsif_statement
         if self._lexer.lex == Lex.ELSE:
             self._lexer.get_next()
-            self._parse_statement_sequence()
+            last.else_code = self._parse_statement_sequence()
         self._check(Lex.END)
+        return if_statement
 
-    def _parse_case_statement(self):
+    def _parse_case_statement(self) -> CASE:
         self._check(Lex.CASE)
-        self._parse_expression()
+        expression = self._parse_expression()
         self._check(Lex.OF)
-        self._parse_case()
+        branches = []
+        branch = self._parse_case()
+        if branch is not None:
+            branches.append(branch)
         while self._lexer.lex == Lex.vertical_line:
             self._lexer.get_next()
-            self._parse_case()
+            branch = self._parse_case()
+            if branch is not None:
+                branches.append(branch)
         self._check(Lex.END)
+        return CASE(expression, branches)
     
-    def _parse_case(self):
-        if self._lexer.lex in [Lex.string, Lex.ident] or (self._lexer.lex == Lex.number and type(self._lexer.value) is int):
-            self._parse_case_label_list()
+    def _parse_case(self) -> CaseBranch | None:
+        # пустая ветка допускается грамматикой
+        lex = self._lexer.lex
+        if lex.bit & _LABEL_START and (lex != Lex.number or type(self._lexer.value) is int):
+            labels = self._parse_case_label_list()
             self._check(Lex.colon)
-            self._parse_statement_sequence()
+            return CaseBranch(labels, self._parse_statement_sequence())
+        return None
         
-    def _parse_case_label_list(self):
-        self._parse_label_range()
+    def _parse_case_label_list(self) -> list[CaseLabel]:
+        labels = [self._parse_label_range()]
         while self._lexer.lex == Lex.comma:
             self._lexer.get_next()
-            self._parse_label_range()
+            labels.append(self._parse_label_range())
+        return labels
     
-    def _parse_label_range(self):
-        self._parse_label()
+    def _parse_label_range(self) -> CaseLabel:
+        label = self._parse_label()
         if self._lexer.lex == Lex.double_dot:
             self._lexer.get_next()
-            self._parse_label()
+            label = IntRange(label, self._parse_label())
+        return CaseLabel(label)
     
-    def _parse_label(self):
+    def _parse_label(self) -> int | str | OberonType:
         if self._lexer.lex == Lex.number and type(self._lexer.value) is int:
-            self._lexer.get_next()
+            return self._parse_number()
         elif self._lexer.lex == Lex.string:
-            self._lexer.get_next()
+            return self._parse_sring()
         elif self._lexer.lex == Lex.ident:
-            self._parse_qualident()
+            # имя константы заменяется ее значением, имя типа - типом
+            # (CASE по типу записи)
+            name = self._parse_qualident()
+            entry = self._nametable.lookup(name)
+            if entry is not None and isinstance(entry.entity, Constant) and entry.entity.value is not None:
+                return entry.entity.value
+            if entry is not None and isinstance(entry.entity, OberonType):
+                return entry.entity
+            raise Exception(f"{self._lexer.get_context()}\nметка case {identifier_to_str(name)} не является константой или типом")
         else:
             self._raise_expected_exception("метка case")
 
-    def _parse_while_statement(self):
+    def _parse_while_statement(self) -> WHILE:
         self._check(Lex.WHILE)
-        self._parse_expression()
+        condition = self._parse_expression()
         self._check(Lex.DO)
-        self._parse_statement_sequence()
+        branches = [WhileBranch(condition, self._parse_statement_sequence())]
         while self._lexer.lex == Lex.ELSIF:
             self._lexer.get_next()
-            self._parse_expression()
+            condition = self._parse_expression()
             self._check(Lex.DO)
-            self._parse_statement_sequence()
+            branches.append(WhileBranch(condition, self._parse_statement_sequence()))
         self._check(Lex.END)
+        return WHILE(branches)
 
-    def _parse_repeat_statement(self):
+    def _parse_repeat_statement(self) -> REPEAT:
         self._check(Lex.REPEAT)
-        self._parse_statement_sequence()
+        code = self._parse_statement_sequence()
         self._check(Lex.UNTIL)
-        self._parse_expression()
+        return REPEAT(code, self._parse_expression())
 
-    def _parse_for_statement(self):
+    def _parse_for_statement(self) -> FOR:
         self._check(Lex.FOR)
-        self._parse_ident()
+        name = CompositeIdentifier(self._parse_ident(), None)
+        entry = self._nametable.lookup(name)
+        if entry is None:
+            raise Exception("неизвестный идентификатор " + identifier_to_str(name))
+        variable = Designator(name, entry.entity)
         self._check(Lex.assignment)
-        self._parse_expression()
+        start = self._parse_expression()
         self._check(Lex.TO)
-        self._parse_expression()
+        end = self._parse_expression()
+        step = None
         if self._lexer.lex == Lex.BY:
             self._lexer.get_next()
-            self._parse_const_expression()
-
+            step = self._parse_const_expression()
+            if type(step.literal) is not int or step.literal == 0:
+                self._raise_expected_exception("ненулевой целый шаг цикла")
+        self._check(Lex.DO)
+        code = self._parse_statement_sequence()
+        self._check(Lex.END)
+        return FOR(variable, start, end, step, code)
 
     ######################################################
     #                  STATEMENT RULES END               #
@@ -448,13 +930,30 @@ class Parser:
         procedure = Procedure()
         procedure.head = self._parse_procedure_heading()
         self._nametable.add_entry(NameTableEntry(procedure.head.name, procedure))
+        self._check(Lex.semicollon)
+        if self._interface_only and self._nametable.scope_level == 0:
+            procedure.body = None
+            self._skipped_procedures[procedure.head.name.name] = (procedure, self._skip_body(procedure.head.name.name))
+        else:
+            self._parse_procedure_rest(procedure)
+        return procedure
+
+    # тело процедуры после заголовка: от объявлений до "END имя"
+    def _parse_procedure_rest(self, procedure: Procedure):
         self._nametable.open_scope()
         self._add_proc_params_to_nametable(procedure.head.procedure_type.parameters)
-        self._check(Lex.semicollon)
         procedure.body = self._parse_procedure_body()
-        self._parse_ident()
+        if self._parse_ident() != procedure.head.name.name:
+            self._raise_expected_exception(f"имя процедуры {procedure.head.name.name}")
         self._nametable.close_scope()
-        return procedure
+
+    def _skip_body(self, name: str) -> SkippedBody:
+        mark = self._lexer.mark()
+        start = self._lexer.start
+        end = self._lexer.skip_block(name)
+        if end is None:
+            self._raise_expected_exception(f"END {name}")
+        return SkippedBody(name, mark, start, end)
 
     def _parse_procedure_heading(self) -> ProcedureHead:
         procedure_head = ProcedureHead(ProcedureType(self._module_name, None, NoReturnType, list()), None)
@@ -466,33 +965,63 @@ class Parser:
     
     def _parse_procedure_body(self) -> ProcedureBody:
         self._parse_declaration_sequence()
+        body = ProcedureBody()
+        for entry in self._nametable.get_local_scope_identifiers():
+            if isinstance(entry.entity, Variable):
+                body.variables.append(entry.entity)
+            elif isinstance(entry.entity, Constant):
+                body.constants.append(entry.entity)
+            elif isinstance(entry.entity, OberonType):
+                body.types.append(entry.entity)
         if self._lexer.lex == Lex.BEGIN:
             self._lexer.get_next()
-            self._parse_statement_sequence()
-            if self._lexer.lex == Lex.RETURN:
-                self._lexer.get_next()
-                self._parse_expression()
-            self._check(Lex.END)
+            body.code = self._parse_statement_sequence()
+        if self._lexer.lex == Lex.RETURN:
+            self._lexer.get_next()
+            body.return_expression = self._parse_expression()
+        self._check(Lex.END)
+        return body
 
     def _parse_declaration_sequence(self):
         if self._lexer.lex == Lex.CONST:
             self._lexer.get_next()
-            while self._lexer.lex == Lex.ident:
-                self._parse_const_declaration()
-                self._check(Lex.semicollon)
+            self._parse_declarations(self._parse_const_declaration)
         if self._lexer.lex == Lex.TYPE:
             self._lexer.get_next()
-            while self._lexer.lex == Lex.ident:
-                self._parse_type_declaration()
-                self._check(Lex.semicollon)
+            self._parse_declarations(self._parse_type_declaration)
+            self._resolve_forward_pointers()
         if self._lexer.lex == Lex.VAR:
             self._lexer.get_next()
-            while self._lexer.lex == Lex.ident:
-                self._parse_variable_declaration()
-                self._check(Lex.semicollon)
+            self._parse_declarations(self._parse_variable_declaration)
         while self._lexer.lex == Lex.PROCEDURE:
-            self._parse_procedure_declaration()
-            self._check(Lex.semicollon)
+            mark = self._lexer.mark()
+            scope_level = self._nametable.scope_level
+            try:
+                self._parse_procedure_declaration()
+                self._check(Lex.semicollon)
+            except Exception as e:
+                if self._diagnostics is None:
+                    raise
+                self._recover_procedure(e, mark, scope_level)
+
+    def _parse_declarations(self, parse_declaration):
+        while True:
+            mark = self._lexer.mark()
+            if self._diagnostics is not None and self._lexer.lex == Lex.unknown_lex:
+                # неизвестный символ между объявлениями
+                if not self._recover(self._unknown_symbol_error(), mark, _DECLARATION_SYNC):
+                    return
+                continue
+            if self._lexer.lex != Lex.ident:
+                return
+            try:
+                parse_declaration()
+                self._check(Lex.semicollon)
+            except Exception as e:
+                if self._diagnostics is None:
+                    raise
+                if not self._recover(e, mark, _DECLARATION_SYNC):
+                    return
 
     def _add_proc_params_to_nametable(self, procedure_parameters: list[ProcedureParameter]):
         for param in procedure_parameters:
@@ -532,20 +1061,32 @@ class Parser:
 
 
     def _parse_formal_type(self) -> OberonType:
-        formal_type: OberonType = None
-        if self._lexer.lex == Lex.ARRAY:
-            formal_type = self._parse_array_type()
-        name = self._parse_qualident()
-        if isinstance(formal_type, ArrayType):
-            formal_type.element_type = self.resolve_type(name)
-        else:
-            formal_type = self.resolve_type(name)
+        # FormalType = {ARRAY OF} qualident, открытый массив имеет размер None
+        open_array_dimensions = 0
+        while self._lexer.lex == Lex.ARRAY:
+            self._lexer.get_next()
+            self._check(Lex.OF)
+            open_array_dimensions += 1
+        formal_type = self.resolve_type(self._parse_qualident())
+        for _ in range(open_array_dimensions):
+            formal_type = TYPES.array(formal_type, None)
         return formal_type
 
     ######################################################
     #              OTHER DECLARATIONS RULES END          #
     ######################################################
 
+    def _parse_compilation_unit(self):
+        if self._diagnostics is None:
+            self._parse_module()
+            return
+        try:
+            self._parse_module()
+        except _ParsingAborted:
+            pass
+        except Exception as e:
+            self._add_diagnostic(e)
+
     def _parse_module(self):
         self._check(Lex.MODULE)
         self._module_name = self._parse_ident()
@@ -553,13 +1094,19 @@ class Parser:
         if self._lexer.lex == Lex.IMPORT:
             self._parse_import_list()
         self._parse_declaration_sequence()
+        if self._interface_only:
+            self._skipped_module_body = self._skip_body(self._module_name)
+        else:
+            self._parse_module_rest()
+        self._check(Lex.dot)
+
+    def _parse_module_rest(self):
         if self._lexer.lex == Lex.BEGIN:
             self._lexer.get_next()
-            self._parse_statement_sequence()
+            self._module_body = self._parse_statement_sequence()
         self._check(Lex.END)
         if self._parse_ident() != self._module_name:
             self._raise_expected_exception(f"имя модуля {self._module_name}")
-        self._check(Lex.dot)
 
     def _parse_import_list(self):
         self._check(Lex.IMPORT)
@@ -581,3 +1128,13 @@ class Parser:
             alias = imported_module_name
             imported_module_name = self._lexer.value
             self._lexer.get_next()
+        else:
+            alias = imported_module_name
+        if alias in self._imported_modules:
+            self._raise_expected_exception(f"однократный импорт модуля {alias}")
+        self._imported_modules[alias] = imported_module_name
+        entries = self._interfaces.get(imported_module_name)
+        if entries is None:
+            entries = load_module_interface(imported_module_name, self._symbol_paths)
+        for entry in entries:
+            self._nametable.add_entry(NameTableEntry(CompositeIdentifier(alias, entry.name.name), entry.entity))
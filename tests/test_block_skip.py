@@ -0,0 +1,44 @@
+import pytest
+
+from lexer import find_block_end
+from source_input import StreamingLexer
+from syntax_analyzer import Parser
+from token_stream import TokenStream
+
+
+# поле процедурного типа в конце записи: за PROCEDURE идет END записи
+PROGRAM = """MODULE M;
+PROCEDURE P*(): INTEGER;
+TYPE R = RECORD g: INTEGER; f: PROCEDURE END;
+VAR r: R;
+  PROCEDURE Inner(VAR x: R);
+  BEGIN x.g := 1
+  END Inner;
+BEGIN Inner(r)
+  RETURN r.g
+END P;
+PROCEDURE Q*;
+END Q;
+END M."""
+
+
+def test_find_block_end_ignores_keyword_after_procedure():
+    start = PROGRAM.index("TYPE")
+    end = find_block_end(PROGRAM, start, "P")
+    assert PROGRAM[:end].endswith("END P")
+
+
+@pytest.mark.parametrize("make_source", [
+    lambda program: program,
+    TokenStream,
+    lambda program: StreamingLexer(iter([program])),
+])
+def test_interface_only_parse_skips_procedure_type_fields(make_source):
+    parser = Parser(make_source(PROGRAM), interface_only=True)
+    assert [entry.name.name for entry in parser.exported_entries()] == ["P", "Q"]
+
+
+def test_skipped_body_parses_on_demand():
+    parser = Parser(PROGRAM, interface_only=True)
+    body = parser.parse_procedure_body("P")
+    assert body.return_expression is not None
@@ -0,0 +1,30 @@
+from build import build
+from compile_cache import CompilationCache
+
+
+def _write_long_sum_module(directory, name: str, terms: int = 600) -> str:
+    path = directory / f"{name}.oberon07"
+    path.write_text(f"MODULE {name};\n"
+                    f"PROCEDURE P*(a: INTEGER): INTEGER;\n"
+                    f"  VAR b: INTEGER;\n"
+                    f"BEGIN\n"
+                    f"  b := {' + '.join(['a'] * terms)}\n"
+                    f"  RETURN b\n"
+                    f"END P;\n"
+                    f"END {name}.\n")
+    return str(path)
+
+
+# результат компиляции (он кешируется и передается между процессами)
+# не содержит деревьев процедур, поэтому длинные выражения не мешают pickle
+def test_long_expression_is_cached(tmp_path):
+    path = _write_long_sum_module(tmp_path, "Long")
+    cache = CompilationCache(str(tmp_path / "cache"))
+    for _ in range(2):
+        assert build([path], symbol_dir=str(tmp_path / "sym"), cache=cache) == {path: None}
+    assert cache.hits == 1
+
+
+def test_long_expression_in_parallel_build(tmp_path):
+    paths = [_write_long_sum_module(tmp_path, name) for name in ("First", "Second")]
+    assert build(paths, jobs=2, symbol_dir=str(tmp_path / "sym")) == {path: None for path in paths}
@@ -0,0 +1,136 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+from compile_server import INVALID_PARAMS, INVALID_REQUEST, METHOD_NOT_FOUND, PARSE_ERROR, SERVER_ERROR, CompileServer
+
+SHAPES = """MODULE Shapes;
+TYPE Point* = RECORD x*, y*: INTEGER END;
+PROCEDURE Move*(VAR p: Point; dx: INTEGER);
+BEGIN p.x := p.x + dx
+END Move;
+END Shapes."""
+
+USER = """MODULE User;
+IMPORT Shapes;
+VAR p: Shapes.Point;
+BEGIN Shapes.Move(p, 1)
+END User."""
+
+
+def _write(directory, name: str, text: str) -> str:
+    path = directory / f"{name}.oberon07"
+    path.write_text(text)
+    return str(path)
+
+
+# сообщения обрабатываются по порядку одним сервером
+def _exchange(tmp_path, messages: list) -> list:
+    async def run():
+        server = CompileServer(str(tmp_path / "sym"))
+        try:
+            responses = []
+            for message in messages:
+                if callable(message):
+                    message = message()
+                line = message if isinstance(message, str) else json.dumps(message)
+                responses.append(await server.handle_message(line))
+            return responses
+        finally:
+            server.close()
+    return asyncio.run(run())
+
+
+def _request(method: str, params=None, request_id: int = 1) -> dict:
+    request = {"jsonrpc": "2.0", "id": request_id, "method": method}
+    if params is not None:
+        request["params"] = params
+    return request
+
+
+def test_compile_reuses_unchanged_modules(tmp_path):
+    paths = [_write(tmp_path, "Shapes", SHAPES), _write(tmp_path, "User", USER)]
+    first, second = _exchange(tmp_path, [_request("compile", {"paths": paths})] * 2)
+    assert first["result"]["results"] == {path: None for path in paths}
+    assert first["result"]["compiled"] == 2
+    assert second["result"]["compiled"] == 0
+    assert os.path.isfile(tmp_path / "sym" / "Shapes.sym")
+
+
+def test_check_uses_interfaces_in_memory(tmp_path):
+    path = _write(tmp_path, "Shapes", SHAPES)
+
+    def remove_symbol_file():
+        os.remove(tmp_path / "sym" / "Shapes.sym")
+        return _request("check", {"source": USER})
+    responses = _exchange(tmp_path, [
+        _request("compile", {"paths": [path]}),
+        remove_symbol_file,
+        _request("check", {"source": USER.replace("Move", "Turn")}),
+    ])
+    assert responses[1]["result"] == {"module": "User", "error": None}
+    assert responses[2]["result"]["module"] is None
+    assert responses[2]["result"]["error"]
+
+
+def test_check_reads_file(tmp_path):
+    path = _write(tmp_path, "User", USER)
+    response, = _exchange(tmp_path, [_request("check", {"path": path, "source": None})])
+    assert response["result"]["error"] and "Shapes" in response["result"]["error"]
+
+
+def test_interface(tmp_path):
+    path = _write(tmp_path, "Shapes", SHAPES)
+    _, response = _exchange(tmp_path, [_request("compile", {"paths": [path]}), _request("interface", {"module": "Shapes"})])
+    assert response["result"] == {"module": "Shapes", "entries": [
+        {"name": "Point", "kind": "RecordType"}, {"name": "Move", "kind": "Procedure"}]}
+
+
+def test_deleted_module_is_forgotten(tmp_path):
+    shapes = _write(tmp_path, "Shapes", SHAPES)
+    user = _write(tmp_path, "User", USER)
+
+    def delete_shapes():
+        os.remove(shapes)
+        return _request("interface", {"module": "Shapes"})
+    responses = _exchange(tmp_path, [
+        _request("compile", {"paths": [str(tmp_path)]}),
+        delete_shapes,
+        _request("compile", {"paths": [str(tmp_path)]}),
+        _request("check", {"path": user}),
+        _request("status"),
+    ])
+    assert responses[1]["error"]["code"] == SERVER_ERROR
+    assert "не найден файл символов модуля Shapes" in responses[2]["result"]["results"][user]
+    assert not os.path.exists(tmp_path / "sym" / "Shapes.sym")
+    assert "Shapes" in responses[3]["result"]["error"]
+    assert responses[4]["result"]["modules_cached"] == 1
+
+
+@pytest.mark.parametrize("message, code", [
+    ("{", PARSE_ERROR),
+    ([1], INVALID_REQUEST),
+    (_request("build"), METHOD_NOT_FOUND),
+    (_request("compile", [["a"]]), INVALID_PARAMS),
+    (_request("compile"), INVALID_PARAMS),
+    (_request("compile", {"paths": "a.oberon07"}), INVALID_PARAMS),
+    (_request("compile", {"paths": [1]}), INVALID_PARAMS),
+    (_request("compile", {"paths": [], "jobs": 2}), INVALID_PARAMS),
+    (_request("check", {"source": 1}), INVALID_PARAMS),
+    (_request("check", {}), INVALID_PARAMS),
+    (_request("interface", {"module": ["Shapes"]}), INVALID_PARAMS),
+    (_request("interface", {"module": "Shapes"}), SERVER_ERROR),
+    (_request("compile", {"paths": ["missing.oberon07"]}), SERVER_ERROR),
+])
+def test_errors(tmp_path, message, code):
+    response, = _exchange(tmp_path, [message])
+    assert response["error"]["code"] == code
+    assert response["id"] == (message.get("id") if isinstance(message, dict) else None)
+
+
+def test_notification_has_no_response(tmp_path):
+    request = _request("status")
+    del request["id"]
+    assert _exchange(tmp_path, [request]) == [None]
@@ -0,0 +1,27 @@
+import pytest
+
+from syntax_analyzer import Parser
+
+
+def _constant(expression: str):
+    parser = Parser(f"MODULE M; CONST c = {expression}; END M.")
+    (entry,) = [entry for entry in parser.nametable.get_global_scope_identifiers() if entry.name.name == "c"]
+    return entry.entity.value
+
+
+@pytest.mark.parametrize("expression, value", [
+    ("LSL(1, 30)", 1 << 30),
+    ("LSL(3, 0)", 3),
+    ("ASR(-8, 1)", -4),
+    ("ASR(-1, 31)", -1),
+])
+def test_shifts(expression, value):
+    assert _constant(expression) == value
+
+
+# величина сдвига проверяется до сдвига: огромное n не должно строить огромное число
+@pytest.mark.parametrize("expression", ["LSL(1, 1000000000)", "ASR(1, 1000000000)", "LSL(1, 32)", "LSL(1, -1)",
+                                        "ASR(8, -1)"])
+def test_shift_out_of_range(expression):
+    with pytest.raises(Exception, match="вне диапазона 0..31"):
+        _constant(expression)
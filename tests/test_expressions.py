@@ -0,0 +1,85 @@
+import pytest
+
+from ast_node import BinaryOperation, Designator, Operation, UnaryOperation
+from syntax_analyzer import Parser
+
+
+DEPTH = 20000
+
+
+def _parse_expression(expression: str, variable: str = "a"):
+    parser = Parser("MODULE M; VAR a, b, c: INTEGER; x, y, z: BOOLEAN;\n"
+                    f"BEGIN {variable} := {expression} END M.")
+    return parser.module_body[0].expression
+
+
+def _show(node) -> str:
+    if isinstance(node, BinaryOperation):
+        return f"({_show(node.left)} {node.value.name} {_show(node.right)})"
+    if isinstance(node, UnaryOperation):
+        return f"({node.value.name} {_show(node.operand)})"
+    assert isinstance(node, Designator)
+    return node.name.parent_name
+
+
+@pytest.mark.parametrize("expression, variable, shape", [
+    ("a + b * c", "a", "(a plus (b multiple c))"),
+    ("a * b + c", "a", "((a multiple b) plus c)"),
+    ("a - b - c", "a", "((a minus b) minus c)"),
+    ("a DIV b MOD c", "a", "((a DIV b) MOD c)"),
+    ("-a * b", "a", "(minus (a multiple b))"),
+    ("-a + b", "a", "((minus a) plus b)"),
+    ("(a + b) * c", "a", "((a plus b) multiple c)"),
+    ("a + b = c", "x", "((a plus b) equal c)"),
+    ("~x OR y & z", "x", "((LOGICAL_NOT x) LOGICAL_OR (y LOGICAL_AND z))"),
+    ("~(x OR y)", "x", "(LOGICAL_NOT (x LOGICAL_OR y))"),
+])
+def test_precedence_and_associativity(expression, variable, shape):
+    assert _show(_parse_expression(expression, variable)) == shape
+
+
+# отношение в выражении только одно: expression = SimpleExpression [relation SimpleExpression]
+def test_relations_do_not_chain():
+    with pytest.raises(Exception):
+        _parse_expression("a < b # x", "x")
+
+
+def test_deep_parentheses():
+    node = _parse_expression("(" * DEPTH + "a" + ")" * DEPTH)
+    assert isinstance(node, Designator) and node.name.parent_name == "a"
+
+
+def test_deep_right_nesting():
+    node = _parse_expression("(b + " * DEPTH + "a" + ")" * DEPTH)
+    for _ in range(DEPTH):
+        assert isinstance(node, BinaryOperation) and node.value == Operation.plus
+        assert node.left.name.parent_name == "b"
+        node = node.right
+    assert node.name.parent_name == "a"
+
+
+def test_long_left_associative_chain():
+    node = _parse_expression(" - ".join(["a"] * DEPTH + ["b"]))
+    assert node.right.name.parent_name == "b"
+    for _ in range(DEPTH):
+        assert isinstance(node, BinaryOperation) and node.value == Operation.minus
+        node = node.left
+    assert node.name.parent_name == "a"
+
+
+def test_mixed_precedence_chain():
+    # a + b * a + b * ... : умножения - правые операнды сложений
+    node = _parse_expression(" + ".join(["b * a"] * DEPTH))
+    for _ in range(DEPTH - 1):
+        assert node.value == Operation.plus
+        assert _show(node.right) == "(b multiple a)"
+        node = node.left
+    assert _show(node) == "(b multiple a)"
+
+
+def test_deep_unary_operators():
+    node = _parse_expression("~" * DEPTH + "x", "x")
+    for _ in range(DEPTH):
+        assert isinstance(node, UnaryOperation) and node.value == Operation.LOGICAL_NOT
+        node = node.operand
+    assert node.name.parent_name == "x"
@@ -0,0 +1,37 @@
+import pytest
+
+import syntax_analyzer as sa
+from grammar import FIRST, FOLLOW, lex_set
+from lexer import Lex
+
+
+def test_binary_operators_match_grammar():
+    assert lex_set(*sa._BINARY_OPERATORS) == sa._BINARY_OPERATOR_START
+
+
+@pytest.mark.parametrize("rule, precedence", [
+    ("relation", sa._RELATION_PRECEDENCE),
+    ("AddOperator", sa._ADDITION_PRECEDENCE),
+    ("MulOperator", sa._MULTIPLICATION_PRECEDENCE),
+])
+def test_operator_precedence_follows_grammar_rule(rule, precedence):
+    operators = [lex for lex, (p, _) in sa._BINARY_OPERATORS.items() if p == precedence]
+    assert lex_set(*operators) == FIRST[rule]
+
+
+def test_operand_start_matches_grammar():
+    # начало простого выражения: операнд, префикс или знак
+    assert sa._OPERAND_PREFIXES & ~FIRST["SimpleExpression"] == 0
+    assert FIRST["SimpleExpression"] & ~FIRST["factor"] == sa._SIGNS
+
+
+def test_parser_sets_are_grammar_sets():
+    assert sa._SELECTOR_START == FIRST["selector"]
+    assert sa._LABEL_START == FIRST["label"]
+    assert sa._STATEMENT_START == FIRST["statement"]
+
+
+def test_statement_sync_ends_statement_sequences():
+    assert FOLLOW["StatementSequence"] & ~sa._STATEMENT_SYNC == 0
+    assert Lex.semicollon.bit & sa._STATEMENT_SYNC
+    assert FOLLOW["DeclarationSequence"] & ~sa._DECLARATION_SYNC == 0
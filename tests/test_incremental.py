@@ -0,0 +1,78 @@
+from incremental import EditableModule
+from syntax_analyzer import Parser
+
+PROGRAM = """MODULE M;
+VAR g: INTEGER;
+PROCEDURE P(x: INTEGER): INTEGER;
+VAR y: INTEGER;
+BEGIN y := x + 1
+  RETURN y
+END P;
+PROCEDURE Q;
+BEGIN g := P(g)
+END Q;
+BEGIN Q
+END M."""
+
+
+# ошибка полного разбора того же текста
+def _full_error(program: str) -> str | None:
+    try:
+        Parser(program)
+    except Exception as e:
+        return str(e)
+    return None
+
+
+def _edit(module: EditableModule, old: str, new: str) -> str | None:
+    offset = module.text.index(old)
+    error = module.apply_edit(offset, len(old), new)
+    assert error == _full_error(module.text)
+    return error
+
+
+def test_body_edit_reparses_procedure():
+    module = EditableModule(PROGRAM)
+    assert _edit(module, "y := x + 1", "y := x * 2;\n  y := y - 1") is None
+    assert module.last_reparse == "procedure"
+    assert _edit(module, "BEGIN Q", "BEGIN Q; g := 0") is None
+    assert module.last_reparse == "module body"
+    assert module.text == PROGRAM.replace("y := x + 1", "y := x * 2;\n  y := y - 1").replace("BEGIN Q", "BEGIN Q; g := 0")
+
+
+def test_declaration_edit_parses_module():
+    module = EditableModule(PROGRAM)
+    assert _edit(module, "VAR g: INTEGER;", "VAR g, h: INTEGER;") is None
+    assert module.last_reparse == "module"
+    assert _edit(module, "g := P(g)", "h := P(g)") is None
+    assert module.last_reparse == "procedure"
+
+
+def test_forward_reference_is_rejected():
+    # Q объявлена после P и не видна в ее теле
+    module = EditableModule(PROGRAM)
+    error = _edit(module, "y := x + 1", "Q; y := x + 1")
+    assert module.last_reparse == "procedure"
+    assert error is not None and "Q" in error
+
+
+def test_broken_then_fixed():
+    module = EditableModule(PROGRAM)
+    error = _edit(module, "y := x + 1", "y := x +")
+    assert error is not None and module.error == error
+    assert _edit(module, "y := x +", "y := x + 2") is None
+    assert module.last_reparse == "procedure"
+    assert module.error is None
+
+
+def test_unbalanced_edit_parses_module():
+    module = EditableModule(PROGRAM)
+    # END закрывает процедуру раньше: блок кончается не там, где раньше,
+    # и остаток P становится телом R
+    error = _edit(module, "y := x + 1", "y := x + 1\n  RETURN y\nEND P;\nPROCEDURE R;\nBEGIN g := 1")
+    assert module.last_reparse == "module"
+    assert error == "неизвестный идентификатор y"
+    module = EditableModule(PROGRAM)
+    # незакрытый комментарий доходит до конца текста
+    assert _edit(module, "g := P(g)", "(* g := P(g)") is not None
+    assert module.last_reparse == "module"
@@ -0,0 +1,254 @@
+import io
+
+import pytest
+
+from bytecode_compiler import compile_module
+from ir import IRFunction, Instruction
+from ir_builder import build_ir
+from ir_interpreter import IRInterpreter
+from ir_passes import DEFAULT_PIPELINE, PassManager, natural_loops
+from syntax_analyzer import Parser
+from vm import VM, OberonTrap
+
+
+# вывод программы и признак аварийной остановки
+def _run_vm(program: str) -> tuple[str, bool]:
+    output = io.StringIO()
+    try:
+        VM(compile_module(Parser(program)), output).run()
+    except OberonTrap:
+        return output.getvalue(), True
+    return output.getvalue(), False
+
+
+def _run_ir(program: str, passes: list[str]) -> tuple[str, bool]:
+    module = build_ir(Parser(program))
+    PassManager.from_names(passes).run(module)
+    output = io.StringIO()
+    try:
+        IRInterpreter(module, output).run()
+    except OberonTrap:
+        return output.getvalue(), True
+    return output.getvalue(), False
+
+
+STRUCTURES = """MODULE M;
+IMPORT Log;
+TYPE
+  Shape = POINTER TO ShapeDesc;
+  ShapeDesc = RECORD x, y: INTEGER; next: Shape END;
+  Circle = POINTER TO CircleDesc;
+  CircleDesc = RECORD (ShapeDesc) r: INTEGER END;
+  Action = PROCEDURE (VAR s: ShapeDesc; d: INTEGER);
+VAR first, s: Shape; c: Circle; copy: ShapeDesc; all: ARRAY 3 OF ShapeDesc;
+  name: ARRAY 8 OF CHAR; act: Action; i, n: INTEGER;
+PROCEDURE Move(VAR s: ShapeDesc; d: INTEGER);
+BEGIN s.x := s.x + d; s.y := s.y - d
+END Move;
+BEGIN
+  FOR i := 1 TO 4 DO
+    IF ODD(i) THEN NEW(c); c.r := i * 10; s := c ELSE NEW(s) END;
+    s.x := i; s.next := first; first := s
+  END;
+  act := Move; s := first; n := 0;
+  WHILE s # NIL DO
+    act(s^, 2);
+    IF s IS Circle THEN Log.Int(s(Circle).r); INC(n) ELSE Log.Char("-") END;
+    Log.Int(s.x); Log.Char(" ");
+    s := s.next
+  END;
+  copy := first^; Move(copy, 100); Log.Int(copy.x); Log.Int(first.x);
+  all[1] := copy; all[1].y := 7; all[0] := all[1]; Log.Int(all[0].y); Log.Int(copy.y);
+  name := "abc"; IF name = "abc" THEN Log.String(name) END; name[1] := "x"; Log.String(name);
+  Log.Int(n)
+END M."""
+
+LOOP_INVALIDATION = """MODULE M;
+IMPORT Log;
+VAR a: ARRAY 4 OF INTEGER; g, i: INTEGER;
+PROCEDURE Bump(VAR x: INTEGER);
+BEGIN INC(x, 3)
+END Bump;
+PROCEDURE SetG(v: INTEGER);
+BEGIN g := v
+END SetG;
+(* x и v[0] могут быть одной переменной *)
+PROCEDURE Aliased(VAR x: INTEGER; VAR v: ARRAY OF INTEGER): INTEGER;
+VAR i, s: INTEGER;
+BEGIN s := 0;
+  FOR i := 0 TO 3 DO
+    IF x > 2 THEN INC(s) END; v[0] := i; s := s + x * 10
+  END
+  RETURN s
+END Aliased;
+PROCEDURE Local(): INTEGER;
+VAR k, i, s: INTEGER; b: BOOLEAN;
+BEGIN k := 0; s := 0;
+  FOR i := 1 TO 5 DO
+    b := k > 4; IF b THEN INC(s, 100) END;
+    s := s + k + 1; Bump(k); s := s + k + 1
+  END
+  RETURN s
+END Local;
+BEGIN
+  i := 0; g := 1;
+  WHILE i < 4 DO a[i] := a[0] + g + i; SetG(g * 2); INC(i) END;
+  FOR i := 0 TO 3 DO Log.Int(a[i]); Log.Char(" ") END;
+  Log.Int(Aliased(a[0], a)); Log.Char(" "); Log.Int(Local())
+END M."""
+
+# операция, которая переполнилась бы, если бы ее вынесли из цикла,
+# не исполняемого ни разу
+GUARDED_OVERFLOW = """MODULE M;
+IMPORT Log;
+PROCEDURE P(n: INTEGER): INTEGER;
+VAR k, i, s: INTEGER;
+BEGIN k := 2147483647; s := 0;
+  WHILE n > 0 DO s := s + k * 2 + (-k - 2) + ABS(k + 1); DEC(n) END;
+  FOR i := 1 TO n DO s := LSL(k, 1) END
+  RETURN s
+END P;
+BEGIN Log.Int(P(0))
+END M."""
+
+# результат не нужен, но индекс вне границ - это аварийная остановка
+DEAD_TRAP = """MODULE M;
+PROCEDURE P(i: INTEGER);
+VAR a: ARRAY 4 OF INTEGER; x: INTEGER;
+BEGIN x := a[i]
+END P;
+BEGIN P(10)
+END M."""
+
+DEAD_DIVISION = """MODULE M;
+PROCEDURE P(d: INTEGER);
+VAR x: INTEGER;
+BEGIN x := 7 DIV d
+END P;
+BEGIN P(0)
+END M."""
+
+PASS_SETS = [[], ["constprop"], ["cse"], ["licm"], ["dce"], list(DEFAULT_PIPELINE)]
+
+
+@pytest.mark.parametrize("passes", PASS_SETS, ids=lambda passes: ",".join(passes) or "none")
+@pytest.mark.parametrize("program", [STRUCTURES, LOOP_INVALIDATION, GUARDED_OVERFLOW, DEAD_TRAP, DEAD_DIVISION],
+                         ids=["structures", "loop_invalidation", "guarded_overflow", "dead_trap", "dead_division"])
+def test_passes_preserve_behaviour(program, passes):
+    assert _run_ir(program, passes) == _run_vm(program)
+
+
+def test_expected_results():
+    assert _run_vm(STRUCTURES) == ("-6 305 -4 103 10667-102abcaxc2", False)
+    assert _run_vm(GUARDED_OVERFLOW) == ("0", False)
+    assert _run_vm(DEAD_TRAP)[1] and _run_vm(DEAD_DIVISION)[1]
+
+
+def _optimized(program: str, passes: list[str], name: str = "P") -> IRFunction:
+    module = build_ir(Parser(program))
+    PassManager.from_names(passes).run(module)
+    return next(function for function in module.functions if function.name == name)
+
+
+def _instructions(function: IRFunction, opcode: str, operator: str | None = None) -> list[Instruction]:
+    return [instruction for block in function.blocks.values() for instruction in block.instructions
+            if instruction.opcode == opcode and (operator is None or instruction.extra.value == operator)]
+
+
+# для каждой подходящей команды: находится ли она в цикле
+def _inside_loop(function: IRFunction, opcode: str, operator: str | None = None) -> list[bool]:
+    loop_blocks = set().union(*natural_loops(function).values())
+    return [label in loop_blocks for label, block in function.blocks.items() for instruction in block.instructions
+            if instruction.opcode == opcode and (operator is None or instruction.extra.value == operator)]
+
+
+def _procedure(declarations: str, body: str) -> str:
+    return f"""MODULE M;
+PROCEDURE Bump(VAR x: INTEGER);
+BEGIN INC(x)
+END Bump;
+PROCEDURE P(VAR v: ARRAY OF INTEGER; VAR r: INTEGER);
+VAR {declarations};
+BEGIN {body}
+END P;
+END M."""
+
+
+@pytest.mark.parametrize("between, loads", [
+    ("x := 0", 1),
+    ("v[j] := 0", 2),
+    ("a[j] := 0", 2),
+    ("Bump(j)", 2),
+    ("Bump(v[j])", 2),
+])
+def test_cse_load_is_invalidated_by_stores_and_calls(between, loads):
+    program = _procedure("a: ARRAY 4 OF INTEGER; i, j, x, y: INTEGER",
+                         f"x := v[i] + a[i]; {between}; y := v[i] + a[i]; r := x + y")
+    function = _optimized(program, ["cse"])
+    assert len(_instructions(function, "load")) == 2 * loads
+
+
+@pytest.mark.parametrize("between, additions", [
+    ("i := 0", 1),
+    ("Bump(k)", 2),
+    ("Bump(r)", 1),
+    ("k := k + 0", 2),
+])
+def test_cse_expression_is_invalidated_by_var_parameter(between, additions):
+    program = _procedure("i, k, x, y: INTEGER", f"x := k * 3; {between}; y := k * 3; r := x + y")
+    function = _optimized(program, ["cse"])
+    assert len(_instructions(function, "binary", "*")) == additions
+
+
+@pytest.mark.parametrize("statement, hoisted", [
+    ("x := 0", True),
+    ("Bump(k)", False),
+    ("v[i] := 0", True),
+    ("r := i", True),
+])
+def test_licm_keeps_comparison_of_changed_local(statement, hoisted):
+    program = _procedure("i, k, x: INTEGER",
+                         f"k := r; FOR i := 0 TO 3 DO IF k > 2 THEN INC(x) END; {statement} END; r := x")
+    function = _optimized(program, ["licm"])
+    assert _inside_loop(function, "binary", ">") == [not hoisted]
+
+
+@pytest.mark.parametrize("statement, hoisted", [
+    ("x := x + 2", True),
+    ("v[i] := 0", False),
+    ("Bump(v[0])", False),
+    ("Bump(i)", False),
+])
+def test_licm_keeps_reads_of_memory_changed_in_loop(statement, hoisted):
+    # r - параметр VAR и может быть элементом v
+    program = _procedure("i, x: INTEGER",
+                         f"i := 0; WHILE i < 4 DO IF r > 2 THEN INC(x) END; {statement}; INC(i) END")
+    function = _optimized(program, ["licm"])
+    assert _inside_loop(function, "binary", ">") == [not hoisted]
+
+
+def test_licm_does_not_hoist_operations_that_can_trap():
+    program = _procedure("i, k, x: INTEGER",
+                         "k := r; FOR i := 0 TO 3 DO x := x + k * 2 + k DIV r + ABS(k) END; r := x")
+    function = _optimized(program, ["licm"])
+    assert _inside_loop(function, "binary", "*") == [True]
+    assert _inside_loop(function, "binary", "DIV") == [True]
+    assert _inside_loop(function, "builtin") == [True]
+
+
+def test_indirect_call_keeps_procedure_value():
+    program = """MODULE M;
+IMPORT Log;
+TYPE Action = PROCEDURE (x: INTEGER);
+PROCEDURE Show(x: INTEGER);
+BEGIN Log.Int(x)
+END Show;
+PROCEDURE P;
+VAR act: Action;
+BEGIN act := Show; act(5)
+END P;
+BEGIN P
+END M."""
+    function = _optimized(program, list(DEFAULT_PIPELINE))
+    assert [str(instruction) for instruction in _instructions(function, "call")] == ["call act(5)"]
+    assert _run_ir(program, list(DEFAULT_PIPELINE)) == _run_vm(program) == ("5", False)
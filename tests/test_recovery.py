@@ -0,0 +1,31 @@
+import pytest
+
+from syntax_analyzer import Parser
+from token_stream import TokenStream
+
+
+PROGRAM = """MODULE M;
+VAR x, y: INTEGER;
+BEGIN
+  x := 1 @ 2;
+  y := ;
+  x := 3 $ $;
+  y := 4
+END M."""
+
+
+@pytest.mark.parametrize("pretokenize", [False, True])
+def test_stray_char_does_not_stop_recovery(pretokenize):
+    program = TokenStream(PROGRAM) if pretokenize else PROGRAM
+    diagnostics = Parser(program, recover=True).diagnostics
+    positions = [(d.line, d.column) for d in diagnostics]
+    assert positions == [(4, 10), (5, 8), (6, 10), (6, 12)]
+    assert "Неизвестный символ $" in diagnostics[-1].message
+
+
+def test_stray_char_in_declarations():
+    diagnostics = Parser("""MODULE M;
+VAR x: INTEGER; ? y: INTEGER;
+  z: ;
+END M.""", recover=True).diagnostics
+    assert len(diagnostics) == 2
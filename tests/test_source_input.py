@@ -0,0 +1,57 @@
+import source_input
+from lexer import Lex, Lexer
+from source_input import LINE_CONTEXT_LIMIT, StreamingLexer
+from syntax_analyzer import Parser
+
+CHUNK = 1000
+
+
+def _chunks(program: str):
+    return (program[i:i + CHUNK] for i in range(0, len(program), CHUNK))
+
+
+# модуль в одну строку, как после минификации
+def _one_line_module(statements: int, tail: str = "") -> str:
+    body = "; ".join(f"x := x + {i}" for i in range(statements))
+    return f"MODULE M; VAR x: INTEGER; BEGIN {body}{tail} END M."
+
+
+def _tokens(lexer) -> list:
+    tokens = []
+    while True:
+        tokens.append((lexer.lex, lexer.value, lexer.start))
+        if lexer.lex == Lex.end_of_text:
+            return tokens
+        lexer.get_next()
+
+
+def test_long_line_window_is_bounded(monkeypatch):
+    program = _one_line_module(50000)
+    sizes = []
+    refill = source_input.ChunkedCharacters.refill
+
+    def recording_refill(wrap):
+        refill(wrap)
+        sizes.append(len(wrap._data))
+    monkeypatch.setattr(source_input.ChunkedCharacters, "refill", recording_refill)
+    assert _tokens(StreamingLexer(_chunks(program))) == _tokens(Lexer(program))
+    assert len(program) > 100 * (LINE_CONTEXT_LIMIT + 2 * CHUNK)
+    assert max(sizes) <= LINE_CONTEXT_LIMIT + 2 * CHUNK
+
+
+def test_error_position_on_long_line():
+    program = _one_line_module(20000, "; x := ")
+    expected = Parser(program, recover=True).diagnostics[0]
+    diagnostic = Parser(StreamingLexer(_chunks(program)), recover=True).diagnostics[0]
+    assert (diagnostic.line, diagnostic.column) == (expected.line, expected.column) == (1, len(program) - 5)
+    # контекст ошибки - конец строки, а не вся строка
+    context, expected_context = diagnostic.message.split("\n")[0], expected.message.split("\n")[0]
+    assert len(context) < LINE_CONTEXT_LIMIT + 2 * CHUNK < len(expected_context)
+    assert expected_context.endswith(context[-LINE_CONTEXT_LIMIT:])
+
+
+def test_positions_after_long_line():
+    program = _one_line_module(20000).replace(" END M.", ";\n  x := \nEND M.")
+    expected = Parser(program, recover=True).diagnostics[0]
+    diagnostic = Parser(StreamingLexer(_chunks(program)), recover=True).diagnostics[0]
+    assert (diagnostic.line, diagnostic.column) == (expected.line, expected.column) == (3, 1)
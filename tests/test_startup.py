@@ -0,0 +1,20 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# модули, которые не нужны команде check (см. oberon.py)
+NOT_FOR_CHECK = {"vm", "transpiler", "ir_passes", "build"}
+
+
+def test_check_does_not_import_backends(tmp_path):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", os.path.join(ROOT, "oberon.py"), "check",
+         "--sym-dir", str(tmp_path), os.path.join(ROOT, "code_samples", "1.oberon07")],
+        capture_output=True, text=True, cwd=ROOT)
+    assert result.returncode == 0, result.stdout + result.stderr
+    imported = {line.split("|")[-1].strip() for line in result.stderr.splitlines()
+                if line.startswith("import time:")}
+    assert "syntax_analyzer" in imported
+    assert imported & NOT_FOR_CHECK == set()
@@ -0,0 +1,49 @@
+import pytest
+
+from symbol_file import SYMBOL_FILE_EXTENSION, SYMBOL_FILE_MAGIC, SYMBOL_FILE_VERSION, decode_interface, encode_interface
+from syntax_analyzer import Parser
+
+
+LIST_MODULE = """
+MODULE A;
+TYPE
+  Node* = POINTER TO NodeDesc;
+  NodeDesc* = RECORD value*: INTEGER; next*: Node END;
+  Hidden = RECORD x*: INTEGER END;
+VAR hidden*: Hidden;
+END A.
+"""
+
+
+def _interface(program: str) -> dict:
+    parser = Parser(program)
+    module_name, entries = decode_interface(encode_interface(parser.module_name, parser.exported_entries()))
+    assert module_name == parser.module_name
+    return {entry.name.name: entry.entity for entry in entries}
+
+
+def test_forward_reference_to_exported_type():
+    interface = _interface(LIST_MODULE)
+    assert interface["Node"].type_of_pointer is interface["NodeDesc"]
+    assert interface["NodeDesc"].fields[1].field_type is interface["Node"]
+
+
+def test_hidden_type_of_exported_variable():
+    interface = _interface(LIST_MODULE)
+    assert "Hidden" not in interface
+    hidden = interface["hidden"].variable_type
+    assert hidden.type_name.name == "Hidden"
+    assert not hidden.type_name.is_exported
+    assert [field.identifier.name for field in hidden.fields] == ["x"]
+
+
+# файл символов прежней версии: интерфейс библиотечного модуля
+# собирается из исходного текста, для остальных - совет перекомпилировать
+@pytest.mark.parametrize("data", [SYMBOL_FILE_MAGIC + bytes([1]), b"", SYMBOL_FILE_MAGIC + bytes([SYMBOL_FILE_VERSION])])
+def test_unreadable_symbol_file(tmp_path, data):
+    for name in ("Log", "A"):
+        (tmp_path / (name + SYMBOL_FILE_EXTENSION)).write_bytes(data)
+    parser = Parser("MODULE M; IMPORT Log; BEGIN Log.Int(1) END M.", symbol_paths=[str(tmp_path)])
+    assert parser.module_name == "M"
+    with pytest.raises(Exception, match="перекомпилируйте модуль A"):
+        Parser("MODULE M; IMPORT A; END M.", symbol_paths=[str(tmp_path)])
@@ -0,0 +1,87 @@
+import pytest
+
+import token_stream
+from build import build, tokenize_source
+from compile_cache import CompilationCache
+from lexer import Lex, Lexer
+from token_stream import TokenStream
+
+
+PROGRAM = """MODULE M; (* комментарий *)
+IMPORT Log;
+CONST K = 10H; R = 1.5E2; C = 41X; S = "строка";
+VAR a: ARRAY 3 OF INTEGER; x: INTEGER;
+BEGIN
+  x := K + 2; a[x MOD 3] := x;
+  IF (x >= 0) & (x # 1) THEN Log.String(S) END
+END M."""
+
+
+def _lexer_tokens(program: str) -> list:
+    lexer = Lexer(program)
+    tokens = [(lexer.lex, lexer.value, lexer.start)]
+    while lexer.lex != Lex.end_of_text:
+        lexer.get_next()
+        tokens.append((lexer.lex, lexer.value, lexer.start))
+    return tokens
+
+
+def _stream_tokens(stream: TokenStream) -> list:
+    stream.reset()
+    tokens = [(stream.lex, stream.value, stream.start)]
+    while stream.lex != Lex.end_of_text:
+        stream.get_next()
+        tokens.append((stream.lex, stream.value, stream.start))
+    return tokens
+
+
+# у ключевых слов и операций значение - их текст, а не значение
+# предыдущего идентификатора; end_of_text не сравнивается (у Lexer
+# значение последней лексемы остается)
+def test_values_match_lexer():
+    assert _stream_tokens(TokenStream(PROGRAM))[:-1] == _lexer_tokens(PROGRAM)[:-1]
+
+
+def test_round_trip_through_bytes():
+    stream = TokenStream(PROGRAM)
+    restored = TokenStream.from_bytes(PROGRAM, stream.to_bytes())
+    assert _stream_tokens(restored) == _stream_tokens(stream)
+    restored.reset()
+    restored.get_next()
+    assert restored.line_and_column() == (1, 8)
+
+
+@pytest.mark.parametrize("data", [b"", b"\x01\x00\x00\x00", TokenStream(PROGRAM).to_bytes()[:-4]])
+def test_damaged_bytes_are_rejected(data):
+    with pytest.raises(Exception):
+        TokenStream.from_bytes(PROGRAM, data)
+
+
+def test_tokens_are_reused_from_cache(tmp_path, monkeypatch):
+    cache = CompilationCache(str(tmp_path))
+    first = tokenize_source(PROGRAM, cache)
+    monkeypatch.setattr(token_stream.TokenStream, "_tokenize", lambda self: pytest.fail("повторный разбор"))
+    second = tokenize_source(PROGRAM, cache)
+    assert _stream_tokens(second) == _stream_tokens(first)
+
+
+def test_lexical_error_is_left_to_the_parser(tmp_path):
+    program = "MODULE M; CONST R = 1.5E; END M."
+    assert tokenize_source(program, CompilationCache(str(tmp_path))) == program
+
+
+# модуль с неизмененным текстом перекомпилируется после изменения
+# интерфейса импорта, но его лексемы берутся из кеша
+def test_build_reuses_tokens_after_interface_change(tmp_path, monkeypatch):
+    library = tmp_path / "A.oberon07"
+    (tmp_path / "B.oberon07").write_text("MODULE B;\nIMPORT A;\nCONST L* = A.K + 1;\nEND B.\n")
+    cache = CompilationCache(str(tmp_path / "cache"))
+    library.write_text("MODULE A;\nCONST K* = 1;\nEND A.\n")
+    assert set(build([str(tmp_path)], symbol_dir=str(tmp_path / "sym"), cache=cache).values()) == {None}
+    tokenized = []
+    original = token_stream.TokenStream._tokenize
+    monkeypatch.setattr(token_stream.TokenStream, "_tokenize",
+                        lambda self: tokenized.append(self._program[:8]) or original(self))
+    library.write_text("MODULE A;\nCONST K* = 2;\nEND A.\n")
+    assert set(build([str(tmp_path)], symbol_dir=str(tmp_path / "sym"), cache=cache).values()) == {None}
+    assert tokenized == ["MODULE A"]
@@ -0,0 +1,96 @@
+import importlib.util
+import io
+
+import pytest
+
+from build import build
+from compile_cache import CompilationCache
+from transpiler import PythonModule, load_code, source_cache_key
+from vm import OberonTrap
+
+
+# оттранслированный код подставляет константы импортируемых модулей,
+# поэтому изменение интерфейса импорта должно давать новый код
+def test_cache_key_depends_on_imported_interfaces(tmp_path):
+    library = tmp_path / "A.oberon07"
+    program = "MODULE B;\nIMPORT A, Log;\nBEGIN Log.Int(A.K); Log.Ln\nEND B.\n"
+    (tmp_path / "B.oberon07").write_text(program)
+    symbol_dir = str(tmp_path / "sym")
+    cache = CompilationCache(str(tmp_path / "cache"))
+    outputs = []
+    for value in (1, 2):
+        library.write_text(f"MODULE A;\nCONST K* = {value};\nEND A.\n")
+        assert set(build([str(tmp_path)], symbol_dir=symbol_dir, cache=cache).values()) == {None}
+        output = io.StringIO()
+        PythonModule(load_code(program, [symbol_dir], cache), output).run()
+        outputs.append(output.getvalue())
+    assert outputs == ["1\n", "2\n"]
+
+
+def _run_python(program: str) -> str:
+    output = io.StringIO()
+    PythonModule(load_code(program), output).run()
+    return output.getvalue()
+
+
+INDEXING = """MODULE M;
+IMPORT Log;
+VAR a: ARRAY 3 OF INTEGER; i: INTEGER;
+PROCEDURE Get(VAR x: ARRAY OF INTEGER; k: INTEGER): INTEGER;
+  RETURN x[k]
+END Get;
+PROCEDURE Put(VAR x: ARRAY OF INTEGER; k: INTEGER);
+BEGIN x[k] := 1
+END Put;
+BEGIN
+  a[2] := 7; i := %s;
+  %s
+END M."""
+
+
+@pytest.mark.parametrize("index, statement", [
+    ("-1", "Log.Int(a[i])"),
+    ("-1", "a[i] := 1"),
+    ("3", "a[i] := 1"),
+    ("-1", "Log.Int(Get(a, i))"),
+    ("-1", "Put(a, i)"),
+    ("-1", "INC(a[i])"),
+])
+def test_index_out_of_bounds_traps(index, statement):
+    with pytest.raises(OberonTrap, match="индекс вне границ массива"):
+        _run_python(INDEXING % (index, statement))
+
+
+def test_index_in_bounds():
+    assert _run_python(INDEXING % ("2", "Log.Int(a[i] + Get(a, i)); Put(a, 0); Log.Int(a[0])")) == "141"
+
+
+NIL_ACCESS = """MODULE M;
+IMPORT Log;
+TYPE R = RECORD x: INTEGER END; P = POINTER TO R;
+VAR p: P; r: R;
+BEGIN
+  %s
+END M."""
+
+
+@pytest.mark.parametrize("statement", ["Log.Int(p.x)", "p.x := 1", "r := p^", "p^ := r"])
+def test_nil_dereference_traps(statement):
+    with pytest.raises(OberonTrap, match="обращение по указателю NIL"):
+        _run_python(NIL_ACCESS % statement)
+
+
+# ошибка в самом переводе или в библиотеке не выдается за ошибку программы
+def test_python_type_error_is_not_a_trap():
+    module = PythonModule(load_code("MODULE M;\nIMPORT Log;\nBEGIN Log.Int(1)\nEND M."),
+                          library={"Log": {"Int": lambda: None}})
+    with pytest.raises(TypeError):
+        module.run()
+
+
+# объекты кода в кеше годятся только для той же версии CPython
+def test_cache_key_depends_on_python_bytecode_version(monkeypatch):
+    program = "MODULE M;\nEND M.\n"
+    key = source_cache_key(program)
+    monkeypatch.setattr(importlib.util, "MAGIC_NUMBER", b"\x00\x00\r\n")
+    assert source_cache_key(program) != key
@@ -0,0 +1,66 @@
+import pytest
+
+from bytecode_compiler import compile_module
+from syntax_analyzer import Parser
+from transpiler import load_code
+from type_table import TYPES
+
+
+DECLARATIONS = """
+TYPE
+  Base = RECORD x: INTEGER END;
+  Ext = RECORD (Base) y: INTEGER END;
+  PBase = POINTER TO Base;
+  PExt = POINTER TO Ext;
+VAR
+  i: INTEGER; b: BYTE; c: CHAR; s: ARRAY 4 OF CHAR; r: REAL; ok: BOOLEAN;
+  base: Base; ext: Ext; pb: PBase; pe: PExt;
+
+PROCEDURE SetX(VAR rec: Base; v: INTEGER);
+BEGIN rec.x := v
+END SetX;
+
+PROCEDURE Length(x: ARRAY OF CHAR): INTEGER;
+  RETURN LEN(x)
+END Length;
+"""
+
+
+def _module(statements: str) -> str:
+    return f"MODULE M;{DECLARATIONS}BEGIN {statements} END M."
+
+
+def _globals(program: str) -> dict:
+    return {entry.name.name: entry.entity for entry in Parser(program).nametable.get_global_scope_identifiers()}
+
+
+def test_forward_pointers_are_distinct():
+    types = _globals("""MODULE M;
+TYPE P = POINTER TO R; Q = POINTER TO S; A = ARRAY 3 OF P; B = ARRAY 3 OF Q;
+  R = RECORD x: INTEGER END; S = RECORD y: REAL END;
+END M.""")
+    assert not TYPES.same_type(types["P"], types["Q"])
+    assert not TYPES.same_type(types["A"], types["B"])
+    assert TYPES.canonical(types["P"]).type_of_pointer is types["R"]
+
+
+@pytest.mark.parametrize("statements", [
+    "i := b; b := i; c := \"A\"; s := \"A\"; s := \"abc\"",
+    "base := ext; NEW(pe); pb := pe; pb := NIL",
+    "SetX(ext, 1); SetX(base, 2); i := Length(s) + Length(\"xy\")",
+])
+@pytest.mark.parametrize("backend", [lambda program: compile_module(Parser(program)),
+                                     lambda program: load_code(program, [], None)])
+def test_compatible(backend, statements):
+    backend(_module(statements))
+
+
+@pytest.mark.parametrize("statements", [
+    "i := ok", "r := i", "c := \"AB\"", "s := \"abcd\"", "ext := base", "pe := pb",
+    "SetX(i, 1)", "i := Length(i)",
+])
+@pytest.mark.parametrize("backend", [lambda program: compile_module(Parser(program)),
+                                     lambda program: load_code(program, [], None)])
+def test_incompatible(backend, statements):
+    with pytest.raises(Exception, match="несовместим"):
+        backend(_module(statements))
@@ -0,0 +1,143 @@
+import io
+
+import pytest
+
+from bytecode_compiler import compile_module
+from syntax_analyzer import Parser
+from transpiler import PythonModule, load_code
+from vm import VM, OberonTrap
+
+
+def _run_vm(program: str) -> str:
+    output = io.StringIO()
+    VM(compile_module(Parser(program)), output).run()
+    return output.getvalue()
+
+
+def _run_python(program: str) -> str:
+    output = io.StringIO()
+    PythonModule(load_code(program), output).run()
+    return output.getvalue()
+
+
+def _run_both(program: str) -> str:
+    result = _run_vm(program)
+    assert _run_python(program) == result
+    return result
+
+
+ARITHMETIC = """MODULE M;
+IMPORT Log;
+VAR i, k: INTEGER; r: REAL; s: SET;
+BEGIN
+  i := 17; k := -5;
+  Log.Int(i + k); Log.Char(" "); Log.Int(i - k); Log.Char(" "); Log.Int(i * k); Log.Char(" ");
+  Log.Int(i DIV k); Log.Char(" "); Log.Int(i MOD k); Log.Char(" ");
+  Log.Int(k DIV 2); Log.Char(" "); Log.Int(k MOD 2); Log.Char(" "); Log.Int(-k); Log.Char(" ");
+  Log.Int(ABS(k)); Log.Char(" "); Log.Int(LSL(i, 3)); Log.Char(" "); Log.Int(ASR(k, 1)); Log.Char(" ");
+  r := FLT(i) / 4.0; Log.Real(r); Log.Char(" "); Log.Int(FLOOR(-r)); Log.Char(" ");
+  (* унарный минус относится ко всему слагаемому: -(s * {0..3}) *)
+  s := {1..5} - {2, 4}; Log.Int(ORD(s)); Log.Char(" "); Log.Int(ORD(-s * {0..3})); Log.Char(" ");
+  i := 2147483647; k := -2147483647 - 1; Log.Int(i); Log.Char(" "); Log.Int(k); Log.Char(" ");
+  INC(k, 10); DEC(i, 10); Log.Int(i + k)
+END M."""
+
+
+def test_arithmetic():
+    assert _run_both(ARITHMETIC) == \
+        "12 22 -85 -4 -3 -3 1 5 5 136 -3 4.25 -5 42 -11 2147483647 -2147483648 -1"
+
+
+LOOPS = """MODULE M;
+IMPORT Log;
+VAR i, j, s: INTEGER;
+BEGIN
+  s := 0;
+  FOR i := 1 TO 10 DO s := s + i END; Log.Int(s); Log.Char(" "); Log.Int(i); Log.Char(" ");
+  FOR i := 10 TO 1 BY -3 DO s := s - i END; Log.Int(s); Log.Char(" "); Log.Int(i); Log.Char(" ");
+  FOR i := 5 TO 1 DO s := 0 END; Log.Int(s); Log.Char(" "); Log.Int(i); Log.Char(" ");
+  i := 0; j := 0;
+  WHILE i < 10 DO INC(i); IF ODD(i) THEN INC(j) END END; Log.Int(j); Log.Char(" ");
+  WHILE i > 5 DO DEC(i) ELSIF i > 0 DO i := i - 2 END; Log.Int(i); Log.Char(" ");
+  REPEAT INC(i, 3) UNTIL i > 20; Log.Int(i)
+END M."""
+
+
+def test_loops():
+    assert _run_both(LOOPS) == "55 11 33 -2 33 5 5 -1 23"
+
+
+CASES = """MODULE M;
+IMPORT Log;
+VAR i: INTEGER; c: CHAR;
+BEGIN
+  FOR i := 0 TO 9 DO
+    CASE i OF
+      0: Log.Char("z")
+    | 1, 3: Log.Char("o")
+    | 4..6, 8: Log.Char("m")
+    | 7: Log.Char("s")
+    | 2, 9: Log.Char("-")
+    END
+  END;
+  c := "b";
+  CASE c OF "a".."c": Log.Char("L") | "x": Log.Char("X") END
+END M."""
+
+
+def test_case():
+    assert _run_both(CASES) == "zo-ommmsm-L"
+
+
+def test_case_without_matching_label_traps():
+    program = "MODULE M;\nVAR i: INTEGER;\nBEGIN i := 5; CASE i OF 1: i := 0 END\nEND M."
+    with pytest.raises(OberonTrap, match="нет подходящей метки"):
+        _run_vm(program)
+    with pytest.raises(OberonTrap, match="нет подходящей метки"):
+        _run_python(program)
+
+
+VAR_PARAMETERS = """MODULE M;
+IMPORT Log;
+TYPE R = RECORD x: INTEGER END;
+VAR a: ARRAY 3 OF INTEGER; r: R; i, j: INTEGER;
+PROCEDURE Swap(VAR x, y: INTEGER);
+VAR t: INTEGER;
+BEGIN t := x; x := y; y := t
+END Swap;
+PROCEDURE Fill(VAR v: ARRAY OF INTEGER; value: INTEGER);
+VAR k: INTEGER;
+BEGIN FOR k := 0 TO LEN(v) - 1 DO v[k] := value + k END
+END Fill;
+PROCEDURE Bump(VAR rec: R);
+BEGIN INC(rec.x, 10)
+END Bump;
+BEGIN
+  i := 1; j := 2; Swap(i, j); Log.Int(i); Log.Int(j); Log.Char(" ");
+  Fill(a, 4); Swap(a[0], a[2]); Log.Int(a[0]); Log.Int(a[1]); Log.Int(a[2]); Log.Char(" ");
+  r.x := 5; Bump(r); Swap(r.x, a[1]); Log.Int(r.x); Log.Char(" "); Log.Int(a[1])
+END M."""
+
+
+def test_var_parameters():
+    assert _run_both(VAR_PARAMETERS) == "21 654 5 15"
+
+
+# выход за INTEGER во время исполнения - авария, как и в константном
+# выражении (см. constant_folding.py)
+@pytest.mark.parametrize("statement", [
+    "k := k + 1", "k := -k - 2", "k := k * 2", "INC(k)", "k := -k; DEC(k, 2)",
+    "k := -k - 1; k := k DIV (-1)", "k := -k - 1; k := ABS(k)", "k := LSL(k, 1)",
+    "k := FLOOR(FLT(k) * 2.0)", "FOR j := k - 1 TO k DO INC(k, 0) END",
+])
+def test_integer_overflow_traps(statement):
+    program = f"MODULE M;\nVAR k, j: INTEGER;\nBEGIN k := 2147483647; {statement}\nEND M."
+    with pytest.raises(OberonTrap, match="переполнение"):
+        _run_vm(program)
+    with pytest.raises(OberonTrap, match="переполнение"):
+        _run_python(program)
+
+
+def test_real_arithmetic_is_not_range_checked():
+    program = "MODULE M;\nIMPORT Log;\nVAR r: REAL;\nBEGIN r := 1.0E30; r := -(r * r); Log.Real(r)\nEND M."
+    assert _run_both(program) == repr(-(1.0e30 * 1.0e30))
@@ -0,0 +1,91 @@
+import os
+
+from symbol_file import symbol_file_path
+from watch import Watcher
+
+SHAPES = """MODULE Shapes;
+VAR count*: INTEGER;
+PROCEDURE Move*(VAR x: INTEGER; d: INTEGER);
+BEGIN x := x + d
+END Move;
+BEGIN count := {count}
+END Shapes."""
+
+USER = """MODULE User;
+IMPORT Shapes;
+VAR x: INTEGER;
+BEGIN Shapes.Move(x, Shapes.count)
+END User."""
+
+
+def _write(directory, name: str, text: str) -> str:
+    path = directory / f"{name}.oberon07"
+    path.write_text(text)
+    return str(path)
+
+
+def _start(tmp_path):
+    shapes = _write(tmp_path, "Shapes", SHAPES.format(count=0))
+    user = _write(tmp_path, "User", USER)
+    watcher = Watcher([str(tmp_path)], symbol_dir=str(tmp_path / "sym"), output=lambda line: None)
+    cycle = watcher.run_cycle([shapes, user])
+    assert cycle.results == {shapes: None, user: None}
+    return watcher, shapes, user
+
+
+def test_body_edit_skips_importers(tmp_path):
+    watcher, shapes, user = _start(tmp_path)
+    _write(tmp_path, "Shapes", SHAPES.format(count=1))
+    cycle = watcher.run_cycle([shapes])
+    assert cycle.compiled == [shapes]
+    assert cycle.skipped == [user]
+    assert cycle.results == {shapes: None}
+
+
+def test_interface_change_recompiles_importers(tmp_path):
+    watcher, shapes, user = _start(tmp_path)
+    _write(tmp_path, "Shapes", SHAPES.format(count=0).replace("count*", "count"))
+    cycle = watcher.run_cycle([shapes])
+    assert cycle.compiled == [shapes, user]
+    assert cycle.skipped == []
+    assert cycle.results[shapes] is None
+    assert "count" in cycle.results[user]
+
+
+def test_removed_module(tmp_path):
+    watcher, shapes, user = _start(tmp_path)
+    symbol_path = symbol_file_path(str(tmp_path / "sym"), "Shapes")
+    assert os.path.exists(symbol_path)
+    os.remove(shapes)
+    cycle = watcher.run_cycle([], [shapes])
+    assert cycle.compiled == [user]
+    assert shapes not in cycle.results
+    assert cycle.results[user] is not None
+    assert not os.path.exists(symbol_path)
+
+
+def test_broken_module_is_fixed(tmp_path):
+    watcher, shapes, user = _start(tmp_path)
+    _write(tmp_path, "Shapes", SHAPES.format(count="TRUE +"))
+    cycle = watcher.run_cycle([shapes])
+    assert cycle.compiled == [shapes]
+    assert cycle.results[shapes] is not None
+    assert cycle.results[user] == "не скомпилированы импортируемые модули: " + shapes
+
+    # интерфейс после исправления тот же, что до ошибки, но User был
+    # отмечен как не скомпилированный и должен быть перекомпилирован
+    _write(tmp_path, "Shapes", SHAPES.format(count=2))
+    cycle = watcher.run_cycle([shapes])
+    assert cycle.compiled == [shapes, user]
+    assert cycle.results == {shapes: None, user: None}
+
+
+def test_check_once_polls_files(tmp_path):
+    watcher, shapes, user = _start(tmp_path)
+    lines = []
+    watcher = Watcher([str(tmp_path)], symbol_dir=str(tmp_path / "sym"), output=lines.append)
+    assert sorted(watcher.check_once().compiled) == [shapes, user]
+    assert watcher.check_once() is None
+    _write(tmp_path, "Shapes", SHAPES.format(count=10000))
+    assert watcher.check_once().skipped == [user]
+    assert lines[-1].endswith("перекомпилировано: 1, не перекомпилировано (интерфейс не изменился): 1")
@@ -0,0 +1,147 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+
+from lexer import Lexer, Lex, find_block_end
+
+
+# вид лексемы хранится как lex.ordinal (см. lexer.py)
+_LEXES: tuple[Lex, ...] = tuple(Lex)
+
+
+# Предварительно разобранный на лексемы текст. Лексемы хранятся
+# в параллельных массивах (вид, смещение, длина), строка и колонка
+# вычисляются только по запросу. Интерфейс совпадает с Lexer
+# (lex, value, get_next, get_context), поэтому Parser может работать
+# с любым из них, но здесь дополнительно доступны peek и откат.
+# Массивы сохраняются в кеше компиляции (to_bytes, from_bytes), и
+# неизмененный текст повторно не разбирается на лексемы (см. build.py).
+class TokenStream:
+    def __init__(self, program: str) -> None:
+        self._init_buffers(program)
+        self._tokenize()
+        self._load()
+
+    def _init_buffers(self, program: str):
+        self._program = program
+        self._kinds = array('i')
+        self._starts = array('i')
+        self._lengths = array('i')
+        # значения нужны только числам и строкам, идентификаторы
+        # берутся срезом исходного текста
+        self._values: dict[int, int | float | str] = dict()
+        self._line_starts: array | None = None
+        self._index = 0
+        self.lex = Lex.unknown_lex
+        self.value = ""
+
+    def _tokenize(self):
+        lexer = Lexer(self._program)
+        kinds, starts, lengths = self._kinds, self._starts, self._lengths
+        while True:
+            lex = lexer.lex
+            if lex in (Lex.number, Lex.string, Lex.unknown_lex):
+                self._values[len(kinds)] = lexer.value
+            kinds.append(lex.ordinal)
+            starts.append(lexer.start)
+            lengths.append(lexer._wrap._index - lexer.start)
+            if lex == Lex.end_of_text:
+                break
+            lexer.get_next()
+
+    # значение лексемы - как у Lexer: число, строка или текст лексемы
+    def _load(self):
+        index = self._index
+        self.lex = _LEXES[self._kinds[index]]
+        value = self._values.get(index)
+        if value is None:
+            start = self._starts[index]
+            value = self._program[start:start + self._lengths[index]]
+        self.value = value
+
+    def kind_counts(self) -> dict[Lex, int]:
+        return {_LEXES[kind]: count for kind, count in Counter(self._kinds).items()}
+
+    def __len__(self) -> int:
+        return len(self._kinds)
+
+    def get_next(self):
+        if self._index < len(self._kinds) - 1:
+            self._index += 1
+        self._load()
+
+    def peek(self, offset: int = 1) -> Lex:
+        index = min(self._index + offset, len(self._kinds) - 1)
+        return _LEXES[self._kinds[index]]
+
+    @property
+    def start(self) -> int:
+        return self._starts[self._index]
+
+    def skip_block(self, name: str) -> int | None:
+        end = find_block_end(self._program, self.start, name)
+        if end is not None:
+            self._index = min(bisect_left(self._starts, end), len(self._kinds) - 1)
+            self._load()
+        return end
+
+    def mark(self) -> int:
+        return self._index
+
+    def reset(self, mark: int = 0):
+        self._index = mark
+        self._load()
+
+    def _get_line_starts(self) -> array:
+        if self._line_starts is None:
+            line_starts = array('i', [0])
+            program = self._program
+            newline = program.find("\n")
+            while newline != -1:
+                line_starts.append(newline + 1)
+                newline = program.find("\n", newline + 1)
+            self._line_starts = line_starts
+        return self._line_starts
+
+    def line_and_column(self, index: int | None = None) -> tuple[int, int]:
+        if index is None:
+            index = self._index
+        offset = self._starts[index]
+        line_starts = self._get_line_starts()
+        line = bisect_right(line_starts, offset)
+        return line, offset - line_starts[line - 1] + 1
+
+    def get_context(self):
+        line, _ = self.line_and_column()
+        line_start = self._get_line_starts()[line - 1]
+        end = self._starts[self._index] + self._lengths[self._index]
+        return f"{line}) {self._program[line_start:end]}"
+
+    def to_bytes(self) -> bytes:
+        header = array('i', [len(self._kinds)])
+        return header.tobytes() + self._kinds.tobytes() + self._starts.tobytes() + self._lengths.tobytes()
+
+    # Значения чисел и строк не сохраняются: они заново вычисляются
+    # лексером по тексту лексемы
+    @classmethod
+    def from_bytes(cls, program: str, data: bytes) -> "TokenStream":
+        stream = cls.__new__(cls)
+        stream._init_buffers(program)
+        item_size = stream._kinds.itemsize
+        count = array('i', data[:item_size])[0] if len(data) >= item_size else 0
+        if count <= 0 or len(data) != (1 + 3 * count) * item_size:
+            raise Exception("повреждённые данные лексем")
+        offset = item_size
+        for buffer in (stream._kinds, stream._starts, stream._lengths):
+            buffer.frombytes(data[offset:offset + count * item_size])
+            offset += count * item_size
+        if stream._kinds[-1] != Lex.end_of_text.ordinal or stream._starts[-1] > len(program):
+            raise Exception("лексемы не соответствуют тексту")
+        for index, kind in enumerate(stream._kinds):
+            lex = _LEXES[kind]
+            if lex in (Lex.number, Lex.string, Lex.unknown_lex):
+                start = stream._starts[index]
+                token = program[start:start + stream._lengths[index]]
+                stream._values[index] = token if lex == Lex.unknown_lex else Lexer(token).value
+        stream._load()
+        return stream
@@ -0,0 +1,1006 @@
+import hashlib
+import importlib.util
+import marshal
+import math
+import sys
+import types
+
+from ast_node import *
+from nametable import *
+from bytecode import record_layout, is_structured
+from build import interface_hash, scan_module_header
+from compile_cache import CompilationCache, make_cache_key
+from constant_folding import constant_type
+from syntax_analyzer import Parser
+from type_table import TYPES
+from universe import BOOLEAN_TYPE, CHAR_TYPE, INTEGER_TYPE, REAL_TYPE, SET_TYPE, StandardProcedure
+from vm import BUILTIN_FUNCTIONS, OberonTrap, checked_integer, log_library, text
+
+
+# Трансляция модуля в текст на Python. Каждая процедура становится
+# функцией Python, тело модуля - функцией _body; текст компилируется
+# один раз встроенной compile(), и дальше процедуры исполняются самим
+# интерпретатором Python без цикла виртуальной машины.
+#
+# Значения те же, что у ВМ (см. bytecode.py), но тип записи в элементе 0
+# списка записи - дескриптор RecordDescriptor, который создается при
+# загрузке модуля: так код не ссылается на объекты компилятора и его
+# можно сохранить в кеше через marshal.
+#
+# Скалярная переменная, которая передается как параметр VAR, хранится в
+# ячейке (types.CellType), и вызываемая процедура работает с ее
+# cell_contents. Элемент массива или поле записи передаются объектом
+# ItemReference с тем же свойством cell_contents. Массивы и записи
+# передаются самим списком.
+#
+# Результат целочисленных +, -, *, DIV и унарного минуса проверяется
+# функцией _int: выход из диапазона INTEGER - аварийный останов, как в ВМ.
+
+_OPERATORS = {
+    Operation.plus: "+", Operation.minus: "-", Operation.multiple: "*", Operation.divide: "/",
+    Operation.DIV: "//", Operation.MOD: "%",
+    Operation.equal: "==", Operation.unequal: "!=", Operation.less: "<",
+    Operation.less_or_equal: "<=", Operation.greater: ">", Operation.greater_or_equal: ">=",
+    Operation.LOGICAL_AND: "and", Operation.LOGICAL_OR: "or", Operation.IN: "in",
+}
+_SET_OPERATORS = {Operation.plus: "|", Operation.minus: "-", Operation.multiple: "&", Operation.divide: "^"}
+_RELATIONS = (Operation.equal, Operation.unequal, Operation.less, Operation.less_or_equal,
+              Operation.greater, Operation.greater_or_equal)
+_CASE_TRAP = "нет подходящей метки в операторе CASE"
+_INDENT = "    "
+
+
+class RecordDescriptor:
+    __slots__ = ("name", "base")
+
+    def __init__(self, name: str, base: "RecordDescriptor | None") -> None:
+        self.name = name
+        self.base = base
+
+
+class ItemReference:
+    __slots__ = ("container", "index")
+
+    def __init__(self, container: list, index: int) -> None:
+        if index < 0:
+            raise IndexError(index)
+        self.container = container
+        self.index = index
+
+    @property
+    def cell_contents(self):
+        return self.container[self.index]
+
+    @cell_contents.setter
+    def cell_contents(self, value):
+        self.container[self.index] = value
+
+
+# Форма значения для создания и копирования: ("S", начальное значение)
+# для скаляров, ("A", длина, форма элемента), ("R", дескриптор, формы полей)
+def _new(shape: tuple):
+    kind = shape[0]
+    if kind == "S":
+        return shape[1]
+    if kind == "A":
+        element = shape[2]
+        if element[0] == "S":
+            return [element[1]] * shape[1]
+        return [_new(element) for _ in range(shape[1])]
+    return [shape[1]] + [_new(field) for field in shape[2]]
+
+
+def _copy(target: list, source, shape: tuple):
+    if isinstance(source, str):
+        if len(source) >= len(target):
+            raise OberonTrap("строка не помещается в массив")
+        target[:len(source)] = source
+        target[len(source)] = "\0"
+        return
+    if shape[0] == "A":
+        if len(source) > len(target):
+            raise OberonTrap("присваивание массива большей длины")
+        element = shape[2]
+        if element[0] == "S":
+            target[:len(source)] = source
+        else:
+            for index, item in enumerate(source):
+                _copy(target[index], item, element)
+        return
+    for index, field in enumerate(shape[2], 1):
+        if field[0] == "S":
+            target[index] = source[index]
+        else:
+            _copy(target[index], source[index], field)
+
+
+def _is(value, descriptor: RecordDescriptor) -> bool:
+    if value is None:
+        return False
+    current = value[0]
+    while current is not None:
+        if current is descriptor:
+            return True
+        current = current.base
+    return False
+
+
+def _guard(value, descriptor: RecordDescriptor):
+    if not _is(value, descriptor):
+        raise OberonTrap("охрана типа не выполнена")
+    return value
+
+
+# индекс элемента массива с проверкой границ, как LOAD_INDEX в ВМ:
+# отрицательный индекс в Python выбрал бы элемент с конца списка
+def _index(index: int, length: int) -> int:
+    if index < 0 or index >= length:
+        raise OberonTrap("индекс вне границ массива")
+    return index
+
+
+# запись по указателю: NIL проверяется явно, другие ошибки Python
+# не выдаются за ошибки программы
+def _deref(pointer: list | None) -> list:
+    if pointer is None:
+        raise OberonTrap("обращение по указателю NIL")
+    return pointer
+
+
+def _set_element(element: int) -> frozenset:
+    if element < 0 or element > 31:
+        raise OberonTrap(f"элемент множества {element} вне диапазона 0..31")
+    return frozenset((element,))
+
+
+def _set_range(low: int, high: int) -> frozenset:
+    if low < 0 or high > 31:
+        raise OberonTrap(f"диапазон множества {low}..{high} вне диапазона 0..31")
+    return frozenset(range(low, high + 1))
+
+
+def _assert(condition: bool):
+    if not condition:
+        raise OberonTrap("нарушено утверждение ASSERT")
+
+
+def _trap(message: str):
+    raise OberonTrap(message)
+
+
+def _call(procedure, *arguments):
+    if procedure is None:
+        raise OberonTrap("вызов процедурной переменной со значением NIL")
+    return procedure(*arguments)
+
+
+def _unpk(x: float) -> tuple[float, int]:
+    if x == 0:
+        return x, 0
+    # frexp дает мантиссу в [0.5, 1), UNPK - в [1, 2)
+    mantissa, exponent = math.frexp(x)
+    return mantissa * 2, exponent - 1
+
+
+def _runtime_namespace(library: dict[str, dict]) -> dict:
+    def external(module_name: str, name: str):
+        procedure = library.get(module_name, {}).get(name)
+        if procedure is None:
+            raise Exception(f"нет реализации процедуры {module_name}.{name}")
+        return procedure
+
+    namespace = {
+        "__builtins__": __builtins__, "_external": external,
+        "RecordDescriptor": RecordDescriptor, "ItemReference": ItemReference, "_Cell": types.CellType,
+        "_new": _new, "_copy": _copy, "_is": _is, "_guard": _guard, "_text": text, "_index": _index, "_deref": _deref, "_int": checked_integer,
+        "_set_element": _set_element, "_set_range": _set_range, "_FULL_SET": frozenset(range(32)),
+        "_assert": _assert, "_trap": _trap, "_call": _call, "_unpk": _unpk, "_ldexp": math.ldexp,
+        "OberonTrap": OberonTrap,
+    }
+    for name, function in BUILTIN_FUNCTIONS.items():
+        namespace["_" + name] = function
+    return namespace
+
+
+def _is_text(oberon_type: OberonType | None) -> bool:
+    return isinstance(oberon_type, ArrayType) and oberon_type.element_type is CHAR_TYPE
+
+
+def _is_reference_type(oberon_type: OberonType | None) -> bool:
+    return isinstance(oberon_type, (PointerType, ProcedureType)) or (
+        oberon_type is not None and oberon_type.type_name is not None and oberon_type.type_name.name == "NIL")
+
+
+def _record_of(oberon_type: OberonType | None) -> OberonType | None:
+    if isinstance(oberon_type, PointerType):
+        return oberon_type.type_of_pointer
+    return oberon_type
+
+
+def _is_no_return(return_type) -> bool:
+    return return_type is None or return_type is NoReturnType or isinstance(return_type, NoReturnType)
+
+
+# строковый литерал из одного символа имеет тип CHAR, но присваивается
+# и массиву символов как строка (см. bytecode_compiler._value_type)
+def _value_type(expression: AstNode, expression_type: OberonType | None) -> OberonType | None:
+    if type(expression) is LiteralValue and isinstance(expression.literal, str):
+        return TYPES.string(len(expression.literal) + 1)
+    return expression_type
+
+
+def _calls(statements: list[Statement]):
+    for node in walk(statements):
+        if type(node) in (ProcedureCall, FunctionCall):
+            yield node
+
+
+class PythonTranspiler:
+    def __init__(self, parser: Parser) -> None:
+        self._parser = parser
+        self._prelude: list[str] = []
+        self._functions: list[str] = []
+        self._procedure_names: dict[int, str] = dict()
+        self._procedures: list[tuple[Procedure, str]] = []
+        self._globals: dict[int, str] = dict()
+        self._descriptors: dict[int, str] = dict()
+        self._shapes: dict[tuple, str] = dict()
+        self._externals: dict[tuple[str, str], str] = dict()
+        self._constants: dict[str, str] = dict()
+        # ячейки: скалярные переменные, которые передаются как VAR
+        self._cells: set[int] = set()
+        self._locals: dict[int, str] = dict()
+        self._by_ref: set[int] = set()
+        self._assigned_globals: set[str] = set()
+        self._type_overrides: dict[int, OberonType] = dict()
+        self._temporary_count = 0
+        self._lines: list[str] = []
+        self._indent = 1
+
+    def translate(self) -> str:
+        self._collect_procedures()
+        global_entities = []
+        for entry in self._parser.nametable.get_global_scope_identifiers():
+            if isinstance(entry.name, Identifier) and isinstance(entry.entity, Variable):
+                global_entities.append(entry.entity)
+        for entity in global_entities:
+            self._globals[id(entity)] = f"g_{entity.name}"
+        for procedure, _ in self._procedures:
+            self._collect_cells(procedure.body.code)
+        self._collect_cells(self._parser.module_body)
+        for entity in global_entities:
+            initial = self._initial_value(entity.variable_type)
+            if id(entity) in self._cells:
+                initial = f"_Cell({initial})"
+            self._prelude.append(f"g_{entity.name} = {initial}")
+        for procedure, name in self._procedures:
+            self._translate_procedure(procedure, name)
+        self._begin_function()
+        self._statements(self._parser.module_body)
+        self._end_function("_body", [], [])
+        exported = ", ".join(f"{entry.name.name!r}: {self._procedure_names[id(entry.entity)]}"
+                             for entry in self._parser.nametable.get_global_scope_identifiers()
+                             if isinstance(entry.name, Identifier) and id(entry.entity) in self._procedure_names)
+        lines = [f"# модуль {self._parser.module_name}"] + self._prelude + [""] + self._functions
+        lines.append(f"_PROCEDURES = {{{exported}}}")
+        return "\n".join(lines) + "\n"
+
+    def _error(self, message: str):
+        raise Exception(f"{self._parser.module_name}: {message}")
+
+    ######################################################
+    #                  ПРЕДВАРИТЕЛЬНЫЙ ОБХОД             #
+    ######################################################
+
+    # вложенные процедуры не попадают в таблицу имен модуля,
+    # поэтому процедуры собираются по ссылкам на них в коде
+    def _collect_procedures(self):
+        pending = []
+        for entry in self._parser.nametable.get_global_scope_identifiers():
+            if isinstance(entry.name, Identifier):
+                pending.append(entry.entity)
+        statements = [self._parser.module_body]
+        while pending or statements:
+            while pending:
+                entity = pending.pop()
+                if not isinstance(entity, Procedure) or isinstance(entity, StandardProcedure) \
+                        or id(entity) in self._procedure_names:
+                    continue
+                name = f"p{len(self._procedures)}_{entity.head.name.name}"
+                self._procedure_names[id(entity)] = name
+                self._procedures.append((entity, name))
+                statements.append(entity.body.code)
+                if entity.body.return_expression is not None:
+                    statements.append([entity.body.return_expression])
+            if not statements:
+                break
+            for node in walk(statements.pop()):
+                if type(node) is Designator and isinstance(node.entity, Procedure) \
+                        and node.name.child_name is None:
+                    pending.append(node.entity)
+
+    def _collect_cells(self, statements: list[Statement]):
+        for call in _calls(statements):
+            entity = call.procedure.entity
+            if isinstance(entity, StandardProcedure):
+                continue
+            for actual in call.actual_parameters:
+                designator = actual.code
+                if actual.by_ref and type(designator) is Designator and not designator.selectors \
+                        and not is_structured(self._entity_type(designator.entity)):
+                    self._cells.add(id(designator.entity))
+
+    ######################################################
+    #                  ТИПЫ И ИМЕНА                      #
+    ######################################################
+
+    def _entity_type(self, entity) -> OberonType | None:
+        override = self._type_overrides.get(id(entity))
+        if override is not None:
+            return override
+        if isinstance(entity, Variable):
+            return entity.variable_type
+        if isinstance(entity, ProcedureParameter):
+            return entity.param_type
+        if isinstance(entity, Constant):
+            return entity.constant_type
+        if isinstance(entity, Procedure):
+            return entity.head.procedure_type
+        return None
+
+    def _field_index(self, record_type: OberonType | None, name: str) -> tuple[int, OberonType]:
+        if isinstance(record_type, RecordType):
+            for index, (field_name, field_type) in enumerate(record_layout(record_type), 1):
+                if field_name == name:
+                    return index, field_type
+        self._error(f"нет поля {name}")
+
+    def _descriptor(self, record_type: OberonType | None) -> str:
+        record_type = _record_of(record_type)
+        if not isinstance(record_type, RecordType):
+            self._error("ожидался тип записи")
+        name = self._descriptors.get(id(record_type))
+        if name is None:
+            base = "None"
+            if isinstance(_record_of(record_type.base_type), RecordType):
+                base = self._descriptor(record_type.base_type)
+            type_name = record_type.type_name.name if record_type.type_name is not None else "RECORD"
+            name = f"r{len(self._descriptors)}_{type_name}"
+            self._descriptors[id(record_type)] = name
+            self._prelude.append(f"{name} = RecordDescriptor({type_name!r}, {base})")
+        return name
+
+    def _shape_literal(self, oberon_type: OberonType | None) -> str:
+        if isinstance(oberon_type, ArrayType):
+            return f'("A", {oberon_type.size}, {self._shape_literal(oberon_type.element_type)})'
+        if isinstance(oberon_type, RecordType):
+            fields = "".join(self._shape_literal(field_type) + ", " for _, field_type in record_layout(oberon_type))
+            return f'("R", {self._descriptor(oberon_type)}, ({fields}))'
+        return f'("S", {self._initial_value(oberon_type)})'
+
+    def _shape(self, oberon_type: OberonType | None) -> str:
+        literal = self._shape_literal(oberon_type)
+        name = self._shapes.get(literal)
+        if name is None:
+            name = f"s{len(self._shapes)}"
+            self._shapes[literal] = name
+            self._prelude.append(f"{name} = {literal}")
+        return name
+
+    def _initial_value(self, oberon_type: OberonType | None) -> str:
+        if oberon_type is REAL_TYPE:
+            return "0.0"
+        if oberon_type is BOOLEAN_TYPE:
+            return "False"
+        if oberon_type is CHAR_TYPE:
+            return "'\\x00'"
+        if oberon_type is SET_TYPE:
+            return "frozenset()"
+        if isinstance(oberon_type, BasicType):
+            return "0"
+        if is_structured(oberon_type) and not (isinstance(oberon_type, ArrayType) and oberon_type.size is None):
+            return f"_new({self._shape(oberon_type)})"
+        return "None"
+
+    def _external(self, module_name: str, name: str) -> str:
+        key = (module_name, name)
+        python_name = self._externals.get(key)
+        if python_name is None:
+            python_name = f"x_{module_name}_{name}"
+            self._externals[key] = python_name
+            self._prelude.append(f"{python_name} = _external({module_name!r}, {name!r})")
+        return python_name
+
+    def _constant(self, literal: str) -> str:
+        name = self._constants.get(literal)
+        if name is None:
+            name = f"k{len(self._constants)}"
+            self._constants[literal] = name
+            self._prelude.append(f"{name} = {literal}")
+        return name
+
+    def _temporary(self) -> str:
+        self._temporary_count += 1
+        return f"t{self._temporary_count}"
+
+    ######################################################
+    #                  ПРОЦЕДУРЫ                         #
+    ######################################################
+
+    def _emit(self, line: str):
+        self._lines.append(_INDENT * self._indent + line)
+
+    def _begin_function(self):
+        self._lines = []
+        self._indent = 1
+        self._locals = dict()
+        self._by_ref = set()
+        self._assigned_globals = set()
+
+    def _end_function(self, name: str, parameters: list[str], header: list[str]):
+        lines = [f"def {name}({', '.join(parameters)}):"]
+        if self._assigned_globals:
+            lines.append(_INDENT + "global " + ", ".join(sorted(self._assigned_globals)))
+        lines += [_INDENT + line for line in header]
+        lines += self._lines
+        if len(lines) == 1:
+            lines.append(_INDENT + "pass")
+        self._functions.append("\n".join(lines) + "\n")
+
+    def _translate_procedure(self, procedure: Procedure, name: str):
+        self._begin_function()
+        parameters = []
+        header = []
+        for parameter in procedure.head.procedure_type.parameters:
+            python_name = f"v_{parameter.name}"
+            parameters.append(python_name)
+            self._locals[id(parameter)] = python_name
+            if parameter.by_ref:
+                if not is_structured(parameter.param_type):
+                    self._by_ref.add(id(parameter))
+            elif id(parameter) in self._cells:
+                header.append(f"{python_name} = _Cell({python_name})")
+        for variable in procedure.body.variables:
+            python_name = f"v_{variable.name}"
+            self._locals[id(variable)] = python_name
+            initial = self._initial_value(variable.variable_type)
+            if id(variable) in self._cells:
+                initial = f"_Cell({initial})"
+            header.append(f"{python_name} = {initial}")
+        self._statements(procedure.body.code)
+        if procedure.body.return_expression is not None:
+            self._emit(f"return {self._expression(procedure.body.return_expression)[0]}")
+        self._end_function(name, parameters, header)
+
+    ######################################################
+    #                  ОПЕРАТОРЫ                         #
+    ######################################################
+
+    def _block(self, statements: list[Statement]):
+        self._indent += 1
+        if statements:
+            self._statements(statements)
+        else:
+            self._emit("pass")
+        self._indent -= 1
+
+    def _statements(self, statements: list[Statement]):
+        for statement in statements:
+            self._statement(statement)
+
+    def _statement(self, statement: Statement):
+        match statement:
+            case Assignment():
+                value, value_type = self._expression(statement.expression)
+                if not TYPES.assignment_compatible(self._designator(statement.var)[1],
+                                                   _value_type(statement.expression, value_type)):
+                    self._error(f"несовместимые типы при присваивании {identifier_to_str(statement.var.name)}")
+                self._assign(statement.var, value)
+            case ProcedureCall():
+                entity = statement.procedure.entity
+                if isinstance(entity, StandardProcedure) and not entity.is_function:
+                    self._standard_procedure(entity.head.name.name, statement.actual_parameters)
+                else:
+                    self._emit(self._call(statement.procedure, statement.actual_parameters)[0])
+            case IF():
+                keyword = "if"
+                while True:
+                    self._emit(f"{keyword} {self._expression(statement.condition)[0]}:")
+                    self._block(statement.code)
+                    else_code = statement.else_code
+                    if else_code is not None and len(else_code) == 1 and type(else_code[0]) is IF:
+                        statement = else_code[0]
+                        keyword = "elif"
+                        continue
+                    if else_code is not None:
+                        self._emit("else:")
+                        self._block(else_code)
+                    break
+            case WHILE():
+                self._while(statement)
+            case REPEAT():
+                self._emit("while True:")
+                self._indent += 1
+                self._statements(statement.code)
+                self._emit(f"if {self._expression(statement.condition)[0]}:")
+                self._emit(_INDENT + "break")
+                self._indent -= 1
+            case FOR():
+                self._for(statement)
+            case CASE():
+                self._case(statement)
+            case _:
+                self._error(f"неизвестный оператор {type(statement).__name__}")
+
+    def _while(self, statement: WHILE):
+        if len(statement.branches) == 1:
+            branch = statement.branches[0]
+            self._emit(f"while {self._expression(branch.condition)[0]}:")
+            self._block(branch.code)
+            return
+        # WHILE с ELSIF повторяется, пока выполняется хотя бы одно условие
+        self._emit("while True:")
+        self._indent += 1
+        keyword = "if"
+        for branch in statement.branches:
+            self._emit(f"{keyword} {self._expression(branch.condition)[0]}:")
+            self._block(branch.code)
+            keyword = "elif"
+        self._emit("else:")
+        self._emit(_INDENT + "break")
+        self._indent -= 1
+
+    def _assigns(self, statements: list[Statement], entity) -> bool:
+        for node in walk(statements):
+            if type(node) is Assignment and node.var.entity is entity:
+                return True
+            if type(node) in (ProcedureCall, FunctionCall):
+                for actual in node.actual_parameters:
+                    if actual.by_ref and type(actual.code) is Designator and actual.code.entity is entity:
+                        return True
+        return False
+
+    def _for(self, statement: FOR):
+        variable = statement.variable
+        step = statement.step.literal if statement.step is not None else 1
+        start = self._temporary()
+        limit = self._temporary()
+        self._emit(f"{start} = {self._expression(statement.start)[0]}")
+        self._emit(f"{limit} = {self._expression(statement.end)[0]}")
+        python_name = self._locals.get(id(variable.entity))
+        if python_name is not None and id(variable.entity) not in self._cells \
+                and id(variable.entity) not in self._by_ref and not self._assigns(statement.code, variable.entity):
+            # счетчик - обычная локальная переменная, которую тело не меняет:
+            # цикл по range, после цикла счетчик получает значение, как в Обероне
+            bound = f"{limit} + 1" if step > 0 else f"{limit} - 1"
+            self._emit(f"for {python_name} in range({start}, {bound}, {step}):")
+            self._block(statement.code)
+            # последнее приращение счетчика может выйти за INTEGER, как в ВМ
+            if step > 0:
+                self._emit(f"{python_name} = {start} if {start} > {limit} else "
+                           f"_int({start} + (({limit} - {start}) // {step} + 1) * {step})")
+            else:
+                self._emit(f"{python_name} = {start} if {start} < {limit} else "
+                           f"_int({start} + (({start} - {limit}) // {-step} + 1) * {step})")
+            return
+        self._assign(variable, start)
+        value = self._designator(variable)[0]
+        self._emit(f"while {value} {'<=' if step > 0 else '>='} {limit}:")
+        self._indent += 1
+        self._statements(statement.code)
+        self._assign(variable, f"_int({self._designator(variable)[0]} + {step})")
+        self._indent -= 1
+
+    def _case(self, statement: CASE):
+        labels = [label.value for branch in statement.branches for label in branch.labels]
+        type_case = any(isinstance(label, OberonType) for label in labels)
+        value = self._temporary()
+        self._emit(f"{value} = {self._expression(statement.expression)[0]}")
+        keyword = "if"
+        for branch in statement.branches:
+            conditions = []
+            for label in branch.labels:
+                label_value = label.value
+                if type_case:
+                    conditions.append(f"_is({value}, {self._descriptor(label_value)})")
+                elif isinstance(label_value, IntRange):
+                    conditions.append(f"{label_value.start!r} <= {value} <= {label_value.end!r}")
+                else:
+                    conditions.append(f"{value} == {label_value!r}")
+            self._emit(f"{keyword} {' or '.join(conditions)}:")
+            keyword = "elif"
+            if type_case:
+                entity = statement.expression.entity
+                previous = self._type_overrides.get(id(entity))
+                self._type_overrides[id(entity)] = branch.labels[0].value
+                self._block(branch.code)
+                if previous is None:
+                    del self._type_overrides[id(entity)]
+                else:
+                    self._type_overrides[id(entity)] = previous
+            else:
+                self._block(branch.code)
+        if statement.branches:
+            self._emit("else:")
+            self._emit(_INDENT + f"_trap({_CASE_TRAP!r})")
+        else:
+            self._emit(f"_trap({_CASE_TRAP!r})")
+
+    ######################################################
+    #                  ПЕРЕМЕННЫЕ                        #
+    ######################################################
+
+    def _variable(self, entity) -> str:
+        key = id(entity)
+        name = self._locals.get(key)
+        if name is None:
+            name = self._globals.get(key)
+            if name is None:
+                self._error(f"переменная {getattr(entity, 'name', '')} недоступна во время исполнения")
+        if key in self._cells or key in self._by_ref:
+            return f"{name}.cell_contents"
+        return name
+
+    def _designator(self, designator: Designator) -> tuple[str, OberonType | None]:
+        result, result_type, _ = self._selected(designator)
+        return result, result_type
+
+    # item - (контейнер, индекс) последнего выбранного элемента или поля
+    def _selected(self, designator: Designator) -> tuple[str, OberonType | None, tuple[str, str] | None]:
+        entity = designator.entity
+        if isinstance(entity, Procedure):
+            if designator.name.child_name is not None or isinstance(entity, StandardProcedure):
+                self._error(f"процедуру {identifier_to_str(designator.name)} нельзя использовать как значение")
+            return self._procedure_names[id(entity)], entity.head.procedure_type, None
+        if isinstance(entity, OberonType):
+            self._error(f"тип {identifier_to_str(designator.name)} использован как значение")
+        if isinstance(entity, Constant):
+            result = repr(entity.value)
+        else:
+            result = self._variable(entity)
+        current_type = self._entity_type(entity)
+        item = None
+        for selector in designator.selectors:
+            match selector:
+                case IndexSelector():
+                    for index in selector.indexes:
+                        index_text = self._expression(index)[0]
+                        if isinstance(current_type, ArrayType) and current_type.size is not None:
+                            item = (result, f"_index({index_text}, {current_type.size})")
+                        else:
+                            # длина открытого массива известна только при
+                            # исполнении: контейнер вычисляется один раз
+                            container = self._temporary()
+                            item = (f"({container} := {result})", f"_index({index_text}, len({container}))")
+                        result = f"{item[0]}[{item[1]}]"
+                        current_type = current_type.element_type if isinstance(current_type, ArrayType) else None
+                case FieldSelector():
+                    if isinstance(current_type, PointerType):
+                        # неявное разыменование p.f
+                        result = f"_deref({result})"
+                    index, current_type = self._field_index(_record_of(current_type), selector.field_name)
+                    item = (result, str(index))
+                    result = f"{result}[{index}]"
+                case DereferenceSelector():
+                    result = f"_deref({result})"
+                    current_type = _record_of(current_type)
+                case TypeGuardSelector():
+                    if selector.guard_type is None:
+                        self._error(f"неизвестный тип {identifier_to_str(selector.type_name)}")
+                    result = f"_guard({result}, {self._descriptor(selector.guard_type)})"
+                    current_type = selector.guard_type
+        return result, current_type, item
+
+    def _assign(self, designator: Designator, value: str):
+        target, target_type = self._designator(designator)
+        if is_structured(target_type):
+            self._emit(f"_copy({target}, {value}, {self._shape(target_type)})")
+            return
+        if not designator.selectors:
+            name = self._globals.get(id(designator.entity))
+            if name is not None and id(designator.entity) not in self._cells:
+                self._assigned_globals.add(name)
+        self._emit(f"{target} = {value}")
+
+    # текст ссылки и тип переменной
+    def _reference(self, expression: AstNode) -> tuple[str, OberonType | None]:
+        if type(expression) is not Designator:
+            self._error("параметр VAR должен быть переменной")
+        value, value_type, item = self._selected(expression)
+        if is_structured(value_type):
+            return value, value_type
+        if not expression.selectors:
+            key = id(expression.entity)
+            return self._locals.get(key) or self._globals.get(key), value_type
+        # адрес элемента массива или поля записи
+        return f"ItemReference({item[0]}, {item[1]})", value_type
+
+    ######################################################
+    #                  ВЫРАЖЕНИЯ                         #
+    ######################################################
+
+    # Выражение переводится без рекурсии, как в bytecode_compiler;
+    # каждая операция берется в скобки. Результат - текст и статический тип
+    def _expression(self, expression: AstNode) -> tuple[str, OberonType | None]:
+        results: list[tuple[str, OberonType | None]] = []
+        tasks: list[tuple[AstNode, bool]] = [(expression, False)]
+        while tasks:
+            node, operands_ready = tasks.pop()
+            node_type = type(node)
+            if node_type is BinaryOperation:
+                if node.value == Operation.IS:
+                    if not operands_ready:
+                        tasks.append((node, True))
+                        tasks.append((node.left, False))
+                        continue
+                    left = results.pop()[0]
+                    tested_type = node.right.entity if type(node.right) is Designator else None
+                    if not isinstance(tested_type, OberonType):
+                        self._error("справа от IS ожидался тип")
+                    results.append((f"_is({left}, {self._descriptor(tested_type)})", BOOLEAN_TYPE))
+                    continue
+                if not operands_ready:
+                    tasks.append((node, True))
+                    tasks.append((node.right, False))
+                    tasks.append((node.left, False))
+                    continue
+                right = results.pop()
+                left = results.pop()
+                results.append(self._binary(node.value, left, right))
+            elif node_type is UnaryOperation:
+                if not operands_ready:
+                    tasks.append((node, True))
+                    tasks.append((node.operand, False))
+                    continue
+                operand, operand_type = results.pop()
+                if node.value == Operation.LOGICAL_NOT:
+                    results.append((f"(not {operand})", BOOLEAN_TYPE))
+                elif node.value == Operation.minus:
+                    if operand_type is SET_TYPE:
+                        results.append((f"(_FULL_SET - {operand})", SET_TYPE))
+                    elif operand_type is REAL_TYPE:
+                        results.append((f"(-{operand})", operand_type))
+                    else:
+                        results.append((f"_int(-{operand})", operand_type))
+                else:
+                    results.append((operand, operand_type))
+            else:
+                results.append(self._operand(node))
+        return results[0]
+
+    def _binary(self, operation: Operation, left: tuple, right: tuple) -> tuple[str, OberonType | None]:
+        left_text, left_type = left
+        right_text, right_type = right
+        if operation in _RELATIONS:
+            if _is_text(left_type) or _is_text(right_type):
+                left_text = f"_text({left_text})"
+                right_text = f"_text({right_text})"
+            elif operation in (Operation.equal, Operation.unequal) and (
+                    _is_reference_type(left_type) or _is_reference_type(right_type)):
+                # указатели и процедуры сравниваются по ссылке
+                operator = "is" if operation == Operation.equal else "is not"
+                return f"({left_text} {operator} {right_text})", BOOLEAN_TYPE
+            return f"({left_text} {_OPERATORS[operation]} {right_text})", BOOLEAN_TYPE
+        if operation in (Operation.IN, Operation.LOGICAL_AND, Operation.LOGICAL_OR):
+            return f"({left_text} {_OPERATORS[operation]} {right_text})", BOOLEAN_TYPE
+        if left_type is SET_TYPE or right_type is SET_TYPE:
+            operator = _SET_OPERATORS.get(operation)
+            if operator is None:
+                self._error(f"операция {operation.value} неприменима к множествам")
+            return f"({left_text} {operator} {right_text})", SET_TYPE
+        operator = _OPERATORS.get(operation)
+        if operator is None:
+            self._error(f"неподдерживаемая операция {operation.value}")
+        result_type = REAL_TYPE if operation == Operation.divide else (left_type or right_type)
+        if result_type is REAL_TYPE or operation == Operation.MOD:
+            return f"({left_text} {operator} {right_text})", result_type
+        return f"_int({left_text} {operator} {right_text})", result_type
+
+    def _operand(self, node: AstNode) -> tuple[str, OberonType | None]:
+        match node:
+            case LiteralValue():
+                return repr(node.literal), constant_type(node.literal)
+            case Designator():
+                return self._designator(node)
+            case FunctionCall():
+                return self._call(node.procedure, node.actual_parameters)
+            case SetConstructor():
+                parts = []
+                for element in node.elements:
+                    if type(element) is SetRange:
+                        parts.append(f"_set_range({self._expression(element.low)[0]}, "
+                                     f"{self._expression(element.high)[0]})")
+                    else:
+                        parts.append(f"_set_element({self._expression(element)[0]})")
+                return "(" + " | ".join(["frozenset()"] + parts) + ")", SET_TYPE
+            case _:
+                self._error(f"неподдерживаемое выражение {type(node).__name__}")
+
+    ######################################################
+    #                  ВЫЗОВЫ                            #
+    ######################################################
+
+    def _arguments(self, parameters: list[ProcedureParameter],
+                   actual_parameters: list[ProcedureActualParameterCalculation], name: str) -> str:
+        if len(parameters) != len(actual_parameters):
+            self._error(f"неверное число параметров при вызове {name}")
+        arguments = []
+        for number, (parameter, actual) in enumerate(zip(parameters, actual_parameters), 1):
+            expression = actual.code
+            actual_type = None
+            if parameter.by_ref:
+                argument, actual_type = self._reference(expression)
+            elif type(expression) is LiteralValue and isinstance(expression.literal, str) \
+                    and isinstance(parameter.param_type, ArrayType):
+                # строка, переданная как ARRAY OF CHAR, - массив символов
+                argument = self._constant(repr(list(expression.literal) + ["\0"]))
+            else:
+                argument, actual_type = self._expression(expression)
+            if not TYPES.parameter_compatible(parameter, _value_type(expression, actual_type)):
+                self._error(f"несовместимый тип параметра {number} при вызове {name}")
+            arguments.append(argument)
+        return ", ".join(arguments)
+
+    def _call(self, designator: Designator,
+              actual_parameters: list[ProcedureActualParameterCalculation]) -> tuple[str, OberonType | None]:
+        entity = designator.entity
+        name = identifier_to_str(designator.name)
+        if isinstance(entity, StandardProcedure):
+            return self._standard_function(entity.head.name.name, actual_parameters)
+        if isinstance(entity, Procedure):
+            procedure_type = entity.head.procedure_type
+            arguments = self._arguments(procedure_type.parameters, actual_parameters, name)
+            if designator.name.child_name is not None:
+                module_name = self._parser.imported_modules[designator.name.parent_name]
+                function = self._external(module_name, designator.name.child_name)
+            else:
+                function = self._procedure_names[id(entity)]
+            result_type = None if _is_no_return(procedure_type.return_type) else procedure_type.return_type
+            return f"{function}({arguments})", result_type
+        function, procedure_type = self._designator(designator)
+        if not isinstance(procedure_type, ProcedureType):
+            self._error(f"{name} не является процедурой")
+        arguments = self._arguments(procedure_type.parameters, actual_parameters, name)
+        result_type = None if _is_no_return(procedure_type.return_type) else procedure_type.return_type
+        return f"_call({function}{', ' if arguments else ''}{arguments})", result_type
+
+    def _standard_function(self, name: str,
+                           actual_parameters: list[ProcedureActualParameterCalculation]) -> tuple[str, OberonType | None]:
+        arguments = [self._expression(actual.code) for actual in actual_parameters]
+        texts = [argument[0] for argument in arguments]
+        if name == "ABS" and len(arguments) == 1:
+            if arguments[0][1] is REAL_TYPE:
+                return f"abs({texts[0]})", REAL_TYPE
+            return f"_int(abs({texts[0]}))", arguments[0][1]
+        if name == "ODD" and len(arguments) == 1:
+            return f"({texts[0]} % 2 == 1)", BOOLEAN_TYPE
+        if name == "FLT" and len(arguments) == 1:
+            return f"float({texts[0]})", REAL_TYPE
+        if name == "CHR" and len(arguments) == 1:
+            return f"chr({texts[0]})", CHAR_TYPE
+        if name == "ORD" and len(arguments) == 1 and arguments[0][1] is CHAR_TYPE:
+            return f"ord({texts[0]})", INTEGER_TYPE
+        if name == "LEN" and len(arguments) == 1 and isinstance(arguments[0][1], ArrayType) \
+                and not isinstance(arguments[0][1], StringType):
+            return f"len({texts[0]})", INTEGER_TYPE
+        result_type = REAL_TYPE if name == "FLT" else BOOLEAN_TYPE if name == "ODD" else \
+            CHAR_TYPE if name == "CHR" else INTEGER_TYPE
+        return f"_{name}({', '.join(texts)})", result_type
+
+    def _standard_procedure(self, name: str, actual_parameters: list[ProcedureActualParameterCalculation]):
+        arguments = [actual.code for actual in actual_parameters]
+        if not arguments:
+            self._error(f"неверное число параметров при вызове {name}")
+        variable = arguments[0]
+        if name in ("INC", "DEC", "INCL", "EXCL", "NEW", "PACK", "UNPK") and type(variable) is not Designator:
+            self._error(f"первый параметр {name} должен быть переменной")
+        if name in ("INC", "DEC"):
+            step = self._expression(arguments[1])[0] if len(arguments) > 1 else "1"
+            value = self._designator(variable)[0]
+            self._assign(variable, f"_int({value} {'+' if name == 'INC' else '-'} {step})")
+        elif name in ("INCL", "EXCL"):
+            value = self._designator(variable)[0]
+            element = f"_set_element({self._expression(arguments[1])[0]})"
+            self._assign(variable, f"{value} {'|' if name == 'INCL' else '-'} {element}")
+        elif name == "NEW":
+            pointer_type = self._designator(variable)[1]
+            if not isinstance(pointer_type, PointerType) or not isinstance(pointer_type.type_of_pointer, RecordType):
+                self._error("параметр NEW должен быть указателем на запись")
+            self._assign(variable, f"_new({self._shape(pointer_type.type_of_pointer)})")
+        elif name == "ASSERT":
+            self._emit(f"_assert({self._expression(variable)[0]})")
+        elif name == "PACK":
+            value = self._designator(variable)[0]
+            self._assign(variable, f"_ldexp({value}, {self._expression(arguments[1])[0]})")
+        elif name == "UNPK":
+            if type(arguments[1]) is not Designator:
+                self._error("второй параметр UNPK должен быть переменной")
+            mantissa = self._temporary()
+            exponent = self._temporary()
+            self._emit(f"{mantissa}, {exponent} = _unpk({self._designator(variable)[0]})")
+            self._assign(variable, mantissa)
+            self._assign(arguments[1], exponent)
+        else:
+            self._error(f"неподдерживаемая стандартная процедура {name}")
+
+
+def translate_module(parser: Parser) -> str:
+    return PythonTranspiler(parser).translate()
+
+
+# Загруженный модуль: пространство имен, в котором выполнен
+# оттранслированный код, и его процедуры как функции Python
+class PythonModule:
+    def __init__(self, code: types.CodeType, output=None, library: dict[str, dict] | None = None) -> None:
+        if library is None:
+            library = {"Log": log_library(output if output is not None else sys.stdout)}
+        self._namespace = _runtime_namespace(library)
+        exec(code, self._namespace)
+        self.procedures: dict[str, types.FunctionType] = self._namespace["_PROCEDURES"]
+
+    def run(self):
+        return self._guarded(self._namespace["_body"])
+
+    def call(self, name: str, *arguments):
+        function = self.procedures.get(name)
+        if function is None:
+            raise Exception(f"нет процедуры {name}")
+        return self._guarded(function, *arguments)
+
+    def _guarded(self, function, *arguments):
+        # ошибки Python во время исполнения - аварийные остановы программы
+        try:
+            return function(*arguments)
+        except ZeroDivisionError:
+            raise OberonTrap("деление на ноль") from None
+        except IndexError:
+            raise OberonTrap("индекс вне границ массива") from None
+        except RecursionError:
+            raise OberonTrap("слишком глубокая рекурсия") from None
+
+
+PYTHON_CACHE_TAG = "python"
+
+# оттранслированный код в памяти процесса: ключ кеша -> объект кода
+_code_objects: dict[str, types.CodeType] = dict()
+
+
+# Ключ, как и в build.py, учитывает интерфейсы импортируемых модулей:
+# оттранслированный код подставляет их константы и зависит от их типов.
+# Формат marshal объекта кода зависит от версии CPython, поэтому в
+# ключ входит и магическое число байт-кода интерпретатора
+def source_cache_key(program: str, symbol_paths: list[str] | None = None) -> str:
+    source_hash = hashlib.sha256(program.encode()).hexdigest()
+    _, imports = scan_module_header(program)
+    imported_interface_hashes = [(name, interface_hash(name, symbol_paths or [])) for name in set(imports)]
+    python_tag = (PYTHON_CACHE_TAG, importlib.util.MAGIC_NUMBER.hex())
+    return make_cache_key(source_hash, imported_interface_hashes + [python_tag])
+
+
+# Трансляция с кешем по хешу исходного текста и интерфейсов импорта:
+# сначала в памяти, затем на диске (объект кода в формате marshal),
+# иначе разбор и трансляция
+def load_code(program: str, symbol_paths: list[str] | None = None,
+              cache: CompilationCache | None = None) -> types.CodeType:
+    key = source_cache_key(program, symbol_paths)
+    code = _code_objects.get(key)
+    if code is not None:
+        return code
+    if cache is not None:
+        data = cache.get(key)
+        if data is not None:
+            try:
+                code = marshal.loads(data)
+            except (EOFError, ValueError, TypeError):
+                code = None
+    if code is None:
+        parser = Parser(program, symbol_paths=symbol_paths)
+        source = translate_module(parser)
+        try:
+            code = compile(source, f"<оберон {parser.module_name}>", "exec")
+        except (SyntaxError, RecursionError, MemoryError):
+            raise Exception(f"{parser.module_name}: модуль слишком сложен для трансляции в Python")
+        if cache is not None:
+            cache.put(key, marshal.dumps(code))
+    _code_objects[key] = code
+    return code
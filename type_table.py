@@ -0,0 +1,179 @@
+from oberon_types import *
+from universe import BASIC_TYPES
+
+
+# Хеш-консинг типов: для каждой структуры типа хранится ровно один
+# канонический неизменяемый экземпляр, поэтому проверка равенства
+# типов сводится к сравнению канонических экземпляров через is.
+# Массивы, указатели и процедурные типы сравниваются структурно,
+# записи - по имени (каждое объявление RECORD - отдельный тип).
+# Таблица общая для всех экземпляров Parser, как и UNIVERSE.
+#
+# Ключ структуры строится из id канонических составляющих; сами
+# составляющие удерживает канонический экземпляр, поэтому id не
+# переиспользуются, пока ключ находится в таблице.
+
+class TypeTable:
+    def __init__(self) -> None:
+        self._structural: dict[tuple, OberonType] = dict()
+        self.nil = self._freeze(OberonType(None, Identifier("NIL", False)))
+        self.no_return = self._freeze(NoReturnType(None, None))
+        for basic_type in BASIC_TYPES.values():
+            self._freeze(basic_type)
+        self._char = BASIC_TYPES[BasicTypesEnum.CHAR]
+        # совместимость по присваиванию базовых типов вычисляется заранее,
+        # для остальных пар запоминается при первой проверке.
+        # Значение - (тип переменной, тип выражения, результат): ссылки
+        # на типы не дают переиспользовать id из ключа
+        self._assignment: dict[tuple[int, int], tuple[OberonType, OberonType, bool]] = dict()
+        self._parameter: dict[tuple[int, int, bool], tuple[OberonType, OberonType, bool]] = dict()
+        integer_types = (BASIC_TYPES[BasicTypesEnum.INTEGER], BASIC_TYPES[BasicTypesEnum.BYTE])
+        for variable_type in BASIC_TYPES.values():
+            for expression_type in BASIC_TYPES.values():
+                compatible = variable_type is expression_type or (
+                    variable_type in integer_types and expression_type in integer_types)
+                self._assignment[(id(variable_type), id(expression_type))] = (variable_type, expression_type, compatible)
+
+    def _freeze(self, oberon_type: OberonType) -> OberonType:
+        object.__setattr__(oberon_type, "canonical_type", oberon_type)
+        object.__setattr__(oberon_type, "_interned", True)
+        return oberon_type
+
+    def _intern(self, key: tuple, make) -> OberonType:
+        canonical = self._structural.get(key)
+        if canonical is None:
+            canonical = self._freeze(make())
+            self._structural[key] = canonical
+        return canonical
+
+    def array(self, element_type: OberonType | None, size: int | None) -> ArrayType:
+        element_type = self.canonical(element_type)
+        return self._intern(("ARRAY", id(element_type), size),
+                            lambda: ArrayType(None, None, element_type, size))
+
+    def string(self, length: int) -> StringType:
+        return self._intern(("STRING", length), lambda: StringType(None, None, self._char, length))
+
+    def pointer(self, type_of_pointer: OberonType | None) -> PointerType:
+        type_of_pointer = self.canonical(type_of_pointer)
+        return self._intern(("POINTER", id(type_of_pointer)),
+                            lambda: PointerType(None, None, type_of_pointer))
+
+    def procedure(self, return_type: OberonType | None, parameters: list[ProcedureParameter]) -> ProcedureType:
+        # имена параметров не входят в тип процедуры
+        if return_type is NoReturnType or isinstance(return_type, NoReturnType):
+            return_type = self.no_return
+        else:
+            return_type = self.canonical(return_type)
+        parameters = [ProcedureParameter("", self.canonical(parameter.param_type), parameter.by_ref)
+                      for parameter in parameters]
+        key = ("PROCEDURE", id(return_type),
+               tuple((id(parameter.param_type), parameter.by_ref) for parameter in parameters))
+        return self._intern(key, lambda: ProcedureType(None, None, return_type, parameters))
+
+    def canonical(self, oberon_type: OberonType | None) -> OberonType | None:
+        if oberon_type is None:
+            return None
+        if oberon_type is NoReturnType:
+            # класс NoReturnType используется и как значение
+            return self.no_return
+        canonical = oberon_type.canonical_type
+        if canonical is not None:
+            return canonical
+        if isinstance(oberon_type, PointerType) and oberon_type.type_of_pointer is None:
+            # указатель, базовый тип которого объявлен ниже в разделе TYPE:
+            # до разрешения ссылки он не интернируется, иначе все такие
+            # указатели стали бы одним типом pointer(None)
+            return oberon_type
+        if isinstance(oberon_type, StringType):
+            canonical = self.string(oberon_type.size)
+        elif isinstance(oberon_type, ArrayType):
+            canonical = self.array(oberon_type.element_type, oberon_type.size)
+        elif isinstance(oberon_type, PointerType):
+            canonical = self.pointer(oberon_type.type_of_pointer)
+        elif isinstance(oberon_type, ProcedureType):
+            canonical = self.procedure(oberon_type.return_type, oberon_type.parameters)
+        elif isinstance(oberon_type, NoReturnType):
+            canonical = self.no_return
+        else:
+            # записи и прочие именованные типы - сами себе канонические
+            canonical = oberon_type
+        oberon_type.canonical_type = canonical
+        return canonical
+
+    def same_type(self, first: OberonType | None, second: OberonType | None) -> bool:
+        return self.canonical(first) is self.canonical(second)
+
+    def is_extension(self, extension: OberonType | None, base: OberonType | None) -> bool:
+        # запись является расширением самой себя
+        base = self.canonical(base)
+        extension = self.canonical(extension)
+        while extension is not None:
+            if extension is base:
+                return True
+            if not isinstance(extension, RecordType):
+                return False
+            extension = self.canonical(extension.base_type)
+        return False
+
+    def assignment_compatible(self, variable_type: OberonType | None, expression_type: OberonType | None) -> bool:
+        variable_type = self.canonical(variable_type)
+        expression_type = self.canonical(expression_type)
+        # неразрешенные типы (None) совместимы со всеми, чтобы не
+        # порождать ложных ошибок
+        if variable_type is expression_type or variable_type is None or expression_type is None:
+            return True
+        key = (id(variable_type), id(expression_type))
+        cached = self._assignment.get(key)
+        if cached is not None:
+            return cached[2]
+        compatible = self._check_assignment(variable_type, expression_type)
+        self._assignment[key] = (variable_type, expression_type, compatible)
+        return compatible
+
+    def _check_assignment(self, variable_type: OberonType, expression_type: OberonType) -> bool:
+        if expression_type is self.nil:
+            return isinstance(variable_type, (PointerType, ProcedureType))
+        if isinstance(expression_type, StringType):
+            if variable_type is self._char:
+                return expression_type.size == 2
+            return (isinstance(variable_type, ArrayType) and variable_type.element_type is self._char
+                    and variable_type.size is not None and expression_type.size <= variable_type.size)
+        if isinstance(variable_type, RecordType) and isinstance(expression_type, RecordType):
+            return self.is_extension(expression_type, variable_type)
+        if isinstance(variable_type, PointerType) and isinstance(expression_type, PointerType):
+            return self.is_extension(expression_type.type_of_pointer, variable_type.type_of_pointer)
+        return False
+
+    def _array_compatible(self, formal_type: OberonType, actual_type: OberonType) -> bool:
+        # открытый массив принимает любой массив с совместимыми элементами
+        while formal_type is not actual_type:
+            if not (isinstance(formal_type, ArrayType) and formal_type.size is None
+                    and isinstance(actual_type, ArrayType)):
+                return False
+            formal_type = formal_type.element_type
+            actual_type = actual_type.element_type
+        return True
+
+    def parameter_compatible(self, parameter: ProcedureParameter, actual_type: OberonType | None) -> bool:
+        formal_type = self.canonical(parameter.param_type)
+        actual_type = self.canonical(actual_type)
+        if formal_type is actual_type or formal_type is None or actual_type is None:
+            return True
+        key = (id(formal_type), id(actual_type), parameter.by_ref)
+        cached = self._parameter.get(key)
+        if cached is not None:
+            return cached[2]
+        if self._array_compatible(formal_type, actual_type):
+            compatible = True
+        elif parameter.by_ref:
+            # VAR-параметр записи принимает расширение записи
+            compatible = (isinstance(formal_type, RecordType) and isinstance(actual_type, RecordType)
+                          and self.is_extension(actual_type, formal_type))
+        else:
+            compatible = self.assignment_compatible(formal_type, actual_type)
+        self._parameter[key] = (formal_type, actual_type, compatible)
+        return compatible
+
+
+TYPES = TypeTable()
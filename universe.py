@@ -0,0 +1,57 @@
+from types import MappingProxyType
+
+from nametable import *
+
+
+# Область видимости предопределенных имен Оберона-07. Строится один раз
+# при импорте модуля и разделяется всеми экземплярами Parser, поэтому
+# у каждого базового типа ровно один объект.
+
+def _make_basic_type(basic_type: BasicTypesEnum) -> BasicType:
+    return BasicType(None, Identifier(basic_type.value[0], False), basic_type)
+
+
+BASIC_TYPES: MappingProxyType[BasicTypesEnum, BasicType] = MappingProxyType({
+    basic_type: _make_basic_type(basic_type) for basic_type in BasicTypesEnum
+})
+
+BOOLEAN_TYPE = BASIC_TYPES[BasicTypesEnum.BOOLEAN]
+CHAR_TYPE = BASIC_TYPES[BasicTypesEnum.CHAR]
+INTEGER_TYPE = BASIC_TYPES[BasicTypesEnum.INTEGER]
+REAL_TYPE = BASIC_TYPES[BasicTypesEnum.REAL]
+BYTE_TYPE = BASIC_TYPES[BasicTypesEnum.BYTE]
+SET_TYPE = BASIC_TYPES[BasicTypesEnum.SET]
+
+
+# функции-процедуры (возвращают значение)
+STANDARD_FUNCTIONS = ("ABS", "ODD", "LEN", "LSL", "ASR", "ROR",
+                      "FLOOR", "FLT", "ORD", "CHR")
+# собственно процедуры
+STANDARD_PROCEDURES = ("INC", "DEC", "INCL", "EXCL", "NEW", "ASSERT",
+                       "PACK", "UNPK")
+
+_VAR_PARAMETERS = {
+    "INC": (0,), "DEC": (0,), "INCL": (0,), "EXCL": (0,), "NEW": (0,),
+    "PACK": (0,), "UNPK": (0, 1),
+}
+
+
+class StandardProcedure(Procedure):
+    def __init__(self, name: str, is_function: bool) -> None:
+        super().__init__(ProcedureHead(None, Identifier(name, False)), ProcedureBody())
+        self.is_function = is_function
+        # номера параметров, передаваемых по ссылке (VAR)
+        self.var_parameters: tuple[int, ...] = _VAR_PARAMETERS.get(name, ())
+
+
+def _build_universe() -> MappingProxyType[str, NameTableEntry]:
+    entries: dict[str, NameTableEntry] = dict()
+    for basic_type in BASIC_TYPES.values():
+        entries[basic_type.type_name.name] = NameTableEntry(basic_type.type_name, basic_type)
+    for name in STANDARD_FUNCTIONS + STANDARD_PROCEDURES:
+        identifier = Identifier(name, False)
+        entries[name] = NameTableEntry(identifier, StandardProcedure(name, name in STANDARD_FUNCTIONS))
+    return MappingProxyType(entries)
+
+
+UNIVERSE = _build_universe()
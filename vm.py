@@ -0,0 +1,564 @@
+import math
+import sys
+
+from bytecode import *
+from constant_folding import INTEGER_MAX, INTEGER_MIN
+from type_table import TYPES
+from universe import BOOLEAN_TYPE, CHAR_TYPE, REAL_TYPE, SET_TYPE
+
+
+# Стековая виртуальная машина для байт-кода из bytecode_compiler.
+# Стек операндов общий для всех вызовов, кадр процедуры - список ее
+# локальных переменных (сначала параметры). Команды выбираются цепочкой
+# сравнений, упорядоченной по частоте команд в циклах.
+#
+# Результат целочисленной операции вне диапазона INTEGER - аварийный
+# останов, как и при вычислении константы (см. constant_folding.py).
+# ADD, SUB, MUL и NEG применяются и к REAL, поэтому проверка диапазона
+# касается только результатов типа int.
+
+_LOAD_CONST = int(Opcode.LOAD_CONST)
+_PUSH_INT = int(Opcode.PUSH_INT)
+_LOAD_LOCAL = int(Opcode.LOAD_LOCAL)
+_STORE_LOCAL = int(Opcode.STORE_LOCAL)
+_LOAD_GLOBAL = int(Opcode.LOAD_GLOBAL)
+_STORE_GLOBAL = int(Opcode.STORE_GLOBAL)
+_LOAD_REF = int(Opcode.LOAD_REF)
+_STORE_REF = int(Opcode.STORE_REF)
+_LOAD_FRAME = int(Opcode.LOAD_FRAME)
+_LOAD_GLOBALS = int(Opcode.LOAD_GLOBALS)
+_UNPACK_REF = int(Opcode.UNPACK_REF)
+_MAKE_REF = int(Opcode.MAKE_REF)
+_LOAD_INDEX = int(Opcode.LOAD_INDEX)
+_LOAD_FIELD = int(Opcode.LOAD_FIELD)
+_STORE_ITEM = int(Opcode.STORE_ITEM)
+_STORE_COPY = int(Opcode.STORE_COPY)
+_POP = int(Opcode.POP)
+_ADD = int(Opcode.ADD)
+_SUB = int(Opcode.SUB)
+_MUL = int(Opcode.MUL)
+_DIVIDE = int(Opcode.DIVIDE)
+_DIV = int(Opcode.DIV)
+_MOD = int(Opcode.MOD)
+_NEG = int(Opcode.NEG)
+_NOT = int(Opcode.NOT)
+_SET_UNION = int(Opcode.SET_UNION)
+_SET_INTERSECTION = int(Opcode.SET_INTERSECTION)
+_SET_SYMMETRIC_DIFFERENCE = int(Opcode.SET_SYMMETRIC_DIFFERENCE)
+_SET_COMPLEMENT = int(Opcode.SET_COMPLEMENT)
+_SET_ADD_ELEMENT = int(Opcode.SET_ADD_ELEMENT)
+_SET_ADD_RANGE = int(Opcode.SET_ADD_RANGE)
+_SET_DIFFERENCE = int(Opcode.SET_DIFFERENCE)
+_EQ = int(Opcode.EQ)
+_NE = int(Opcode.NE)
+_LT = int(Opcode.LT)
+_LE = int(Opcode.LE)
+_GT = int(Opcode.GT)
+_GE = int(Opcode.GE)
+_IN = int(Opcode.IN)
+_IS = int(Opcode.IS)
+_STR_COMPARE = int(Opcode.STR_COMPARE)
+_TYPE_GUARD = int(Opcode.TYPE_GUARD)
+_JUMP = int(Opcode.JUMP)
+_JUMP_IF_FALSE = int(Opcode.JUMP_IF_FALSE)
+_JUMP_IF_TRUE = int(Opcode.JUMP_IF_TRUE)
+_JUMP_IF_FALSE_OR_POP = int(Opcode.JUMP_IF_FALSE_OR_POP)
+_JUMP_IF_TRUE_OR_POP = int(Opcode.JUMP_IF_TRUE_OR_POP)
+_CASE_JUMP = int(Opcode.CASE_JUMP)
+_CALL = int(Opcode.CALL)
+_CALL_VALUE = int(Opcode.CALL_VALUE)
+_CALL_EXTERNAL = int(Opcode.CALL_EXTERNAL)
+_CALL_BUILTIN = int(Opcode.CALL_BUILTIN)
+_RETURN = int(Opcode.RETURN)
+_RETURN_NONE = int(Opcode.RETURN_NONE)
+_NEW_RECORD = int(Opcode.NEW_RECORD)
+_ASSERT = int(Opcode.ASSERT)
+_TRAP = int(Opcode.TRAP)
+
+_FULL_SET = frozenset(range(32))
+# глубина вызовов, после которой исполнение прерывается
+MAX_CALL_DEPTH = 100000
+
+
+class OberonTrap(Exception):
+    pass
+
+
+def integer_overflow(value: int) -> OberonTrap:
+    return OberonTrap(f"переполнение: {value} вне диапазона INTEGER")
+
+
+def checked_integer(value):
+    if (value < INTEGER_MIN or value > INTEGER_MAX) and type(value) is int:
+        raise integer_overflow(value)
+    return value
+
+
+def make_value(oberon_type: OberonType | None):
+    if isinstance(oberon_type, BasicType):
+        if oberon_type is REAL_TYPE:
+            return 0.0
+        if oberon_type is BOOLEAN_TYPE:
+            return False
+        if oberon_type is CHAR_TYPE:
+            return "\0"
+        if oberon_type is SET_TYPE:
+            return frozenset()
+        return 0
+    if isinstance(oberon_type, ArrayType) and oberon_type.size is not None:
+        element_type = oberon_type.element_type
+        if is_structured(element_type):
+            return [make_value(element_type) for _ in range(oberon_type.size)]
+        return [make_value(element_type)] * oberon_type.size
+    if isinstance(oberon_type, RecordType):
+        return [oberon_type] + [make_value(field_type) for _, field_type in record_layout(oberon_type)]
+    # указатели, процедурные переменные и неразрешенные типы
+    return None
+
+
+def text(value) -> str:
+    # строка Оберона заканчивается на 0X
+    if isinstance(value, str):
+        return value
+    result = "".join(value)
+    end = result.find("\0")
+    return result if end < 0 else result[:end]
+
+
+# Присваивание массивов и записей копирует значение внутрь существующего
+# объекта, на который могут ссылаться указатели и параметры VAR.
+# Запись-расширение присваивается базовой записи по полям базы
+def copy_into(target: list, source, oberon_type: OberonType | None):
+    if isinstance(source, str):
+        if len(source) >= len(target):
+            raise OberonTrap("строка не помещается в массив")
+        target[:len(source)] = source
+        target[len(source)] = "\0"
+        return
+    if isinstance(oberon_type, ArrayType):
+        if len(source) > len(target):
+            raise OberonTrap("присваивание массива большей длины")
+        element_type = oberon_type.element_type
+        if is_structured(element_type):
+            for index, item in enumerate(source):
+                copy_into(target[index], item, element_type)
+        else:
+            target[:len(source)] = source
+        return
+    for index, (_, field_type) in enumerate(record_layout(oberon_type), 1):
+        if is_structured(field_type):
+            copy_into(target[index], source[index], field_type)
+        else:
+            target[index] = source[index]
+
+
+def _is_record_extension(value, record_type: OberonType) -> bool:
+    return TYPES.is_extension(value[0], record_type)
+
+
+def _to_signed(value: int) -> int:
+    value &= 0xFFFFFFFF
+    return value - 0x100000000 if value > 0x7FFFFFFF else value
+
+
+def _builtin_abs(x):
+    return checked_integer(abs(x))
+
+
+def _builtin_odd(x):
+    return x % 2 == 1
+
+
+def _builtin_lsl(x, n):
+    return checked_integer(x << n)
+
+
+def _builtin_asr(x, n):
+    return x >> n
+
+
+def _builtin_ror(x, n):
+    n %= 32
+    x &= 0xFFFFFFFF
+    return _to_signed((x >> n) | (x << (32 - n)))
+
+
+def _builtin_floor(x):
+    if not INTEGER_MIN <= x < INTEGER_MAX + 1:
+        raise OberonTrap(f"переполнение: FLOOR({x!r}) вне диапазона INTEGER")
+    return math.floor(x)
+
+
+def _builtin_flt(x):
+    return float(x)
+
+
+def _builtin_ord(x):
+    if isinstance(x, frozenset):
+        return _to_signed(sum(1 << element for element in x))
+    if isinstance(x, str):
+        return ord(x)
+    return int(x)
+
+
+def _builtin_chr(x):
+    return chr(x)
+
+
+def _builtin_len(x):
+    return len(x) + 1 if isinstance(x, str) else len(x)
+
+
+def _builtin_pack(reference, n):
+    container, index = reference
+    container[index] = math.ldexp(container[index], n)
+
+
+def _builtin_unpk(reference, exponent_reference):
+    container, index = reference
+    x = container[index]
+    if x == 0:
+        exponent = 0
+    else:
+        # frexp дает мантиссу в [0.5, 1), UNPK - в [1, 2)
+        x, exponent = math.frexp(x)
+        x, exponent = x * 2, exponent - 1
+    container[index] = x
+    exponent_container, exponent_index = exponent_reference
+    exponent_container[exponent_index] = exponent
+
+
+BUILTIN_FUNCTIONS = {
+    "ABS": _builtin_abs, "ODD": _builtin_odd, "LSL": _builtin_lsl, "ASR": _builtin_asr,
+    "ROR": _builtin_ror, "FLOOR": _builtin_floor, "FLT": _builtin_flt, "ORD": _builtin_ord,
+    "CHR": _builtin_chr, "LEN": _builtin_len, "PACK": _builtin_pack, "UNPK": _builtin_unpk,
+}
+_BUILTINS = tuple(BUILTIN_FUNCTIONS[name] for name in BUILTINS)
+
+
+# Реализация библиотечного модуля Log (см. lib/Log.oberon07)
+def log_library(output) -> dict:
+    return {
+        "Clear": lambda: None,
+        "Ln": lambda: output.write("\n"),
+        "String": lambda s: output.write(text(s)),
+        "Char": lambda ch: output.write(ch),
+        "Int": lambda x: output.write(str(x)),
+        "Real": lambda x: output.write(repr(x)),
+        "Bool": lambda b: output.write("TRUE" if b else "FALSE"),
+    }
+
+
+def _relation(opcode: int, left, right) -> bool:
+    if opcode == _EQ:
+        return left == right
+    if opcode == _NE:
+        return left != right
+    if opcode == _LT:
+        return left < right
+    if opcode == _LE:
+        return left <= right
+    if opcode == _GT:
+        return left > right
+    return left >= right
+
+
+class VM:
+    def __init__(self, module: BytecodeModule, output=None, library: dict[str, dict] | None = None) -> None:
+        if output is None:
+            output = sys.stdout
+        if library is None:
+            library = {"Log": log_library(output)}
+        self._module = module
+        self._constants = module.constants
+        self._functions = module.functions
+        # код исполняется из списков: индексирование списка быстрее, чем array
+        self._codes = [list(function.code) for function in module.functions]
+        self._function_indexes = {id(function): index for index, function in enumerate(module.functions)}
+        self.globals = [make_value(global_type) for global_type in module.global_types]
+        self._externals: dict[int, object] = dict()
+        for index, constant in enumerate(module.constants):
+            if isinstance(constant, ExternalProcedure):
+                procedure = library.get(constant.module_name, {}).get(constant.name)
+                if procedure is None:
+                    raise Exception(f"нет реализации процедуры {constant.module_name}.{constant.name}")
+                self._externals[index] = procedure
+
+    def run(self):
+        return self._execute(self._module.body, [])
+
+    def call(self, name: str, *arguments):
+        index = self._module.procedures.get(name)
+        if index is None:
+            raise Exception(f"в модуле {self._module.name} нет процедуры {name}")
+        function = self._functions[index]
+        if len(arguments) != function.parameters_count:
+            raise Exception(f"неверное число параметров при вызове {name}")
+        return self._execute(index, list(arguments))
+
+    def _new_frame(self, function_index: int, arguments: list) -> list:
+        local_types = self._functions[function_index].local_types
+        if local_types:
+            arguments.extend(make_value(local_type) for local_type in local_types)
+        return arguments
+
+    def _execute(self, function_index: int, arguments: list):
+        constants = self._constants
+        codes = self._codes
+        global_values = self.globals
+        stack = []
+        frames = []
+        code = codes[function_index]
+        frame = self._new_frame(function_index, arguments)
+        pc = 0
+        try:
+            while True:
+                opcode = code[pc]
+                argument = code[pc + 1]
+                pc += 2
+                if opcode == _LOAD_LOCAL:
+                    stack.append(frame[argument])
+                elif opcode == _PUSH_INT:
+                    stack.append(argument)
+                elif opcode == _STORE_LOCAL:
+                    frame[argument] = stack.pop()
+                elif opcode == _JUMP_IF_FALSE:
+                    if not stack.pop():
+                        pc = argument
+                elif opcode == _JUMP:
+                    pc = argument
+                elif opcode == _ADD:
+                    right = stack.pop()
+                    result = stack[-1] + right
+                    if (result > INTEGER_MAX or result < INTEGER_MIN) and type(result) is int:
+                        raise integer_overflow(result)
+                    stack[-1] = result
+                elif opcode == _LOAD_INDEX:
+                    index = stack.pop()
+                    if index < 0:
+                        raise IndexError(index)
+                    stack[-1] = stack[-1][index]
+                elif opcode == _LE:
+                    right = stack.pop()
+                    stack[-1] = stack[-1] <= right
+                elif opcode == _LT:
+                    right = stack.pop()
+                    stack[-1] = stack[-1] < right
+                elif opcode == _SUB:
+                    right = stack.pop()
+                    result = stack[-1] - right
+                    if (result > INTEGER_MAX or result < INTEGER_MIN) and type(result) is int:
+                        raise integer_overflow(result)
+                    stack[-1] = result
+                elif opcode == _LOAD_GLOBAL:
+                    stack.append(global_values[argument])
+                elif opcode == _STORE_GLOBAL:
+                    global_values[argument] = stack.pop()
+                elif opcode == _STORE_ITEM:
+                    value = stack.pop()
+                    index = stack.pop()
+                    if index < 0:
+                        raise IndexError(index)
+                    stack.pop()[index] = value
+                elif opcode == _MUL:
+                    right = stack.pop()
+                    result = stack[-1] * right
+                    if (result > INTEGER_MAX or result < INTEGER_MIN) and type(result) is int:
+                        raise integer_overflow(result)
+                    stack[-1] = result
+                elif opcode == _GT:
+                    right = stack.pop()
+                    stack[-1] = stack[-1] > right
+                elif opcode == _GE:
+                    right = stack.pop()
+                    stack[-1] = stack[-1] >= right
+                elif opcode == _EQ:
+                    right = stack.pop()
+                    left = stack[-1]
+                    # указатели равны, только если ссылаются на одну запись
+                    stack[-1] = left is right if type(left) is list else left == right
+                elif opcode == _NE:
+                    right = stack.pop()
+                    left = stack[-1]
+                    stack[-1] = left is not right if type(left) is list else left != right
+                elif opcode == _MOD:
+                    right = stack.pop()
+                    stack[-1] %= right
+                elif opcode == _DIV:
+                    right = stack.pop()
+                    # единственное переполнение - MIN(INTEGER) DIV -1
+                    stack[-1] = checked_integer(stack[-1] // right)
+                elif opcode == _LOAD_REF:
+                    container, index = frame[argument]
+                    stack.append(container[index])
+                elif opcode == _STORE_REF:
+                    container, index = frame[argument]
+                    container[index] = stack.pop()
+                elif opcode == _LOAD_FIELD:
+                    stack[-1] = stack[-1][argument]
+                elif opcode == _LOAD_CONST:
+                    stack.append(constants[argument])
+                elif opcode == _CALL:
+                    if len(frames) >= MAX_CALL_DEPTH:
+                        raise RecursionError()
+                    count = self._functions[argument].parameters_count
+                    if count:
+                        callee_arguments = stack[-count:]
+                        del stack[-count:]
+                    else:
+                        callee_arguments = []
+                    frames.append((code, pc, frame))
+                    code = codes[argument]
+                    frame = self._new_frame(argument, callee_arguments)
+                    pc = 0
+                elif opcode == _RETURN or opcode == _RETURN_NONE:
+                    if opcode == _RETURN_NONE:
+                        stack.append(None)
+                    if not frames:
+                        return stack.pop()
+                    code, pc, frame = frames.pop()
+                elif opcode == _POP:
+                    stack.pop()
+                elif opcode == _JUMP_IF_TRUE:
+                    if stack.pop():
+                        pc = argument
+                elif opcode == _JUMP_IF_FALSE_OR_POP:
+                    if stack[-1]:
+                        stack.pop()
+                    else:
+                        pc = argument
+                elif opcode == _JUMP_IF_TRUE_OR_POP:
+                    if stack[-1]:
+                        pc = argument
+                    else:
+                        stack.pop()
+                elif opcode == _NOT:
+                    stack[-1] = not stack[-1]
+                elif opcode == _NEG:
+                    stack[-1] = checked_integer(-stack[-1])
+                elif opcode == _DIVIDE:
+                    right = stack.pop()
+                    stack[-1] /= right
+                elif opcode == _LOAD_FRAME:
+                    stack.append(frame)
+                elif opcode == _LOAD_GLOBALS:
+                    stack.append(global_values)
+                elif opcode == _MAKE_REF:
+                    index = stack.pop()
+                    if index < 0:
+                        raise IndexError(index)
+                    stack[-1] = (stack[-1], index)
+                elif opcode == _UNPACK_REF:
+                    container, index = stack.pop()
+                    stack.append(container)
+                    stack.append(index)
+                elif opcode == _STORE_COPY:
+                    value = stack.pop()
+                    index = stack.pop()
+                    if index < 0:
+                        raise IndexError(index)
+                    copy_into(stack.pop()[index], value, constants[argument])
+                elif opcode == _CASE_JUMP:
+                    value = stack.pop()
+                    table = constants[argument]
+                    target = table.targets.get(value)
+                    if target is None:
+                        target = table.default
+                        for low, high, range_target in table.ranges:
+                            if low <= value <= high:
+                                target = range_target
+                                break
+                    pc = target
+                elif opcode == _CALL_EXTERNAL:
+                    index, count = divmod(argument, ARGUMENT_COUNT_BASE)
+                    callee_arguments = stack[len(stack) - count:]
+                    del stack[len(stack) - count:]
+                    stack.append(self._externals[index](*callee_arguments))
+                elif opcode == _CALL_BUILTIN:
+                    index, count = divmod(argument, ARGUMENT_COUNT_BASE)
+                    callee_arguments = stack[len(stack) - count:]
+                    del stack[len(stack) - count:]
+                    stack.append(_BUILTINS[index](*callee_arguments))
+                elif opcode == _CALL_VALUE:
+                    callee = stack.pop(len(stack) - argument - 1)
+                    if callee is None:
+                        raise OberonTrap("вызов процедурной переменной со значением NIL")
+                    if len(frames) >= MAX_CALL_DEPTH:
+                        raise RecursionError()
+                    callee_index = self._function_indexes[id(callee)]
+                    if argument:
+                        callee_arguments = stack[-argument:]
+                        del stack[-argument:]
+                    else:
+                        callee_arguments = []
+                    frames.append((code, pc, frame))
+                    code = codes[callee_index]
+                    frame = self._new_frame(callee_index, callee_arguments)
+                    pc = 0
+                elif opcode == _SET_UNION:
+                    right = stack.pop()
+                    stack[-1] |= right
+                elif opcode == _SET_INTERSECTION:
+                    right = stack.pop()
+                    stack[-1] &= right
+                elif opcode == _SET_SYMMETRIC_DIFFERENCE:
+                    right = stack.pop()
+                    stack[-1] ^= right
+                elif opcode == _SET_DIFFERENCE:
+                    right = stack.pop()
+                    stack[-1] -= right
+                elif opcode == _SET_COMPLEMENT:
+                    stack[-1] = _FULL_SET - stack[-1]
+                elif opcode == _SET_ADD_ELEMENT:
+                    element = stack.pop()
+                    if element < 0 or element > 31:
+                        raise OberonTrap(f"элемент множества {element} вне диапазона 0..31")
+                    stack[-1] = stack[-1] | {element}
+                elif opcode == _SET_ADD_RANGE:
+                    high = stack.pop()
+                    low = stack.pop()
+                    if low < 0 or high > 31:
+                        raise OberonTrap(f"диапазон множества {low}..{high} вне диапазона 0..31")
+                    stack[-1] = stack[-1] | frozenset(range(low, high + 1))
+                elif opcode == _IN:
+                    right = stack.pop()
+                    stack[-1] = stack[-1] in right
+                elif opcode == _STR_COMPARE:
+                    right = text(stack.pop())
+                    stack[-1] = _relation(argument, text(stack[-1]), right)
+                elif opcode == _IS:
+                    value = stack[-1]
+                    stack[-1] = value is not None and _is_record_extension(value, constants[argument])
+                elif opcode == _TYPE_GUARD:
+                    value = stack[-1]
+                    if value is None or not _is_record_extension(value, constants[argument]):
+                        raise OberonTrap("охрана типа не выполнена")
+                elif opcode == _NEW_RECORD:
+                    stack.append(make_value(constants[argument]))
+                elif opcode == _ASSERT:
+                    if not stack.pop():
+                        raise OberonTrap("нарушено утверждение ASSERT")
+                elif opcode == _TRAP:
+                    raise OberonTrap(constants[argument])
+                else:
+                    raise OberonTrap(f"неизвестная команда {opcode}")
+        except OberonTrap as error:
+            raise OberonTrap(self._location(code, pc) + str(error)) from None
+        except ZeroDivisionError:
+            raise OberonTrap(self._location(code, pc) + "деление на ноль") from None
+        except IndexError:
+            raise OberonTrap(self._location(code, pc) + "индекс вне границ массива") from None
+        except TypeError:
+            raise OberonTrap(self._location(code, pc) + "обращение по указателю NIL") from None
+        except RecursionError:
+            raise OberonTrap(self._location(code, pc) + "слишком глубокая рекурсия") from None
+
+    def _location(self, code: list, pc: int) -> str:
+        for index, function_code in enumerate(self._codes):
+            if function_code is code:
+                return f"{self._functions[index].name}, команда {pc - 2}: "
+        return ""
+
+
+def run_module(module: BytecodeModule, output=None):
+    return VM(module, output).run()
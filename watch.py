@@ -0,0 +1,148 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, NamedTuple
+
+from build import (DEFAULT_SYMBOL_DIR, ModuleInfo, add_library_modules, build_dependency_graph,
+                   compile_module_file, find_module_files, scan_modules, topological_waves)
+from symbol_file import symbol_file_path, write_symbol_file
+
+
+DEFAULT_INTERVAL = 0.5
+
+
+class WatchCycle(NamedTuple):
+    changed: list[str]
+    compiled: list[str]
+    # зависимые модули, которые не перекомпилированы: интерфейс
+    # измененного модуля остался прежним
+    skipped: list[str]
+    # путь -> ошибка (None - успешно) для всех обработанных модулей
+    results: dict[str, str | None]
+
+
+# Режим наблюдения: файлы модулей периодически опрашиваются (mtime и
+# размер), и перекомпилируются только измененные модули. Модули, которые
+# их импортируют (обратный индекс импортов), перекомпилируются, только
+# если изменился интерфейс - экспортируемые объявления в файле символов.
+class Watcher:
+    def __init__(self, paths: list[str], symbol_dir: str = DEFAULT_SYMBOL_DIR, jobs: int = 1,
+                 output: Callable[[str], None] = print) -> None:
+        self._paths = paths
+        self._symbol_dir = symbol_dir
+        self._jobs = jobs
+        self._output = output
+        self._executor: ProcessPoolExecutor | None = None
+        self._stamps: dict[str, tuple[int, int]] = dict()
+        self._modules: dict[str, ModuleInfo] = dict()
+        self._interfaces: dict[str, bytes | None] = dict()
+        self._results: dict[str, str | None] = dict()
+        # имя модуля -> пути модулей, которые его импортируют
+        self._importers: dict[str, set[str]] = dict()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+
+    def _poll(self) -> tuple[list[str], list[str]]:
+        files = set(find_module_files(self._paths)) | set(self._modules)
+        stamps = dict()
+        for path in files:
+            try:
+                status = os.stat(path)
+            except OSError:
+                continue
+            stamps[path] = (status.st_mtime_ns, status.st_size)
+        changed = sorted(path for path, stamp in stamps.items() if self._stamps.get(path) != stamp)
+        removed = sorted(path for path in self._stamps if path not in stamps)
+        self._stamps = stamps
+        return changed, removed
+
+    def _update_modules(self, changed: list[str], removed: list[str]) -> set[str]:
+        dirty = set(changed)
+        for path in removed:
+            module = self._modules.pop(path)
+            self._results.pop(path, None)
+            if self._interfaces.pop(path, None) is not None:
+                # устаревший файл символов удаленного модуля больше не нужен
+                try:
+                    os.remove(symbol_file_path(self._symbol_dir, module.name))
+                except OSError:
+                    pass
+            dirty |= self._importers.get(module.name, set())
+        for module in scan_modules(changed):
+            self._modules[module.path] = module
+        for module in add_library_modules(list(self._modules.values())):
+            if module.path not in self._modules:
+                self._modules[module.path] = module
+                dirty.add(module.path)
+                status = os.stat(module.path)
+                self._stamps[module.path] = (status.st_mtime_ns, status.st_size)
+        self._importers = dict()
+        for module in self._modules.values():
+            for imported_name in module.imports:
+                self._importers.setdefault(imported_name, set()).add(module.path)
+        return {path for path in dirty if path in self._modules}
+
+    def _compile(self, paths: list[str]):
+        if self._jobs > 1 and len(paths) > 1:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(self._jobs)
+            return self._executor.map(compile_module_file, paths, [self._symbol_dir] * len(paths))
+        return (compile_module_file(path, self._symbol_dir) for path in paths)
+
+    def run_cycle(self, changed: list[str], removed: list[str] = ()) -> WatchCycle:
+        dirty = self._update_modules(changed, list(removed))
+        graph = build_dependency_graph(list(self._modules.values()))
+        compiled = []
+        results = dict()
+        for wave in topological_waves(graph):
+            ready = []
+            for path in wave:
+                if path not in dirty:
+                    continue
+                failed = [dependency for dependency in graph[path] if self._results.get(dependency) is not None]
+                if failed:
+                    results[path] = "не скомпилированы импортируемые модули: " + ", ".join(sorted(failed))
+                    self._results[path] = results[path]
+                    if self._interfaces.get(path) is not None:
+                        dirty |= self._importers.get(self._modules[path].name, set())
+                    self._interfaces[path] = None
+                    continue
+                ready.append(path)
+            for path, (compiled_module, _) in zip(ready, self._compile(ready)):
+                compiled.append(path)
+                results[path] = compiled_module.error
+                self._results[path] = compiled_module.error
+                if compiled_module.interface is not None:
+                    write_symbol_file(self._symbol_dir, compiled_module.module_name, compiled_module.interface)
+                if self._interfaces.get(path) != compiled_module.interface:
+                    dirty |= self._importers.get(self._modules[path].name, set())
+                self._interfaces[path] = compiled_module.interface
+        skipped = sorted({importer for path in changed if path in self._modules
+                          for importer in self._importers.get(self._modules[path].name, set())} - dirty)
+        return WatchCycle(changed, compiled, skipped, results)
+
+    def _report(self, cycle: WatchCycle):
+        for path, error in cycle.results.items():
+            self._output(f"{path}: успешно скомпилировано" if error is None else f"{path}: {error}")
+        self._output(f"изменено модулей: {len(cycle.changed)}, перекомпилировано: {len(cycle.compiled)}, "
+                     f"не перекомпилировано (интерфейс не изменился): {len(cycle.skipped)}")
+
+    def check_once(self) -> WatchCycle | None:
+        changed, removed = self._poll()
+        if not changed and not removed:
+            return None
+        cycle = self.run_cycle(changed, removed)
+        self._report(cycle)
+        return cycle
+
+    def watch(self, interval: float = DEFAULT_INTERVAL):
+        try:
+            while True:
+                self.check_once()
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()